@@ -0,0 +1,49 @@
+"""OCR job priority
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+OCR 公平调度: ocr_jobs 增加 priority 列。
+初始迁移未包含 ocr_jobs 表，这里按模型补建。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: str | None = '001'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            book_id UUID NOT NULL,
+            user_id UUID NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            total_pages INTEGER NOT NULL DEFAULT 0,
+            processed_pages INTEGER NOT NULL DEFAULT 0,
+            progress INTEGER NOT NULL DEFAULT 0,
+            output_key TEXT,
+            error TEXT,
+            started_at TIMESTAMPTZ,
+            completed_at TIMESTAMPTZ,
+            celery_task_id VARCHAR(50),
+            credits_consumed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    ''')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_ocr_jobs_book_id ON ocr_jobs (book_id)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_ocr_jobs_user_id ON ocr_jobs (user_id)')
+
+    # OCRPriority: 付费 0-3，免费 6-9；存量任务按免费普通处理
+    op.execute('ALTER TABLE ocr_jobs ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 7')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE ocr_jobs DROP COLUMN IF EXISTS priority')
@@ -0,0 +1,28 @@
+"""Books deleted_at index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+
+垃圾回收按 deleted_at 扫描过期的软删除书籍，只索引已删除的行。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: str | None = '002'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS idx_books_deleted_at ON books (deleted_at) '
+        'WHERE deleted_at IS NOT NULL'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_books_deleted_at')
@@ -0,0 +1,84 @@
+"""Storage blobs
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 00:00:00.000000
+
+以 storage_blobs 登记按内容去重的书籍文件与封面及其引用计数，取代 books.storage_ref_count。
+迁移时按现有书籍记录 (含软删除) 回填引用计数。
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: str | None = '003'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'storage_blobs',
+        sa.Column('kind', sa.String(10), nullable=False),
+        sa.Column('sha256', sa.String(64), nullable=False),
+        sa.Column('key', sa.Text(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('released_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'sha256'),
+    )
+    op.execute(
+        'CREATE INDEX idx_storage_blobs_released ON storage_blobs (released_at) '
+        'WHERE refcount = 0'
+    )
+
+    # 书籍文件: 每条记录一个引用，规范 Key 取原书 (非秒传引用) 中最早的一条
+    op.execute("""
+        INSERT INTO storage_blobs (kind, sha256, key, size, refcount)
+        SELECT 'book',
+               content_sha256,
+               (array_agg(minio_key ORDER BY canonical_book_id IS NOT NULL, created_at))[1],
+               MAX(size),
+               COUNT(*)
+        FROM books
+        WHERE content_sha256 IS NOT NULL AND minio_key IS NOT NULL
+        GROUP BY content_sha256
+    """)
+    # 封面: 以内容寻址 Key 中的哈希标识
+    op.execute(r"""
+        INSERT INTO storage_blobs (kind, sha256, key, refcount)
+        SELECT 'cover', cover_id, MIN(cover_image_key), COUNT(*)
+        FROM (
+            SELECT cover_image_key,
+                   regexp_replace(cover_image_key, '^.*/|\.[^.]*$', '', 'g') AS cover_id
+            FROM books
+            WHERE cover_image_key IS NOT NULL
+        ) covers
+        GROUP BY cover_id
+    """)
+
+    op.drop_column('books', 'storage_ref_count')
+
+
+def downgrade() -> None:
+    op.add_column(
+        'books',
+        sa.Column('storage_ref_count', sa.Integer(), nullable=False, server_default='1'),
+    )
+    # 引用计数记在原书上
+    op.execute("""
+        UPDATE books b
+        SET storage_ref_count = sb.refcount
+        FROM storage_blobs sb
+        WHERE sb.kind = 'book'
+          AND sb.sha256 = b.content_sha256
+          AND b.canonical_book_id IS NULL
+    """)
+    op.drop_index('idx_storage_blobs_released', table_name='storage_blobs')
+    op.drop_table('storage_blobs')
@@ -0,0 +1,103 @@
+"""Reading stats snapshot
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+新增 reading_stats 统计快照表，按现有 reading_daily 与 book_position 回填:
+本周/本月以迁移当天所在周期计，连续天数取截至最后阅读日的连续天数。
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: str | None = '004'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reading_stats',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('total_duration_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('finished_books', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_active_day', sa.Date(), nullable=True),
+        sa.Column('today_duration_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('streak_days', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('week_start', sa.Date(), nullable=True),
+        sa.Column('week_duration_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('week_days_active', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('month_start', sa.Date(), nullable=True),
+        sa.Column('month_duration_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('month_days_active', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('month_books_finished', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    op.execute("""
+        WITH periods AS (
+            SELECT CAST(date_trunc('week', CURRENT_DATE) AS date) AS week_start,
+                   CAST(date_trunc('month', CURRENT_DATE) AS date) AS month_start
+        ),
+        daily AS (
+            SELECT d.user_id,
+                   SUM(d.total_duration_ms) AS total_ms,
+                   MAX(d.day) AS last_day,
+                   (array_agg(d.total_duration_ms ORDER BY d.day DESC))[1] AS last_day_ms,
+                   SUM(d.total_duration_ms) FILTER (WHERE d.day >= p.week_start) AS week_ms,
+                   COUNT(*) FILTER (WHERE d.day >= p.week_start) AS week_days,
+                   SUM(d.total_duration_ms) FILTER (WHERE d.day >= p.month_start) AS month_ms,
+                   COUNT(*) FILTER (WHERE d.day >= p.month_start) AS month_days
+            FROM reading_daily d, periods p
+            GROUP BY d.user_id
+        ),
+        -- 按日期倒序编号，day + 序号 在截至最后阅读日的连续区间内相同
+        streaks AS (
+            SELECT user_id, COUNT(*) AS streak
+            FROM (
+                SELECT user_id,
+                       day + CAST(row_number() OVER (PARTITION BY user_id ORDER BY day DESC) AS integer) AS grp,
+                       MAX(day) OVER (PARTITION BY user_id) AS last_day
+                FROM reading_daily
+            ) r
+            WHERE grp = last_day + 1
+            GROUP BY user_id
+        ),
+        finished AS (
+            SELECT bp.user_id,
+                   COUNT(*) AS finished,
+                   COUNT(*) FILTER (WHERE bp.finished_at >= p.month_start) AS month_finished
+            FROM book_position bp, periods p
+            WHERE bp.finished_at IS NOT NULL
+            GROUP BY bp.user_id
+        )
+        INSERT INTO reading_stats (
+            user_id, total_duration_ms, finished_books,
+            last_active_day, today_duration_ms, streak_days,
+            week_start, week_duration_ms, week_days_active,
+            month_start, month_duration_ms, month_days_active, month_books_finished
+        )
+        SELECT u.id,
+               COALESCE(d.total_ms, 0), COALESCE(f.finished, 0),
+               d.last_day, COALESCE(d.last_day_ms, 0), COALESCE(s.streak, 0),
+               p.week_start, COALESCE(d.week_ms, 0), COALESCE(d.week_days, 0),
+               p.month_start, COALESCE(d.month_ms, 0), COALESCE(d.month_days, 0), COALESCE(f.month_finished, 0)
+        FROM users u
+        CROSS JOIN periods p
+        LEFT JOIN daily d ON d.user_id = u.id
+        LEFT JOIN streaks s ON s.user_id = u.id
+        LEFT JOIN finished f ON f.user_id = u.id
+        WHERE d.user_id IS NOT NULL OR f.user_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('reading_stats')
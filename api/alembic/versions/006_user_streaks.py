@@ -0,0 +1,75 @@
+"""User streaks maintained with daily stats
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+连续阅读天数改由 user_streaks 维护: last_read_date 改为本地日期，按 reading_daily 回填当前与最长连续天数，
+reading_stats 不再保存 streak_days。
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: str | None = '005'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'user_streaks',
+        'last_read_date',
+        type_=sa.Date(),
+        postgresql_using='CAST(last_read_date AS date)',
+    )
+
+    # day - 序号 在同一段连续阅读内相同 (gaps and islands)
+    op.execute("""
+        WITH islands AS (
+            SELECT user_id, MAX(day) AS last_day, COUNT(*) AS length
+            FROM (
+                SELECT user_id, day,
+                       day - CAST(row_number() OVER (PARTITION BY user_id ORDER BY day) AS integer) AS grp
+                FROM reading_daily
+            ) d
+            GROUP BY user_id, grp
+        )
+        INSERT INTO user_streaks (user_id, current_streak, longest_streak, last_read_date)
+        SELECT user_id,
+               (array_agg(length ORDER BY last_day DESC))[1],
+               MAX(length),
+               MAX(last_day)
+        FROM islands
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET current_streak = EXCLUDED.current_streak,
+            longest_streak = GREATEST(user_streaks.longest_streak, EXCLUDED.longest_streak),
+            last_read_date = EXCLUDED.last_read_date,
+            updated_at = now()
+    """)
+
+    op.drop_column('reading_stats', 'streak_days')
+
+
+def downgrade() -> None:
+    op.add_column(
+        'reading_stats',
+        sa.Column('streak_days', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.execute("""
+        UPDATE reading_stats rs
+        SET streak_days = us.current_streak
+        FROM user_streaks us
+        WHERE us.user_id = rs.user_id
+    """)
+    op.alter_column(
+        'user_streaks',
+        'last_read_date',
+        type_=sa.DateTime(timezone=True),
+        postgresql_using='CAST(last_read_date AS timestamptz)',
+    )
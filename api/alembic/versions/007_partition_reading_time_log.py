@@ -0,0 +1,130 @@
+"""Partition reading_time_log by month
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+reading_time_log 改为按 created_at 按月范围分区 (主键改为 (id, created_at))，时间列使用 BRIN 索引。
+为已有数据所在月份至之后 3 个月建立分区并迁移数据；之后的分区由 maintain_reading_log_partitions 预建。
+重建的表重新启用 001 的行级安全与 reading_time_log_policy (按父表访问时生效)。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: str | None = '006'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS = 'id, user_id, book_id, device_id, is_active, duration_ms, last_active_at, created_at, updated_at'
+
+LEGACY_INDEXES = (
+    'ix_reading_time_log_user_id',
+    'ix_reading_time_log_book_id',
+    'ix_reading_time_log_started_at',
+    'idx_reading_time_log_user_book',
+    'idx_reading_time_log_active',
+)
+
+
+def _create_indexes() -> None:
+    op.execute('CREATE INDEX ix_reading_time_log_user_id ON reading_time_log (user_id)')
+    op.execute('CREATE INDEX ix_reading_time_log_book_id ON reading_time_log (book_id)')
+    op.execute('CREATE INDEX idx_reading_time_log_user_book ON reading_time_log (user_id, book_id)')
+    op.execute(
+        'CREATE INDEX idx_reading_time_log_active ON reading_time_log (is_active) WHERE is_active = true'
+    )
+
+
+def _enable_rls() -> None:
+    op.execute('ALTER TABLE reading_time_log ENABLE ROW LEVEL SECURITY')
+    op.execute("""
+        CREATE POLICY reading_time_log_policy ON reading_time_log
+        FOR ALL
+        USING (user_id = current_user_id())
+    """)
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE reading_time_log RENAME TO reading_time_log_legacy')
+    op.execute('ALTER TABLE reading_time_log_legacy RENAME CONSTRAINT reading_time_log_pkey TO reading_time_log_legacy_pkey')
+    for name in LEGACY_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+    op.execute("""
+        CREATE TABLE reading_time_log (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            book_id uuid NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+            device_id varchar(64),
+            is_active boolean NOT NULL DEFAULT true,
+            duration_ms bigint NOT NULL DEFAULT 0,
+            last_active_at timestamptz NOT NULL DEFAULT now(),
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # 分区: 已有数据最早的月份 (UTC) 至当月之后 3 个月
+    op.execute("""
+        DO $$
+        DECLARE
+            first_month date;
+            last_month date := CAST(date_trunc('month', now() AT TIME ZONE 'UTC') AS date) + INTERVAL '3 months';
+            month date;
+        BEGIN
+            SELECT CAST(date_trunc('month', MIN(created_at) AT TIME ZONE 'UTC') AS date)
+            INTO first_month
+            FROM reading_time_log_legacy;
+            month := LEAST(
+                COALESCE(first_month, last_month),
+                CAST(date_trunc('month', now() AT TIME ZONE 'UTC') AS date)
+            );
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF reading_time_log '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'reading_time_log_p' || to_char(month, 'YYYYMM'),
+                    month || ' 00:00:00+00',
+                    CAST(month + INTERVAL '1 month' AS date) || ' 00:00:00+00'
+                );
+                month := month + INTERVAL '1 month';
+            END LOOP;
+        END $$
+    """)
+
+    op.execute(f'INSERT INTO reading_time_log ({COLUMNS}) SELECT {COLUMNS} FROM reading_time_log_legacy')
+    op.execute('DROP TABLE reading_time_log_legacy')
+
+    _create_indexes()
+    op.execute('CREATE INDEX idx_reading_time_log_created_brin ON reading_time_log USING brin (created_at)')
+    op.execute('CREATE INDEX idx_reading_time_log_last_active_brin ON reading_time_log USING brin (last_active_at)')
+    _enable_rls()
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE reading_time_log RENAME TO reading_time_log_partitioned')
+    for name in (*LEGACY_INDEXES, 'idx_reading_time_log_created_brin', 'idx_reading_time_log_last_active_brin'):
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER TABLE reading_time_log_partitioned RENAME CONSTRAINT reading_time_log_pkey TO reading_time_log_partitioned_pkey')
+
+    op.execute("""
+        CREATE TABLE reading_time_log (
+            id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+            user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            book_id uuid NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+            device_id varchar(64),
+            is_active boolean NOT NULL DEFAULT true,
+            duration_ms bigint NOT NULL DEFAULT 0,
+            last_active_at timestamptz NOT NULL DEFAULT now(),
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute(f'INSERT INTO reading_time_log ({COLUMNS}) SELECT {COLUMNS} FROM reading_time_log_partitioned')
+    op.execute('DROP TABLE reading_time_log_partitioned')
+    _create_indexes()
+    _enable_rls()
@@ -0,0 +1,39 @@
+"""Keyset pagination indexes
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+书籍、笔记、AI 会话、支付历史列表改为按 (排序键, id) 键集分页，建立 (user_id, 排序键, id) 复合索引，
+按用户定位后沿索引倒序读取一页，不再排序与跳过前面的行。
+(user_id, book_id, created_at, id) 覆盖原 idx_notes_user_book 的查询，原索引删除。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: str | None = '007'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXES = (
+    ('idx_books_user_created', 'books', 'user_id, created_at, id'),
+    ('idx_notes_user_created', 'notes', 'user_id, created_at, id'),
+    ('idx_notes_user_book_created', 'notes', 'user_id, book_id, created_at, id'),
+    ('idx_ai_conversations_user_updated', 'ai_conversations', 'user_id, updated_at, id'),
+    ('idx_payment_sessions_user_created', 'payment_sessions', 'user_id, created_at, id'),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+    op.execute('DROP INDEX IF EXISTS idx_notes_user_book')
+
+
+def downgrade() -> None:
+    op.execute('CREATE INDEX IF NOT EXISTS idx_notes_user_book ON notes (user_id, book_id)')
+    for name, _, _ in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,56 @@
+"""Partial covering indexes for list queries
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+按热点列表查询建立索引，使过滤、排序都由索引完成:
+
+- 书籍、笔记列表只列未删除的行: 键集分页索引改为 WHERE deleted_at IS NULL 的部分索引，
+  已删除的行不占索引空间，也不在扫描中被逐行过滤
+- 书籍的高亮、书签列表 (user_id, book_id, 未删除, 按 created_at): 原 (user_id, book_id) 索引需要回表过滤并排序
+- 最近阅读 (book_position 按 user_id、updated_at 倒序): INCLUDE 列表所需的 book_id、progress、finished_at，
+  仅扫描索引即可取得位置部分
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: str | None = '008'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# 008 建立的全量索引改为部分索引
+REPLACED = (
+    ('idx_books_user_created', 'books', 'user_id, created_at, id'),
+    ('idx_notes_user_created', 'notes', 'user_id, created_at, id'),
+    ('idx_notes_user_book_created', 'notes', 'user_id, book_id, created_at, id'),
+)
+
+ADDED = (
+    ('idx_highlights_user_book_created', 'highlights', 'user_id, book_id, created_at'),
+    ('idx_bookmarks_user_book_created', 'bookmarks', 'user_id, book_id, created_at'),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in REPLACED:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns}) WHERE deleted_at IS NULL')
+    for name, table, columns in ADDED:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns}) WHERE deleted_at IS NULL')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS idx_book_position_user_updated ON book_position (user_id, updated_at) '
+        'INCLUDE (book_id, progress, finished_at)'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_book_position_user_updated')
+    for name, _, _ in ADDED:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    for name, table, columns in REPLACED:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns})')
@@ -0,0 +1,29 @@
+"""OCR job free pages
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 00:00:00.000000
+
+OCR 计费: ocr_jobs 增加 free_pages 列，记录任务使用的每月免费页数。
+credits_consumed 改为记录任务当前占用的积分 (触发时按估算预留，识别前按实际页数结算，失败退回)。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: str | None = '009'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE ocr_jobs ADD COLUMN IF NOT EXISTS free_pages INTEGER NOT NULL DEFAULT 0')
+    # 每月免费页数按用户统计本月任务
+    op.execute('CREATE INDEX IF NOT EXISTS idx_ocr_jobs_user_created ON ocr_jobs (user_id, created_at)')
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_ocr_jobs_user_created')
+    op.execute('ALTER TABLE ocr_jobs DROP COLUMN IF EXISTS free_pages')
@@ -0,0 +1,29 @@
+"""books blob registered
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 00:00:00.000000
+
+books 增加 blob_registered 列，标记书籍是否已持有 storage_blobs 中书籍文件的引用。
+导入任务据此判断是否需要登记引用，删除书籍时只释放已登记的引用；
+content_sha256 可能先于登记写入，不能作为判断依据。
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: str | None = '010'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE books ADD COLUMN IF NOT EXISTS blob_registered BOOLEAN NOT NULL DEFAULT false')
+    # 此前 content_sha256 只在登记引用时写入
+    op.execute('UPDATE books SET blob_registered = true WHERE content_sha256 IS NOT NULL')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE books DROP COLUMN IF EXISTS blob_registered')
@@ -23,12 +23,14 @@ from app.models.user import User
 __all__ = [
     "get_db_session",
     "get_current_user",
+    "get_current_user_id",
     "get_current_user_optional",
     "get_current_active_user",
     "get_current_admin_user",
     "get_device_id",
     "get_client_ip",
     "CurrentUser",
+    "CurrentUserId",
     "CurrentActiveUser",
     "CurrentAdminUser",
     "OptionalUser",
@@ -74,6 +76,23 @@ async def get_current_user(
     return user
 
 
+async def get_current_user_id(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
+) -> str:
+    """
+    获取当前用户 ID (只校验 Token，不查询数据库)
+
+    用于阅读心跳等高频接口；账号停用要到 Token 过期后才对这些接口生效。
+    """
+    if credentials is None:
+        raise UnauthorizedException()
+
+    payload = verify_token(credentials.credentials, token_type="access")
+    if payload is None:
+        raise TokenInvalidException()
+    return str(payload.sub)
+
+
 async def get_current_user_optional(
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
     db: Annotated[AsyncSession, Depends(get_db_session)],
@@ -145,6 +164,7 @@ def get_client_ip(request: Request) -> str:
 
 # 类型别名
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUserId = Annotated[str, Depends(get_current_user_id)]
 CurrentActiveUser = Annotated[User, Depends(get_current_active_user)]
 CurrentAdminUser = Annotated[User, Depends(get_current_admin_user)]
 OptionalUser = Annotated[User | None, Depends(get_current_user_optional)]
@@ -56,21 +56,26 @@ async def list_sessions(
     book_id: str | None = Query(None, description="按书籍筛选"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="分页游标 (上一页的 next_cursor，给出时忽略 page)"),
+    with_total: bool | None = Query(None, description="是否统计总数 (默认页码分页统计、游标分页不统计)"),
 ) -> AISessionListResponse:
     """获取 AI 会话列表"""
     service = AIService(db)
-    sessions, total = await service.list_sessions(
+    result = await service.list_sessions(
         user_id=str(current_user.id),
         book_id=book_id,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        with_total=with_total,
     )
     return AISessionListResponse(
-        items=[_session_to_response(s) for s in sessions],
-        total=total,
+        items=[_session_to_response(s) for s in result.items],
+        total=result.total,
         page=page,
         page_size=page_size,
-        has_more=page * page_size < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
     )
 
 
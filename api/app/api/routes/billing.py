@@ -98,13 +98,17 @@ async def get_payment_history(
     db: Annotated[AsyncSession, Depends(get_db_session)],
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="分页游标 (上一页的 next_cursor，给出时忽略 page)"),
+    with_total: bool | None = Query(None, description="是否统计总数 (默认页码分页统计、游标分页不统计)"),
 ) -> PaymentHistoryResponse:
     """获取支付历史"""
     service = BillingService(db)
-    sessions, total = await service.get_payment_history(
+    result = await service.get_payment_history(
         user_id=str(current_user.id),
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        with_total=with_total,
     )
 
     return PaymentHistoryResponse(
@@ -119,12 +123,13 @@ async def get_payment_history(
                 created_at=s.created_at,
                 completed_at=s.completed_at,
             )
-            for s in sessions
+            for s in result.items
         ],
-        total=total,
+        total=result.total,
         page=page,
         page_size=page_size,
-        has_more=page * page_size < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
     )
 
 
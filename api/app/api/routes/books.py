@@ -4,12 +4,12 @@
 处理书籍上传、下载、删除等功能。
 """
 
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import CurrentUser, get_db_session
+from app.api.deps import CurrentAdminUser, CurrentUser, get_db_session
 from app.api.schemas.book import (
     BookContentResponse,
     BookCoverResponse,
@@ -112,27 +112,32 @@ async def list_books(
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
     search: str | None = Query(None, max_length=100, description="搜索关键词"),
     shelf_id: str | None = Query(None, description="书架 ID"),
+    cursor: str | None = Query(None, description="分页游标 (上一页的 next_cursor，给出时忽略 page)"),
+    with_total: bool | None = Query(None, description="是否统计总数 (默认页码分页统计、游标分页不统计)"),
 ) -> BookListResponse:
     """
     获取书籍列表
 
-    支持分页、搜索和书架过滤。
+    支持分页 (页码或游标)、搜索和书架过滤。
     """
     service = BookService(db)
-    books, total = await service.list_books(
+    result = await service.list_books(
         user_id=str(current_user.id),
         page=page,
         page_size=page_size,
         search=search,
         shelf_id=shelf_id,
+        cursor=cursor,
+        with_total=with_total,
     )
 
     return BookListResponse(
-        items=[_book_to_response(b) for b in books],
-        total=total,
+        items=[_book_to_response(b) for b in result.items],
+        total=result.total,
         page=page,
         page_size=page_size,
-        has_more=page * page_size < total,
+        has_more=result.has_more,
+        next_cursor=result.next_cursor,
     )
 
 
@@ -175,15 +180,18 @@ async def get_book_cover(
     book_id: str,
     current_user: CurrentUser,
     db: Annotated[AsyncSession, Depends(get_db_session)],
+    size: Literal["small", "medium", "large"] = Query("medium", description="封面尺寸"),
+    fmt: Literal["webp", "avif"] = Query("webp", alias="format", description="图片格式"),
 ) -> BookCoverResponse:
-    """获取书籍封面 URL"""
+    """
+    获取书籍封面 URL
+
+    书架网格使用 small，详情页使用 medium；变体不存在时回退为 JPEG 封面。
+    """
     service = BookService(db)
-    result = await service.get_cover_url(book_id, str(current_user.id))
+    result = await service.get_cover_url(book_id, str(current_user.id), size=size, fmt=fmt)
 
-    return BookCoverResponse(
-        cover_url=result["cover_url"],
-        expires_in=result["expires_in"],
-    )
+    return BookCoverResponse(**result)
 
 
 @router.delete("/{book_id}", response_model=BookDeleteResponse)
@@ -221,6 +229,7 @@ def _book_to_response(book) -> BookResponse:
             page_count=book.meta.get("page_count"),
             toc=book.meta.get("toc"),
             cover_color=book.meta.get("cover_color"),
+            cover_blurhash=(book.meta.get("cover") or {}).get("blurhash"),
             is_scanned=book.meta.get("is_scanned"),
             dpi=book.meta.get("dpi"),
         )
@@ -254,6 +263,18 @@ def _book_to_response(book) -> BookResponse:
 # ============================================================================
 
 
+@router.get("/ocr/queue/stats")
+async def get_ocr_queue_stats(_admin: CurrentAdminUser) -> dict:
+    """
+    OCR 调度队列统计 (管理员)
+
+    返回付费/免费等级的排队长度与排队等待时间 p50/p90/p99 (秒)。
+    """
+    from app.services.ocr_scheduler import OcrQueue
+
+    return await OcrQueue().stats()
+
+
 @router.post("/{book_id}/ocr")
 async def trigger_ocr(
     book_id: str,
@@ -293,11 +314,13 @@ async def get_ocr_status(
 
     return OcrStatusResponse(
         status=status["ocr_status"] or "none",
-        progress=0,  # TODO: 从任务获取进度
-        total_pages=0,
-        processed_pages=0,
+        progress=status["progress"],
+        total_pages=status["total_pages"],
+        processed_pages=status["processed_pages"],
+        queue_position=status["queue_position"],
+        estimated_minutes=status["estimated_minutes"],
         error=status["error_message"],
-        started_at=None,
+        started_at=status["started_at"],
         completed_at=status["completed_at"],
     )
 
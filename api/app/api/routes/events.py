@@ -0,0 +1,83 @@
+"""
+事件推送 API 路由
+
+通过 SSE 推送书籍处理与 OCR 进度，取代轮询状态接口。
+"""
+
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.exceptions import TokenInvalidException
+from app.core.security import verify_token
+from app.services.progress_service import HEARTBEAT, format_sse, get_progress_hub
+
+router = APIRouter(prefix="/events", tags=["事件"])
+
+
+@router.get("/stream")
+async def stream_events(
+    token: str = Query(..., description="Access Token (EventSource 无法设置请求头)"),
+    book_id: str | None = Query(None, description="只接收指定书籍的事件"),
+) -> StreamingResponse:
+    """
+    订阅处理进度 (Server-Sent Events)
+
+    事件类型:
+    - processing: 入库处理阶段 (stage/status/progress)
+    - ocr: OCR 排队与处理 (status/queue_position/total_pages/pages_done/eta_seconds)
+
+    只校验 JWT 签名与有效期，连接期间不占用数据库会话。
+    指定 book_id 且该书有排队或运行中的 OCR 任务时，先推送一次当前状态。
+    """
+    payload = verify_token(token, token_type="access")
+    if payload is None:
+        raise TokenInvalidException()
+    user_id = str(payload.sub)
+
+    return StreamingResponse(
+        _event_stream(user_id, book_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 缓冲，事件立即下发
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _event_stream(user_id: str, book_id: str | None) -> AsyncIterator[str]:
+    async with get_progress_hub().subscribe(user_id) as queue:
+        yield "retry: 5000\n\n"
+
+        if book_id:
+            snapshot = await _ocr_snapshot(user_id, book_id)
+            if snapshot:
+                yield format_sse(snapshot)
+
+        while True:
+            event = await queue.get()
+            if event is HEARTBEAT:
+                yield ": ping\n\n"
+            elif book_id is None or event.get("book_id") == book_id:
+                yield format_sse(event)
+
+
+async def _ocr_snapshot(user_id: str, book_id: str) -> dict | None:
+    """当前 OCR 排队/处理状态 (只读 Redis)"""
+    from app.services.ocr_scheduler import OcrQueue
+
+    live = await OcrQueue().get_status(book_id)
+    if not live or live["user_id"] != user_id:
+        return None
+    return {
+        "kind": "ocr",
+        "book_id": book_id,
+        "stage": "ocr",
+        "status": live["state"],
+        "queue_position": live["queue_position"],
+        "total_pages": live["total_pages"],
+        "pages_done": live["processed_pages"],
+        "eta_seconds": live["estimated_seconds"],
+    }
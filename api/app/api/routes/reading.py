@@ -13,7 +13,7 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import CurrentUser, get_db_session
+from app.api.deps import CurrentUser, CurrentUserId, get_db_session
 from app.api.schemas.reading import (
     BookPositionResponse,
     BookPositionUpdate,
@@ -74,24 +74,25 @@ async def get_book_position(
 async def update_book_position(
     book_id: Annotated[str, Path(description="书籍 ID")],
     request: BookPositionUpdate,
-    current_user: CurrentUser,
+    user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db_session)],
 ) -> BookPositionResponse:
     """
     更新书籍阅读位置
 
     注意：正常情况下，阅读位置通过 PowerSync 同步。
-    此接口用于需要立即服务端确认的场景。
+    此接口用于需要立即服务端确认的场景；位置先写入缓冲，数秒内批量写回数据库。
     """
     service = ReadingService(db)
     position = await service.update_position(
-        user_id=str(current_user.id),
+        user_id=user_id,
         book_id=book_id,
         progress=request.progress,
         last_cfi=request.last_cfi,
         last_page=request.last_page,
         total_pages=request.total_pages,
         device_id=request.device_id,
+        client_updated_at=request.updated_at,
     )
 
     return BookPositionResponse(
@@ -189,7 +190,7 @@ async def get_active_session(
 async def update_reading_session(
     session_id: Annotated[str, Path(description="会话 ID")],
     request: ReadingTimeLogUpdate,
-    current_user: CurrentUser,
+    user_id: CurrentUserId,
     db: Annotated[AsyncSession, Depends(get_db_session)],
 ) -> ReadingTimeLogResponse:
     """
@@ -197,11 +198,12 @@ async def update_reading_session(
 
     用于心跳更新（定期汇报时长）或结束会话。
     建议客户端每 30 秒发送一次心跳。
+    心跳只校验 Token 并写入 Redis 缓冲 (一次往返)，不访问数据库。
     """
     service = ReadingService(db)
     session = await service.update_reading_session(
         session_id=session_id,
-        user_id=str(current_user.id),
+        user_id=user_id,
         duration_ms=request.duration_ms,
         is_active=request.is_active,
     )
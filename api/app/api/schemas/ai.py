@@ -38,10 +38,13 @@ class AISessionListResponse(BaseModel):
     """AI 会话列表响应"""
 
     items: list[AISessionResponse]
-    total: int
+    # 游标分页默认不统计总数
+    total: int | None
     page: int
     page_size: int
     has_more: bool
+    # 下一页游标，原样传回 cursor 参数
+    next_cursor: str | None = None
 
 
 # ============================================================================
@@ -71,10 +71,13 @@ class PaymentHistoryResponse(BaseModel):
     """支付历史列表"""
 
     items: list[PaymentHistoryItem]
-    total: int
+    # 游标分页默认不统计总数
+    total: int | None
     page: int
     page_size: int
     has_more: bool
+    # 下一页游标，原样传回 cursor 参数
+    next_cursor: str | None = None
 
 
 # ============================================================================
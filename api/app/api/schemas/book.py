@@ -77,6 +77,7 @@ class BookMetaResponse(BaseModel):
     page_count: int | None = None
     toc: list[dict[str, Any]] | None = None
     cover_color: str | None = None
+    cover_blurhash: str | None = None
     is_scanned: bool | None = None
     dpi: int | None = None
 
@@ -124,10 +125,13 @@ class BookListResponse(BaseModel):
     """书籍列表响应"""
 
     items: list[BookResponse]
-    total: int
+    # 游标分页默认不统计总数
+    total: int | None
     page: int
     page_size: int
     has_more: bool
+    # 下一页游标，原样传回 cursor 参数
+    next_cursor: str | None = None
 
 
 class BookContentResponse(BaseModel):
@@ -144,6 +148,10 @@ class BookCoverResponse(BaseModel):
 
     cover_url: str = Field(..., description="封面图片 URL")
     expires_in: int = Field(..., description="URL 有效期(秒)")
+    content_type: str = Field("image/jpeg", description="封面格式 (变体不存在时回退为 JPEG)")
+    blurhash: str | None = Field(None, description="BlurHash 占位图")
+    width: int | None = Field(None, description="原始封面宽度")
+    height: int | None = Field(None, description="原始封面高度")
 
 
 class OcrStatusResponse(BaseModel):
@@ -153,6 +161,8 @@ class OcrStatusResponse(BaseModel):
     progress: int  # 0-100
     total_pages: int
     processed_pages: int
+    queue_position: int | None = None
+    estimated_minutes: int | None = None
     error: str | None
     started_at: datetime | None
     completed_at: datetime | None
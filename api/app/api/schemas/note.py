@@ -67,10 +67,13 @@ class NoteListResponse(BaseModel):
     """笔记列表响应"""
 
     items: list[NoteResponse]
-    total: int
+    # 游标分页默认不统计总数
+    total: int | None
     page: int
     page_size: int
     has_more: bool
+    # 下一页游标，原样传回 cursor 参数
+    next_cursor: str | None = None
 
 
 # ============================================================================
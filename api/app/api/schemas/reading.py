@@ -26,6 +26,9 @@ class BookPositionUpdate(BookPositionBase):
     """更新阅读位置请求"""
 
     device_id: str | None = Field(None, max_length=64, description="设备 ID")
+    updated_at: datetime | None = Field(
+        None, description="客户端记录该位置的时间 (离线补传时用于与其他设备的冲突判断)"
+    )
 
 
 class BookPositionResponse(BookPositionBase):
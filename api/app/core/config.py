@@ -68,6 +68,8 @@ class DatabaseSettings(BaseSettings):
     database_pool_size: int = 20
     database_max_overflow: int = 10
     database_echo: bool = False
+    # 单个请求的 SQL 语句数预算，超出时记录警告 (0 表示不检查)
+    database_query_budget: int = 30
 
 
 class RedisSettings(BaseSettings):
@@ -95,6 +97,10 @@ class MinioSettings(BaseSettings):
     minio_bucket_covers: str = "athena-covers"
     minio_bucket_ocr: str = "athena-ocr"
 
+    # Range 读取：块大小 (bytes) 与每个文件对象缓存的块数
+    minio_range_block_size: int = 256 * 1024
+    minio_range_cache_blocks: int = 64
+
     @computed_field
     @property
     def minio_url(self) -> str:
@@ -149,6 +155,32 @@ class CelerySettings(BaseSettings):
     celery_task_soft_time_limit: int = 300
     celery_task_time_limit: int = 360
 
+    # Worker 本地文件缓存 (同一主机的 Worker 共享目录)
+    worker_cache_dir: str = "/tmp/athena-worker-cache"
+    worker_cache_max_mb: int = 20480
+
+    # 软删除书籍的保留天数与垃圾回收批次
+    book_retention_days: int = 30
+    gc_batch_size: int = 500
+    # 单次垃圾回收的时间预算 (秒)，需小于任务软超时；积压未清完时续排下一轮
+    gc_time_budget_seconds: int = 240
+    # 孤立文件与已释放文件的宽限期 (小时)：更新的对象可能是进行中的上传，不删除
+    orphan_grace_hours: int = 24
+    # 导入/OCR 超过该小时数未更新的书籍视为 Worker 丢失，标记为失败
+    stalled_book_hours: int = 6
+
+
+class CalibreSettings(BaseSettings):
+    """Calibre 转换服务配置"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # 常驻转换服务的 Unix Socket (Calibre 容器与转换 Worker 共同挂载)
+    calibre_socket_path: str = "/run/athena-calibre/convert.sock"
+    # 与 Calibre 容器共享的文件目录 (路径在两侧必须一致)
+    calibre_shared_dir: str = "/tmp/athena-worker-cache"
+    calibre_convert_timeout: int = 300
+
 
 class OcrSettings(BaseSettings):
     """OCR 配置"""
@@ -159,6 +191,39 @@ class OcrSettings(BaseSettings):
     ocr_gpu_enabled: bool = False
     ocr_max_pages: int = 2000
     ocr_timeout_seconds: int = 1800
+    # 入库流水线检测到图片型 PDF 时自动排队 OCR (会消耗配额)
+    ocr_auto_on_ingest: bool = False
+    # 公平调度: 全局同时运行的 OCR 任务数 (应与 OCR Worker 总并发一致)
+    ocr_dispatch_slots: int = 2
+    # 每个用户同时运行的 OCR 任务上限
+    ocr_user_concurrency_paid: int = 2
+    ocr_user_concurrency_free: int = 1
+    # 付费/免费等级之间的调度权重
+    ocr_paid_weight: int = 3
+    ocr_free_weight: int = 1
+    # 尚无完成任务样本时预计时间使用的单 Worker 每秒页数
+    ocr_default_pages_per_sec: float = 0.5
+    # 按实际 OCR 的页数扣减积分 (已有文字层的页面不计费)
+    ocr_credits_per_page: int = 1
+
+
+class ReadingSettings(BaseSettings):
+    """阅读进度与时长配置"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # 阅读会话心跳先写入 Redis，按该间隔 (秒) 批量写回数据库
+    reading_flush_interval_seconds: int = 60
+    reading_flush_batch_size: int = 1000
+    # 会话与阅读位置缓冲的保留时间 (秒)，超过该时间没有更新即过期
+    reading_session_ttl_seconds: int = 86400
+    # 阅读位置先写入 Redis，按该间隔 (秒) 批量写回数据库
+    reading_position_flush_seconds: int = 5
+    # 书籍归属缓存时间 (秒)，书籍删除时主动失效
+    reading_owner_cache_ttl_seconds: int = 3600
+    # 阅读时长记录按月分区: 保留天数 (整月过期后删除分区)、提前建立的分区月数
+    reading_log_retention_days: int = 365
+    reading_log_partitions_ahead: int = 3
 
 
 class AiSettings(BaseSettings):
@@ -224,7 +289,9 @@ class Settings(BaseSettings):
     auth: AuthSettings = Field(default_factory=AuthSettings)
     powersync: PowerSyncSettings = Field(default_factory=PowerSyncSettings)
     celery: CelerySettings = Field(default_factory=CelerySettings)
+    calibre: CalibreSettings = Field(default_factory=CalibreSettings)
     ocr: OcrSettings = Field(default_factory=OcrSettings)
+    reading: ReadingSettings = Field(default_factory=ReadingSettings)
     ai: AiSettings = Field(default_factory=AiSettings)
     smtp: SmtpSettings = Field(default_factory=SmtpSettings)
     stripe: StripeSettings = Field(default_factory=StripeSettings)
@@ -8,7 +8,7 @@ from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Any
 
-from sqlalchemy import text
+from sqlalchemy import Engine, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -17,6 +17,7 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.core.config import settings
+from app.core.instrumentation import InstrumentedQueuePool, instrument_engine
 
 
 def create_engine(
@@ -45,6 +46,7 @@ def create_engine(
     if poolclass is not None:
         engine_kwargs["poolclass"] = poolclass
     else:
+        engine_kwargs["poolclass"] = InstrumentedQueuePool
         engine_kwargs["pool_size"] = pool_size or settings.database.database_pool_size
         engine_kwargs["max_overflow"] = max_overflow or settings.database.database_max_overflow
         engine_kwargs["pool_pre_ping"] = True
@@ -53,8 +55,9 @@ def create_engine(
     return create_async_engine(url, **engine_kwargs)
 
 
-# 全局引擎实例
+# 全局引擎实例 (请求内的语句计入请求级指标)
 engine = create_engine()
+instrument_engine(engine)
 
 # 会话工厂
 async_session_factory = async_sessionmaker(
@@ -157,3 +160,31 @@ async def init_db() -> None:
 async def close_db() -> None:
     """关闭数据库连接池"""
     await engine.dispose()
+
+
+# ============================================================================
+# 同步引擎 (Celery 任务)
+# ============================================================================
+
+_sync_engine: Engine | None = None
+
+
+def get_sync_engine() -> Engine:
+    """
+    获取 Celery 任务使用的同步引擎
+
+    延迟到首次使用时创建 (即 fork 之后)，每个 Worker 进程一个连接池，
+    任务之间复用连接，而不是每次更新都新建引擎。
+    """
+    global _sync_engine
+    if _sync_engine is None:
+        from sqlalchemy import create_engine as create_sync_engine
+
+        _sync_engine = create_sync_engine(
+            settings.database.database_url_sync,
+            pool_size=5,
+            max_overflow=5,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+        )
+    return _sync_engine
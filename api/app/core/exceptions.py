@@ -330,6 +330,13 @@ class RateLimitedException(AthenaException):
         super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="rate_limited")
 
 
+class InvalidCursorException(AthenaException):
+    """分页游标无效"""
+
+    def __init__(self) -> None:
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+
+
 class InternalErrorException(AthenaException):
     """服务器内部错误"""
 
@@ -0,0 +1,159 @@
+"""
+请求级数据库指标
+
+统计每个 HTTP 请求执行的 SQL 语句数、数据库耗时与等待连接池的时间:
+
+- 采集: 异步引擎的 before/after_cursor_execute 事件累加到当前请求的 ContextVar
+  (引擎事件在 greenlet 中同步执行，沿用调用方的上下文)；等待连接的时间由连接池取连接时计时
+- 输出: 响应头 Server-Timing (db / db-pool)，浏览器开发者工具、curl -i 可直接查看；
+  Prometheus 直方图按方法与路由模板分组，由 /metrics 暴露
+- 预算: 语句数超过 database_query_budget 时记录警告 (N+1、重复提交)
+
+请求之外 (Celery 任务、启动检查) 执行的语句不计入。Server-Timing 在响应开始时写入，
+流式响应与后台任务之后执行的语句只计入直方图。
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+LABELS = ("method", "route")
+
+DB_STATEMENTS = Histogram(
+    "athena_request_db_statements",
+    "每个请求执行的 SQL 语句数",
+    LABELS,
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_SECONDS = Histogram(
+    "athena_request_db_seconds",
+    "每个请求的数据库耗时 (秒)",
+    LABELS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "athena_request_db_pool_wait_seconds",
+    "每个请求等待数据库连接的时间 (秒)",
+    LABELS,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+@dataclass
+class RequestDbStats:
+    """一个请求的数据库用量"""
+
+    statements: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+
+
+_current: ContextVar[RequestDbStats | None] = ContextVar("request_db_stats", default=None)
+
+
+def current_stats() -> RequestDbStats | None:
+    """当前请求的数据库用量 (请求之外为 None)"""
+    return _current.get()
+
+
+def server_timing(stats: RequestDbStats) -> str:
+    """Server-Timing 响应头 (毫秒)"""
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+        f"db-pool;dur={stats.pool_wait_seconds * 1000:.1f}"
+    )
+
+
+def route_label(scope: Scope) -> str:
+    """路由模板 (如 /api/v1/books/{book_id})，未匹配到路由时为 unmatched，避免按实际路径产生大量标签"""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """记录请求等待连接时间的连接池 (含连接池不足时新建连接的时间)"""
+
+    def _do_get(self) -> Any:
+        stats = _current.get()
+        if stats is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats.pool_wait_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """为引擎注册语句计数与计时事件"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:  # noqa: ANN001
+        if _current.get() is not None:
+            context._athena_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:  # noqa: ANN001
+        stats = _current.get()
+        started = getattr(context, "_athena_started", None)
+        if stats is None or started is None:
+            return
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+class DbMetricsMiddleware:
+    """请求级数据库指标中间件 (纯 ASGI，不改变响应体的发送方式)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = _current.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            record(scope["method"], route_label(scope), stats)
+
+
+def record(method: str, route: str, stats: RequestDbStats) -> None:
+    """写入直方图，超出查询预算时记录警告"""
+    DB_STATEMENTS.labels(method, route).observe(stats.statements)
+    DB_SECONDS.labels(method, route).observe(stats.db_seconds)
+    DB_POOL_WAIT_SECONDS.labels(method, route).observe(stats.pool_wait_seconds)
+
+    budget = settings.database.database_query_budget
+    if budget and stats.statements > budget:
+        logger.warning(
+            "Query budget exceeded",
+            method=method,
+            route=route,
+            statements=stats.statements,
+            budget=budget,
+            db_ms=round(stats.db_seconds * 1000, 1),
+            pool_wait_ms=round(stats.pool_wait_seconds * 1000, 1),
+        )
@@ -0,0 +1,108 @@
+"""
+列表分页
+
+列表接口支持两种分页方式，排序均为 (排序键, id) 倒序 (新的在前):
+
+- 游标: cursor 为上一页返回的 next_cursor，以 WHERE (排序键, id) < (上一页最后一行) 沿复合索引
+  (user_id, 排序键, id) 直接定位，深翻页不变慢；默认不统计总数
+- 页码 (兼容旧客户端): OFFSET 分页；总数只在无法由本页推算时才执行 COUNT
+
+两种方式都多取一行判断是否还有下一页，不依赖总数。
+游标对客户端不透明 (base64url 编码的 JSON)，只能原样传回。
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, TypeVar
+from uuid import UUID
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.core.exceptions import InvalidCursorException
+
+T = TypeVar("T")
+
+
+@dataclass
+class Page(Generic[T]):
+    """一页结果"""
+
+    items: list[T]
+    # 未统计时为 None
+    total: int | None
+    has_more: bool
+    # 下一页游标 (没有下一页时为 None)
+    next_cursor: str | None
+
+
+def encode_cursor(sort_value: datetime, row_id: UUID | str) -> str:
+    """(排序键, id) → 游标"""
+    raw = json.dumps({"k": sort_value.isoformat(), "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    游标 → (排序键, id)
+
+    Raises:
+        InvalidCursorException: 游标被篡改或格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["k"]), UUID(data["id"])
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorException() from e
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    page: int = 1,
+    page_size: int = 20,
+    cursor: str | None = None,
+    with_total: bool | None = None,
+) -> Page[Any]:
+    """
+    按 (排序键, id) 倒序分页
+
+    Args:
+        query: 已加过滤条件、未排序的查询 (结果为单个实体)
+        cursor: 上一页的 next_cursor；给出时忽略 page
+        with_total: 是否统计总数，默认页码分页统计、游标分页不统计
+    """
+    ordered = query.order_by(sort_column.desc(), id_column.desc())
+    offset = 0
+    if cursor:
+        ordered = ordered.where(tuple_(sort_column, id_column) < decode_cursor(cursor))
+    else:
+        offset = (page - 1) * page_size
+        ordered = ordered.offset(offset)
+
+    rows = list((await db.execute(ordered.limit(page_size + 1))).scalars().all())
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    if with_total is None:
+        with_total = cursor is None
+    total = None
+    if with_total:
+        if not cursor and not has_more and (items or offset == 0):
+            # 最后一页，由偏移量推算
+            total = offset + len(items)
+        else:
+            total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar() or 0
+
+    return Page(items=items, total=total, has_more=has_more, next_cursor=next_cursor)
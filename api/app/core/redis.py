@@ -0,0 +1,38 @@
+"""
+Redis/Valkey 客户端
+
+API 进程使用异步客户端，Celery 任务使用同步客户端。
+两者都按进程延迟创建并复用连接池。
+"""
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+_async_client: aioredis.Redis | None = None
+_sync_client: redis.Redis | None = None
+
+
+def get_redis() -> aioredis.Redis:
+    """获取异步 Redis 客户端 (API 进程)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.redis.redis_url, decode_responses=True)
+    return _async_client
+
+
+def get_sync_redis() -> redis.Redis:
+    """获取同步 Redis 客户端 (Celery 任务)"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.redis.redis_url, decode_responses=True)
+    return _sync_client
+
+
+async def close_redis() -> None:
+    """关闭异步客户端连接池"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -11,10 +11,15 @@ import structlog
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from prometheus_client import make_asgi_app
+from starlette.types import Receive, Scope, Send
 
 from app.core.config import settings
 from app.core.database import close_db, init_db
 from app.core.exceptions import AthenaException
+from app.core.instrumentation import DbMetricsMiddleware
+from app.core.redis import close_redis
+from app.services.progress_service import close_progress_hub
 
 # 配置结构化日志
 structlog.configure(
@@ -53,6 +58,9 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
     await close_db()
     logger.info("Database connection pool closed")
 
+    await close_progress_hub()
+    await close_redis()
+
 
 def create_app() -> FastAPI:
     """创建 FastAPI 应用实例"""
@@ -76,6 +84,9 @@ def create_app() -> FastAPI:
         expose_headers=["X-Request-ID", "X-RateLimit-Remaining"],
     )
 
+    # 请求级数据库指标 (Server-Timing 响应头、Prometheus 直方图、查询预算)
+    app.add_middleware(DbMetricsMiddleware)
+
     # 注册异常处理器
     @app.exception_handler(AthenaException)
     async def athena_exception_handler(
@@ -92,6 +103,7 @@ def create_app() -> FastAPI:
         auth,
         billing,
         books,
+        events,
         export,
         invite,
         notes,
@@ -112,12 +124,25 @@ def create_app() -> FastAPI:
     app.include_router(invite.router, prefix="/api/v1")
     app.include_router(export.router, prefix="/api/v1")
     app.include_router(users.router, prefix="/api/v1")
+    app.include_router(events.router, prefix="/api/v1")
 
     # 健康检查
     @app.get("/health")
     async def health_check() -> dict[str, str]:
         return {"status": "ok", "version": "0.1.0"}
 
+    # Prometheus 指标 (OCR 排队等待分位数在抓取时从 Redis 刷新)
+    metrics_app = make_asgi_app()
+
+    async def metrics(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            from app.services.ocr_scheduler import refresh_queue_metrics
+
+            await refresh_queue_metrics()
+        await metrics_app(scope, receive, send)
+
+    app.mount("/metrics", metrics)
+
     @app.get("/")
     async def root() -> dict[str, str]:
         return {
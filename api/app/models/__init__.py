@@ -32,6 +32,7 @@ from app.models.book import (
     ConversionJob,
     Shelf,
     ShelfBook,
+    StorageBlob,
 )
 
 # 笔记与高亮
@@ -48,6 +49,7 @@ from app.models.note import (
 from app.models.reading import (
     BookPosition,
     ReadingDaily,
+    ReadingStats,
     ReadingTimeLog,
 )
 
@@ -94,6 +96,7 @@ __all__ = [
     "Book",
     "Shelf",
     "ShelfBook",
+    "StorageBlob",
     "ConversionJob",
     # Note
     "Note",
@@ -106,6 +109,7 @@ __all__ = [
     "BookPosition",
     "ReadingTimeLog",
     "ReadingDaily",
+    "ReadingStats",
     # AI
     "AiModel",
     "AiConversation",
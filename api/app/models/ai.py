@@ -116,6 +116,8 @@ class AiConversation(Base, UUIDPrimaryKeyMixin, TimestampMixin):
 
     __table_args__ = (
         Index("idx_ai_conversations_user_book", "user_id", "book_id"),
+        # 会话列表键集分页 (按更新时间倒序)
+        Index("idx_ai_conversations_user_updated", "user_id", "updated_at", "id"),
     )
 
     def __repr__(self) -> str:
@@ -166,6 +166,8 @@ class PaymentSession(Base, UUIDPrimaryKeyMixin, TimestampMixin):
 
     __table_args__ = (
         Index("idx_payment_sessions_status", "status"),
+        # 支付历史键集分页 (按创建时间倒序)
+        Index("idx_payment_sessions_user_created", "user_id", "created_at", "id"),
     )
 
     def __repr__(self) -> str:
@@ -18,6 +18,7 @@ from sqlalchemy import (
     Numeric,
     String,
     Text,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -88,9 +89,9 @@ class Book(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, VersionMi
     metadata_confirmed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     metadata_confirmed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    # SHA256 去重
+    # SHA256 去重 (文件归属与引用计数见 storage_blobs)
     content_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
-    storage_ref_count: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    blob_registered: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)  # 是否持有书籍文件引用
     canonical_book_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("books.id", ondelete="SET NULL"),
@@ -141,6 +142,12 @@ class Book(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, VersionMi
     __table_args__ = (
         Index("idx_books_content_sha256", "content_sha256", postgresql_where=content_sha256.isnot(None)),
         Index("idx_books_user_deleted", "user_id", "deleted_at"),
+        # 书籍列表 (未删除，按创建时间倒序键集分页)
+        Index(
+            "idx_books_user_created", "user_id", "created_at", "id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        Index("idx_books_deleted_at", "deleted_at", postgresql_where=text("deleted_at IS NOT NULL")),
     )
 
     @property
@@ -157,10 +164,41 @@ class Book(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, VersionMi
         """判断是否为去重引用书"""
         return self.canonical_book_id is not None
 
+    @property
+    def blob_sha256(self) -> str | None:
+        """书籍持有引用的文件哈希 (尚未登记引用时为 None)"""
+        return self.content_sha256 if self.blob_registered else None
+
     def __repr__(self) -> str:
         return f"<Book {self.id} '{self.title}'>"
 
 
+class StorageBlob(Base, TimestampMixin):
+    """
+    对象存储文件 (按内容寻址，引用计数)
+
+    每条书籍记录对其文件 (kind=book) 与封面 (kind=cover) 各持有一个引用；
+    引用计数归零的文件由垃圾回收删除。存储桶由 kind 决定。
+    """
+
+    __tablename__ = "storage_blobs"
+
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)  # book/cover
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    refcount: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    # 引用计数归零的时间 (垃圾回收按此排序)
+    released_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("idx_storage_blobs_released", "released_at", postgresql_where=text("refcount = 0")),
+    )
+
+    def __repr__(self) -> str:
+        return f"<StorageBlob {self.kind}:{self.sha256} refs={self.refcount}>"
+
+
 class Shelf(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, VersionMixin):
     """书架"""
 
@@ -76,7 +76,15 @@ class Note(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, VersionMi
     )
 
     __table_args__ = (
-        Index("idx_notes_user_book", "user_id", "book_id"),
+        # 笔记列表 (未删除，按创建时间倒序键集分页，可按书籍筛选)
+        Index(
+            "idx_notes_user_created", "user_id", "created_at", "id",
+            postgresql_where="deleted_at IS NULL",
+        ),
+        Index(
+            "idx_notes_user_book_created", "user_id", "book_id", "created_at", "id",
+            postgresql_where="deleted_at IS NULL",
+        ),
         Index("idx_notes_tsv", "tsv", postgresql_using="gin"),
     )
 
@@ -141,6 +149,11 @@ class Highlight(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, Vers
 
     __table_args__ = (
         Index("idx_highlights_user_book", "user_id", "book_id"),
+        # 书籍的高亮列表 (未删除，按创建时间)
+        Index(
+            "idx_highlights_user_book_created", "user_id", "book_id", "created_at",
+            postgresql_where="deleted_at IS NULL",
+        ),
         Index("idx_highlights_tsv", "tsv", postgresql_using="gin"),
     )
 
@@ -181,6 +194,11 @@ class Bookmark(Base, UUIDPrimaryKeyMixin, TimestampMixin, SoftDeleteMixin, Versi
 
     __table_args__ = (
         Index("idx_bookmarks_user_book", "user_id", "book_id"),
+        # 书籍的书签列表 (未删除，按创建时间)
+        Index(
+            "idx_bookmarks_user_book_created", "user_id", "book_id", "created_at",
+            postgresql_where="deleted_at IS NULL",
+        ),
     )
 
     def __repr__(self) -> str:
@@ -1,11 +1,11 @@
 """
 阅读进度与统计相关模型
 
-包含 BookPosition, ReadingTimeLog, ReadingDaily 等表。
+包含 BookPosition, ReadingTimeLog, ReadingDaily, ReadingStats 等表。
 """
 
 import uuid
-from datetime import date, datetime
+from datetime import UTC, date, datetime
 from typing import TYPE_CHECKING
 
 from sqlalchemy import (
@@ -17,8 +17,10 @@ from sqlalchemy import (
     Index,
     Integer,
     Numeric,
+    PrimaryKeyConstraint,
     String,
     Text,
+    func,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -69,15 +71,36 @@ class BookPosition(Base, TimestampMixin):
     # 关系
     book: Mapped["Book"] = relationship("Book", back_populates="position")
 
+    __table_args__ = (
+        # 最近阅读的书籍 (按更新时间倒序，覆盖列表所需的位置字段，仅扫描索引)
+        Index(
+            "idx_book_position_user_updated", "user_id", "updated_at",
+            postgresql_include=["book_id", "progress", "finished_at"],
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<BookPosition user={self.user_id} book={self.book_id} progress={self.progress}>"
 
 
 class ReadingTimeLog(Base, UUIDPrimaryKeyMixin, TimestampMixin):
-    """阅读时长记录 (每次打开阅读器创建一条)"""
+    """
+    阅读时长记录 (每次打开阅读器创建一条)
+
+    按 created_at 以月为单位范围分区 (见 partition_service)，过期数据整月删除分区。
+    """
 
     __tablename__ = "reading_time_log"
 
+    # 分区键须包含在主键中；由应用写入，分区路由不依赖数据库时钟
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        default=lambda: datetime.now(UTC),
+        server_default=func.now(),
+        nullable=False,
+    )
+
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="CASCADE"),
@@ -111,8 +134,14 @@ class ReadingTimeLog(Base, UUIDPrimaryKeyMixin, TimestampMixin):
     book: Mapped["Book"] = relationship("Book", back_populates="reading_logs")
 
     __table_args__ = (
+        # id 在前: 按会话 ID 查询时在各分区的主键索引上定位
+        PrimaryKeyConstraint("id", "created_at"),
         Index("idx_reading_time_log_user_book", "user_id", "book_id"),
         Index("idx_reading_time_log_active", "is_active", postgresql_where="is_active = true"),
+        # 记录按时间追加写入，BRIN 以极小的体积支持按时间范围扫描
+        Index("idx_reading_time_log_created_brin", "created_at", postgresql_using="brin"),
+        Index("idx_reading_time_log_last_active_brin", "last_active_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
     def __repr__(self) -> str:
@@ -150,3 +179,48 @@ class ReadingDaily(Base):
 
     def __repr__(self) -> str:
         return f"<ReadingDaily user={self.user_id} day={self.day}>"
+
+
+class ReadingStats(Base):
+    """
+    用户阅读统计快照 (仅服务端，不同步)
+
+    会话结束、读完书籍时与每日统计在同一事务内增量更新，统计页只需按主键读取一行。
+    今日/本周/本月计数以所属周期起始日标记，周期变更后的首次更新时清零重计。
+    """
+
+    __tablename__ = "reading_stats"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    # 累计
+    total_duration_ms: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    finished_books: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # 今日 (以最后阅读日标记)；连续阅读天数见 user_streaks
+    last_active_day: Mapped[date | None] = mapped_column(Date, nullable=True)
+    today_duration_ms: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+    # 本周
+    week_start: Mapped[date | None] = mapped_column(Date, nullable=True)
+    week_duration_ms: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    week_days_active: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # 本月
+    month_start: Mapped[date | None] = mapped_column(Date, nullable=True)
+    month_duration_ms: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    month_days_active: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    month_books_finished: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default="now()",
+        nullable=False,
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReadingStats user={self.user_id}>"
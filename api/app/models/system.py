@@ -121,6 +121,9 @@ class OcrJob(Base, UUIDPrimaryKeyMixin, TimestampMixin):
         nullable=False,
     )  # pending/processing/completed/failed
 
+    # 调度优先级 (OCRPriority, 0-9，越小越优先)
+    priority: Mapped[int] = mapped_column(Integer, default=7, nullable=False)
+
     # 进度
     total_pages: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     processed_pages: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -137,8 +140,13 @@ class OcrJob(Base, UUIDPrimaryKeyMixin, TimestampMixin):
     # Celery 任务 ID
     celery_task_id: Mapped[str | None] = mapped_column(String(50), nullable=True)
 
-    # 计费
+    # 计费: 占用的积分 (触发时按估算预留，识别前按实际页数结算，失败退回) 与使用的每月免费页数
     credits_consumed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    free_pages: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("idx_ocr_jobs_user_created", "user_id", "created_at"),
+    )
 
     def __repr__(self) -> str:
         return f"<OcrJob {self.id} book={self.book_id} {self.status}>"
@@ -5,11 +5,12 @@
 """
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import TYPE_CHECKING, Any
 
 from sqlalchemy import (
     Boolean,
+    Date,
     DateTime,
     ForeignKey,
     Index,
@@ -266,7 +267,11 @@ class UserReadingGoal(Base, TimestampMixin):
 
 
 class UserStreak(Base, TimestampMixin):
-    """用户阅读连续天数"""
+    """
+    用户阅读连续天数
+
+    与每日统计在同一事务内更新，日期为用户所在时区的本地日期。
+    """
 
     __tablename__ = "user_streaks"
 
@@ -278,10 +283,7 @@ class UserStreak(Base, TimestampMixin):
 
     current_streak: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     longest_streak: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
-    last_read_date: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
-        nullable=True,
-    )
+    last_read_date: Mapped[date | None] = mapped_column(Date, nullable=True)
 
     def __repr__(self) -> str:
         return f"<UserStreak user={self.user_id} current={self.current_streak}>"
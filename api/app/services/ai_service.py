@@ -15,6 +15,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.exceptions import AthenaException, ErrorCode
+from app.core.pagination import Page, paginate
 from app.models import AIMessage, AISession
 
 logger = structlog.get_logger()
@@ -79,32 +80,28 @@ class AIService:
         book_id: str | None = None,
         page: int = 1,
         page_size: int = 20,
-    ) -> tuple[list[AISession], int]:
-        """列出会话"""
+        cursor: str | None = None,
+        with_total: bool | None = None,
+    ) -> Page[AISession]:
+        """列出会话 (按更新时间倒序，支持游标分页；翻页期间有更新的会话会移到前面)"""
         query = select(AISession).where(AISession.user_id == UUID(user_id))
 
         if book_id:
             query = query.where(AISession.book_id == UUID(book_id))
 
-        # 计数
-        count_query = select(func.count()).select_from(query.subquery())
-        total = (await self.db.execute(count_query)).scalar() or 0
-
-        # 分页
-        query = query.order_by(AISession.updated_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
-
-        result = await self.db.execute(query)
-        sessions = list(result.scalars().all())
+        result = await paginate(
+            self.db, query, AISession.updated_at, AISession.id,
+            page=page, page_size=page_size, cursor=cursor, with_total=with_total,
+        )
 
         # 获取消息数量
-        for session in sessions:
+        for session in result.items:
             count_result = await self.db.execute(
                 select(func.count()).where(AIMessage.session_id == session.id)
             )
             session.message_count = count_result.scalar() or 0
 
-        return sessions, total
+        return result
 
     async def delete_session(self, session_id: str, user_id: str) -> None:
         """删除会话"""
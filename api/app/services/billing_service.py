@@ -2,6 +2,10 @@
 付费订阅服务层
 
 处理订阅、支付、积分等业务逻辑。
+
+积分扣减与退回以 SQLAlchemy Core 语句构造 (debit_statement / credit_statement / ledger_statement)，
+API 的异步会话与 Celery 任务的同步连接 (debit_credits / refund_credits) 走同一路径:
+扣减为带余额条件的单条 UPDATE，余额不足时不更新并抛出 InsufficientCreditsException。
 """
 
 from datetime import UTC, datetime
@@ -9,7 +13,7 @@ from decimal import Decimal
 from typing import Any
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Connection, Insert, Update, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import (
@@ -17,6 +21,7 @@ from app.core.exceptions import (
     NotFoundException,
     PaymentFailedException,
 )
+from app.core.pagination import Page, paginate
 from app.models.billing import (
     CreditAccount,
     CreditLedger,
@@ -178,30 +183,20 @@ class BillingService:
         user_id: str,
         page: int = 1,
         page_size: int = 20,
-    ) -> tuple[list[Any], int]:
-        """获取支付历史"""
-        offset = (page - 1) * page_size
-
-        # 查询总数
-        from sqlalchemy import func
-        count_result = await self.db.execute(
-            select(func.count()).select_from(PaymentSession).where(
-                PaymentSession.user_id == UUID(user_id),
-            )
+        cursor: str | None = None,
+        with_total: bool | None = None,
+    ) -> Page[PaymentSession]:
+        """获取支付历史 (按创建时间倒序，支持游标分页)"""
+        return await paginate(
+            self.db,
+            select(PaymentSession).where(PaymentSession.user_id == UUID(user_id)),
+            PaymentSession.created_at,
+            PaymentSession.id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            with_total=with_total,
         )
-        total = count_result.scalar() or 0
-
-        # 查询列表
-        result = await self.db.execute(
-            select(PaymentSession)
-            .where(PaymentSession.user_id == UUID(user_id))
-            .order_by(PaymentSession.created_at.desc())
-            .offset(offset)
-            .limit(page_size)
-        )
-        sessions = result.scalars().all()
-
-        return sessions, total
 
     # ========================================================================
     # 订阅状态
@@ -305,29 +300,21 @@ class BillingService:
         Raises:
             InsufficientCreditsException: 余额不足
         """
-        result = await self.db.execute(
-            select(CreditAccount).where(CreditAccount.user_id == UUID(user_id))
-        )
-        account = result.scalar_one_or_none()
-
-        if not account or account.balance < amount:
-            raise InsufficientCreditsException("insufficient_credits")
-
-        # 扣减余额
-        account.balance -= amount
-        balance_after = account.balance
-
-        # 记录流水
-        ledger = CreditLedger(
-            user_id=UUID(user_id),
-            amount=-amount,
-            balance_after=balance_after,
-            transaction_type=transaction_type,
-            description=description,
-            reference_type=reference_type,
-            reference_id=UUID(reference_id) if reference_id else None,
+        balance_after = (await self.db.execute(debit_statement(user_id, amount))).scalar_one_or_none()
+        if balance_after is None:
+            raise InsufficientCreditsException()
+
+        await self.db.execute(
+            ledger_statement(
+                user_id,
+                -amount,
+                balance_after,
+                transaction_type,
+                description=description,
+                reference_type=reference_type,
+                reference_id=reference_id,
+            )
         )
-        self.db.add(ledger)
         await self.db.commit()
 
         return balance_after
@@ -457,3 +444,103 @@ class BillingService:
             "auto_renewing": is_subscription,
             "membership_updated": True,
         }
+
+
+# ============================================================================
+# 积分语句 (同步/异步共用)
+# ============================================================================
+
+
+def debit_statement(user_id: str, amount: int) -> Update:
+    """扣减积分，返回扣减后的余额；账户不存在或余额不足时不更新任何行"""
+    return (
+        update(CreditAccount)
+        .where(CreditAccount.user_id == UUID(user_id), CreditAccount.balance >= amount)
+        .values(balance=CreditAccount.balance - amount, updated_at=func.now())
+        .returning(CreditAccount.balance)
+    )
+
+
+def credit_statement(user_id: str, amount: int) -> Update:
+    """退回积分到已有账户，返回退回后的余额"""
+    return (
+        update(CreditAccount)
+        .where(CreditAccount.user_id == UUID(user_id))
+        .values(balance=CreditAccount.balance + amount, updated_at=func.now())
+        .returning(CreditAccount.balance)
+    )
+
+
+def ledger_statement(
+    user_id: str,
+    amount: int,
+    balance_after: int,
+    transaction_type: str,
+    description: str | None = None,
+    reference_type: str | None = None,
+    reference_id: str | None = None,
+    meta: dict[str, Any] | None = None,
+) -> Insert:
+    """积分流水 (amount 正=增加, 负=扣减)"""
+    return insert(CreditLedger).values(
+        user_id=UUID(user_id),
+        amount=amount,
+        balance_after=balance_after,
+        transaction_type=transaction_type,
+        description=description,
+        reference_type=reference_type,
+        reference_id=UUID(reference_id) if reference_id else None,
+        meta=meta,
+    )
+
+
+def debit_credits(
+    conn: Connection,
+    user_id: str,
+    amount: int,
+    transaction_type: str,
+    description: str | None = None,
+    reference_type: str | None = None,
+    reference_id: str | None = None,
+    meta: dict[str, Any] | None = None,
+) -> int:
+    """
+    在同步连接上扣减积分并记录流水 (不提交，随调用方事务)
+
+    Returns:
+        扣减后的余额
+
+    Raises:
+        InsufficientCreditsException: 余额不足
+    """
+    balance_after = conn.execute(debit_statement(user_id, amount)).scalar_one_or_none()
+    if balance_after is None:
+        raise InsufficientCreditsException()
+    conn.execute(
+        ledger_statement(
+            user_id, -amount, balance_after, transaction_type, description, reference_type, reference_id, meta
+        )
+    )
+    return balance_after
+
+
+def refund_credits(
+    conn: Connection,
+    user_id: str,
+    amount: int,
+    description: str | None = None,
+    reference_type: str | None = None,
+    reference_id: str | None = None,
+    meta: dict[str, Any] | None = None,
+) -> int:
+    """
+    在同步连接上退回积分并记录流水 (不提交，随调用方事务)
+
+    Returns:
+        退回后的余额
+    """
+    balance_after = conn.execute(credit_statement(user_id, amount)).scalar_one()
+    conn.execute(
+        ledger_statement(user_id, amount, balance_after, "refund", description, reference_type, reference_id, meta)
+    )
+    return balance_after
@@ -0,0 +1,124 @@
+"""
+存储文件引用计数
+
+storage_blobs 以 (kind, sha256) 登记对象存储中按内容去重的文件，
+书籍记录对文件的引用在上传、秒传、删除时与书籍记录的修改在同一事务内增减:
+
+- 书籍文件 (kind=book): 以文件内容哈希标识，先上传者的 Key 为规范 Key，
+  之后相同内容的上传改指向规范 Key；OCR 结果与 derived/ 下的派生产物随之回收
+- 封面 (kind=cover): 以内容寻址 Key 中的哈希标识 ({sha[:2]}/{sha}.jpg)，连同全部变体回收
+
+引用计数归零时记录 released_at，宽限期内重新引用 (相同内容再次上传) 会复活该行；
+垃圾回收只按部分索引扫描 refcount = 0 的行，不再逐本书判断文件是否仍被使用。
+
+语句以 SQLAlchemy Core 构造，Celery 任务的同步连接与 API 的异步会话都可直接执行。
+"""
+
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import Update, case, column, func, update, values
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.types import Integer, String
+
+from app.core.config import settings
+from app.models.book import StorageBlob
+
+BLOB_BOOK = "book"
+BLOB_COVER = "cover"
+
+
+def blob_bucket(kind: str) -> str:
+    """文件所在的存储桶"""
+    if kind == BLOB_COVER:
+        return settings.minio.minio_bucket_covers
+    return settings.minio.minio_bucket_books
+
+
+def cover_blob_id(cover_key: str) -> str:
+    """封面文件标识 (内容寻址 Key 去掉目录与扩展名)"""
+    return cover_key.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+
+def book_blob_refs(content_sha256: str | None, cover_image_key: str | None) -> list[tuple[str, str]]:
+    """一条书籍记录持有的文件引用 [(kind, sha256)]"""
+    refs = []
+    if content_sha256:
+        refs.append((BLOB_BOOK, content_sha256))
+    if cover_image_key:
+        refs.append((BLOB_COVER, cover_blob_id(cover_image_key)))
+    return refs
+
+
+def acquire_blob(kind: str, sha256: str, key: str, size: int | None = None) -> Insert:
+    """
+    登记文件并增加一个引用
+
+    文件已登记时只增加引用计数 (并清除释放标记)，RETURNING 的 key 为规范 Key，
+    与传入的 Key 不同说明同一内容已存在，调用方应改指向规范 Key。
+    """
+    stmt = insert(StorageBlob).values(kind=kind, sha256=sha256, key=key, size=size, refcount=1)
+    return stmt.on_conflict_do_update(
+        index_elements=[StorageBlob.kind, StorageBlob.sha256],
+        set_={
+            "refcount": StorageBlob.refcount + 1,
+            "released_at": None,
+            "updated_at": func.now(),
+        },
+    ).returning(StorageBlob.key)
+
+
+def share_blob(kind: str, sha256: str) -> Update:
+    """
+    为仍被引用的文件增加一个引用 (秒传)
+
+    文件未登记或已释放时不返回行。
+    """
+    return (
+        update(StorageBlob)
+        .where(StorageBlob.kind == kind, StorageBlob.sha256 == sha256, StorageBlob.refcount > 0)
+        .values(refcount=StorageBlob.refcount + 1, updated_at=func.now())
+        .returning(StorageBlob.key)
+    )
+
+
+def release_blobs(refs: Iterable[tuple[str, str]]) -> Update | None:
+    """
+    释放一组引用
+
+    同一文件可能出现多次 (一批删除多本相同内容的书)，按次数合并为一条 UPDATE ... FROM (VALUES ...)。
+    计数归零时记录 released_at，交给垃圾回收。
+
+    Returns:
+        没有引用需要释放时返回 None
+    """
+    counts = Counter(refs)
+    if not counts:
+        return None
+
+    released = (
+        values(column("kind", String), column("sha256", String), column("n", Integer), name="released")
+        .data([(kind, sha256, n) for (kind, sha256), n in sorted(counts.items())])
+    )
+    return (
+        update(StorageBlob)
+        .where(StorageBlob.kind == released.c.kind, StorageBlob.sha256 == released.c.sha256)
+        .values(
+            refcount=func.greatest(StorageBlob.refcount - released.c.n, 0),
+            released_at=case(
+                (StorageBlob.refcount <= released.c.n, func.now()),
+                else_=StorageBlob.released_at,
+            ),
+            updated_at=func.now(),
+        )
+    )
+
+
+def ocr_blob_key(sha256: str) -> str:
+    """书籍文件的 OCR 结果 Key (books 桶，按内容寻址，随书籍文件回收)"""
+    return f"ocr/{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+
+
+def derived_prefix(sha256: str) -> str:
+    """书籍文件的派生产物前缀 (books 桶)"""
+    return f"derived/{sha256[:2]}/{sha256}/"
@@ -5,9 +5,10 @@
 """
 
 from datetime import UTC, datetime, timedelta
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import func, or_, select, update
+import structlog
+from sqlalchemy import or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
@@ -17,12 +18,34 @@ from app.core.exceptions import (
     CanonicalNotFoundException,
     UploadForbiddenQuotaExceededException,
 )
+from app.core.pagination import Page, paginate
 from app.models.book import Book, ShelfBook
 from app.models.note import Bookmark, Highlight, Note
 from app.models.reading import BookPosition, ReadingTimeLog
 from app.models.user import User, UserStats
+from app.services.blob_service import (
+    BLOB_BOOK,
+    BLOB_COVER,
+    acquire_blob,
+    book_blob_refs,
+    cover_blob_id,
+    release_blobs,
+    share_blob,
+)
+from app.services.cover_service import (
+    DEFAULT_FORMAT,
+    DEFAULT_SIZE,
+    select_cover_key,
+)
+from app.services.reading_buffer import ReadingPositionBuffer
+from app.services.reading_stats import release_finished
 from app.services.storage_service import get_storage_service
 
+if TYPE_CHECKING:
+    from app.models.system import OcrJob
+
+logger = structlog.get_logger()
+
 
 class BookService:
     """书籍服务"""
@@ -138,9 +161,10 @@ class BookService:
         await self.db.commit()
         await self.db.refresh(book)
 
-        # TODO: 触发后处理任务 (Celery)
-        # from app.tasks.book_processing import process_book
-        # process_book.delay(str(book.id))
+        # 触发入库流水线 (转换、元数据、封面、文字层检测)
+        from app.tasks.ingest_tasks import start_ingest_pipeline
+
+        start_ingest_pipeline(str(book.id), str(user.id), key)
 
         return book
 
@@ -154,7 +178,7 @@ class BookService:
         """
         创建秒传引用书籍
 
-        复用已存在的文件，只创建新的书籍记录。
+        复用已存在的文件，只创建新的书籍记录，并对文件与封面各增加一个引用。
         """
         # 查找原书
         canonical = await self._find_canonical_by_sha256(sha256)
@@ -164,6 +188,16 @@ class BookService:
         # 检查配额
         await self._check_quota(user, 0)  # 秒传不占用存储
 
+        # 增加文件引用 (文件已释放时不能秒传)
+        minio_key = (await self.db.execute(share_blob(BLOB_BOOK, sha256))).scalar_one_or_none()
+        if minio_key is None:
+            await self.db.rollback()
+            raise CanonicalNotFoundException()
+        if canonical.cover_image_key:
+            await self.db.execute(
+                acquire_blob(BLOB_COVER, cover_blob_id(canonical.cover_image_key), canonical.cover_image_key)
+            )
+
         # 创建引用书籍
         book = Book(
             user_id=user.id,
@@ -171,10 +205,11 @@ class BookService:
             author=author or canonical.author,
             language=canonical.language,
             original_format=canonical.original_format,
-            minio_key=canonical.minio_key,
+            minio_key=minio_key,
             size=canonical.size,
             cover_image_key=canonical.cover_image_key,
             content_sha256=sha256,
+            blob_registered=True,
             canonical_book_id=canonical.id,
             has_text_layer=canonical.has_text_layer,
             text_layer_confidence=canonical.text_layer_confidence,
@@ -188,9 +223,6 @@ class BookService:
         )
         self.db.add(book)
 
-        # 增加原书引用计数
-        canonical.storage_ref_count += 1
-
         # 更新用户统计 (不增加存储使用，只增加书籍数)
         await self._update_user_stats(user.id, size_delta=0, count_delta=1)
 
@@ -220,12 +252,11 @@ class BookService:
         page_size: int = 20,
         search: str | None = None,
         shelf_id: str | None = None,
-    ) -> tuple[list[Book], int]:
+        cursor: str | None = None,
+        with_total: bool | None = None,
+    ) -> Page[Book]:
         """
-        获取书籍列表
-
-        Returns:
-            (books, total)
+        获取书籍列表 (按创建时间倒序，支持游标分页，见 app.core.pagination)
         """
         query = select(Book).where(
             Book.user_id == user_id,
@@ -246,19 +277,10 @@ class BookService:
         if shelf_id:
             query = query.join(ShelfBook).where(ShelfBook.shelf_id == shelf_id)
 
-        # 统计总数
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.db.execute(count_query)
-        total = total_result.scalar() or 0
-
-        # 分页
-        query = query.order_by(Book.created_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
-
-        result = await self.db.execute(query)
-        books = list(result.scalars().all())
-
-        return books, total
+        return await paginate(
+            self.db, query, Book.created_at, Book.id,
+            page=page, page_size=page_size, cursor=cursor, with_total=with_total,
+        )
 
     async def delete_book(self, book_id: str, user_id: str, permanent: bool = False) -> bool:
         """
@@ -269,44 +291,30 @@ class BookService:
             user_id: 用户 ID
             permanent: 是否永久删除
 
-        软删除: 设置 deleted_at，保留文件
-        永久删除: 删除私人数据，清理存储引用
+        软删除: 设置 deleted_at，保留文件 (过期后由垃圾回收删除)
+        永久删除: 删除书籍记录，释放文件引用
+        秒传引用书始终直接删除。文件本身在引用计数归零后由垃圾回收删除。
         """
         book = await self.get_book(book_id, user_id)
 
         # 1. 始终删除私人数据
         await self._delete_private_data(book_id, user_id)
 
-        if book.canonical_book_id:
-            # 引用书：直接删除，减少原书引用计数
-            canonical_result = await self.db.execute(
-                select(Book).where(Book.id == book.canonical_book_id)
-            )
-            canonical = canonical_result.scalar_one_or_none()
-            if canonical:
-                canonical.storage_ref_count -= 1
-
-                # 如果原书已软删除且没有其他引用，硬删除原书
-                if canonical.deleted_at and canonical.storage_ref_count <= 1:
-                    await self._hard_delete_book(canonical)
-
-            # 删除引用书记录
-            await self.db.delete(book)
-
+        if permanent or book.canonical_book_id:
+            await self._hard_delete_book(book)
         else:
-            # 原书
-            if permanent or book.storage_ref_count <= 1:
-                # 硬删除
-                await self._hard_delete_book(book)
-            else:
-                # 软删除
-                book.deleted_at = datetime.now(UTC)
+            book.deleted_at = datetime.now(UTC)
 
         # 更新用户统计
         size_delta = -(book.size or 0) if not book.canonical_book_id else 0
         await self._update_user_stats(user_id, size_delta=size_delta, count_delta=-1)
 
         await self.db.commit()
+
+        # 阅读位置缓冲中的归属与未写回位置随书籍失效
+        positions = ReadingPositionBuffer()
+        await positions.forget_owner(book_id)
+        await positions.discard(user_id, book_id)
         return True
 
     async def get_content_url(self, book_id: str, user_id: str) -> dict[str, Any]:
@@ -332,15 +340,31 @@ class BookService:
             "size": book.size,
         }
 
-    async def get_cover_url(self, book_id: str, user_id: str) -> dict[str, Any]:
-        """获取封面 URL"""
+    async def get_cover_url(
+        self,
+        book_id: str,
+        user_id: str,
+        size: str = DEFAULT_SIZE,
+        fmt: str = DEFAULT_FORMAT,
+    ) -> dict[str, Any]:
+        """
+        获取封面 URL
+
+        Args:
+            book_id: 书籍 ID
+            user_id: 用户 ID
+            size: small/medium/large
+            fmt: webp/avif
+        """
         book = await self.get_book(book_id, user_id)
 
         if not book.cover_image_key:
             raise BookNotFoundException()
 
+        cover = (book.meta or {}).get("cover")
+        object_key, content_type = select_cover_key(book.cover_image_key, cover, size, fmt)
         url = self.storage.generate_presigned_download_url(
-            object_key=book.cover_image_key,
+            object_key=object_key,
             bucket=settings.minio.minio_bucket_covers,
             expires=timedelta(hours=24),
         )
@@ -348,6 +372,10 @@ class BookService:
         return {
             "cover_url": url,
             "expires_in": 86400,
+            "content_type": content_type,
+            "blurhash": cover.get("blurhash") if cover else None,
+            "width": cover.get("width") if cover else None,
+            "height": cover.get("height") if cover else None,
         }
 
     # =========================================================================
@@ -387,13 +415,16 @@ class BookService:
     async def _find_canonical_by_sha256(self, sha256: str) -> Book | None:
         """根据 SHA256 查找原书"""
         result = await self.db.execute(
-            select(Book).where(
+            select(Book)
+            .where(
                 Book.content_sha256 == sha256,
                 Book.canonical_book_id.is_(None),
                 Book.deleted_at.is_(None),
             )
+            .order_by(Book.created_at)
+            .limit(1)
         )
-        return result.scalar_one_or_none()
+        return result.scalars().first()
 
     async def _update_user_stats(
         self,
@@ -428,13 +459,18 @@ class BookService:
         await self.db.execute(
             delete(Bookmark).where(Bookmark.book_id == book_id, Bookmark.user_id == user_id)
         )
-        # 删除阅读位置
-        await self.db.execute(
-            delete(BookPosition).where(
+        # 删除阅读位置 (读完的书从统计快照中扣除)
+        result = await self.db.execute(
+            delete(BookPosition)
+            .where(
                 BookPosition.book_id == book_id,
                 BookPosition.user_id == user_id,
             )
+            .returning(BookPosition.finished_at)
         )
+        finished_at = result.scalar_one_or_none()
+        if finished_at:
+            await self.db.execute(release_finished(user_id, finished_at.date()))
         # 删除阅读时长记录
         await self.db.execute(
             delete(ReadingTimeLog).where(
@@ -448,22 +484,15 @@ class BookService:
         )
 
     async def _hard_delete_book(self, book: Book) -> None:
-        """硬删除书籍 (包括存储文件)"""
-        # 删除 MinIO 文件
-        if book.minio_key:
-            self.storage.delete_object(book.minio_key)
-        if book.cover_image_key:
-            self.storage.delete_object(
-                book.cover_image_key,
-                bucket=settings.minio.minio_bucket_covers,
-            )
-        if book.ocr_pdf_key:
-            self.storage.delete_object(
-                book.ocr_pdf_key,
-                bucket=settings.minio.minio_bucket_ocr,
-            )
-        if book.converted_epub_key:
-            self.storage.delete_object(book.converted_epub_key)
+        """
+        硬删除书籍
+
+        删除书籍记录并在同一事务内释放文件与封面的引用；
+        存储文件不在请求中删除，引用计数归零后由垃圾回收统一删除。
+        """
+        released = release_blobs(book_blob_refs(book.blob_sha256, book.cover_image_key))
+        if released is not None:
+            await self.db.execute(released)
 
         # TODO: 删除向量索引
         # await self._delete_vectors(book.id)
@@ -497,8 +526,11 @@ class BookService:
                 "queue_position": int | None,
                 "estimated_minutes": int | None,
             }
+
+        Raises:
+            InsufficientCreditsException: 积分不足以支付估算页数 (扣除每月免费页数后)
         """
-        from uuid import UUID
+        from uuid import UUID, uuid4
 
         from app.core.exceptions import (
             AlreadyDigitalizedException,
@@ -518,7 +550,7 @@ class BookService:
             raise OcrInProgressException()
 
         # 检查配额
-        await self._check_ocr_quota(user_id)
+        user = await self._check_ocr_quota(user_id)
 
         # 检查是否可复用 (假 OCR)
         if book.content_sha256:
@@ -540,42 +572,91 @@ class BookService:
                     "message": "OCR 结果已复用，处理完成。",
                 }
 
-        # 创建 OCR 任务
+        # 创建 OCR 任务 (优先级由会员等级 + 请求优先级决定)
+        from app.services.ocr_scheduler import OcrQueue, ocr_priority_for
+        from app.services.text_layer_service import estimate_ocr_pages
+
+        job_priority = ocr_priority_for(user.membership_tier, user.membership_expire_at, priority)
         ocr_job = OcrJob(
+            id=uuid4(),
             book_id=UUID(book_id),
             user_id=UUID(user_id),
             status="pending",
-            priority=1 if priority == "high" else 0,
+            priority=job_priority,
         )
         self.db.add(ocr_job)
 
         # 更新书籍状态
         book.ocr_status = "pending"
-        await self.db.commit()
 
-        # 提交 Celery 任务
-        from app.tasks.ocr_tasks import process_ocr
+        # 只有图片页需要 OCR，按抽样结果估算页数；按估算预留积分后与任务一并提交
+        meta = book.meta or {}
+        ocr_pages = estimate_ocr_pages(meta.get("text_layer"))
+        if ocr_pages is None:
+            ocr_pages = meta.get("page_count")
+        await self._reserve_ocr_credits(ocr_job, user_id, ocr_pages or 0)
+
+        # 进入公平调度队列，由调度器按空闲槽位投递 Celery 任务
+        queue = OcrQueue()
+        live = None
+        try:
+            await queue.enqueue(
+                job_id=str(ocr_job.id),
+                user_id=user_id,
+                book_id=book_id,
+                minio_key=book.minio_key,
+                sha256=book.content_sha256 or "",
+                priority=job_priority,
+                pages=ocr_pages,
+            )
 
-        process_ocr.delay(
-            book_id=book_id,
-            user_id=user_id,
-            minio_key=book.minio_key,
-            sha256=book.content_sha256 or "",
-        )
+            from app.tasks.ocr_tasks import dispatch_ocr_jobs
+
+            dispatch_ocr_jobs.delay()
+
+            # 排队位置与预计时间 (Redis)
+            live = await queue.get_status(book_id)
+        except Exception:
+            # 任务已提交为 pending，定时调度会补入队列
+            logger.exception("Failed to enqueue OCR job", job_id=str(ocr_job.id), book_id=book_id)
 
-        # 计算队列位置
-        queue_position = await self._get_ocr_queue_position(book_id)
+        queue_position = live["queue_position"] if live else None
+        estimated_minutes = _seconds_to_minutes(live["estimated_seconds"]) if live else None
 
         return {
             "status": "queued",
             "queue_position": queue_position,
-            "estimated_minutes": queue_position * 5,  # 估算每本 5 分钟
-            "message": f"OCR 任务已进入排队，预计 {queue_position * 5} 分钟后完成。",
+            "estimated_minutes": estimated_minutes,
+            "message": ocr_queued_message(estimated_minutes),
         }
 
     async def get_ocr_status(self, book_id: str, user_id: str) -> dict[str, Any]:
-        """获取 OCR 处理状态"""
+        """
+        获取 OCR 处理状态
+
+        排队或处理中的任务直接从 Redis 读取排队位置与预计时间，
+        轮询期间不访问数据库；任务结束后才查询 OcrJob。
+        """
         from app.models.system import OcrJob
+        from app.services.ocr_scheduler import OcrQueue
+
+        live = await OcrQueue().get_status(book_id)
+        if live and live["user_id"] == user_id:
+            total = live["total_pages"]
+            started_at_ms = live["started_at_ms"]
+            return {
+                "book_id": book_id,
+                "is_digitalized": False,
+                "ocr_status": live["state"],
+                "queue_position": live["queue_position"],
+                "estimated_minutes": _seconds_to_minutes(live["estimated_seconds"]),
+                "progress": live["processed_pages"] * 100 // total if total else 0,
+                "total_pages": total,
+                "processed_pages": live["processed_pages"],
+                "started_at": datetime.fromtimestamp(started_at_ms / 1000, UTC) if started_at_ms else None,
+                "completed_at": None,
+                "error_message": None,
+            }
 
         book = await self.get_book(book_id, user_id)
 
@@ -592,14 +673,18 @@ class BookService:
             "book_id": book_id,
             "is_digitalized": book.has_text_layer,
             "ocr_status": book.ocr_status,
-            "queue_position": await self._get_ocr_queue_position(book_id) if book.ocr_status == "pending" else None,
+            "queue_position": None,
             "estimated_minutes": None,
+            "progress": ocr_job.progress if ocr_job else 0,
+            "total_pages": ocr_job.total_pages if ocr_job else 0,
+            "processed_pages": ocr_job.processed_pages if ocr_job else 0,
+            "started_at": ocr_job.started_at if ocr_job else None,
             "completed_at": ocr_job.completed_at if ocr_job else None,
-            "error_message": ocr_job.error_message if ocr_job and ocr_job.status == "failed" else None,
+            "error_message": ocr_job.error if ocr_job and ocr_job.status == "failed" else None,
         }
 
-    async def _check_ocr_quota(self, user_id: str) -> None:
-        """检查 OCR 配额"""
+    async def _check_ocr_quota(self, user_id: str) -> User:
+        """检查 OCR 配额，返回用户"""
         from uuid import UUID
 
         from app.core.exceptions import OcrQuotaExceededException
@@ -617,6 +702,34 @@ class BookService:
         if user.free_ocr_usage >= monthly_limit:
             raise OcrQuotaExceededException()
 
+        return user
+
+    async def _reserve_ocr_credits(self, ocr_job: "OcrJob", user_id: str, ocr_pages: int) -> None:
+        """
+        按估算页数预留积分 (每月免费页数先抵扣)，与任务一并提交
+
+        Raises:
+            InsufficientCreditsException: 余额不足
+        """
+        from app.services.billing_service import BillingService
+        from app.services.ocr_billing import free_pages_used_statement, split_ocr_charge
+
+        used = (await self.db.execute(free_pages_used_statement(user_id))).scalar_one()
+        free_pages, credits = split_ocr_charge(ocr_pages, used)
+        ocr_job.free_pages = free_pages
+        ocr_job.credits_consumed = credits
+        if not credits:
+            await self.db.commit()
+            return
+        await BillingService(self.db).deduct_credits(
+            user_id,
+            credits,
+            "consume",
+            description=f"OCR 预留 {ocr_pages} 页",
+            reference_type="ocr_job",
+            reference_id=str(ocr_job.id),
+        )
+
     async def _deduct_ocr_quota(self, user_id: str) -> None:
         """扣减 OCR 配额"""
         from uuid import UUID
@@ -643,19 +756,14 @@ class BookService:
             return {"ocr_pdf_key": book.ocr_pdf_key}
         return None
 
-    async def _get_ocr_queue_position(self, book_id: str) -> int:
-        """获取 OCR 队列位置"""
-        from uuid import UUID
 
-        from app.models.system import OcrJob
+def ocr_queued_message(estimated_minutes: int | None) -> str:
+    """OCR 排队提示 (暂无预计时间时不显示)"""
+    if estimated_minutes is None:
+        return "OCR 任务已进入排队。"
+    return f"OCR 任务已进入排队，预计 {estimated_minutes} 分钟后完成。"
 
-        result = await self.db.execute(
-            select(func.count())
-            .select_from(OcrJob)
-            .where(
-                OcrJob.status == "pending",
-                OcrJob.created_at <= select(OcrJob.created_at).where(OcrJob.book_id == UUID(book_id)).scalar_subquery(),
-            )
-        )
-        return result.scalar() or 1
 
+def _seconds_to_minutes(seconds: int) -> int:
+    """预计时间向上取整到分钟 (至少 1 分钟)"""
+    return max(1, -(-seconds // 60))
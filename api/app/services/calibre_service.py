@@ -0,0 +1,201 @@
+"""
+Calibre 转换服务客户端
+
+通过 Unix Socket 调用 Calibre 容器内的常驻转换服务 (见 calibre/conversion_server.py)。
+文件经由两侧共同挂载的共享目录传递，不再使用 docker cp。
+服务不可用时 (如本地开发) 回退为直接调用本机的 ebook-convert / ebook-meta。
+"""
+
+import json
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class CalibreService:
+    """Calibre 转换服务客户端"""
+
+    def __init__(self, socket_path: str | None = None, shared_dir: str | None = None):
+        self.socket_path = socket_path or settings.calibre.calibre_socket_path
+        self.shared_dir = Path(shared_dir or settings.calibre.calibre_shared_dir)
+
+    @property
+    def server_available(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    def convert(
+        self,
+        input_path: Path,
+        output_path: Path,
+        args: list[str] | None = None,
+        timeout: int | None = None,
+    ) -> dict:
+        """
+        转换电子书格式
+
+        Returns:
+            {"success": bool, "error": str | None}
+        """
+        args = args or []
+        timeout = timeout or settings.calibre.calibre_convert_timeout
+
+        if not self.server_available:
+            return self._run_local(
+                ["ebook-convert", str(input_path), str(output_path), *args], timeout
+            )
+
+        with self._shared_input(input_path) as shared_input, self._shared_tmpdir() as tmpdir:
+            shared_output = tmpdir / output_path.name
+            response = self._request(
+                {
+                    "op": "convert",
+                    "input": str(shared_input),
+                    "output": str(shared_output),
+                    "args": args,
+                    "timeout": timeout,
+                },
+                timeout,
+            )
+            if not response["ok"]:
+                return {"success": False, "error": response.get("error") or response.get("output")}
+            if not shared_output.exists():
+                return {"success": False, "error": "Output file not created"}
+
+            shutil.move(str(shared_output), output_path)
+
+        logger.debug("Calibre server conversion finished", elapsed=response.get("elapsed"))
+        return {"success": True}
+
+    def read_metadata(self, input_path: Path, timeout: int = 60) -> dict:
+        """
+        读取电子书元数据 (ebook-meta 输出)
+
+        Returns:
+            {"success": bool, "output": str, "error": str | None}
+        """
+        if not self.server_available:
+            return self._run_local(["ebook-meta", str(input_path)], timeout)
+
+        with self._shared_input(input_path) as shared_input:
+            response = self._request(
+                {"op": "metadata", "input": str(shared_input), "timeout": timeout},
+                timeout,
+            )
+        if not response["ok"]:
+            return {"success": False, "error": response.get("error") or response.get("output")}
+        return {"success": True, "output": response["output"]}
+
+    def ping(self) -> bool:
+        """检查转换服务是否在线"""
+        try:
+            return self._request({"op": "ping"}, timeout=5)["ok"]
+        except OSError:
+            return False
+
+    def _request(self, payload: dict, timeout: int) -> dict:
+        """发送一行 JSON 请求并读取一行 JSON 响应"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # 服务端自身按 timeout 终止任务，这里多留出排队与回传的余量
+            sock.settimeout(timeout + 30)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+
+        return json.loads(b"".join(chunks))
+
+    @contextmanager
+    def _shared_input(self, path: Path) -> Iterator[Path]:
+        """
+        确保输入文件位于共享目录内
+
+        Worker 缓存目录即共享目录时直接使用；否则硬链接 (跨设备时复制) 进去。
+        转换服务以其他用户运行，其他用户不可读的文件 (如 mkstemp 的 0600 文件) 复制为 0644 副本，
+        不修改原文件的权限。
+        """
+        real = path.resolve()
+        readable = bool(real.stat().st_mode & stat.S_IROTH)
+        if readable and real.is_relative_to(self.shared_dir.resolve()):
+            yield real
+            return
+
+        with self._shared_tmpdir() as tmpdir:
+            target = tmpdir / path.name
+            if not (readable and self._link(real, target)):
+                shutil.copyfile(real, target)
+                target.chmod(0o644)
+            yield target
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> bool:
+        """硬链接 (跨设备等无法链接时返回 False)"""
+        try:
+            os.link(source, target)
+        except OSError:
+            return False
+        return True
+
+    @contextmanager
+    def _shared_tmpdir(self) -> Iterator[Path]:
+        """共享目录内的临时目录 (Calibre 容器以其他用户写入)"""
+        root = self.shared_dir / "calibre"
+        root.mkdir(parents=True, exist_ok=True)
+        tmpdir = Path(tempfile.mkdtemp(dir=root))
+        try:
+            tmpdir.chmod(0o777)
+            yield tmpdir
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    @staticmethod
+    def _run_local(cmd: list[str], timeout: int) -> dict:
+        """回退: 直接调用本机 Calibre 命令"""
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                check=False,
+            )
+        except FileNotFoundError:
+            return {
+                "success": False,
+                "error": f"{cmd[0]} not found and Calibre server socket missing: "
+                f"{settings.calibre.calibre_socket_path}",
+            }
+
+        if result.returncode != 0:
+            return {"success": False, "error": result.stderr or result.stdout or "Unknown error"}
+        return {"success": True, "output": result.stdout}
+
+
+# 单例
+_calibre_service: CalibreService | None = None
+
+
+def get_calibre_service() -> CalibreService:
+    """获取 Calibre 服务客户端单例"""
+    global _calibre_service
+    if _calibre_service is None:
+        _calibre_service = CalibreService()
+    return _calibre_service
@@ -0,0 +1,249 @@
+"""
+封面处理
+
+把提取到的封面生成多尺寸、多格式的变体，并计算 BlurHash 占位图。
+
+- 尺寸: small (书架网格) / medium (详情页) / large (大屏)，按宽度等比缩放，不放大
+- 格式: WebP 与 AVIF (Pillow 不支持或编码失败时跳过该格式)，另保留一份 large 尺寸的 JPEG
+  作为兼容旧客户端的默认封面 (cover_image_key)；摘要只列出实际上传的变体
+- Key: JPEG 封面按原始图片内容哈希寻址 ({sha[:2]}/{sha}.jpg)，相同封面只存一份；
+  变体 Key 由其确定性推导，{base}/{size}.{format}，无需在数据库中逐个记录
+- 引用: 封面随书籍文件的引用计数释放，且没有其他书籍使用同一封面时才删除
+- BlurHash: 在 32px 缩略图上计算 4x3 分量，客户端在封面加载前渲染模糊占位
+"""
+
+import hashlib
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any
+
+import structlog
+
+logger = structlog.get_logger()
+
+# 变体尺寸 (宽度像素)
+COVER_SIZES: dict[str, int] = {"small": 160, "medium": 320, "large": 640}
+DEFAULT_SIZE = "medium"
+# 变体格式，按优先级排列
+COVER_FORMATS = ("avif", "webp")
+DEFAULT_FORMAT = "webp"
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+# BlurHash 分量数与计算用缩略图宽度
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_SAMPLE_WIDTH = 32
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+@dataclass
+class CoverVariants:
+    """封面处理结果"""
+
+    jpeg: bytes
+    width: int
+    height: int
+    blurhash: str
+    # (尺寸, 格式) -> 图片数据
+    variants: dict[tuple[str, str], bytes] = field(default_factory=dict)
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        """全部已生成变体的摘要"""
+        return self.summary(self.variants)
+
+    def summary(self, available: Iterable[tuple[str, str]]) -> dict[str, Any]:
+        """
+        写入 books.meta["cover"] 的摘要
+
+        只列出 available (已上传的 (尺寸, 格式)) 中的变体；格式须在列出的每个尺寸下都存在，
+        客户端按 sizes × formats 请求变体时不会缺失。
+        """
+        available = set(available)
+        sizes = [size for size in COVER_SIZES if any(s == size for s, _ in available)]
+        return {
+            "width": self.width,
+            "height": self.height,
+            "blurhash": self.blurhash,
+            "sizes": sizes,
+            "formats": [fmt for fmt in COVER_FORMATS if sizes and all((s, fmt) in available for s in sizes)],
+        }
+
+
+def supported_formats() -> tuple[str, ...]:
+    """当前 Pillow 可编码的变体格式"""
+    from PIL import features
+
+    return tuple(fmt for fmt in COVER_FORMATS if features.check(fmt))
+
+
+def content_cover_key(data: bytes) -> str:
+    """按原始封面图片内容寻址的 JPEG 封面 Key"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest[:2]}/{digest}.jpg"
+
+
+def cover_variant_key(cover_key: str, size: str, fmt: str) -> str:
+    """由 JPEG 封面 Key 推导变体 Key"""
+    return f"{cover_key.rsplit('.', 1)[0]}/{size}.{fmt}"
+
+
+def cover_variant_suffixes() -> list[str]:
+    """全部可能存在的变体 Key 后缀 ({size}.{format})"""
+    return [f"{size}.{fmt}" for size in COVER_SIZES for fmt in COVER_FORMATS]
+
+
+def cover_object_keys(cover_key: str) -> list[str]:
+    """封面及其全部可能存在的变体 Key (删除时使用)"""
+    base = cover_key.rsplit(".", 1)[0]
+    return [cover_key] + [f"{base}/{suffix}" for suffix in cover_variant_suffixes()]
+
+
+def select_cover_key(
+    cover_key: str,
+    cover_meta: dict[str, Any] | None,
+    size: str = DEFAULT_SIZE,
+    fmt: str = DEFAULT_FORMAT,
+) -> tuple[str, str]:
+    """
+    选择要下发的封面对象
+
+    变体不存在 (旧数据或不支持的格式) 时回退到 JPEG 封面。
+
+    Returns:
+        (对象 Key, Content-Type)
+    """
+    if cover_meta and size in cover_meta.get("sizes", ()) and fmt in cover_meta.get("formats", ()):
+        return cover_variant_key(cover_key, size, fmt), CONTENT_TYPES[fmt]
+    return cover_key, CONTENT_TYPES["jpeg"]
+
+
+def build_cover_variants(data: bytes) -> CoverVariants:
+    """
+    从原始封面图片生成全部变体与 BlurHash
+
+    Args:
+        data: 任意 Pillow 可读取的图片
+    """
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as source:
+        image = source.convert("RGB")
+
+    formats = supported_formats()
+    variants: dict[tuple[str, str], bytes] = {}
+    resized: dict[str, Image.Image] = {}
+    for size, width in COVER_SIZES.items():
+        resized[size] = _fit_width(image, width)
+        for fmt in formats:
+            try:
+                variants[(size, fmt)] = _encode(resized[size], fmt)
+            except Exception:
+                # 编码器可用但编码失败 (如 AVIF 插件缺少编码库)，跳过该变体
+                logger.warning("Cover variant encode failed", size=size, format=fmt, exc_info=True)
+
+    return CoverVariants(
+        jpeg=_encode(resized["large"], "jpeg"),
+        width=image.width,
+        height=image.height,
+        blurhash=blurhash_encode(_fit_width(image, BLURHASH_SAMPLE_WIDTH)),
+        variants=variants,
+    )
+
+
+def _fit_width(image, width: int):  # noqa: ANN001, ANN202
+    """按宽度等比缩小 (不放大)"""
+    from PIL import Image
+
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(image, fmt: str) -> bytes:  # noqa: ANN001
+    out = BytesIO()
+    if fmt == "avif":
+        image.save(out, format="AVIF", quality=60, speed=8)
+    elif fmt == "webp":
+        image.save(out, format="WEBP", quality=80, method=4)
+    else:
+        image.save(out, format="JPEG", quality=85, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+# =============================================================================
+# BlurHash 编码 (https://github.com/woltapp/blurhash)
+# =============================================================================
+
+
+def blurhash_encode(image, components: tuple[int, int] = BLURHASH_COMPONENTS) -> str:  # noqa: ANN001
+    """
+    计算 RGB 图片的 BlurHash
+
+    图片应先缩小到几十像素宽，计算量与像素数 × 分量数成正比。
+    """
+    cx, cy = components
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(c) for c in px) for px in image.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(cx)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(cy)]
+
+    factors: list[tuple[float, float, float]] = []
+    for j in range(cy):
+        for i in range(cx):
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = cos_y[j][y]
+                for x in range(width):
+                    basis = cos_x[i][x] * basis_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((cx - 1) + (cy - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        result += _encode83(0, 1)
+
+    result += _encode83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, math.floor(_sign_pow(v / max_value, 0.5) * 9 + 9.5))) for v in factor
+        )
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
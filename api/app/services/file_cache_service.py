@@ -0,0 +1,283 @@
+"""
+Worker 本地文件缓存服务
+
+将 MinIO 对象按内容寻址缓存到 Worker 本地磁盘，
+同一主机上的多个任务/进程复用同一份文件，每本书只从对象存储拉取一次。
+
+- 缓存键: sha256 (已知内容哈希时) 或 bucket/key/etag
+- 容量上限: 超出后按最近使用时间 (mtime) 淘汰，使用中的条目不会被淘汰
+- 原子填充: 先下载到临时文件，再 os.replace 到最终路径
+- 跨进程锁: 每个条目一个 flock 锁文件，填充时排他锁，使用时共享锁；锁文件随条目淘汰删除
+"""
+
+import fcntl
+import hashlib
+import os
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+import structlog
+
+from app.core.config import settings
+from app.services.storage_service import StorageService, get_storage_service
+
+logger = structlog.get_logger()
+
+
+class FileCacheService:
+    """Worker 本地内容寻址 LRU 文件缓存"""
+
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        max_bytes: int | None = None,
+        storage: StorageService | None = None,
+    ):
+        self.cache_dir = Path(cache_dir or settings.celery.worker_cache_dir)
+        self.max_bytes = (
+            max_bytes if max_bytes is not None
+            else settings.celery.worker_cache_max_mb * 1024 * 1024
+        )
+        self.objects_dir = self.cache_dir / "objects"
+        self.locks_dir = self.cache_dir / "locks"
+        self.tmp_dir = self.cache_dir / "tmp"
+        for directory in (self.objects_dir, self.locks_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._storage = storage
+
+    @property
+    def storage(self) -> StorageService:
+        if self._storage is None:
+            self._storage = get_storage_service()
+        return self._storage
+
+    @contextmanager
+    def local_copy(
+        self,
+        key: str,
+        bucket: str | None = None,
+        suffix: str = "",
+        sha256: str | None = None,
+    ) -> Iterator[Path]:
+        """
+        获取对象的本地只读副本
+
+        在 with 块内持有条目的共享锁，期间不会被其他进程淘汰。
+
+        Args:
+            key: 对象键
+            bucket: 存储桶名称
+            suffix: 文件后缀 (如 ".pdf")，部分工具依赖后缀识别格式
+            sha256: 已知的内容哈希，提供时跳过 stat 请求
+
+        Yields:
+            本地文件路径 (调用方不得修改或删除)
+        """
+        bucket = bucket or settings.minio.minio_bucket_books
+        if sha256:
+            cache_key = f"sha256:{sha256}"
+        else:
+            info = self.storage.get_object_info(key, bucket=bucket)
+            if info is None:
+                raise FileNotFoundError(f"{bucket}/{key}")
+            cache_key = f"{bucket}/{key}@{info['etag']}"
+
+        digest = hashlib.sha256(f"{cache_key}{suffix}".encode()).hexdigest()
+        path = self.objects_dir / digest[:2] / f"{digest}{suffix}"
+
+        lock_fd = self._open_entry(digest, path, bucket, key)
+        try:
+            yield path
+        finally:
+            os.close(lock_fd)  # 关闭即释放 flock
+
+    def adopt(self, source: Path, sha256: str, suffix: str = "") -> None:
+        """
+        把已缓存的文件登记到内容哈希键下 (硬链接，不复制)
+
+        首次下载时内容哈希未知，只能按 bucket/key/etag 缓存；算出哈希后登记，
+        后续按 sha256 寻址的调用直接命中，不再下载。调用方须仍持有 source 的锁。
+        """
+        digest = hashlib.sha256(f"sha256:{sha256}{suffix}".encode()).hexdigest()
+        path = self.objects_dir / digest[:2] / f"{digest}{suffix}"
+        if path.exists():
+            return
+
+        lock_fd = self._lock(digest, fcntl.LOCK_EX)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with suppress(FileExistsError):
+                os.link(source, path)
+        finally:
+            os.close(lock_fd)
+
+    def evict(self, exclude: Path | None = None) -> int:
+        """
+        按 LRU 淘汰条目直到总大小低于上限
+
+        只有一个进程执行淘汰；正被使用 (持有锁) 的条目跳过。
+        没有对应条目的锁文件一并清理，锁目录不随历史对象无限增长。
+
+        Returns:
+            释放的字节数
+        """
+        evict_lock = os.open(self.cache_dir / ".evict.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(evict_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            entries = []
+            total = 0
+            for path in self.objects_dir.glob("*/*"):
+                with suppress(FileNotFoundError):
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            freed = 0
+            live = {path.name[:64] for _mtime, _size, path in entries}
+            entries.sort()
+            for _mtime, size, path in entries:
+                if total - freed <= self.max_bytes:
+                    break
+                if path == exclude:
+                    continue
+                if self._try_remove(path.name[:64], path):
+                    freed += size
+                    live.discard(path.name[:64])
+
+            stale_locks = 0
+            for lock_path in self.locks_dir.glob("*.lock"):
+                if lock_path.stem not in live and self._try_remove(lock_path.stem):
+                    stale_locks += 1
+
+            if freed or stale_locks:
+                logger.info(
+                    "Worker cache evicted",
+                    freed_bytes=freed,
+                    total_bytes=total - freed,
+                    stale_locks=stale_locks,
+                )
+            return freed
+        finally:
+            os.close(evict_lock)
+
+    def _open_entry(self, digest: str, path: Path, bucket: str, key: str) -> int:
+        """
+        锁定条目并确保已填充，返回持有共享锁的锁文件描述符
+
+        命中时直接取共享锁。未命中时先取排他锁再复查，由取得排他锁的进程填充后降级为共享锁；
+        取不到排他锁说明其他进程正在填充，改为等待共享锁，填充完成后按命中处理，
+        冷启动的调用方不会互相串行。flock 的锁转换不是原子的，降级间隙内条目可能被淘汰，
+        复查失败时重来。
+        """
+        while True:
+            filled = False
+            lock_fd = None
+            if not path.exists():
+                lock_fd = self._lock(digest, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if lock_fd is None:
+                lock_fd = self._lock(digest, fcntl.LOCK_SH)
+            else:
+                try:
+                    if not path.exists():
+                        self._fill(path, bucket, key)
+                        filled = True
+                        logger.info("Worker cache filled", key=key, size=path.stat().st_size)
+                    fcntl.flock(lock_fd, fcntl.LOCK_SH)
+                except BaseException:
+                    os.close(lock_fd)
+                    raise
+            if path.exists() and self._lock_is_current(lock_fd, digest):
+                break
+            os.close(lock_fd)
+
+        if filled:
+            self.evict(exclude=path)
+        else:
+            os.utime(path)
+            logger.debug("Worker cache hit", key=key)
+        return lock_fd
+
+    def _try_remove(self, digest: str, path: Path | None = None) -> bool:
+        """
+        在不阻塞的前提下获取排他锁，删除条目及其锁文件
+
+        未给出条目路径时只清理锁文件，且仅在该摘要下没有任何条目时删除。
+        """
+        fd = self._lock(digest, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if fd is None:
+            return False
+        try:
+            if path is not None:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    return False
+            elif any(self.objects_dir.glob(f"{digest[:2]}/{digest}*")):
+                return False
+            # 持有排他锁时删除：在旧 inode 上等待的进程加锁后复查发现失效，会重新创建锁文件
+            self._lock_path(digest).unlink()
+            return True
+        finally:
+            os.close(fd)
+
+    def _lock(self, digest: str, operation: int) -> int | None:
+        """
+        打开条目锁文件并加锁，非阻塞加锁失败时返回 None
+
+        锁文件可能在等待期间被淘汰删除，加锁后确认仍是当前路径上的文件，
+        否则各进程会锁在不同的 inode 上。
+        """
+        while True:
+            fd = os.open(self._lock_path(digest), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, operation)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            if self._lock_is_current(fd, digest):
+                return fd
+            os.close(fd)
+
+    def _lock_is_current(self, fd: int, digest: str) -> bool:
+        """锁文件描述符是否仍指向锁目录中的同一文件"""
+        try:
+            current = os.stat(self._lock_path(digest))
+        except FileNotFoundError:
+            return False
+        held = os.fstat(fd)
+        return (held.st_dev, held.st_ino) == (current.st_dev, current.st_ino)
+
+    def _lock_path(self, digest: str) -> Path:
+        return self.locks_dir / f"{digest}.lock"
+
+    def _fill(self, path: Path, bucket: str, key: str) -> None:
+        """下载到临时文件后原子替换，避免读到半成品"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            self.storage.download_file(bucket=bucket, key=key, file_path=tmp_path)
+            # mkstemp 创建的文件为 0600；缓存目录兼作 Calibre 共享目录时，转换服务以其他用户读取
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+# 单例
+_file_cache_service: FileCacheService | None = None
+
+
+def get_file_cache_service() -> FileCacheService:
+    """获取 Worker 文件缓存单例"""
+    global _file_cache_service
+    if _file_cache_service is None:
+        _file_cache_service = FileCacheService()
+    return _file_cache_service
@@ -13,6 +13,7 @@ from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import AthenaException, ErrorCode
+from app.core.pagination import Page, paginate
 from app.models import (
     Book,
     Bookmark,
@@ -89,8 +90,10 @@ class NoteService:
         book_id: str | None = None,
         page: int = 1,
         page_size: int = 20,
-    ) -> tuple[list[Note], int]:
-        """列出笔记"""
+        cursor: str | None = None,
+        with_total: bool | None = None,
+    ) -> Page[Note]:
+        """列出笔记 (按创建时间倒序，支持游标分页)"""
         query = select(Note).where(
             Note.user_id == UUID(user_id),
             Note.deleted_at.is_(None),
@@ -99,18 +102,10 @@ class NoteService:
         if book_id:
             query = query.where(Note.book_id == UUID(book_id))
 
-        # 计数
-        count_query = select(func.count()).select_from(query.subquery())
-        total = (await self.db.execute(count_query)).scalar() or 0
-
-        # 分页
-        query = query.order_by(Note.created_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
-
-        result = await self.db.execute(query)
-        notes = list(result.scalars().all())
-
-        return notes, total
+        return await paginate(
+            self.db, query, Note.created_at, Note.id,
+            page=page, page_size=page_size, cursor=cursor, with_total=with_total,
+        )
 
     async def update_note(
         self,
@@ -0,0 +1,130 @@
+"""
+OCR 计费
+
+按实际 OCR 的页数 (图片页) 扣减积分，每月免费页数 (free_ocr_pages_monthly) 先抵扣:
+
+- 预留: 触发时按抽样估算的页数预留积分，余额不足时拒绝 (402)；页数未知时不预留
+- 结算: Worker 逐页分析后、运行 OCRmyPDF 前按实际页数多退少补，补扣不足时任务失败，不做识别
+- 退回: 任务失败时退回全部预留，所用免费页数不计入本月用量
+
+任务当前占用的积分与免费页数记在 ocr_jobs.credits_consumed / free_pages，结算按差额调整，
+Celery 重试时重复结算不会重复扣费。积分变动与流水走 billing_service 的同一组语句。
+同一用户的预留与结算按用户行加锁串行，并发任务不会重复使用免费页数。
+"""
+
+from datetime import UTC, datetime
+from uuid import UUID
+
+from sqlalchemy import Connection, Select, func, select, text, update
+
+from app.core.config import settings
+from app.models.system import OcrJob
+from app.services.billing_service import debit_credits, refund_credits
+
+
+def ocr_credits(ocr_pages: int) -> int:
+    """按实际 OCR 的页数计算积分"""
+    return ocr_pages * settings.ocr.ocr_credits_per_page
+
+
+def month_start(now: datetime | None = None) -> datetime:
+    """本月起始时刻 (UTC)，每月免费页数按此重置"""
+    now = now or datetime.now(UTC)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def split_ocr_charge(ocr_pages: int, free_pages_used: int) -> tuple[int, int]:
+    """
+    OCR 页数 → (免费页数, 积分)
+
+    Args:
+        ocr_pages: 需要 OCR 的页数
+        free_pages_used: 本月其他任务已使用的免费页数
+    """
+    free_remaining = max(settings.quota.free_ocr_pages_monthly - free_pages_used, 0)
+    free_pages = min(ocr_pages, free_remaining)
+    return free_pages, ocr_credits(ocr_pages - free_pages)
+
+
+def free_pages_used_statement(user_id: str, exclude_job_id: str | None = None) -> Select:
+    """用户本月未失败的 OCR 任务使用的免费页数"""
+    stmt = select(func.coalesce(func.sum(OcrJob.free_pages), 0)).where(
+        OcrJob.user_id == UUID(user_id),
+        OcrJob.status != "failed",
+        OcrJob.created_at >= month_start(),
+    )
+    if exclude_job_id:
+        stmt = stmt.where(OcrJob.id != UUID(exclude_job_id))
+    return stmt
+
+
+def reserve_ocr_credits(conn: Connection, job_id: str, user_id: str, ocr_pages: int) -> tuple[int, int]:
+    """
+    为新建的任务按估算页数预留 (同步连接，随调用方事务)
+
+    Returns:
+        (免费页数, 预留积分)
+
+    Raises:
+        InsufficientCreditsException: 余额不足
+    """
+    return _charge(conn, job_id, user_id, ocr_pages, "OCR 预留")
+
+
+def settle_ocr_credits(conn: Connection, job_id: str, user_id: str, ocr_pages: int) -> tuple[int, int]:
+    """
+    按实际 OCR 页数结算 (多退少补)
+
+    Returns:
+        (免费页数, 积分)
+
+    Raises:
+        InsufficientCreditsException: 需补扣的积分超出余额
+    """
+    return _charge(conn, job_id, user_id, ocr_pages, "OCR 结算")
+
+
+def release_ocr_credits(conn: Connection, job_id: str, user_id: str) -> int:
+    """
+    任务失败，退回全部预留
+
+    Returns:
+        退回的积分
+    """
+    _lock_user(conn, user_id)
+    reserved = conn.execute(
+        select(OcrJob.credits_consumed).where(OcrJob.id == UUID(job_id)).with_for_update()
+    ).scalar_one()
+    if reserved:
+        refund_credits(conn, user_id, reserved, "OCR 失败退回", "ocr_job", job_id)
+    conn.execute(update(OcrJob).where(OcrJob.id == UUID(job_id)).values(credits_consumed=0, free_pages=0))
+    return reserved
+
+
+def _charge(conn: Connection, job_id: str, user_id: str, ocr_pages: int, description: str) -> tuple[int, int]:
+    """把任务占用的积分与免费页数调整为 ocr_pages 对应的值"""
+    _lock_user(conn, user_id)
+    reserved = conn.execute(
+        select(OcrJob.credits_consumed).where(OcrJob.id == UUID(job_id)).with_for_update()
+    ).scalar_one()
+    used = conn.execute(free_pages_used_statement(user_id, exclude_job_id=job_id)).scalar_one()
+    free_pages, credits = split_ocr_charge(ocr_pages, used)
+
+    delta = credits - reserved
+    meta = {"ocr_pages": ocr_pages, "free_pages": free_pages}
+    if delta > 0:
+        debit_credits(conn, user_id, delta, "consume", f"{description} {ocr_pages} 页", "ocr_job", job_id, meta)
+    elif delta < 0:
+        refund_credits(conn, user_id, -delta, f"{description} {ocr_pages} 页", "ocr_job", job_id, meta)
+
+    conn.execute(
+        update(OcrJob)
+        .where(OcrJob.id == UUID(job_id))
+        .values(credits_consumed=credits, free_pages=free_pages)
+    )
+    return free_pages, credits
+
+
+def _lock_user(conn: Connection, user_id: str) -> None:
+    """同一用户的计费串行执行 (免费页数按本月其他任务累计)"""
+    conn.execute(text("SELECT id FROM users WHERE id = CAST(:user_id AS uuid) FOR UPDATE"), {"user_id": user_id})
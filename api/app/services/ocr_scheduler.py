@@ -0,0 +1,660 @@
+"""
+OCR 公平调度
+
+OCR 任务不再直接投递到 Celery，而是先进入 Redis 中按等级划分的等待队列，
+由调度器在 Worker 有空位时取出投递:
+
+- 优先级: 会员等级 + 请求优先级 (normal/high) 映射为 OCRPriority，
+  同一等级队列内按优先级、再按入队时间排序
+- 公平: 付费/免费两个等级之间使用加权公平队列 (stride scheduling)，
+  付费等级获得更多份额，但免费用户不会被饿死
+- 并发上限: 每个用户同时运行的 OCR 任务数受限，避免单个用户批量上传占满 Worker
+- 观测: 记录每个等级的排队等待时间，导出 p50/p90/p99 (Prometheus 指标 athena_ocr_queue_wait_seconds，
+  调度时与 /metrics 抓取时从 Redis 样本刷新)
+- 排队位置与预计时间: 状态轮询只读 Redis (ZRANK + 吞吐模型)，不访问数据库；
+  每次投递后向队首的等待任务推送新的排队位置 (见 progress_service)
+
+Redis 键:
+    ocr:queue:{tier}     ZSET  job_id → priority * 1e13 + 入队毫秒
+    ocr:job:{job_id}     HASH  任务参数 (user_id/book_id/minio_key/sha256/priority/tier/enqueued_at/pages)
+    ocr:running          ZSET  job_id → 投递毫秒
+    ocr:running_users    HASH  user_id → 运行中任务数
+    ocr:pass             HASH  tier → stride pass 值
+    ocr:wait:{tier}      LIST  最近的排队等待秒数样本
+    ocr:book:{book_id}   STR   书籍当前的 job_id (排队或运行中)
+    ocr:model            HASH  吞吐模型 (pages_per_sec/pages_per_job/samples/refreshed_at)
+"""
+
+import math
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import structlog
+from prometheus_client import Gauge
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_sync_engine
+from app.core.redis import get_redis, get_sync_redis
+from app.services.progress_service import publish_progress
+from app.services.text_layer_service import estimate_ocr_pages
+from app.tasks.celery_app import OCRPriority
+
+logger = structlog.get_logger()
+
+TIER_PAID = "paid"
+TIER_FREE = "free"
+TIERS = (TIER_PAID, TIER_FREE)
+
+QUEUE_KEY = "ocr:queue:{tier}"
+JOB_KEY = "ocr:job:{job_id}"
+RUNNING_KEY = "ocr:running"
+RUNNING_USERS_KEY = "ocr:running_users"
+PASS_KEY = "ocr:pass"
+WAIT_KEY = "ocr:wait:{tier}"
+BOOK_JOB_KEY = "ocr:book:{book_id}"
+MODEL_KEY = "ocr:model"
+DISPATCH_LOCK_KEY = "ocr:dispatch_lock"
+
+# 分数 = 优先级 * PRIORITY_SCALE + 入队毫秒，保证先按优先级、再按时间排序
+PRIORITY_SCALE = 10**13
+# 每个等级保留的等待时间样本数
+WAIT_SAMPLES = 1000
+# 每次调度从每个等级队首扫描的任务数 (跳过已达并发上限的用户)
+SCAN_DEPTH = 50
+# 吞吐模型取最近完成的任务数
+MODEL_WINDOW = 200
+# 页数未知时的默认页数
+DEFAULT_JOB_PAGES = 100
+# 每次调度最多补入队的待处理任务数
+REQUEUE_BATCH = 100
+
+QUEUE_WAIT_SECONDS = Gauge(
+    "athena_ocr_queue_wait_seconds",
+    "OCR 各等级最近排队等待时间的分位数 (秒)",
+    ("tier", "percentile"),
+)
+
+
+@dataclass
+class QueuedJob:
+    """等待队列中的一个 OCR 任务"""
+
+    job_id: str
+    user_id: str
+    tier: str
+    priority: int
+    enqueued_ms: int = 0
+    book_id: str = ""
+    pages: int = 0
+
+
+@dataclass
+class ThroughputModel:
+    """OCR 吞吐模型 (最近完成任务的单 Worker 每秒页数)"""
+
+    pages_per_sec: float
+    pages_per_job: float
+    samples: int = 0
+
+    @classmethod
+    def from_hash(cls, data: dict[str, str]) -> "ThroughputModel":
+        """从 Redis 哈希读取，无样本时使用配置的默认值"""
+        if not data or not int(data.get("samples", 0)):
+            return cls(settings.ocr.ocr_default_pages_per_sec, DEFAULT_JOB_PAGES)
+        return cls(
+            float(data["pages_per_sec"]),
+            float(data["pages_per_job"]),
+            int(data["samples"]),
+        )
+
+
+def estimate_position(rank: int, tier: str, other_queued: int, weights: dict[str, int]) -> int:
+    """
+    等级内排名 (ZRANK, 从 0 开始) → 全局排队位置 (从 1 开始)
+
+    加权公平调度下，另一等级会按权重比例插入任务，但不超过其排队数。
+    """
+    other = TIER_FREE if tier == TIER_PAID else TIER_PAID
+    interleaved = math.ceil((rank + 1) * weights[other] / max(weights[tier], 1))
+    return rank + min(other_queued, interleaved) + 1
+
+
+def estimate_eta_seconds(
+    position: int,
+    pages: int,
+    model: ThroughputModel,
+    workers: int,
+    elapsed_seconds: float = 0.0,
+) -> int:
+    """
+    预计完成时间 (秒)
+
+    排队部分: 前面任务的页数 ÷ 每秒页数 ÷ Worker 数；
+    处理部分: 本任务剩余页数 ÷ 每秒页数 (一个任务由一个 Worker 处理)。
+    """
+    pps = max(model.pages_per_sec, 1e-6)
+    wait = max(position - 1, 0) * model.pages_per_job / pps / max(workers, 1)
+    run = max(pages / pps - elapsed_seconds, 0.0)
+    return math.ceil(wait + run)
+
+
+def is_paid_member(membership_tier: str, membership_expire_at: datetime | None) -> bool:
+    """会员等级非 FREE 且未过期"""
+    if membership_tier == "FREE":
+        return False
+    return membership_expire_at is None or membership_expire_at > datetime.now(UTC)
+
+
+def ocr_priority_for(
+    membership_tier: str,
+    membership_expire_at: datetime | None,
+    request_priority: str = "normal",
+) -> int:
+    """会员等级 + 请求优先级 → OCRPriority"""
+    high = request_priority == "high"
+    if is_paid_member(membership_tier, membership_expire_at):
+        return OCRPriority.PAID_HIGH if high else OCRPriority.PAID_NORMAL
+    return OCRPriority.FREE_HIGH if high else OCRPriority.FREE_NORMAL
+
+
+def tier_for_priority(priority: int) -> str:
+    """OCRPriority → 调度等级"""
+    return TIER_PAID if priority < OCRPriority.FREE_HIGH else TIER_FREE
+
+
+def queue_score(priority: int, enqueued_ms: int) -> float:
+    return float(priority * PRIORITY_SCALE + enqueued_ms)
+
+
+def tier_weights() -> dict[str, int]:
+    return {
+        TIER_PAID: settings.ocr.ocr_paid_weight,
+        TIER_FREE: settings.ocr.ocr_free_weight,
+    }
+
+
+def user_caps() -> dict[str, int]:
+    return {
+        TIER_PAID: settings.ocr.ocr_user_concurrency_paid,
+        TIER_FREE: settings.ocr.ocr_user_concurrency_free,
+    }
+
+
+def pick_next(
+    heads: dict[str, list[QueuedJob]],
+    passes: dict[str, float],
+    weights: dict[str, int],
+    running_by_user: dict[str, int],
+    caps: dict[str, int],
+) -> QueuedJob | None:
+    """
+    选出下一个投递的任务 (stride scheduling)
+
+    每个有可运行任务的等级中 pass 最小者胜出 (相同时付费优先)，
+    胜出等级的 pass 增加 1/weight。空闲等级的 pass 追平当前最小值，
+    避免长时间空闲后积攒份额一次性抢占。
+
+    heads 与 passes 会被原地更新 (取出的任务从 heads 中移除)。
+    """
+    eligible: dict[str, QueuedJob] = {}
+    for tier in TIERS:
+        for job in heads.get(tier, []):
+            if running_by_user.get(job.user_id, 0) < caps[tier]:
+                eligible[tier] = job
+                break
+
+    if not eligible:
+        return None
+
+    floor = min(passes.get(tier, 0.0) for tier in eligible)
+    for tier in TIERS:
+        if tier not in eligible:
+            passes[tier] = max(passes.get(tier, 0.0), floor)
+
+    tier = min(eligible, key=lambda t: (passes.get(t, 0.0), TIERS.index(t)))
+    job = eligible[tier]
+
+    passes[tier] = passes.get(tier, 0.0) + 1.0 / max(weights[tier], 1)
+    heads[tier].remove(job)
+    running_by_user[job.user_id] = running_by_user.get(job.user_id, 0) + 1
+    return job
+
+
+def percentiles(samples: Iterable[float], points: Iterable[int] = (50, 90, 99)) -> dict[str, float | None]:
+    """最近秩法计算分位数"""
+    ordered = sorted(samples)
+    result: dict[str, float | None] = {}
+    for p in points:
+        if not ordered:
+            result[f"p{p}"] = None
+            continue
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        result[f"p{p}"] = round(ordered[rank - 1], 3)
+    return result
+
+
+def export_wait_metrics(waits: dict[str, dict[str, float | None]]) -> None:
+    """把各等级的排队等待分位数写入 Prometheus 指标 (没有样本时为 NaN)"""
+    for tier, points in waits.items():
+        for point, value in points.items():
+            QUEUE_WAIT_SECONDS.labels(tier=tier, percentile=point).set(math.nan if value is None else value)
+
+
+async def refresh_queue_metrics() -> None:
+    """从 Redis 样本刷新排队等待指标 (/metrics 抓取时调用，样本由 Worker 调度时写入)"""
+    try:
+        stats = await OcrQueue().stats()
+    except Exception:
+        logger.warning("Failed to refresh OCR queue metrics", exc_info=True)
+        return
+    export_wait_metrics({tier: stats[tier]["wait_seconds"] for tier in TIERS})
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _queue_job(
+    pipe,  # noqa: ANN001
+    job_id: str,
+    user_id: str,
+    book_id: str,
+    minio_key: str,
+    sha256: str,
+    priority: int,
+    pages: int | None,
+) -> None:
+    """向 pipeline 写入入队命令 (API 侧异步与 Celery 侧同步共用)"""
+    tier = tier_for_priority(priority)
+    enqueued_ms = _now_ms()
+    pipe.hset(
+        JOB_KEY.format(job_id=job_id),
+        mapping={
+            "user_id": user_id,
+            "book_id": book_id,
+            "minio_key": minio_key,
+            "sha256": sha256,
+            "priority": priority,
+            "tier": tier,
+            "enqueued_at": enqueued_ms,
+            "pages": pages or 0,
+        },
+    )
+    pipe.zadd(QUEUE_KEY.format(tier=tier), {job_id: queue_score(priority, enqueued_ms)})
+    pipe.set(BOOK_JOB_KEY.format(book_id=book_id), job_id)
+
+
+class OcrQueue:
+    """OCR 等待队列 (API 侧，异步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_redis()
+
+    async def enqueue(
+        self,
+        job_id: str,
+        user_id: str,
+        book_id: str,
+        minio_key: str,
+        sha256: str,
+        priority: int,
+        pages: int | None = None,
+    ) -> None:
+        """任务入队，等待调度器投递"""
+        pipe = self.redis.pipeline(transaction=True)
+        _queue_job(pipe, job_id, user_id, book_id, minio_key, sha256, priority, pages)
+        await pipe.execute()
+
+    async def get_status(self, book_id: str) -> dict | None:
+        """
+        书籍当前 OCR 任务的排队位置与预计完成时间
+
+        只读 Redis，没有排队或运行中的任务时返回 None。
+        """
+        job_id = await self.redis.get(BOOK_JOB_KEY.format(book_id=book_id))
+        if not job_id:
+            return None
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(JOB_KEY.format(job_id=job_id))
+        for tier in TIERS:
+            pipe.zrank(QUEUE_KEY.format(tier=tier), job_id)
+            pipe.zcard(QUEUE_KEY.format(tier=tier))
+        pipe.zscore(RUNNING_KEY, job_id)
+        pipe.hgetall(MODEL_KEY)
+        job, paid_rank, paid_len, free_rank, free_len, dispatched_ms, model_data = await pipe.execute()
+        if not job:
+            return None
+
+        model = ThroughputModel.from_hash(model_data)
+        pages = int(job.get("pages") or 0) or round(model.pages_per_job)
+        workers = settings.ocr.ocr_dispatch_slots
+        status = {
+            "job_id": job_id,
+            "user_id": job["user_id"],
+            "total_pages": pages,
+        }
+
+        if dispatched_ms is not None:
+            elapsed = max(_now_ms() - dispatched_ms, 0) / 1000
+            processed = min(int(elapsed * model.pages_per_sec), pages)
+            return {
+                **status,
+                "state": "processing",
+                "queue_position": 0,
+                "started_at_ms": int(dispatched_ms),
+                "processed_pages": processed,
+                "estimated_seconds": estimate_eta_seconds(1, pages, model, workers, elapsed),
+            }
+
+        if paid_rank is not None:
+            position = estimate_position(paid_rank, TIER_PAID, free_len, tier_weights())
+        elif free_rank is not None:
+            position = estimate_position(free_rank, TIER_FREE, paid_len, tier_weights())
+        else:
+            # 已出队但尚未进入运行集合 (调度瞬间)
+            position = 1
+        return {
+            **status,
+            "state": "pending",
+            "queue_position": position,
+            "started_at_ms": None,
+            "processed_pages": 0,
+            "estimated_seconds": estimate_eta_seconds(position, pages, model, workers),
+        }
+
+    async def stats(self) -> dict[str, dict]:
+        """每个等级的排队长度与等待时间分位数"""
+        pipe = self.redis.pipeline(transaction=False)
+        for tier in TIERS:
+            pipe.zcard(QUEUE_KEY.format(tier=tier))
+            pipe.lrange(WAIT_KEY.format(tier=tier), 0, -1)
+        pipe.zcard(RUNNING_KEY)
+        results = await pipe.execute()
+
+        stats: dict[str, dict] = {}
+        for i, tier in enumerate(TIERS):
+            queued, waits = results[2 * i], results[2 * i + 1]
+            stats[tier] = {
+                "queued": queued,
+                "samples": len(waits),
+                "wait_seconds": percentiles(float(w) for w in waits),
+            }
+        stats["running"] = {"jobs": results[-1], "slots": settings.ocr.ocr_dispatch_slots}
+        return stats
+
+
+class OcrScheduler:
+    """OCR 调度器 (Celery 侧，同步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_sync_redis()
+
+    def enqueue(
+        self,
+        job_id: str,
+        user_id: str,
+        book_id: str,
+        minio_key: str,
+        sha256: str,
+        priority: int,
+        pages: int | None = None,
+    ) -> None:
+        """任务入队 (Celery 侧，如入库流水线自动 OCR)"""
+        pipe = self.redis.pipeline(transaction=True)
+        _queue_job(pipe, job_id, user_id, book_id, minio_key, sha256, priority, pages)
+        pipe.execute()
+
+    def dispatch(self) -> int:
+        """
+        按空闲槽位投递等待中的任务
+
+        Returns:
+            本次投递的任务数
+        """
+        lock = self.redis.lock(DISPATCH_LOCK_KEY, timeout=30, blocking_timeout=5)
+        if not lock.acquire():
+            return 0
+        try:
+            capacity = settings.ocr.ocr_dispatch_slots - self.redis.zcard(RUNNING_KEY)
+            if capacity <= 0:
+                return 0
+
+            heads = {tier: self._load_heads(tier) for tier in TIERS}
+            if not any(heads.values()):
+                return 0
+
+            passes = {k: float(v) for k, v in self.redis.hgetall(PASS_KEY).items()}
+            running_by_user = {k: int(v) for k, v in self.redis.hgetall(RUNNING_USERS_KEY).items()}
+            weights, caps = tier_weights(), user_caps()
+
+            dispatched = 0
+            while dispatched < capacity:
+                job = pick_next(heads, passes, weights, running_by_user, caps)
+                if job is None:
+                    break
+                self._dispatch(job)
+                dispatched += 1
+
+            if dispatched:
+                self.redis.hset(PASS_KEY, mapping=passes)
+                self._publish_positions(heads)
+            return dispatched
+        finally:
+            lock.release()
+
+    def release(self, job_id: str) -> None:
+        """任务结束 (成功或最终失败) 后释放运行槽位，可重复调用"""
+        job_key = JOB_KEY.format(job_id=job_id)
+        user_id, book_id = self.redis.hmget(job_key, "user_id", "book_id")
+        if not self.redis.zrem(RUNNING_KEY, job_id):
+            return
+        if user_id and self.redis.hincrby(RUNNING_USERS_KEY, user_id, -1) <= 0:
+            self.redis.hdel(RUNNING_USERS_KEY, user_id)
+        self.redis.delete(job_key)
+        if book_id:
+            # 同一本书可能已重新入队，只删除指向本任务的映射
+            book_key = BOOK_JOB_KEY.format(book_id=book_id)
+            if self.redis.get(book_key) == job_id:
+                self.redis.delete(book_key)
+
+    def reclaim_stale(self, max_age_seconds: int) -> int:
+        """回收超时未释放的运行槽位 (Worker 崩溃等)"""
+        cutoff = _now_ms() - max_age_seconds * 1000
+        stale = self.redis.zrangebyscore(RUNNING_KEY, 0, cutoff)
+        for job_id in stale:
+            logger.warning("Reclaiming stale OCR slot", job_id=job_id)
+            self.release(job_id)
+        return len(stale)
+
+    def requeue_missing(self, min_age_seconds: int = 60) -> int:
+        """
+        重新入队数据库中待处理但不在 Redis 中的任务
+
+        OcrJob 先提交、后入队，入队失败 (Redis 不可用) 或运行槽位被回收时任务会停在 pending，
+        由定时调度补入队列。min_age_seconds 内创建的任务可能正在入队，跳过。
+        """
+        with get_sync_engine().connect() as conn:
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT j.id, j.user_id, j.book_id, j.priority,
+                           b.minio_key, b.content_sha256, b.meta
+                    FROM ocr_jobs j
+                    JOIN books b ON b.id = j.book_id AND b.deleted_at IS NULL
+                    WHERE j.status = 'pending'
+                      AND j.created_at < NOW() - make_interval(secs => :min_age)
+                    ORDER BY j.created_at
+                    LIMIT :limit
+                    """
+                ),
+                {"min_age": min_age_seconds, "limit": REQUEUE_BATCH},
+            ).all()
+        if not rows:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for row in rows:
+            pipe.exists(JOB_KEY.format(job_id=row.id))
+        missing = [row for row, exists in zip(rows, pipe.execute(), strict=True) if not exists]
+
+        for row in missing:
+            meta = row.meta or {}
+            pages = estimate_ocr_pages(meta.get("text_layer"))
+            logger.warning("Requeueing pending OCR job missing from queue", job_id=str(row.id))
+            self.enqueue(
+                job_id=str(row.id),
+                user_id=str(row.user_id),
+                book_id=str(row.book_id),
+                minio_key=row.minio_key,
+                sha256=row.content_sha256 or "",
+                priority=row.priority,
+                pages=pages if pages is not None else meta.get("page_count"),
+            )
+        return len(missing)
+
+    def refresh_model(self, max_age_seconds: int = 300) -> ThroughputModel:
+        """
+        用最近完成的 OcrJob 耗时刷新吞吐模型
+
+        由定时调度调用，模型缓存在 Redis 中供状态轮询读取。
+        """
+        cached = self.redis.hgetall(MODEL_KEY)
+        if cached and time.time() - float(cached.get("refreshed_at", 0)) < max_age_seconds:
+            return ThroughputModel.from_hash(cached)
+
+        with get_sync_engine().connect() as conn:
+            row = conn.execute(
+                text(
+                    """
+                    SELECT COUNT(*) AS jobs,
+                           COALESCE(SUM(processed_pages), 0) AS pages,
+                           COALESCE(SUM(EXTRACT(EPOCH FROM completed_at - started_at)), 0) AS seconds
+                    FROM (
+                        SELECT processed_pages, started_at, completed_at
+                        FROM ocr_jobs
+                        WHERE status = 'completed'
+                          AND processed_pages > 0
+                          AND completed_at > started_at
+                        ORDER BY completed_at DESC
+                        LIMIT :window
+                    ) recent
+                    """
+                ),
+                {"window": MODEL_WINDOW},
+            ).one()
+
+        jobs, pages, seconds = int(row.jobs), float(row.pages), float(row.seconds)
+        data = {"samples": 0, "refreshed_at": time.time()}
+        if jobs and seconds > 0:
+            data.update(pages_per_sec=pages / seconds, pages_per_job=pages / jobs, samples=jobs)
+        self.redis.hset(MODEL_KEY, mapping=data)
+        return ThroughputModel.from_hash({k: str(v) for k, v in data.items()})
+
+    def wait_percentiles(self) -> dict[str, dict[str, float | None]]:
+        """每个等级的排队等待时间分位数 (秒)"""
+        return {
+            tier: percentiles(float(w) for w in self.redis.lrange(WAIT_KEY.format(tier=tier), 0, -1))
+            for tier in TIERS
+        }
+
+    def _load_heads(self, tier: str) -> list[QueuedJob]:
+        """读取等级队首若干任务"""
+        job_ids = self.redis.zrange(QUEUE_KEY.format(tier=tier), 0, SCAN_DEPTH - 1)
+        if not job_ids:
+            return []
+
+        pipe = self.redis.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hmget(
+                JOB_KEY.format(job_id=job_id), "user_id", "priority", "enqueued_at", "book_id", "pages"
+            )
+        heads = []
+        for job_id, (user_id, priority, enqueued_at, book_id, pages) in zip(
+            job_ids, pipe.execute(), strict=True
+        ):
+            if user_id is None:
+                # 任务详情丢失，移出队列
+                self.redis.zrem(QUEUE_KEY.format(tier=tier), job_id)
+                continue
+            heads.append(
+                QueuedJob(
+                    job_id, user_id, tier, int(priority), int(enqueued_at), book_id or "", int(pages or 0)
+                )
+            )
+        return heads
+
+    def model(self) -> ThroughputModel:
+        """缓存的吞吐模型"""
+        return ThroughputModel.from_hash(self.redis.hgetall(MODEL_KEY))
+
+    def _publish_positions(self, heads: dict[str, list[QueuedJob]]) -> None:
+        """向队首仍在等待的任务推送新的排队位置与预计时间"""
+        model = self.model()
+        weights = tier_weights()
+        queued = {tier: self.redis.zcard(QUEUE_KEY.format(tier=tier)) for tier in TIERS}
+        for tier, jobs in heads.items():
+            other = TIER_FREE if tier == TIER_PAID else TIER_PAID
+            for rank, job in enumerate(jobs):
+                position = estimate_position(rank, tier, queued[other], weights)
+                pages = job.pages or round(model.pages_per_job)
+                publish_progress(
+                    job.user_id,
+                    job.book_id,
+                    kind="ocr",
+                    stage="ocr",
+                    status="queued",
+                    queue_position=position,
+                    total_pages=pages,
+                    eta_seconds=estimate_eta_seconds(
+                        position, pages, model, settings.ocr.ocr_dispatch_slots
+                    ),
+                )
+
+    def _dispatch(self, job: QueuedJob) -> None:
+        """从等待队列移入运行集合并投递 Celery 任务"""
+        from app.tasks.ocr_tasks import process_ocr
+
+        now_ms = _now_ms()
+        job_key = JOB_KEY.format(job_id=job.job_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(QUEUE_KEY.format(tier=job.tier), job.job_id)
+        pipe.zadd(RUNNING_KEY, {job.job_id: now_ms})
+        pipe.hincrby(RUNNING_USERS_KEY, job.user_id, 1)
+        pipe.lpush(WAIT_KEY.format(tier=job.tier), round((now_ms - job.enqueued_ms) / 1000, 3))
+        pipe.ltrim(WAIT_KEY.format(tier=job.tier), 0, WAIT_SAMPLES - 1)
+        pipe.hgetall(job_key)
+        params = pipe.execute()[-1]
+
+        process_ocr.apply_async(
+            kwargs={
+                "book_id": params["book_id"],
+                "user_id": params["user_id"],
+                "minio_key": params["minio_key"],
+                "sha256": params["sha256"],
+                "job_id": job.job_id,
+            },
+            priority=job.priority,
+        )
+        logger.info(
+            "OCR job dispatched",
+            job_id=job.job_id,
+            tier=job.tier,
+            priority=job.priority,
+            waited_ms=now_ms - job.enqueued_ms,
+        )
+
+
+# 单例
+_ocr_scheduler: OcrScheduler | None = None
+
+
+def get_ocr_scheduler() -> OcrScheduler:
+    """获取 OCR 调度器单例"""
+    global _ocr_scheduler
+    if _ocr_scheduler is None:
+        _ocr_scheduler = OcrScheduler()
+    return _ocr_scheduler
@@ -0,0 +1,120 @@
+"""
+按月分区表维护
+
+reading_time_log 按 created_at 以月为单位做范围分区 (分区名 {表名}_pYYYYMM，边界为 UTC 月初):
+
+- 预建: 定时任务提前建好之后几个月的分区，写入不会因分区缺失而失败 (不设默认分区，
+  否则新建分区时需要扫描默认分区)
+- 保留: 整月分区过期后 DETACH 再 DROP，只涉及元数据，不产生死元组，也不长时间锁表
+
+供 Celery 任务在同步连接上调用，每个 DDL 各自一个事务，锁只持有到该语句结束。
+"""
+
+import re
+from datetime import UTC, date, datetime
+
+import structlog
+from sqlalchemy import Engine, text
+
+logger = structlog.get_logger()
+
+READING_LOG_TABLE = "reading_time_log"
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    """月初日期加减若干个月"""
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(table: str, name: str) -> date | None:
+    """分区名 → 所属月份 (不是按本模块规则命名的返回 None)"""
+    if not name.startswith(f"{table}_p"):
+        return None
+    match = _PARTITION_SUFFIX.search(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    """建立某月分区的 DDL (边界为 UTC 月初，不受会话时区影响)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+def list_partitions(engine: Engine, table: str) -> dict[str, date]:
+    """表的现有分区 {分区名: 月份}"""
+    with engine.connect() as conn:
+        names = conn.execute(
+            text("""
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = CAST(:table AS regclass)
+            """),
+            {"table": table},
+        ).scalars().all()
+    partitions = {}
+    for name in names:
+        month = partition_month(table, name)
+        if month is not None:
+            partitions[name] = month
+    return partitions
+
+
+def ensure_partitions(engine: Engine, table: str, months_ahead: int, today: date | None = None) -> list[str]:
+    """
+    确保当月及之后若干个月的分区存在
+
+    Returns:
+        新建的分区名
+    """
+    current = month_start(today or datetime.now(UTC).date())
+    existing = list_partitions(engine, table)
+
+    created = []
+    for n in range(months_ahead + 1):
+        month = add_months(current, n)
+        name = partition_name(table, month)
+        if name in existing:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(create_partition_sql(table, month)))
+        created.append(name)
+        logger.info("Partition created", table=table, partition=name)
+    return created
+
+
+def drop_partitions_before(engine: Engine, table: str, cutoff: datetime) -> list[str]:
+    """
+    删除整月都早于 cutoff 的分区 (先 DETACH 再 DROP)
+
+    Returns:
+        删除的分区名
+    """
+    dropped = []
+    for name, month in sorted(list_partitions(engine, table).items(), key=lambda item: item[1]):
+        upper = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=UTC)
+        if upper > cutoff:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        dropped.append(name)
+        logger.info("Partition dropped", table=table, partition=name)
+    return dropped
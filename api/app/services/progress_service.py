@@ -0,0 +1,185 @@
+"""
+处理进度推送
+
+Celery 任务把书籍处理与 OCR 的进度发布到 Redis 频道 (每个用户一个频道)，
+API 进程通过 SSE 推送给客户端，取代轮询状态接口。
+
+- 发布: 任务侧同步调用 publish_progress，失败只记录日志，不影响任务本身
+- 订阅: 每个 API 进程只有一个 Redis 订阅连接 (PSUBSCRIBE)，
+  收到消息后按用户扇出到本进程内各 SSE 连接的 asyncio 队列；
+  心跳由一个定时任务统一下发，空闲连接不持有各自的定时器，
+  单进程可以承载数万个空闲订阅者
+"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import structlog
+
+from app.core.redis import get_redis, get_sync_redis
+
+logger = structlog.get_logger()
+
+CHANNEL_PREFIX = "athena:events:"
+# 每个订阅者缓冲的事件数，满时丢弃最旧的事件 (进度事件是快照，只需最新)
+QUEUE_SIZE = 32
+# 心跳间隔 (秒)，防止代理因空闲断开连接
+HEARTBEAT_INTERVAL = 15.0
+
+# 心跳哨兵
+HEARTBEAT: dict[str, Any] = {"kind": "heartbeat"}
+
+
+def user_channel(user_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def publish_progress(
+    user_id: str,
+    book_id: str,
+    kind: str,
+    stage: str,
+    status: str,
+    **fields: Any,
+) -> None:
+    """
+    发布进度事件 (Celery 任务侧)
+
+    Args:
+        user_id: 用户 ID (决定频道)
+        book_id: 书籍 ID
+        kind: processing (入库处理) / ocr
+        stage: 当前阶段
+        status: queued / processing / completed / failed
+        **fields: progress (0-100)、pages_done、total_pages、eta_seconds、queue_position、error 等
+    """
+    event = {
+        "kind": kind,
+        "book_id": book_id,
+        "stage": stage,
+        "status": status,
+        "ts": int(time.time() * 1000),
+        **{k: v for k, v in fields.items() if v is not None},
+    }
+    try:
+        get_sync_redis().publish(user_channel(user_id), json.dumps(event))
+    except Exception:
+        logger.warning("Failed to publish progress", book_id=book_id, kind=kind, stage=stage)
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    """编码为一条 SSE 消息"""
+    return f"event: {event['kind']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+class ProgressHub:
+    """进程内的进度订阅中心"""
+
+    def __init__(self, redis=None, queue_size: int = QUEUE_SIZE):  # noqa: ANN001
+        self._redis = redis
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._tasks: list[asyncio.Task] = []
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        """订阅某个用户的事件，退出时自动取消"""
+        await self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def deliver(self, user_id: str, event: dict[str, Any]) -> None:
+        """扇出到该用户的全部订阅者"""
+        for queue in self._subscribers.get(user_id, ()):
+            _put_latest(queue, event)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _ensure_started(self) -> None:
+        if self._tasks:
+            return
+        async with self._start_lock:
+            if not self._tasks:
+                self._tasks = [
+                    asyncio.create_task(self._listen()),
+                    asyncio.create_task(self._heartbeat()),
+                ]
+
+    async def _listen(self) -> None:
+        """唯一的 Redis 订阅连接，断线后退避重连"""
+        backoff = 1.0
+        while True:
+            pubsub = (self._redis or get_redis()).pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    user_id = message["channel"].removeprefix(CHANNEL_PREFIX)
+                    if user_id in self._subscribers:
+                        self.deliver(user_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Progress subscription lost, reconnecting", backoff=backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                await pubsub.aclose()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for queues in list(self._subscribers.values()):
+                for queue in queues:
+                    _put_latest(queue, HEARTBEAT)
+
+
+def _put_latest(queue: asyncio.Queue, event: dict[str, Any]) -> None:
+    """放入事件，队列满时丢弃最旧的一条"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+# 单例
+_progress_hub: ProgressHub | None = None
+
+
+def get_progress_hub() -> ProgressHub:
+    """获取进程内订阅中心单例"""
+    global _progress_hub
+    if _progress_hub is None:
+        _progress_hub = ProgressHub()
+    return _progress_hub
+
+
+async def close_progress_hub() -> None:
+    """关闭订阅连接 (应用关闭时调用)"""
+    global _progress_hub
+    if _progress_hub is not None:
+        await _progress_hub.close()
+        _progress_hub = None
@@ -0,0 +1,557 @@
+"""
+阅读数据写缓冲
+
+阅读器每 30 秒发送一次会话心跳、每次翻页上报一次阅读位置，逐条写数据库使
+reading_time_log 与 book_position 成为更新最频繁的表。两者都先写入 Redis，
+由定时任务批量写回数据库。
+
+会话心跳:
+- 心跳: 一次 EVALSHA 完成归属校验、时长更新 (只增不减) 与脏标记，不访问数据库
+- 写回: flush_reading_sessions 定时取出一批脏会话，合并为一条 UPDATE ... FROM unnest(...)，
+  时长增量同一事务内按用户本地日期汇总到每日统计 (见 reading_rollup)
+- 结束: 会话结束仍同步写数据库 (汇总剩余时长)，随后删除缓冲；开始新会话时同样结束该用户之前未关闭的会话，
+  已结束的会话不再接受心跳，写回时也跳过
+- 缓冲丢失 (Redis 重启或过期) 时回源数据库校验归属并重建缓冲，最多丢失一个写回间隔的时长
+
+阅读位置:
+- 归属: book → owner 映射缓存在 Redis，未命中时查一次数据库；书籍删除时失效
+- 合并: 每个 (用户, 书籍) 一个哈希，后写入者覆盖 (last-write-wins)，
+  服务端时间戳单调递增；其他设备离线补传的、比当前位置更早记录的位置不覆盖
+- 写回: flush_reading_positions 每隔几秒以一条 INSERT ... ON CONFLICT 批量写回，
+  只覆盖更旧的行 (PowerSync 上传可能直接写入了更新的位置)；第一次读完的书籍同一事务内记入统计快照
+- 更新一次 EVALSHA 完成，直接返回缓冲中的最新状态
+
+Redis 键:
+    reading:session:{session_id}           HASH  user_id/book_id/device_id/duration_ms/last_active_ms/created_ms
+    reading:dirty                          SET   有未写回心跳的会话 ID
+    reading:owner:{book_id}                STR   书籍所属用户 ID
+    reading:position:{user_id}:{book_id}   HASH  progress/last_cfi/last_page/total_pages/device_id/
+                                                 updated_ms/client_ms/finished_ms
+    reading:position_dirty                 SET   有未写回位置的 {user_id}:{book_id}
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import get_sync_engine
+from app.core.redis import get_redis, get_sync_redis
+from app.services.reading_rollup import DailyRollup
+from app.services.reading_stats import local_day, record_finished
+
+SESSION_KEY = "reading:session:{session_id}"
+DIRTY_SESSIONS_KEY = "reading:dirty"
+BOOK_OWNER_KEY = "reading:owner:{book_id}"
+POSITION_KEY = "reading:position:{user_id}:{book_id}"
+DIRTY_POSITIONS_KEY = "reading:position_dirty"
+
+# 进度达到该值视为读完
+FINISHED_PROGRESS = 0.99
+
+# 校验归属后更新时长与最后活跃时间，返回更新后的哈希；缓冲不存在或不属于该用户时返回 nil
+# KEYS: 会话哈希, 脏集合   ARGV: user_id, duration_ms, now_ms, ttl, session_id
+HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'user_id') ~= ARGV[1] then
+    return nil
+end
+local duration = tonumber(redis.call('HGET', KEYS[1], 'duration_ms') or '0')
+if tonumber(ARGV[2]) > duration then
+    redis.call('HSET', KEYS[1], 'duration_ms', ARGV[2])
+end
+redis.call('HSET', KEYS[1], 'last_active_ms', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('SADD', KEYS[2], ARGV[5])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# 心跳可能乱序到达，时长与最后活跃时间只增不减
+# reading_time_log 按 created_at 分区，附带创建时间 (缓冲中为毫秒精度，放宽 2ms) 以便执行时裁剪分区
+# 锁定并取出更新前的时长与最后活跃时间，返回增量供汇总到每日统计 (数据库中的时长即已汇总的时长)
+# 已结束的会话跳过 (结束时已汇总，删除缓冲前取出的心跳不再写回)
+FLUSH_SESSIONS_SQL = """
+    WITH hb AS (
+        SELECT *
+        FROM unnest(
+            CAST(:ids AS uuid[]),
+            CAST(:durations AS bigint[]),
+            CAST(:last_active AS timestamptz[]),
+            CAST(:created AS timestamptz[])
+        ) AS hb(id, duration_ms, last_active_at, created_at)
+    ),
+    prev AS (
+        SELECT r.id, r.created_at, r.user_id, r.duration_ms, r.last_active_at
+        FROM reading_time_log r
+        JOIN hb ON r.id = hb.id
+               AND r.created_at BETWEEN hb.created_at - INTERVAL '2 milliseconds'
+                                    AND hb.created_at + INTERVAL '2 milliseconds'
+        WHERE r.is_active
+        FOR UPDATE OF r
+    )
+    UPDATE reading_time_log r
+    SET duration_ms = GREATEST(prev.duration_ms, hb.duration_ms),
+        last_active_at = GREATEST(prev.last_active_at, hb.last_active_at),
+        updated_at = NOW()
+    FROM prev
+    JOIN hb ON hb.id = prev.id
+    JOIN users u ON u.id = prev.user_id
+    WHERE r.id = prev.id
+      AND r.created_at = prev.created_at
+    RETURNING CAST(r.user_id AS text) AS user_id,
+              u.timezone,
+              prev.last_active_at AS rolled_at,
+              r.last_active_at,
+              r.duration_ms - prev.duration_ms AS delta_ms
+"""
+
+
+@dataclass
+class BufferedSession:
+    """缓冲中的阅读会话 (字段与 ReadingTimeLog 一致，可直接用于响应)"""
+
+    id: str
+    user_id: str
+    book_id: str
+    device_id: str | None
+    duration_ms: int
+    last_active_at: datetime
+    created_at: datetime
+    is_active: bool = True
+
+    @classmethod
+    def from_hash(cls, session_id: str, data: dict[str, str]) -> "BufferedSession":
+        return cls(
+            id=session_id,
+            user_id=data["user_id"],
+            book_id=data["book_id"],
+            device_id=data.get("device_id") or None,
+            duration_ms=int(data.get("duration_ms") or 0),
+            last_active_at=_from_ms(data["last_active_ms"]),
+            created_at=_from_ms(data["created_ms"]),
+        )
+
+
+def session_hash(session) -> dict[str, str | int]:  # noqa: ANN001
+    """ReadingTimeLog → 缓冲哈希"""
+    return {
+        "user_id": str(session.user_id),
+        "book_id": str(session.book_id),
+        "device_id": session.device_id or "",
+        "duration_ms": session.duration_ms,
+        "last_active_ms": _to_ms(session.last_active_at),
+        "created_ms": _to_ms(session.created_at),
+    }
+
+
+def flush_params(session_ids: list[str], values: list[list[str | None]]) -> dict[str, list]:
+    """
+    脏会话 → 批量 UPDATE 参数
+
+    Args:
+        session_ids: 会话 ID
+        values: 对应的 [duration_ms, last_active_ms, created_ms]；缓冲已删除 (会话已结束) 的跳过
+    """
+    params: dict[str, list] = {"ids": [], "durations": [], "last_active": [], "created": []}
+    for session_id, (duration_ms, last_active_ms, created_ms) in zip(session_ids, values, strict=True):
+        if duration_ms is None or last_active_ms is None or created_ms is None:
+            continue
+        params["ids"].append(session_id)
+        params["durations"].append(int(duration_ms))
+        params["last_active"].append(_from_ms(last_active_ms))
+        params["created"].append(_from_ms(created_ms))
+    return params
+
+
+def _to_ms(value: datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def _from_ms(value: str | int) -> datetime:
+    return datetime.fromtimestamp(int(value) / 1000, tz=UTC)
+
+
+def _now_ms() -> int:
+    return _to_ms(datetime.now(UTC))
+
+
+class ReadingSessionBuffer:
+    """阅读会话缓冲 (API 侧，异步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_redis()
+        self._heartbeat = self.redis.register_script(HEARTBEAT_SCRIPT)
+
+    async def open(self, session, duration_ms: int | None = None) -> BufferedSession:  # noqa: ANN001
+        """
+        建立会话缓冲
+
+        Args:
+            session: ReadingTimeLog
+            duration_ms: 覆盖数据库中的时长 (回源重建时传入本次心跳的时长)
+        """
+        key = SESSION_KEY.format(session_id=session.id)
+        data = session_hash(session)
+        if duration_ms is not None:
+            data["duration_ms"] = max(int(data["duration_ms"]), duration_ms)
+            data["last_active_ms"] = _now_ms()
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping=data)
+        pipe.expire(key, settings.reading.reading_session_ttl_seconds)
+        if duration_ms is not None:
+            pipe.sadd(DIRTY_SESSIONS_KEY, str(session.id))
+        await pipe.execute()
+        return BufferedSession.from_hash(str(session.id), {k: str(v) for k, v in data.items()})
+
+    async def heartbeat(self, session_id: str, user_id: str, duration_ms: int) -> BufferedSession | None:
+        """
+        记录心跳 (一次 Redis 往返)
+
+        Returns:
+            更新后的会话；缓冲中没有该用户的这个会话时返回 None
+        """
+        flat = await self._heartbeat(
+            keys=[SESSION_KEY.format(session_id=session_id), DIRTY_SESSIONS_KEY],
+            args=[user_id, duration_ms, _now_ms(), settings.reading.reading_session_ttl_seconds, session_id],
+        )
+        if not flat:
+            return None
+        return BufferedSession.from_hash(session_id, _pairs(flat))
+
+    async def get(self, session_id: str) -> BufferedSession | None:
+        """读取缓冲中的会话 (可能比数据库新)"""
+        data = await self.redis.hgetall(SESSION_KEY.format(session_id=session_id))
+        return BufferedSession.from_hash(session_id, data) if data else None
+
+    async def close(self, session_id: str) -> None:
+        """会话结束后删除缓冲"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(SESSION_KEY.format(session_id=session_id))
+        pipe.srem(DIRTY_SESSIONS_KEY, session_id)
+        await pipe.execute()
+
+
+class ReadingSessionFlusher:
+    """阅读会话写回 (Celery 侧，同步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_sync_redis()
+
+    def flush(self, batch_size: int) -> int:
+        """
+        取出一批脏会话写回数据库
+
+        时长增量按用户本地日期汇总到每日统计，与会话更新同一事务；写入失败时会话重新标记为脏，下一轮重试。
+
+        Returns:
+            取出的会话数 (含已结束、无需写回的会话)
+        """
+        session_ids = self.redis.spop(DIRTY_SESSIONS_KEY, batch_size)
+        if not session_ids:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hmget(SESSION_KEY.format(session_id=session_id), "duration_ms", "last_active_ms", "created_ms")
+        params = flush_params(session_ids, pipe.execute())
+        if not params["ids"]:
+            return len(session_ids)
+
+        try:
+            with get_sync_engine().begin() as conn:
+                rollup = DailyRollup()
+                for row in conn.execute(text(FLUSH_SESSIONS_SQL), params):
+                    rollup.add(row.user_id, row.timezone, row.rolled_at, row.last_active_at, row.delta_ms)
+                for statement in rollup.statements():
+                    conn.execute(statement)
+        except Exception:
+            self.redis.sadd(DIRTY_SESSIONS_KEY, *session_ids)
+            raise
+        return len(session_ids)
+
+
+# =============================================================================
+# 阅读位置
+# =============================================================================
+
+# 结果: {'unknown'} 归属未缓存 / {'forbidden'} 不属于该用户 /
+#       {'stale', 哈希...} 其他设备更早记录的位置，未覆盖 / {'ok', 哈希...}
+# KEYS: 归属, 位置哈希, 脏集合
+# ARGV: user_id, now_ms, client_ms (可为空), device_id, progress, last_cfi, last_page, total_pages,
+#       finished (1/0), ttl, 脏集合成员
+POSITION_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    return {'unknown'}
+end
+if owner ~= ARGV[1] then
+    return {'forbidden'}
+end
+local stored_device = redis.call('HGET', KEYS[2], 'device_id') or ''
+local stored_client = tonumber(redis.call('HGET', KEYS[2], 'client_ms') or '0')
+local client = tonumber(ARGV[3])
+if client and stored_device ~= ARGV[4] and client < stored_client then
+    return {'stale', unpack(redis.call('HGETALL', KEYS[2]))}
+end
+local updated = math.max(tonumber(ARGV[2]), tonumber(redis.call('HGET', KEYS[2], 'updated_ms') or '0') + 1)
+updated = string.format('%d', updated)
+redis.call('HSET', KEYS[2],
+    'progress', ARGV[5], 'last_cfi', ARGV[6], 'last_page', ARGV[7], 'total_pages', ARGV[8],
+    'device_id', ARGV[4], 'updated_ms', updated, 'client_ms', client and ARGV[3] or updated)
+if ARGV[9] == '1' and not redis.call('HGET', KEYS[2], 'finished_ms') then
+    redis.call('HSET', KEYS[2], 'finished_ms', updated)
+end
+redis.call('EXPIRE', KEYS[2], ARGV[10])
+redis.call('SADD', KEYS[3], ARGV[11])
+return {'ok', unpack(redis.call('HGETALL', KEYS[2]))}
+"""
+
+# 只覆盖更旧的行；读完时间只记录第一次；书籍已被删除的位置丢弃
+# 返回本批中第一次读完的书籍所属用户及其时区 (每本一行)，用于按读完当天的本地日期更新统计快照
+FLUSH_POSITIONS_SQL = """
+    WITH incoming AS (
+        SELECT p.*
+        FROM unnest(
+            CAST(:user_ids AS uuid[]),
+            CAST(:book_ids AS uuid[]),
+            CAST(:progress AS numeric[]),
+            CAST(:last_cfi AS text[]),
+            CAST(:last_page AS integer[]),
+            CAST(:total_pages AS integer[]),
+            CAST(:device_ids AS text[]),
+            CAST(:finished_at AS timestamptz[]),
+            CAST(:updated_at AS timestamptz[])
+        ) AS p(user_id, book_id, progress, last_cfi, last_page, total_pages, device_id, finished_at, updated_at)
+        JOIN books b ON b.id = p.book_id AND b.user_id = p.user_id AND b.deleted_at IS NULL
+    ),
+    finished_before AS (
+        SELECT bp.user_id, bp.book_id
+        FROM book_position bp
+        JOIN incoming i ON i.user_id = bp.user_id AND i.book_id = bp.book_id
+        WHERE bp.finished_at IS NOT NULL
+    ),
+    written AS (
+        INSERT INTO book_position (
+            user_id, book_id, progress, last_cfi, last_page, total_pages, device_id, finished_at, updated_at
+        )
+        SELECT user_id, book_id, progress, last_cfi, last_page, total_pages, device_id, finished_at, updated_at
+        FROM incoming
+        ON CONFLICT (user_id, book_id) DO UPDATE
+        SET progress = EXCLUDED.progress,
+            last_cfi = EXCLUDED.last_cfi,
+            last_page = EXCLUDED.last_page,
+            total_pages = EXCLUDED.total_pages,
+            device_id = EXCLUDED.device_id,
+            finished_at = COALESCE(book_position.finished_at, EXCLUDED.finished_at),
+            updated_at = EXCLUDED.updated_at
+        WHERE book_position.updated_at <= EXCLUDED.updated_at
+        RETURNING user_id, book_id, finished_at
+    )
+    SELECT CAST(w.user_id AS text) AS user_id, u.timezone, w.finished_at
+    FROM written w
+    JOIN users u ON u.id = w.user_id
+    WHERE w.finished_at IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM finished_before f WHERE f.user_id = w.user_id AND f.book_id = w.book_id
+      )
+"""
+
+
+class BookOwnerUnknown(Exception):
+    """归属未缓存，需要查询数据库"""
+
+
+@dataclass
+class BufferedPosition:
+    """缓冲中的阅读位置 (字段与 BookPosition 一致，可直接用于响应)"""
+
+    user_id: str
+    book_id: str
+    progress: float
+    last_cfi: str | None
+    last_page: int | None
+    total_pages: int | None
+    device_id: str | None
+    finished_at: datetime | None
+    updated_at: datetime
+    # 本次更新因其他设备有更新的位置而未生效
+    stale: bool = False
+
+    @classmethod
+    def from_hash(cls, user_id: str, book_id: str, data: dict[str, str], stale: bool = False) -> "BufferedPosition":
+        return cls(
+            user_id=user_id,
+            book_id=book_id,
+            progress=float(data.get("progress") or 0),
+            last_cfi=data.get("last_cfi") or None,
+            last_page=_int_or_none(data.get("last_page")),
+            total_pages=_int_or_none(data.get("total_pages")),
+            device_id=data.get("device_id") or None,
+            finished_at=_from_ms(data["finished_ms"]) if data.get("finished_ms") else None,
+            updated_at=_from_ms(data["updated_ms"]),
+            stale=stale,
+        )
+
+
+def position_member(user_id: str, book_id: str) -> str:
+    """脏集合成员"""
+    return f"{user_id}:{book_id}"
+
+
+def position_flush_params(members: list[str], hashes: list[dict[str, str]]) -> dict[str, list]:
+    """
+    脏位置 → 批量 UPSERT 参数
+
+    缓冲已过期的成员跳过。
+    """
+    params: dict[str, list] = {
+        name: []
+        for name in (
+            "user_ids", "book_ids", "progress", "last_cfi", "last_page",
+            "total_pages", "device_ids", "finished_at", "updated_at",
+        )
+    }
+    for member, data in zip(members, hashes, strict=True):
+        if not data:
+            continue
+        user_id, book_id = member.split(":", 1)
+        position = BufferedPosition.from_hash(user_id, book_id, data)
+        params["user_ids"].append(user_id)
+        params["book_ids"].append(book_id)
+        params["progress"].append(position.progress)
+        params["last_cfi"].append(position.last_cfi)
+        params["last_page"].append(position.last_page)
+        params["total_pages"].append(position.total_pages)
+        params["device_ids"].append(position.device_id)
+        params["finished_at"].append(position.finished_at)
+        params["updated_at"].append(position.updated_at)
+    return params
+
+
+def _int_or_none(value: str | None) -> int | None:
+    return int(value) if value else None
+
+
+def _pairs(flat: list[str]) -> dict[str, str]:
+    return dict(zip(flat[::2], flat[1::2], strict=True))
+
+
+class ReadingPositionBuffer:
+    """阅读位置缓冲 (API 侧，异步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_redis()
+        self._update = self.redis.register_script(POSITION_SCRIPT)
+
+    async def update(
+        self,
+        user_id: str,
+        book_id: str,
+        progress: float,
+        last_cfi: str | None = None,
+        last_page: int | None = None,
+        total_pages: int | None = None,
+        device_id: str | None = None,
+        client_updated_at: datetime | None = None,
+    ) -> BufferedPosition | None:
+        """
+        合并一次位置更新 (一次 Redis 往返)
+
+        Returns:
+            缓冲中的最新位置；书籍不属于该用户时返回 None
+
+        Raises:
+            BookOwnerUnknown: 归属未缓存，调用方查询数据库后 remember_owner 再重试
+        """
+        flat = await self._update(
+            keys=[
+                BOOK_OWNER_KEY.format(book_id=book_id),
+                POSITION_KEY.format(user_id=user_id, book_id=book_id),
+                DIRTY_POSITIONS_KEY,
+            ],
+            args=[
+                user_id,
+                _now_ms(),
+                _to_ms(client_updated_at) if client_updated_at else "",
+                device_id or "",
+                progress,
+                last_cfi or "",
+                last_page or "",
+                total_pages or "",
+                1 if progress >= FINISHED_PROGRESS else 0,
+                settings.reading.reading_session_ttl_seconds,
+                position_member(user_id, book_id),
+            ],
+        )
+        status = flat[0]
+        if status == "unknown":
+            raise BookOwnerUnknown(book_id)
+        if status == "forbidden":
+            return None
+        return BufferedPosition.from_hash(user_id, book_id, _pairs(flat[1:]), stale=status == "stale")
+
+    async def get(self, user_id: str, book_id: str) -> BufferedPosition | None:
+        """读取缓冲中的位置 (可能比数据库新)"""
+        data = await self.redis.hgetall(POSITION_KEY.format(user_id=user_id, book_id=book_id))
+        return BufferedPosition.from_hash(user_id, book_id, data) if data else None
+
+    async def discard(self, user_id: str, book_id: str) -> None:
+        """丢弃缓冲 (位置已直接写入数据库)"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(POSITION_KEY.format(user_id=user_id, book_id=book_id))
+        pipe.srem(DIRTY_POSITIONS_KEY, position_member(user_id, book_id))
+        await pipe.execute()
+
+    async def remember_owner(self, book_id: str, user_id: str) -> None:
+        """缓存书籍归属"""
+        await self.redis.set(
+            BOOK_OWNER_KEY.format(book_id=book_id),
+            user_id,
+            ex=settings.reading.reading_owner_cache_ttl_seconds,
+        )
+
+    async def forget_owner(self, book_id: str) -> None:
+        """书籍删除后使归属缓存失效"""
+        await self.redis.delete(BOOK_OWNER_KEY.format(book_id=book_id))
+
+
+class ReadingPositionFlusher:
+    """阅读位置写回 (Celery 侧，同步)"""
+
+    def __init__(self, redis=None):  # noqa: ANN001
+        self.redis = redis or get_sync_redis()
+
+    def flush(self, batch_size: int) -> int:
+        """
+        取出一批脏位置写回数据库
+
+        写入失败时重新标记为脏，下一轮重试。缓冲保留到过期，供读取使用。
+
+        Returns:
+            取出的位置数
+        """
+        members = self.redis.spop(DIRTY_POSITIONS_KEY, batch_size)
+        if not members:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for member in members:
+            user_id, book_id = member.split(":", 1)
+            pipe.hgetall(POSITION_KEY.format(user_id=user_id, book_id=book_id))
+        params = position_flush_params(members, pipe.execute())
+        if not params["user_ids"]:
+            return len(members)
+
+        try:
+            with get_sync_engine().begin() as conn:
+                finished = Counter(
+                    (row.user_id, local_day(row.timezone, row.finished_at))
+                    for row in conn.execute(text(FLUSH_POSITIONS_SQL), params)
+                )
+                for (user_id, day), count in sorted(finished.items()):
+                    conn.execute(record_finished(user_id, day, count))
+        except Exception:
+            self.redis.sadd(DIRTY_POSITIONS_KEY, *members)
+            raise
+        return len(members)
@@ -0,0 +1,111 @@
+"""
+阅读时长汇总
+
+会话时长以增量方式汇总到 reading_daily、统计快照 (reading_stats) 与连续天数 (user_streaks)。
+reading_time_log.duration_ms 始终等于已汇总的时长: 每次写回 (心跳批量写回、会话结束) 只汇总
+新旧时长之差，与会话行的更新在同一事务内，不重复计入；会话未正常结束 (客户端崩溃) 时已写回的心跳也已计入。
+
+- 日期: 按用户所在时区 (users.timezone) 的本地日期，不使用服务器日期
+- 跨天: 增量发生在上次写回与本次最后活跃时间之间，按贴近最后活跃时间的一段计算，
+  跨越本地午夜时按两侧实际时长拆分
+- 批量: 一次写回的全部增量按 (用户, 日期) 合并，reading_daily 一条 UPSERT；快照与连续天数每个用户一行，
+  同一用户的多个日期按日期先后分轮执行 (通常只有一轮，跨天时两轮)
+
+语句以 SQLAlchemy Core 构造，Celery 任务的同步连接与 API 的异步会话都可直接执行。
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Executable
+
+from app.services.reading_stats import (
+    DayDuration,
+    record_daily,
+    record_reading,
+    record_streak,
+    user_zone,
+)
+
+_EPSILON = timedelta(milliseconds=1)
+
+
+def split_by_local_day(
+    start: datetime,
+    end: datetime,
+    duration_ms: int,
+    timezone: str | None,
+) -> list[tuple[date, int]]:
+    """
+    把一段阅读时长按用户本地日期拆分
+
+    Args:
+        start: 上次写回时的最后活跃时间 (增量不早于此)
+        end: 本次的最后活跃时间
+        duration_ms: 增量时长 (暂停不计时，可能短于 end - start)
+        timezone: 用户时区
+
+    Returns:
+        [(本地日期, 时长)]，按日期升序；超出区间的部分 (时钟偏差) 计入最早的一天
+    """
+    tz = user_zone(timezone)
+    pieces: dict[date, int] = {}
+    cursor, remaining = end, max(duration_ms, 0)
+
+    while remaining > 0:
+        # (day_start, cursor] 属于同一本地日期
+        day = (cursor - _EPSILON).astimezone(tz).date()
+        day_start = datetime.combine(day, time.min, tzinfo=tz)
+        if day_start <= start:
+            pieces[day] = pieces.get(day, 0) + remaining
+            break
+        piece = min(remaining, int((cursor - day_start) / _EPSILON))
+        pieces[day] = pieces.get(day, 0) + piece
+        remaining -= piece
+        cursor = day_start
+
+    return sorted(pieces.items())
+
+
+class DailyRollup:
+    """一次写回的阅读时长汇总"""
+
+    def __init__(self):
+        self.durations: dict[tuple[str, date], int] = defaultdict(int)
+
+    def add(
+        self,
+        user_id: str,
+        timezone: str | None,
+        start: datetime,
+        end: datetime,
+        duration_ms: int,
+    ) -> None:
+        """记入一个会话的时长增量"""
+        for day, ms in split_by_local_day(start, end, duration_ms, timezone):
+            self.durations[(str(user_id), day)] += ms
+
+    def rounds(self) -> list[list[DayDuration]]:
+        """按日期先后分轮，每轮每个用户至多一行"""
+        per_user: dict[str, list[DayDuration]] = defaultdict(list)
+        for (user_id, day), ms in sorted(self.durations.items()):
+            per_user[user_id].append(DayDuration(user_id, day, ms))
+
+        rounds: list[list[DayDuration]] = []
+        for entries in per_user.values():
+            for i, entry in enumerate(entries):
+                if i == len(rounds):
+                    rounds.append([])
+                rounds[i].append(entry)
+        return rounds
+
+    def statements(self) -> list[Executable]:
+        """需在同一事务内依次执行的语句 (没有增量时为空)"""
+        if not self.durations:
+            return []
+        entries = [DayDuration(user_id, day, ms) for (user_id, day), ms in sorted(self.durations.items())]
+        statements: list[Executable] = [record_daily(entries)]
+        for batch in self.rounds():
+            statements.append(record_reading(batch))
+            statements.append(record_streak(batch))
+        return statements
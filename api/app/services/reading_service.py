@@ -7,34 +7,66 @@
 from datetime import UTC, date, datetime, timedelta
 from typing import Any
 
-from sqlalchemy import func, select, update
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import BookNotFoundException
 from app.models.book import Book
-from app.models.reading import BookPosition, ReadingDaily, ReadingTimeLog
+from app.models.reading import BookPosition, ReadingDaily, ReadingStats, ReadingTimeLog
+from app.models.user import User, UserStats, UserStreak
+from app.services.reading_buffer import (
+    BookOwnerUnknown,
+    BufferedPosition,
+    BufferedSession,
+    ReadingPositionBuffer,
+    ReadingSessionBuffer,
+)
+from app.services.reading_rollup import DailyRollup
+from app.services.reading_stats import (
+    build_stats,
+    current_streak,
+    local_day,
+    record_finished,
+)
 
 
 class ReadingService:
     """阅读服务"""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        buffer: ReadingSessionBuffer | None = None,
+        positions: ReadingPositionBuffer | None = None,
+    ):
         self.db = db
+        self._buffer = buffer
+        self._positions = positions
+
+    @property
+    def buffer(self) -> ReadingSessionBuffer:
+        """阅读会话心跳缓冲 (首次使用时创建)"""
+        if self._buffer is None:
+            self._buffer = ReadingSessionBuffer()
+        return self._buffer
+
+    @property
+    def positions(self) -> ReadingPositionBuffer:
+        """阅读位置缓冲 (首次使用时创建)"""
+        if self._positions is None:
+            self._positions = ReadingPositionBuffer()
+        return self._positions
 
     # ==========================================================================
     # 阅读位置 (BookPosition)
     # ==========================================================================
 
-    async def get_position(self, user_id: str, book_id: str) -> BookPosition | None:
-        """获取书籍阅读位置"""
-        result = await self.db.execute(
-            select(BookPosition).where(
-                BookPosition.user_id == user_id,
-                BookPosition.book_id == book_id,
-            )
-        )
-        return result.scalar_one_or_none()
+    async def get_position(self, user_id: str, book_id: str) -> BookPosition | BufferedPosition | None:
+        """获取书籍阅读位置 (缓冲中尚未写回的位置优先)"""
+        buffered = await self.positions.get(user_id, book_id)
+        if buffered is not None:
+            return buffered
+        return await self._get_stored_position(user_id, book_id)
 
     async def update_position(
         self,
@@ -45,52 +77,40 @@ class ReadingService:
         last_page: int | None = None,
         total_pages: int | None = None,
         device_id: str | None = None,
-    ) -> BookPosition:
-        """更新阅读位置 (Upsert)"""
-        # 验证书籍存在
-        await self._get_book_or_404(book_id, user_id)
-
-        # 计算是否读完
-        finished_at = None
-        if progress >= 0.99:
-            finished_at = datetime.now(UTC)
-
-        # Upsert 操作
-        stmt = insert(BookPosition).values(
-            user_id=user_id,
-            book_id=book_id,
-            progress=progress,
-            last_cfi=last_cfi,
-            last_page=last_page,
-            total_pages=total_pages,
-            device_id=device_id,
-            finished_at=finished_at,
-            updated_at=datetime.now(UTC),
-        )
-
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["user_id", "book_id"],
-            set_={
-                "progress": stmt.excluded.progress,
-                "last_cfi": stmt.excluded.last_cfi,
-                "last_page": stmt.excluded.last_page,
-                "total_pages": stmt.excluded.total_pages,
-                "device_id": stmt.excluded.device_id,
-                "finished_at": func.coalesce(
-                    BookPosition.finished_at, stmt.excluded.finished_at
-                ),
-                "updated_at": stmt.excluded.updated_at,
-            },
-        )
-
-        await self.db.execute(stmt)
-        await self.db.commit()
-
-        return await self.get_position(user_id, book_id)  # type: ignore
+        client_updated_at: datetime | None = None,
+    ) -> BufferedPosition:
+        """
+        更新阅读位置
+
+        写入 Redis 缓冲并直接返回缓冲中的最新状态，由定时任务批量写回数据库。
+        归属校验使用缓存的 book → owner 映射，未命中时才查询数据库。
+        """
+        update = {
+            "progress": progress,
+            "last_cfi": last_cfi,
+            "last_page": last_page,
+            "total_pages": total_pages,
+            "device_id": device_id,
+            "client_updated_at": client_updated_at,
+        }
+        try:
+            position = await self.positions.update(user_id, book_id, **update)
+        except BookOwnerUnknown:
+            await self._get_book_or_404(book_id, user_id)
+            await self.positions.remember_owner(book_id, user_id)
+            position = await self.positions.update(user_id, book_id, **update)
+
+        if position is None:
+            raise BookNotFoundException()
+        return position
 
     async def mark_finished(self, user_id: str, book_id: str) -> BookPosition:
-        """标记书籍已读完"""
-        position = await self.get_position(user_id, book_id)
+        """标记书籍已读完 (直接写数据库，并带上缓冲中尚未写回的位置)"""
+        buffered = await self.positions.get(user_id, book_id)
+        position = await self._get_stored_position(user_id, book_id)
+        if not position or not position.finished_at:
+            await self.db.execute(record_finished(user_id, await self._local_today(user_id)))
+
         if not position:
             # 创建新记录
             position = BookPosition(
@@ -104,8 +124,16 @@ class ReadingService:
             position.progress = 1.0
             position.finished_at = datetime.now(UTC)
 
+        if buffered is not None:
+            position.last_cfi = buffered.last_cfi
+            position.last_page = buffered.last_page
+            position.total_pages = buffered.total_pages
+            position.device_id = buffered.device_id
+
         await self.db.commit()
         await self.db.refresh(position)
+        # 缓冲中尚未写回的位置已过时
+        await self.positions.discard(user_id, book_id)
         return position
 
     # ==========================================================================
@@ -122,15 +150,18 @@ class ReadingService:
         # 验证书籍
         await self._get_book_or_404(book_id, user_id)
 
-        # 关闭该用户之前未关闭的会话
-        await self.db.execute(
-            update(ReadingTimeLog)
-            .where(
+        # 结束该用户之前未关闭的会话: 汇总缓冲中的时长并删除缓冲，迟到的心跳不再写回
+        result = await self.db.execute(
+            select(ReadingTimeLog.id).where(
                 ReadingTimeLog.user_id == user_id,
                 ReadingTimeLog.is_active == True,  # noqa: E712
             )
-            .values(is_active=False)
         )
+        for previous_id in result.scalars().all():
+            buffered = await self.buffer.get(str(previous_id))
+            await self.end_reading_session(
+                str(previous_id), user_id, buffered.duration_ms if buffered else 0
+            )
 
         # 创建新会话
         session = ReadingTimeLog(
@@ -145,6 +176,9 @@ class ReadingService:
         await self.db.commit()
         await self.db.refresh(session)
 
+        # 之后的心跳只写缓冲
+        await self.buffer.open(session)
+
         return session
 
     async def update_reading_session(
@@ -153,31 +187,25 @@ class ReadingService:
         user_id: str,
         duration_ms: int,
         is_active: bool = True,
-    ) -> ReadingTimeLog | None:
-        """更新阅读会话 (心跳/结束)"""
-        result = await self.db.execute(
-            select(ReadingTimeLog).where(
-                ReadingTimeLog.id == session_id,
-                ReadingTimeLog.user_id == user_id,
-            )
-        )
-        session = result.scalar_one_or_none()
-
-        if not session:
-            return None
+    ) -> ReadingTimeLog | BufferedSession | None:
+        """
+        更新阅读会话 (心跳/结束)
 
-        session.duration_ms = duration_ms
-        session.is_active = is_active
-        session.last_active_at = datetime.now(UTC)
-
-        # 如果会话结束，更新每日统计
+        心跳只写 Redis 缓冲，由定时任务批量写回；结束时同步写数据库。
+        """
         if not is_active:
-            await self._update_daily_stats(user_id, duration_ms)
+            return await self.end_reading_session(session_id, user_id, duration_ms)
 
-        await self.db.commit()
-        await self.db.refresh(session)
+        buffered = await self.buffer.heartbeat(session_id, user_id, duration_ms)
+        if buffered is not None:
+            return buffered
 
-        return session
+        # 缓冲中没有该会话 (Redis 重启或过期)，回源数据库校验归属后重建缓冲
+        session = await self._get_session(session_id, user_id)
+        if not session or not session.is_active:
+            # 已结束的会话不再接受心跳
+            return session
+        return await self.buffer.open(session, duration_ms=duration_ms)
 
     async def end_reading_session(
         self,
@@ -185,16 +213,38 @@ class ReadingService:
         user_id: str,
         final_duration_ms: int,
     ) -> ReadingTimeLog | None:
-        """结束阅读会话"""
-        return await self.update_reading_session(
-            session_id=session_id,
-            user_id=user_id,
-            duration_ms=final_duration_ms,
-            is_active=False,
+        """结束阅读会话 (同步写数据库并汇总剩余时长)"""
+        # 锁定会话行，与心跳批量写回的汇总互斥
+        session = await self._get_session(session_id, user_id, for_update=True)
+        if not session:
+            return None
+
+        # 数据库中的时长均已汇总，只汇总增量；时长只增不减
+        now = datetime.now(UTC)
+        final_duration_ms = max(session.duration_ms, final_duration_ms)
+        rollup = DailyRollup()
+        rollup.add(
+            user_id,
+            await self._user_timezone(user_id),
+            session.last_active_at,
+            now,
+            final_duration_ms - session.duration_ms,
         )
+        for statement in rollup.statements():
+            await self.db.execute(statement)
+
+        session.duration_ms = final_duration_ms
+        session.is_active = False
+        session.last_active_at = now
 
-    async def get_active_session(self, user_id: str) -> ReadingTimeLog | None:
-        """获取当前活跃会话"""
+        await self.db.commit()
+        await self.db.refresh(session)
+        await self.buffer.close(session_id)
+
+        return session
+
+    async def get_active_session(self, user_id: str) -> ReadingTimeLog | BufferedSession | None:
+        """获取当前活跃会话 (缓冲中的心跳比数据库新)"""
         result = await self.db.execute(
             select(ReadingTimeLog)
             .where(
@@ -204,7 +254,10 @@ class ReadingService:
             .order_by(ReadingTimeLog.created_at.desc())
             .limit(1)
         )
-        return result.scalar_one_or_none()
+        session = result.scalar_one_or_none()
+        if not session:
+            return None
+        return await self.buffer.get(str(session.id)) or session
 
     # ==========================================================================
     # 阅读统计 (ReadingStats)
@@ -272,12 +325,24 @@ class ReadingService:
         else:
             month_end = date(year, month + 1, 1) - timedelta(days=1)
 
-        # 统计阅读时长和天数
+        # 读完的书与阅读时长、天数在同一条语句中统计
+        books_finished = (
+            select(func.count(BookPosition.book_id))
+            .where(
+                BookPosition.user_id == user_id,
+                BookPosition.finished_at >= datetime.combine(month_start, datetime.min.time()),
+                BookPosition.finished_at < datetime.combine(
+                    month_end + timedelta(days=1), datetime.min.time()
+                ),
+            )
+            .scalar_subquery()
+        )
         result = await self.db.execute(
             select(
                 func.sum(ReadingDaily.total_duration_ms).label("total_ms"),
                 func.sum(ReadingDaily.books_read).label("books"),
                 func.count(ReadingDaily.day).label("days_active"),
+                books_finished.label("books_finished"),
             ).where(
                 ReadingDaily.user_id == user_id,
                 ReadingDaily.day >= month_start,
@@ -286,113 +351,50 @@ class ReadingService:
         )
         row = result.one()
 
-        # 统计读完的书
-        finished_result = await self.db.execute(
-            select(func.count(BookPosition.book_id)).where(
-                BookPosition.user_id == user_id,
-                BookPosition.finished_at >= datetime.combine(month_start, datetime.min.time()),
-                BookPosition.finished_at < datetime.combine(
-                    month_end + timedelta(days=1), datetime.min.time()
-                ),
-            )
-        )
-        books_finished = finished_result.scalar() or 0
-
         return {
             "year": year,
             "month": month,
             "total_duration_ms": row.total_ms or 0,
             "books_read": row.books or 0,
-            "books_finished": books_finished,
+            "books_finished": row.books_finished or 0,
             "days_active": row.days_active or 0,
         }
 
     async def get_reading_streak(self, user_id: str) -> int:
-        """获取连续阅读天数"""
-        today = date.today()
-
-        # 获取最近的阅读记录
+        """获取连续阅读天数 (读取 user_streaks)"""
         result = await self.db.execute(
-            select(ReadingDaily.day)
-            .where(ReadingDaily.user_id == user_id)
-            .order_by(ReadingDaily.day.desc())
-            .limit(365)  # 最多查一年
+            select(User.timezone, UserStreak)
+            .select_from(User)
+            .outerjoin(UserStreak, UserStreak.user_id == User.id)
+            .where(User.id == user_id)
         )
-        days = [row.day for row in result.all()]
-
-        if not days:
+        row = result.first()
+        if not row:
             return 0
-
-        # 计算连续天数
-        streak = 0
-        expected_day = today
-
-        for day in days:
-            if day == expected_day:
-                streak += 1
-                expected_day -= timedelta(days=1)
-            elif day == expected_day - timedelta(days=1):
-                # 今天还没阅读，从昨天开始算
-                streak += 1
-                expected_day = day - timedelta(days=1)
-            else:
-                break
-
-        return streak
+        return current_streak(row.UserStreak, local_day(row.timezone))
 
     async def get_comprehensive_stats(self, user_id: str) -> dict[str, Any]:
-        """获取综合阅读统计"""
-        today = date.today()
-        week_start = today - timedelta(days=today.weekday())
-
-        # 并行获取各项统计
-        today_stats = await self.get_daily_stats(user_id, today)
-        week_stats = await self.get_weekly_stats(user_id, week_start)
-        month_stats = await self.get_monthly_stats(user_id, today.year, today.month)
-        streak = await self.get_reading_streak(user_id)
-
-        # 总计统计
-        total_result = await self.db.execute(
-            select(func.sum(ReadingDaily.total_duration_ms)).where(
-                ReadingDaily.user_id == user_id
-            )
-        )
-        total_duration = total_result.scalar() or 0
-
-        # 书籍统计
-        books_result = await self.db.execute(
-            select(func.count(Book.id)).where(
-                Book.user_id == user_id,
-                Book.deleted_at.is_(None),
-            )
-        )
-        total_books = books_result.scalar() or 0
-
-        finished_result = await self.db.execute(
-            select(func.count(BookPosition.book_id)).where(
-                BookPosition.user_id == user_id,
-                BookPosition.finished_at.isnot(None),
-            )
+        """获取综合阅读统计 (按主键读取统计快照与连续天数)"""
+        result = await self.db.execute(
+            select(User.timezone, UserStats.book_count, ReadingStats, UserStreak)
+            .select_from(User)
+            .outerjoin(UserStats, UserStats.user_id == User.id)
+            .outerjoin(ReadingStats, ReadingStats.user_id == User.id)
+            .outerjoin(UserStreak, UserStreak.user_id == User.id)
+            .where(User.id == user_id)
         )
-        finished_books = finished_result.scalar() or 0
-
-        return {
-            "today": today_stats,
-            "this_week": week_stats,
-            "this_month": month_stats,
-            "streak_days": streak,
-            "total_books": total_books,
-            "finished_books": finished_books,
-            "total_duration_ms": total_duration,
-        }
+        row = result.first()
+        if not row:
+            return build_stats(None, None, 0, local_day(None))
+        return build_stats(row.ReadingStats, row.UserStreak, row.book_count or 0, local_day(row.timezone))
 
     async def get_reading_history(
         self,
         user_id: str,
         days: int = 30,
     ) -> list[dict[str, Any]]:
-        """获取阅读历史"""
-        start_date = date.today() - timedelta(days=days - 1)
+        """获取阅读历史 (按用户所在时区的日期)"""
+        start_date = await self._local_today(user_id) - timedelta(days=days - 1)
 
         result = await self.db.execute(
             select(ReadingDaily)
@@ -418,9 +420,17 @@ class ReadingService:
         user_id: str,
         limit: int = 10,
     ) -> list[dict[str, Any]]:
-        """获取最近阅读的书籍"""
+        """获取最近阅读的书籍 (只取列表所需的列，位置部分由 idx_book_position_user_updated 覆盖)"""
         result = await self.db.execute(
-            select(BookPosition, Book)
+            select(
+                BookPosition.book_id,
+                BookPosition.progress,
+                BookPosition.updated_at,
+                BookPosition.finished_at,
+                Book.title,
+                Book.author,
+                Book.cover_image_key,
+            )
             .join(Book, BookPosition.book_id == Book.id)
             .where(
                 BookPosition.user_id == user_id,
@@ -433,15 +443,15 @@ class ReadingService:
 
         return [
             {
-                "book_id": str(pos.book_id),
-                "title": book.title,
-                "author": book.author,
-                "cover_url": book.cover_key,  # 需要前端转换为实际 URL
-                "progress": float(pos.progress),
-                "last_read_at": pos.updated_at,
-                "finished_at": pos.finished_at,
+                "book_id": str(row.book_id),
+                "title": row.title,
+                "author": row.author,
+                "cover_url": row.cover_image_key,  # 需要前端转换为实际 URL
+                "progress": float(row.progress),
+                "last_read_at": row.updated_at,
+                "finished_at": row.finished_at,
             }
-            for pos, book in rows
+            for row in rows
         ]
 
     # ==========================================================================
@@ -462,25 +472,37 @@ class ReadingService:
             raise BookNotFoundException()
         return book
 
-    async def _update_daily_stats(self, user_id: str, duration_ms: int) -> None:
-        """更新每日统计 (Upsert)"""
-        today = date.today()
-
-        stmt = insert(ReadingDaily).values(
-            user_id=user_id,
-            day=today,
-            total_duration_ms=duration_ms,
-            books_read=1,
-            pages_read=0,
-            updated_at=datetime.now(UTC),
+    async def _get_stored_position(self, user_id: str, book_id: str) -> BookPosition | None:
+        """获取数据库中的阅读位置 (不含缓冲)"""
+        result = await self.db.execute(
+            select(BookPosition).where(
+                BookPosition.user_id == user_id,
+                BookPosition.book_id == book_id,
+            )
         )
+        return result.scalar_one_or_none()
 
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["user_id", "day"],
-            set_={
-                "total_duration_ms": ReadingDaily.total_duration_ms + duration_ms,
-                "updated_at": stmt.excluded.updated_at,
-            },
+    async def _get_session(
+        self,
+        session_id: str,
+        user_id: str,
+        for_update: bool = False,
+    ) -> ReadingTimeLog | None:
+        """获取用户的阅读会话"""
+        stmt = select(ReadingTimeLog).where(
+            ReadingTimeLog.id == session_id,
+            ReadingTimeLog.user_id == user_id,
         )
+        if for_update:
+            stmt = stmt.with_for_update()
+        result = await self.db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def _user_timezone(self, user_id: str) -> str | None:
+        """用户所在时区"""
+        result = await self.db.execute(select(User.timezone).where(User.id == user_id))
+        return result.scalar_one_or_none()
 
-        await self.db.execute(stmt)
+    async def _local_today(self, user_id: str) -> date:
+        """用户所在时区的今天"""
+        return local_day(await self._user_timezone(user_id))
@@ -0,0 +1,451 @@
+"""
+阅读统计快照
+
+reading_stats 为每个用户保存一行统计快照，随阅读时长汇总 (见 reading_rollup)、书籍读完增量更新，
+统计页只需一次主键读取，不再对 reading_daily / book_position 做聚合:
+
+- 累计: 总阅读时长、读完书籍数
+- 今日: 以最后阅读日标记
+- 本周/本月: 以周期起始日标记，进入新周期后的首次更新清零重计
+
+连续阅读天数 (当前、最长) 记在 user_streaks，与快照同时更新: 隔天首次阅读时按是否相邻累加或重置。
+日期均为用户所在时区的本地日期 (users.timezone)。
+
+更新在数据库端按旧行计算 (INSERT ... ON CONFLICT DO UPDATE)，并发会话结束互不覆盖；
+早于快照周期的补记只计入累计与所属周期，不回退今日与连续天数。
+读取时按当前日期判断周期是否已过，过期的周期计数视为 0。
+
+快照与连续天数可由明细现算重建 (rebuild_stats / rebuild_streaks)，各项独立聚合合并为一条
+带 FILTER 的 CTE 语句，只扫描一次该用户的 reading_daily，不再逐项串行查询。
+本周/本月的起始日在语句内按每个用户的时区由数据库当前时间算出，一批用户各用各的本地日期。
+
+语句以 SQLAlchemy Core 构造，Celery 任务的同步连接与 API 的异步会话都可直接执行。
+"""
+
+from collections.abc import Sequence
+from datetime import UTC, date, datetime, timedelta
+from typing import Any, NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import ColumnElement, TextClause, Update, case, func, text, update
+from sqlalchemy.dialects.postgresql import Insert, insert
+
+from app.models.reading import ReadingDaily, ReadingStats
+from app.models.user import UserStreak
+
+# 用户未设置或设置了无效时区时使用 (与 users.timezone 默认值一致)
+DEFAULT_TIMEZONE = "Asia/Shanghai"
+
+# 快照列 (不含 user_id)
+STATS_COLUMNS = (
+    "total_duration_ms", "finished_books",
+    "last_active_day", "today_duration_ms",
+    "week_start", "week_duration_ms", "week_days_active",
+    "month_start", "month_duration_ms", "month_days_active", "month_books_finished",
+)
+
+# 连续天数列 (不含 user_id)
+STREAK_COLUMNS = ("current_streak", "longest_streak", "last_read_date")
+
+# 由 reading_daily / book_position / books 现算一批用户的快照与连续天数 (一条语句，各聚合以 FILTER 合并)
+# 周期: 用户时区的当前时间 (未设置或无效时区使用默认时区) 所在周 (周一起)、月的起始日，
+#       本月起始时刻 (timestamptz) 用于比较读完时间
+# 连续天数: 按日期正序编号，day - 序号 在同一段连续阅读内相同 (gaps and islands)
+_LIVE_STATS_CTE = """
+    WITH targets AS (
+        SELECT u.id AS user_id,
+               CAST(date_trunc('week', l.local_now) AS date) AS week_start,
+               CAST(date_trunc('month', l.local_now) AS date) AS month_start,
+               date_trunc('month', l.local_now) AT TIME ZONE l.zone AS month_started_at
+        FROM users u
+        LEFT JOIN pg_timezone_names z ON z.name = u.timezone
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(z.name, :default_timezone) AS zone,
+                   now() AT TIME ZONE COALESCE(z.name, :default_timezone) AS local_now
+        ) l
+        WHERE u.id = ANY(CAST(:user_ids AS uuid[]))
+    ),
+    days AS (
+        SELECT rd.user_id, rd.day, rd.total_duration_ms, t.week_start, t.month_start,
+               rd.day - CAST(row_number() OVER (PARTITION BY rd.user_id ORDER BY rd.day) AS integer) AS grp
+        FROM reading_daily rd
+        JOIN targets t ON t.user_id = rd.user_id
+    ),
+    daily AS (
+        SELECT user_id,
+               SUM(total_duration_ms) AS total_ms,
+               MAX(day) AS last_day,
+               (array_agg(total_duration_ms ORDER BY day DESC))[1] AS last_day_ms,
+               SUM(total_duration_ms) FILTER (WHERE day >= week_start) AS week_ms,
+               COUNT(*) FILTER (WHERE day >= week_start) AS week_days,
+               SUM(total_duration_ms) FILTER (WHERE day >= month_start) AS month_ms,
+               COUNT(*) FILTER (WHERE day >= month_start) AS month_days
+        FROM days
+        GROUP BY user_id
+    ),
+    islands AS (
+        SELECT user_id, MAX(day) AS last_day, COUNT(*) AS length
+        FROM days
+        GROUP BY user_id, grp
+    ),
+    streaks AS (
+        SELECT user_id,
+               (array_agg(length ORDER BY last_day DESC))[1] AS current_streak,
+               MAX(length) AS longest_streak
+        FROM islands
+        GROUP BY user_id
+    ),
+    finished AS (
+        SELECT bp.user_id,
+               COUNT(*) AS finished,
+               COUNT(*) FILTER (WHERE bp.finished_at >= t.month_started_at) AS month_finished
+        FROM book_position bp
+        JOIN targets t ON t.user_id = bp.user_id
+        WHERE bp.finished_at IS NOT NULL
+        GROUP BY bp.user_id
+    ),
+    owned AS (
+        SELECT b.user_id, COUNT(*) AS total_books
+        FROM books b
+        JOIN targets t ON t.user_id = b.user_id
+        WHERE b.deleted_at IS NULL
+        GROUP BY b.user_id
+    ),
+    live AS (
+        SELECT t.user_id,
+               COALESCE(d.total_ms, 0) AS total_duration_ms,
+               COALESCE(f.finished, 0) AS finished_books,
+               d.last_day AS last_active_day,
+               COALESCE(d.last_day_ms, 0) AS today_duration_ms,
+               t.week_start,
+               COALESCE(d.week_ms, 0) AS week_duration_ms,
+               COALESCE(d.week_days, 0) AS week_days_active,
+               t.month_start,
+               COALESCE(d.month_ms, 0) AS month_duration_ms,
+               COALESCE(d.month_days, 0) AS month_days_active,
+               COALESCE(f.month_finished, 0) AS month_books_finished,
+               COALESCE(o.total_books, 0) AS total_books,
+               COALESCE(s.current_streak, 0) AS current_streak,
+               COALESCE(s.longest_streak, 0) AS longest_streak,
+               d.last_day AS last_read_date
+        FROM targets t
+        LEFT JOIN daily d ON d.user_id = t.user_id
+        LEFT JOIN streaks s ON s.user_id = t.user_id
+        LEFT JOIN finished f ON f.user_id = t.user_id
+        LEFT JOIN owned o ON o.user_id = t.user_id
+    )
+"""
+
+LIVE_STATS_SQL = _LIVE_STATS_CTE + "    SELECT * FROM live\n"
+
+REBUILD_STATS_SQL = _LIVE_STATS_CTE + f"""
+    INSERT INTO reading_stats (user_id, {", ".join(STATS_COLUMNS)})
+    SELECT user_id, {", ".join(STATS_COLUMNS)}
+    FROM live
+    ON CONFLICT (user_id) DO UPDATE
+    SET {", ".join(f"{c} = EXCLUDED.{c}" for c in STATS_COLUMNS)},
+        updated_at = now()
+"""
+
+REBUILD_STREAKS_SQL = _LIVE_STATS_CTE + f"""
+    INSERT INTO user_streaks (user_id, {", ".join(STREAK_COLUMNS)})
+    SELECT user_id, {", ".join(STREAK_COLUMNS)}
+    FROM live
+    WHERE last_read_date IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE
+    SET {", ".join(f"{c} = EXCLUDED.{c}" for c in STREAK_COLUMNS)},
+        updated_at = now()
+"""
+
+
+class DayDuration(NamedTuple):
+    """某用户某个本地日期的阅读时长"""
+
+    user_id: str
+    day: date
+    duration_ms: int
+
+
+def user_zone(timezone: str | None) -> ZoneInfo:
+    """用户所在时区 (未设置或无效时使用默认时区)"""
+    try:
+        return ZoneInfo(timezone or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def local_day(timezone: str | None, at: datetime | None = None) -> date:
+    """用户所在时区的本地日期"""
+    return (at or datetime.now(UTC)).astimezone(user_zone(timezone)).date()
+
+
+def period_starts(day: date) -> tuple[date, date]:
+    """所属周 (周一起) 与月的起始日"""
+    return day - timedelta(days=day.weekday()), day.replace(day=1)
+
+
+def _in_period(
+    start_column: ColumnElement,
+    start: date,
+    column: ColumnElement,
+    same: Any,
+    reset: Any,
+) -> ColumnElement:
+    """同一周期累加；更早的周期不动；进入新周期重置"""
+    return case(
+        (start_column == start, same),
+        (start_column > start, column),
+        else_=reset,
+    )
+
+
+def record_daily(entries: Sequence[DayDuration]) -> Insert:
+    """记入每日阅读时长 (一批 (用户, 日期) 各一行，不可重复)"""
+    d = ReadingDaily
+    stmt = insert(d).values([
+        {
+            "user_id": e.user_id,
+            "day": e.day,
+            "total_duration_ms": e.duration_ms,
+            "books_read": 1,
+            "pages_read": 0,
+        }
+        for e in entries
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[d.user_id, d.day],
+        set_={
+            "total_duration_ms": d.total_duration_ms + stmt.excluded.total_duration_ms,
+            "updated_at": func.now(),
+        },
+    )
+
+
+def record_reading(entries: Sequence[DayDuration]) -> Insert:
+    """记入阅读时长到快照 (一批用户各一行，同一用户不可重复)"""
+    s = ReadingStats
+    values = []
+    for e in entries:
+        week_start, month_start = period_starts(e.day)
+        values.append({
+            "user_id": e.user_id,
+            "total_duration_ms": e.duration_ms,
+            "finished_books": 0,
+            "last_active_day": e.day,
+            "today_duration_ms": e.duration_ms,
+            "week_start": week_start,
+            "week_duration_ms": e.duration_ms,
+            "week_days_active": 1,
+            "month_start": month_start,
+            "month_duration_ms": e.duration_ms,
+            "month_days_active": 1,
+            "month_books_finished": 0,
+        })
+    stmt = insert(s).values(values)
+    new = stmt.excluded
+    # 当天第一次阅读 (补记更早的日期时无法判断，不计)
+    new_day = case((s.last_active_day >= new.last_active_day, 0), else_=1)
+
+    return stmt.on_conflict_do_update(
+        index_elements=[s.user_id],
+        set_={
+            "total_duration_ms": s.total_duration_ms + new.total_duration_ms,
+            "today_duration_ms": case(
+                (s.last_active_day == new.last_active_day, s.today_duration_ms + new.today_duration_ms),
+                (s.last_active_day > new.last_active_day, s.today_duration_ms),
+                else_=new.today_duration_ms,
+            ),
+            "last_active_day": func.greatest(s.last_active_day, new.last_active_day),
+            "week_duration_ms": _in_period(
+                s.week_start, new.week_start,
+                s.week_duration_ms, s.week_duration_ms + new.week_duration_ms, new.week_duration_ms,
+            ),
+            "week_days_active": _in_period(
+                s.week_start, new.week_start, s.week_days_active, s.week_days_active + new_day, 1
+            ),
+            "week_start": func.greatest(s.week_start, new.week_start),
+            "month_duration_ms": _in_period(
+                s.month_start, new.month_start,
+                s.month_duration_ms, s.month_duration_ms + new.month_duration_ms, new.month_duration_ms,
+            ),
+            "month_days_active": _in_period(
+                s.month_start, new.month_start, s.month_days_active, s.month_days_active + new_day, 1
+            ),
+            "month_books_finished": _in_period(
+                s.month_start, new.month_start, s.month_books_finished, s.month_books_finished, 0
+            ),
+            "month_start": func.greatest(s.month_start, new.month_start),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def record_finished(user_id: str, day: date, count: int = 1) -> Insert:
+    """记入读完的书籍 (只在书籍第一次读完时调用)"""
+    s = ReadingStats
+    _, month_start = period_starts(day)
+
+    stmt = insert(s).values(
+        user_id=user_id,
+        total_duration_ms=0,
+        finished_books=count,
+        today_duration_ms=0,
+        week_duration_ms=0,
+        week_days_active=0,
+        month_start=month_start,
+        month_duration_ms=0,
+        month_days_active=0,
+        month_books_finished=count,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[s.user_id],
+        set_={
+            "finished_books": s.finished_books + count,
+            "month_books_finished": _in_period(
+                s.month_start, month_start, s.month_books_finished, s.month_books_finished + count, count
+            ),
+            "month_duration_ms": _in_period(
+                s.month_start, month_start, s.month_duration_ms, s.month_duration_ms, 0
+            ),
+            "month_days_active": _in_period(
+                s.month_start, month_start, s.month_days_active, s.month_days_active, 0
+            ),
+            "month_start": func.greatest(s.month_start, month_start),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def record_streak(entries: Sequence[DayDuration]) -> Insert:
+    """
+    记入阅读日 (与每日统计同时更新，一批用户各一行，同一用户不可重复)
+
+    前一天读过则当前连续天数加一，同一天不变，否则从 1 重新计；补记更早的日期不回退。
+    """
+    s = UserStreak
+    stmt = insert(s).values([
+        {"user_id": e.user_id, "current_streak": 1, "longest_streak": 1, "last_read_date": e.day}
+        for e in entries
+    ])
+    day = stmt.excluded.last_read_date
+    current = case(
+        (s.last_read_date >= day, s.current_streak),
+        (s.last_read_date + 1 == day, s.current_streak + 1),
+        else_=1,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[s.user_id],
+        set_={
+            "current_streak": current,
+            "longest_streak": func.greatest(s.longest_streak, current),
+            "last_read_date": func.greatest(s.last_read_date, day),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def current_streak(streak: UserStreak | None, today: date) -> int:
+    """当前连续天数 (今天还没阅读时，截至昨天的连续天数仍然有效)"""
+    if streak is None or streak.last_read_date is None:
+        return 0
+    if streak.last_read_date < today - timedelta(days=1):
+        return 0
+    return streak.current_streak or 0
+
+
+def release_finished(user_id: str, finished_day: date) -> Update:
+    """读完的书籍被删除 (其阅读位置随之删除)"""
+    s = ReadingStats
+    _, month_start = period_starts(finished_day)
+    return (
+        update(s)
+        .where(s.user_id == user_id)
+        .values(
+            finished_books=func.greatest(s.finished_books - 1, 0),
+            month_books_finished=case(
+                (s.month_start == month_start, func.greatest(s.month_books_finished - 1, 0)),
+                else_=s.month_books_finished,
+            ),
+            updated_at=func.now(),
+        )
+    )
+
+
+def _batch_params(user_ids: list[str]) -> dict[str, Any]:
+    return {"user_ids": user_ids, "default_timezone": DEFAULT_TIMEZONE}
+
+
+def live_stats(user_ids: list[str]) -> TextClause:
+    """由明细现算快照 (每个用户一行，另含 total_books；周期按各用户时区的今天)"""
+    return text(LIVE_STATS_SQL).bindparams(**_batch_params(user_ids))
+
+
+def rebuild_stats(user_ids: list[str]) -> TextClause:
+    """由明细重建一批用户的快照 (修正增量更新的偏差)"""
+    return text(REBUILD_STATS_SQL).bindparams(**_batch_params(user_ids))
+
+
+def rebuild_streaks(user_ids: list[str]) -> TextClause:
+    """由明细重建一批用户的连续天数 (回填历史)"""
+    return text(REBUILD_STREAKS_SQL).bindparams(**_batch_params(user_ids))
+
+
+def stats_from_row(row: Any) -> tuple[ReadingStats, UserStreak, int]:
+    """live_stats 结果行 → (快照, 连续天数, 书籍数)"""
+    return (
+        ReadingStats(user_id=row.user_id, **{c: getattr(row, c) for c in STATS_COLUMNS}),
+        UserStreak(user_id=row.user_id, **{c: getattr(row, c) for c in STREAK_COLUMNS}),
+        row.total_books,
+    )
+
+
+def build_stats(
+    stats: ReadingStats | None,
+    streak: UserStreak | None,
+    total_books: int,
+    today: date,
+) -> dict[str, Any]:
+    """
+    快照 → 综合统计 (get_comprehensive_stats 的返回结构)
+
+    reading_daily 每天一行且 books_read 恒为 1，周/月的 books_read 即活跃天数；页数目前未采集。
+    """
+    week_start, month_start = period_starts(today)
+    s = stats or ReadingStats()
+
+    active_today = s.last_active_day == today
+    this_week = s.week_start == week_start
+    this_month = s.month_start == month_start
+
+    week_ms = (s.week_duration_ms or 0) if this_week else 0
+    week_days = (s.week_days_active or 0) if this_week else 0
+    month_days = (s.month_days_active or 0) if this_month else 0
+
+    return {
+        "today": {
+            "day": today,
+            "total_duration_ms": (s.today_duration_ms or 0) if active_today else 0,
+            "books_read": 1 if active_today else 0,
+            "pages_read": 0,
+        },
+        "this_week": {
+            "week_start": week_start,
+            "week_end": week_start + timedelta(days=6),
+            "total_duration_ms": week_ms,
+            "daily_average_ms": week_ms // 7,
+            "books_read": week_days,
+            "days_active": week_days,
+        },
+        "this_month": {
+            "year": today.year,
+            "month": today.month,
+            "total_duration_ms": (s.month_duration_ms or 0) if this_month else 0,
+            "books_read": month_days,
+            "books_finished": (s.month_books_finished or 0) if this_month else 0,
+            "days_active": month_days,
+        },
+        "streak_days": current_streak(streak, today),
+        "total_books": total_books,
+        "finished_books": s.finished_books or 0,
+        "total_duration_ms": s.total_duration_ms or 0,
+    }
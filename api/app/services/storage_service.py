@@ -4,8 +4,11 @@
 MinIO S3 对象存储操作封装。
 """
 
+import io
 import uuid
-from datetime import timedelta
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from datetime import datetime, timedelta
 from typing import BinaryIO
 
 from minio import Minio
@@ -13,6 +16,9 @@ from minio.error import S3Error
 
 from app.core.config import settings
 
+# 单个 Multi-Object Delete 请求的对象数上限
+DELETE_BATCH_SIZE = 1000
+
 
 class StorageService:
     """MinIO 存储服务"""
@@ -136,6 +142,22 @@ class StorageService:
         except S3Error:
             return None
 
+    def iter_objects(
+        self,
+        bucket: str | None = None,
+        prefix: str | None = None,
+    ) -> Iterator[tuple[str, datetime]]:
+        """
+        按 Key 的字节序流式列出对象 (ListObjectsV2 自动分页)
+
+        Yields:
+            (Key, 最后修改时间)
+        """
+        bucket = bucket or settings.minio.minio_bucket_books
+        for obj in self.client.list_objects(bucket, prefix=prefix, recursive=True):
+            if not obj.is_dir:
+                yield obj.object_name, obj.last_modified
+
     def delete_object(
         self,
         object_key: str,
@@ -149,6 +171,28 @@ class StorageService:
         except S3Error:
             return False
 
+    def delete_objects(
+        self,
+        object_keys: list[str],
+        bucket: str | None = None,
+    ) -> list[str]:
+        """
+        批量删除对象 (S3 Multi-Object Delete，每个请求最多 1000 个)
+
+        Returns:
+            删除失败的 Key (不存在的对象视为删除成功)
+        """
+        from minio.deleteobjects import DeleteObject
+
+        bucket = bucket or settings.minio.minio_bucket_books
+        failed: list[str] = []
+        for start in range(0, len(object_keys), DELETE_BATCH_SIZE):
+            chunk = object_keys[start:start + DELETE_BATCH_SIZE]
+            # remove_objects 惰性执行，需遍历返回的错误
+            errors = self.client.remove_objects(bucket, [DeleteObject(key) for key in chunk])
+            failed.extend(error.name for error in errors)
+        return failed
+
     def copy_object(
         self,
         source_key: str,
@@ -197,6 +241,241 @@ class StorageService:
         except S3Error:
             return False
 
+    def upload_bytes(
+        self,
+        data: bytes,
+        object_key: str,
+        content_type: str,
+        bucket: str | None = None,
+    ) -> None:
+        """上传内存中的数据"""
+        bucket = bucket or settings.minio.minio_bucket_books
+        self.client.put_object(
+            bucket_name=bucket,
+            object_name=object_key,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+        )
+
+    def upload_local_file(
+        self,
+        file_path: str,
+        object_key: str,
+        content_type: str,
+        bucket: str | None = None,
+    ) -> None:
+        """上传本地文件 (大文件自动分片)"""
+        bucket = bucket or settings.minio.minio_bucket_books
+        self.client.fput_object(
+            bucket_name=bucket,
+            object_name=object_key,
+            file_path=file_path,
+            content_type=content_type,
+        )
+
+    def get_object_range(
+        self,
+        object_key: str,
+        offset: int,
+        length: int,
+        bucket: str | None = None,
+    ) -> bytes:
+        """
+        按字节范围读取对象 (HTTP Range 请求)
+
+        Args:
+            object_key: 对象键
+            offset: 起始偏移
+            length: 读取长度
+            bucket: 存储桶名称
+
+        Returns:
+            读取到的字节，越过对象末尾时可能短于 length
+        """
+        bucket = bucket or settings.minio.minio_bucket_books
+        response = self.client.get_object(bucket, object_key, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def open_object(
+        self,
+        object_key: str,
+        bucket: str | None = None,
+        size: int | None = None,
+    ) -> "ObjectRangeReader":
+        """
+        以可 seek 的只读文件对象打开远端对象
+
+        读取按块通过 Range 请求拉取并缓存，不会下载整个文件。
+
+        Args:
+            object_key: 对象键
+            bucket: 存储桶名称
+            size: 对象大小，未提供时通过 stat 获取
+        """
+        bucket = bucket or settings.minio.minio_bucket_books
+        if size is None:
+            size = self.client.stat_object(bucket, object_key).size
+
+        return ObjectRangeReader(
+            fetch=lambda offset, length: self.get_object_range(
+                object_key, offset, length, bucket=bucket
+            ),
+            size=size,
+            block_size=settings.minio.minio_range_block_size,
+            max_blocks=settings.minio.minio_range_cache_blocks,
+        )
+
+    def download_file(
+        self,
+        bucket: str,
+        key: str,
+        file_path: str,
+    ) -> None:
+        """下载对象到本地文件"""
+        self.client.fget_object(bucket, key, file_path)
+
+
+class ObjectRangeReader(io.RawIOBase):
+    """
+    基于 Range 请求的只读文件对象
+
+    将对象切分为固定大小的块，按需拉取并保存在 LRU 块缓存中；
+    一次读取涉及的连续缺失块合并为一个 Range 请求。
+    适合 PDF 解析等只访问文件头尾少量区域的场景。
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int, int], bytes],
+        size: int,
+        block_size: int = 256 * 1024,
+        max_blocks: int = 64,
+    ):
+        super().__init__()
+        self._fetch = fetch
+        self._size = size
+        self._block_size = block_size
+        self._max_blocks = max(1, max_blocks)
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._pos = 0
+
+        # 统计信息
+        self.request_count = 0
+        self.bytes_fetched = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return self._pos
+
+    def read(self, size: int | None = -1) -> bytes:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+        if size is None or size < 0:
+            size = self._size - self._pos
+        end = min(self._pos + size, self._size)
+        if end <= self._pos:
+            return b""
+
+        data = self._read_range(self._pos, end)
+        self._pos = end
+        return data
+
+    def readinto(self, buffer) -> int:  # type: ignore[no-untyped-def]
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def readall(self) -> bytes:
+        return self.read(-1)
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        """读取 [start, end) 区间，缺失块合并拉取"""
+        first = start // self._block_size
+        last = (end - 1) // self._block_size
+
+        # 超过缓存容量的大块读取直接透传，避免冲刷缓存
+        if last - first + 1 > self._max_blocks:
+            data = self._fetch(start, end - start)
+            self.request_count += 1
+            self.bytes_fetched += len(data)
+            return data
+
+        missing_run: list[int] = []
+        for index in range(first, last + 1):
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+                if missing_run:
+                    self._fetch_blocks(missing_run[0], missing_run[-1])
+                    missing_run = []
+            else:
+                missing_run.append(index)
+        if missing_run:
+            self._fetch_blocks(missing_run[0], missing_run[-1])
+
+        chunks = []
+        for index in range(first, last + 1):
+            block = self._get_block(index)
+            block_start = index * self._block_size
+            lo = max(start - block_start, 0)
+            hi = min(end - block_start, len(block))
+            chunks.append(block[lo:hi])
+        return b"".join(chunks)
+
+    def _get_block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is None:
+            # 被同一次读取中更后面的块挤出缓存，重新拉取
+            self._fetch_blocks(index, index)
+            block = self._blocks[index]
+        return block
+
+    def _fetch_blocks(self, first: int, last: int) -> None:
+        """一次 Range 请求拉取 [first, last] 块"""
+        offset = first * self._block_size
+        length = min((last + 1) * self._block_size, self._size) - offset
+        data = self._fetch(offset, length)
+
+        self.request_count += 1
+        self.bytes_fetched += len(data)
+
+        for index in range(first, last + 1):
+            lo = (index - first) * self._block_size
+            self._blocks[index] = data[lo : lo + self._block_size]
+            self._blocks.move_to_end(index)
+
+        while len(self._blocks) > self._max_blocks:
+            self._blocks.popitem(last=False)
+
 
 # 单例
 _storage_service: StorageService | None = None
@@ -0,0 +1,248 @@
+"""
+PDF 文字层分析
+
+判断 PDF 是否需要 OCR，并记录逐页的文字覆盖情况供局部 OCR 使用。
+
+- 抽样: 固定抽取前几页 (封面/版权页等) 与末页，其余样本在全书均匀分布，
+  按"由粗到细"的顺序评估，超出时间预算时已评估的样本仍覆盖全书
+- 统计: 使用 PyMuPDF 的绘制记录 (bboxlog) 统计文字与图片的覆盖面积，
+  不做完整的文字提取；不可见文字 (已有 OCR 层) 计为文字
+- 未安装 PyMuPDF 时回退为 PyPDF2 读取页面资源中的字体与图片，不解析内容流，
+  并按页树的 /Count 直接定位抽样页，不展开整棵页树
+
+页面分类:
+    text   有文字层
+    image  图片覆盖大部分页面且几乎没有文字，需要 OCR
+    blank  空白或只有少量矢量图形
+"""
+
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+# 抽样页数上限
+SAMPLE_PAGES = 24
+# 必定抽样的前几页
+HEAD_PAGES = 3
+# 时间预算内至少评估的页数
+MIN_SAMPLES = 6
+# 抽样分析的时间预算 (毫秒)
+TIME_BUDGET_MS = 80.0
+
+# 图片覆盖率达到该值且文字覆盖率低于 MIN_TEXT_COVERAGE 视为扫描页
+IMAGE_PAGE_COVERAGE = 0.5
+MIN_TEXT_COVERAGE = 0.02
+# 文字页占比 (置信度) 达到该值视为有文字层
+HAS_TEXT_THRESHOLD = 0.5
+
+TEXT_OPS = frozenset({"fill-text", "stroke-text", "ignore-text"})
+IMAGE_OPS = frozenset({"fill-image", "fill-imgmask"})
+
+
+@dataclass
+class PageCoverage:
+    """单页覆盖统计"""
+
+    index: int
+    text: float  # 文字覆盖率 0-1
+    image: float  # 图片覆盖率 0-1
+    text_ops: int  # 文字绘制次数
+
+    @property
+    def kind(self) -> str:
+        if self.image >= IMAGE_PAGE_COVERAGE and self.text < MIN_TEXT_COVERAGE:
+            return "image"
+        if self.text_ops:
+            return "text"
+        return "blank"
+
+
+def sample_pages(page_count: int, max_samples: int = SAMPLE_PAGES) -> list[int]:
+    """
+    选取抽样页并按由粗到细的顺序排列
+
+    前 HEAD_PAGES 页与末页必选，其余在全书均匀分布。
+    """
+    if page_count <= max_samples:
+        pages = list(range(page_count))
+    else:
+        picked = set(range(HEAD_PAGES)) | {page_count - 1}
+        spread = max_samples - len(picked)
+        picked |= {int((k + 0.5) * page_count / spread) for k in range(spread)}
+        pages = sorted(picked)
+
+    ordered: list[int] = []
+    seen: set[int] = set()
+    step = 1
+    while step * 2 < len(pages):
+        step *= 2
+    while step:
+        for i in range(0, len(pages), step):
+            if i not in seen:
+                seen.add(i)
+                ordered.append(pages[i])
+        step //= 2
+    return ordered
+
+
+def summarize(pages: list[PageCoverage], page_count: int, method: str) -> dict[str, Any]:
+    """汇总逐页统计为文字层结论"""
+    kinds = [page.kind for page in pages]
+    text_pages = kinds.count("text")
+    image_pages = kinds.count("image")
+    confidence = text_pages / (text_pages + image_pages) if text_pages + image_pages else 0.0
+
+    return {
+        "has_text_layer": confidence >= HAS_TEXT_THRESHOLD,
+        "confidence": round(confidence, 4),
+        "page_count": page_count,
+        "sampled_pages": len(pages),
+        "coverage": {str(p.index): round(p.text, 4) for p in sorted(pages, key=lambda p: p.index)},
+        "image_pages": sorted(p.index for p in pages if p.kind == "image"),
+        "method": method,
+    }
+
+
+def estimate_ocr_pages(text_layer: dict[str, Any] | None) -> int | None:
+    """
+    按抽样结果估算需要 OCR 的页数 (排队预计时间使用)
+
+    Returns:
+        估算页数；没有抽样结果时返回 None
+    """
+    if not text_layer or not text_layer.get("sampled_pages") or "image_pages" not in text_layer:
+        return None
+    ratio = len(text_layer["image_pages"]) / text_layer["sampled_pages"]
+    return math.ceil(int(text_layer.get("page_count") or 0) * ratio)
+
+
+def analyze_text_layer(
+    path: Path,
+    full: bool = False,
+    time_budget_ms: float = TIME_BUDGET_MS,
+) -> dict[str, Any]:
+    """
+    分析 PDF 文字层
+
+    Args:
+        path: 本地 PDF 路径
+        full: 逐页分析全部页面 (局部 OCR 使用，不受时间预算限制)
+        time_budget_ms: 抽样分析的时间预算
+
+    Returns:
+        {has_text_layer, confidence, page_count, sampled_pages,
+         coverage: {页码: 文字覆盖率}, image_pages: [需要 OCR 的页码], method, elapsed_ms}
+    """
+    started = time.perf_counter()
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(str(path)) as doc:
+            pages = _collect(doc.page_count, lambda i: _fitz_coverage(doc[i], i), full, started, time_budget_ms)
+            result = summarize(pages, doc.page_count, method="pymupdf")
+    else:
+        from PyPDF2 import PdfReader
+
+        root = PdfReader(str(path)).trailer["/Root"].get_object()["/Pages"].get_object()
+        page_count = int(root.get("/Count", 0))
+        pages = _collect(
+            page_count, lambda i: _pypdf_coverage(_page_resources(root, i), i), full, started, time_budget_ms
+        )
+        result = summarize(pages, page_count, method="pypdf")
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _collect(
+    page_count: int,
+    coverage_of: Callable[[int], PageCoverage],
+    full: bool,
+    started: float,
+    time_budget_ms: float,
+) -> list[PageCoverage]:
+    """逐页统计；抽样模式下超出时间预算即停止"""
+    indices = range(page_count) if full else sample_pages(page_count)
+    pages: list[PageCoverage] = []
+    for index in indices:
+        pages.append(coverage_of(index))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not full and len(pages) >= MIN_SAMPLES and elapsed_ms > time_budget_ms:
+            break
+    return pages
+
+
+def _fitz_coverage(page, index: int) -> PageCoverage:  # noqa: ANN001
+    """按绘制记录统计文字与图片面积 (不提取文字)"""
+    rect = page.rect
+    area = rect.width * rect.height or 1.0
+    text_area = image_area = 0.0
+    text_ops = 0
+
+    for op, bbox in page.get_bboxlog():
+        if op in TEXT_OPS:
+            text_ops += 1
+            text_area += _clipped_area(bbox, rect)
+        elif op in IMAGE_OPS:
+            image_area += _clipped_area(bbox, rect)
+
+    return PageCoverage(index, min(text_area / area, 1.0), min(image_area / area, 1.0), text_ops)
+
+
+def _clipped_area(bbox, rect) -> float:  # noqa: ANN001
+    x0, y0, x1, y1 = bbox
+    width = min(x1, rect.x1) - max(x0, rect.x0)
+    height = min(y1, rect.y1) - max(y0, rect.y0)
+    return width * height if width > 0 and height > 0 else 0.0
+
+
+def _page_resources(node, index: int) -> dict:  # noqa: ANN001
+    """沿页树按 /Count 下降到第 index 页，返回其 (可能继承自上级的) /Resources"""
+    resources = node.get("/Resources")
+    while node.get("/Type") == "/Pages":
+        kids = node["/Kids"]
+        if int(node.get("/Count", 0)) == len(kids):
+            # 每个子节点恰好一页 (常见的扁平页树)，直接定位
+            node, index = kids[index].get_object(), 0
+            resources = node.get("/Resources", resources)
+            continue
+        for ref in kids:
+            kid = ref.get_object()
+            count = int(kid.get("/Count", 0)) if kid.get("/Type") == "/Pages" else 1
+            if index < count:
+                node = kid
+                break
+            index -= count
+        else:
+            raise IndexError("page index out of range")
+        resources = node.get("/Resources", resources)
+
+    return resources.get_object() if hasattr(resources, "get_object") else resources or {}
+
+
+def _pypdf_coverage(resources: dict, index: int) -> PageCoverage:
+    """
+    按页面资源判断 (回退)
+
+    有字体资源视为有文字；有图片资源视为整页图片。两者都有时按文字页处理，
+    宁可漏掉个别扫描页也不重复 OCR。
+    """
+    fonts = resources.get("/Font") or {}
+    fonts = fonts.get_object() if hasattr(fonts, "get_object") else fonts
+    has_images = False
+    xobjects = resources.get("/XObject") or {}
+    xobjects = xobjects.get_object() if hasattr(xobjects, "get_object") else xobjects
+    for ref in xobjects.values():
+        obj = ref.get_object() if hasattr(ref, "get_object") else ref
+        if obj.get("/Subtype") == "/Image":
+            has_images = True
+            break
+
+    text = MIN_TEXT_COVERAGE if fonts else 0.0
+    return PageCoverage(index, text, 1.0 if has_images else 0.0, len(fonts))
@@ -20,6 +20,7 @@ from app.models.book import Book, ShelfBook
 from app.models.note import Bookmark, Highlight, Note
 from app.models.reading import BookPosition, ReadingTimeLog
 from app.models.user import User, UserOAuthAccount, UserSession, UserSetting
+from app.services.blob_service import book_blob_refs, release_blobs
 
 
 class UserService:
@@ -109,24 +110,20 @@ class UserService:
         """
         uid = UUID(user_id)
 
-        # 删除所有书籍 (会触发引用计数减少)
-        # 先获取书籍列表
+        # 删除所有书籍，一次释放其文件与封面引用
         result = await self.db.execute(select(Book).where(Book.user_id == uid))
         books = result.scalars().all()
 
         for book in books:
             # 删除私人数据
             await self._delete_book_private_data(str(book.id), user_id)
-            # 处理引用计数
-            if book.canonical_book_id:
-                # 引用书直接删除
-                await self.db.delete(book)
-            else:
-                # 原书减少引用计数
-                book.storage_ref_count -= 1
-                if book.storage_ref_count <= 0:
-                    # 硬删除
-                    await self.db.delete(book)
+            await self.db.delete(book)
+
+        released = release_blobs(
+            ref for book in books for ref in book_blob_refs(book.blob_sha256, book.cover_image_key)
+        )
+        if released is not None:
+            await self.db.execute(released)
 
         # 删除其他用户数据
         await self.db.execute(delete(UserOAuthAccount).where(UserOAuthAccount.user_id == uid))
@@ -0,0 +1,195 @@
+"""
+任务侧书籍写入
+
+Celery 任务对 books 表的修改先在内存中合并，再一次性写入：
+
+- BookUnitOfWork: 一个处理步骤内的状态、元数据、封面、错误等修改合并为一条 UPDATE
+- BookUpdateBatch: 维护任务的多行修改按列组合分组，以 executemany 批量刷新
+
+books 是 PowerSync 复制最频繁的表，每条 UPDATE 都会产生一个新的行版本、
+WAL 记录和一次同步下发，连续的小更新应合并。
+"""
+
+import json
+from collections import defaultdict
+from typing import Any
+
+import structlog
+from sqlalchemy import Connection, text
+
+from app.core.database import get_sync_engine
+
+logger = structlog.get_logger()
+
+# 允许任务写入的列 (列名会拼入 SQL，必须走白名单)
+BOOK_COLUMNS = frozenset({
+    "original_format",
+    "content_sha256",
+    "cover_image_key",
+    "converted_epub_key",
+    "ocr_pdf_key",
+    "reader_type",
+    "has_text_layer",
+    "text_layer_confidence",
+    "processing_status",
+    "processing_error",
+    "ocr_status",
+    "is_readable",
+    "is_interactive",
+    "vector_indexed_at",
+})
+
+
+def build_book_update(columns: tuple[str, ...], merge_meta: bool) -> str:
+    """
+    生成 books 的 UPDATE 语句
+
+    meta 以 JSONB 合并 (||) 写入，不覆盖其他键。
+    """
+    unknown = set(columns) - BOOK_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown book columns: {sorted(unknown)}")
+
+    assignments = [f"{column} = :{column}" for column in columns]
+    if merge_meta:
+        assignments.append("meta = COALESCE(meta, '{}'::jsonb) || CAST(:meta AS jsonb)")
+    assignments.append("updated_at = NOW()")
+    return f"UPDATE books SET {', '.join(assignments)} WHERE id = :book_id"
+
+
+def _run(conn: Connection | None, sql: str, params: dict | list[dict]) -> None:
+    """在给定连接上执行；未给定时使用独立事务"""
+    if conn is not None:
+        conn.execute(text(sql), params)
+        return
+    with get_sync_engine().begin() as own_conn:
+        own_conn.execute(text(sql), params)
+
+
+def _dump_meta(meta: dict) -> str:
+    return json.dumps(meta, ensure_ascii=False)
+
+
+class BookUnitOfWork:
+    """
+    单本书一个处理步骤的写入单元
+
+    用法:
+        with BookUnitOfWork(book_id) as uow:
+            uow.set(cover_image_key=key)
+            uow.merge_meta({"page_count": 10})
+            uow.set(processing_status="completed", processing_error=None)
+        # 正常退出时合并为一条 UPDATE；with 块内抛出异常时丢弃，失败状态由调用方另行写入
+    """
+
+    def __init__(self, book_id: str, conn: Connection | None = None):
+        self.book_id = book_id
+        self.conn = conn
+        self.fields: dict[str, Any] = {}
+        self.meta: dict[str, Any] = {}
+
+    def set(self, **fields: Any) -> "BookUnitOfWork":
+        """记录列修改，同一列以最后一次为准"""
+        unknown = set(fields) - BOOK_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown book columns: {sorted(unknown)}")
+        self.fields.update(fields)
+        return self
+
+    def merge_meta(self, meta: dict[str, Any]) -> "BookUnitOfWork":
+        """记录 meta 顶层键的合并"""
+        self.meta.update(meta)
+        return self
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.fields or self.meta)
+
+    def flush(self) -> bool:
+        """
+        写入累积的修改
+
+        Returns:
+            是否执行了 UPDATE
+        """
+        if not self.dirty:
+            return False
+
+        columns = tuple(sorted(self.fields))
+        params = {"book_id": self.book_id, **self.fields}
+        if self.meta:
+            params["meta"] = _dump_meta(self.meta)
+
+        _run(self.conn, build_book_update(columns, merge_meta=bool(self.meta)), params)
+        self.fields.clear()
+        self.meta.clear()
+        return True
+
+    def __enter__(self) -> "BookUnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:  # noqa: ANN001
+        if exc_type is not None:
+            # 步骤失败时不写入部分修改 (未给定连接时会以独立事务提交，留下半成品或"已完成"状态)
+            if self.dirty:
+                logger.warning("Discarding book update after error", book_id=self.book_id)
+            self.fields.clear()
+            self.meta.clear()
+            return
+        self.flush()
+
+
+class BookUpdateBatch:
+    """
+    多本书的批量写入
+
+    修改按 (列集合, 是否合并 meta) 分组，每组一条语句以 executemany 执行；
+    累积行数达到 flush_size 时自动刷新。
+    """
+
+    def __init__(self, conn: Connection | None = None, flush_size: int = 500):
+        self.conn = conn
+        self.flush_size = flush_size
+        self._groups: dict[tuple[tuple[str, ...], bool], list[dict]] = defaultdict(list)
+        self._pending = 0
+        self.flushed = 0
+
+    def add(self, book_id: str, meta: dict[str, Any] | None = None, **fields: Any) -> None:
+        """加入一行修改"""
+        columns = tuple(sorted(fields))
+        unknown = set(columns) - BOOK_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown book columns: {sorted(unknown)}")
+
+        params = {"book_id": book_id, **fields}
+        if meta:
+            params["meta"] = _dump_meta(meta)
+        self._groups[(columns, bool(meta))].append(params)
+
+        self._pending += 1
+        if self._pending >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        写入所有累积的修改
+
+        Returns:
+            写入的行数
+        """
+        rows = 0
+        for (columns, merge_meta), params in self._groups.items():
+            _run(self.conn, build_book_update(columns, merge_meta), params)
+            rows += len(params)
+
+        self._groups.clear()
+        self._pending = 0
+        self.flushed += rows
+        return rows
+
+    def __enter__(self) -> "BookUpdateBatch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:  # noqa: ANN001
+        if exc_type is None:
+            self.flush()
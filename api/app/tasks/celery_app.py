@@ -26,6 +26,8 @@ celery_app = Celery(
         "app.tasks.book_tasks",
         "app.tasks.cleanup_tasks",
         "app.tasks.conversion_tasks",
+        "app.tasks.ingest_tasks",
+        "app.tasks.reading_tasks",
     ],
 )
 
@@ -76,10 +78,16 @@ celery_app.conf.update(
 
     # 任务路由
     task_routes={
+        # 入库流水线: 转换阶段需要 Calibre，其余阶段在 processing 队列
+        "app.tasks.ingest_tasks.ingest_convert": {"queue": "conversion"},
+        "app.tasks.ingest_tasks.*": {"queue": "processing"},
+        # OCR 调度本身很轻，不能排在长时间运行的 OCR 任务后面
+        "app.tasks.ocr_tasks.dispatch_ocr_jobs": {"queue": "default"},
         "app.tasks.ocr_tasks.*": {"queue": "ocr"},
         "app.tasks.book_tasks.*": {"queue": "processing"},
         "app.tasks.conversion_tasks.*": {"queue": "conversion"},
         "app.tasks.cleanup_tasks.*": {"queue": "cleanup"},
+        "app.tasks.reading_tasks.*": {"queue": "default"},
     },
 
     # 定时任务
@@ -92,6 +100,26 @@ celery_app.conf.update(
             "task": "app.tasks.cleanup_tasks.cleanup_orphan_files",
             "schedule": 86400.0,  # 每天
         },
+        "recover-stalled-books": {
+            "task": "app.tasks.cleanup_tasks.recover_stalled_books",
+            "schedule": 3600.0,  # 每小时
+        },
+        "maintain-reading-log-partitions": {
+            "task": "app.tasks.cleanup_tasks.maintain_reading_log_partitions",
+            "schedule": 86400.0,  # 每天
+        },
+        "dispatch-ocr-jobs": {
+            "task": "app.tasks.ocr_tasks.dispatch_ocr_jobs",
+            "schedule": 10.0,  # 兜底调度，正常由入队/任务结束触发
+        },
+        "flush-reading-sessions": {
+            "task": "app.tasks.reading_tasks.flush_reading_sessions",
+            "schedule": float(settings.reading.reading_flush_interval_seconds),
+        },
+        "flush-reading-positions": {
+            "task": "app.tasks.reading_tasks.flush_reading_positions",
+            "schedule": float(settings.reading.reading_position_flush_seconds),
+        },
     },
 
     # Redis 优先级队列配置
@@ -1,176 +1,448 @@
 """
 清理任务
 
-处理软删除书籍的自动清理、孤立文件清理等。
+处理软删除书籍的自动清理、孤立文件清理、停滞书籍恢复、阅读日志分区维护等。
 """
 
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
 
 import structlog
 from celery import shared_task
-from sqlalchemy import create_engine, text
+from sqlalchemy import Connection, text
 
 from app.core.config import settings
-from app.services.storage_service import StorageService
+from app.core.database import get_sync_engine
+from app.services.blob_service import (
+    BLOB_BOOK,
+    blob_bucket,
+    book_blob_refs,
+    derived_prefix,
+    ocr_blob_key,
+    release_blobs,
+)
+from app.services.cover_service import cover_object_keys, cover_variant_suffixes
+from app.services.partition_service import (
+    READING_LOG_TABLE,
+    drop_partitions_before,
+    ensure_partitions,
+)
+from app.services.storage_service import DELETE_BATCH_SIZE, get_storage_service
+from app.tasks.book_writes import BookUpdateBatch
 
 logger = structlog.get_logger()
 
+# 派生产物前缀 (按内容哈希寻址: derived/{sha[:2]}/{sha}/{name})
+DERIVED_PREFIX = "derived/"
+# 流式读取被引用 Key 的批大小
+REFERENCE_FETCH_SIZE = 10000
+
+BOOK_KEYS_SQL = """
+    SELECT key FROM (
+        SELECT minio_key AS key FROM books WHERE minio_key IS NOT NULL
+        UNION
+        SELECT converted_epub_key FROM books WHERE converted_epub_key IS NOT NULL
+        UNION
+        SELECT ocr_pdf_key FROM books WHERE ocr_pdf_key IS NOT NULL
+        UNION
+        SELECT key FROM storage_blobs WHERE kind = 'book'
+    ) refs
+    ORDER BY key COLLATE "C"
+"""
+
+CONTENT_SHA_SQL = """
+    SELECT key FROM (
+        SELECT content_sha256 AS key FROM books WHERE content_sha256 IS NOT NULL
+        UNION
+        SELECT sha256 FROM storage_blobs WHERE kind = 'book'
+    ) refs
+    ORDER BY key COLLATE "C"
+"""
+
+# 封面变体 Key 由 JPEG Key 去掉扩展名后拼接 /{size}.{format} (与 cover_variant_key 一致)
+COVER_KEYS_SQL = r"""
+    WITH covers AS (
+        SELECT cover_image_key AS key FROM books WHERE cover_image_key IS NOT NULL
+        UNION
+        SELECT key FROM storage_blobs WHERE kind = 'cover'
+    )
+    SELECT key FROM (
+        SELECT key FROM covers
+        UNION
+        SELECT regexp_replace(covers.key, '\.[^.]*$', '') || '/' || variant.suffix
+        FROM covers CROSS JOIN unnest(CAST(:suffixes AS text[])) AS variant(suffix)
+    ) refs
+    ORDER BY key COLLATE "C"
+"""
+
 
 @shared_task(name="app.tasks.cleanup_tasks.cleanup_expired_books")
 def cleanup_expired_books() -> dict:
     """
-    清理过期的软删除书籍
-
-    软删除超过 30 天的书籍将被永久删除。
+    清理过期的软删除书籍并回收不再被引用的文件 (批量垃圾回收)
+
+    软删除超过 BOOK_RETENTION_DAYS 天的书籍将被永久删除:
+    - 每批一条 DELETE ... RETURNING (SKIP LOCKED，可并发执行)，其文件与封面引用
+      合并为一条 UPDATE 释放
+    - 引用计数归零且超过宽限期的 storage_blobs 行按部分索引取一批删除，
+      不再逐本书判断文件是否仍被使用
+    - 每批单独提交，提交后再用 Multi-Object Delete 删除对象；删除失败的对象
+      由孤立文件清理兜底
+    - 循环到积压清空或超出时间预算，超出预算时续排下一轮
     """
     logger.info("Starting expired books cleanup")
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
-    storage = StorageService()
-
-    deleted_count = 0
-    failed_count = 0
+    storage = get_storage_service()
+    batch_size = settings.celery.gc_batch_size
+    budget = settings.celery.gc_time_budget_seconds
+    started = time.monotonic()
+
+    totals = {
+        "deleted_count": 0,
+        "released_refs": 0,
+        "blobs_reclaimed": 0,
+        "objects_deleted": 0,
+        "objects_failed": 0,
+        "batches": 0,
+    }
+    drained = False
 
     try:
-        with engine.connect() as conn:
-            # 查找过期的软删除书籍
-            result = conn.execute(
-                text("""
-                    SELECT id, minio_key, cover_key, ocr_pdf_key, sha256, storage_ref_count
-                    FROM books
-                    WHERE deleted_at IS NOT NULL
-                      AND deleted_at < NOW() - INTERVAL '30 days'
-                    LIMIT 100
-                """)
-            )
-
-            books = result.fetchall()
-
-            for book in books:
-                book_id = str(book.id)
-                try:
-                    # 减少引用计数
-                    if book.storage_ref_count and book.storage_ref_count > 1:
-                        # 还有其他引用，只减少计数
-                        conn.execute(
-                            text("""
-                                UPDATE books
-                                SET storage_ref_count = storage_ref_count - 1
-                                WHERE sha256 = :sha256 AND id != :book_id::uuid
-                            """),
-                            {"sha256": book.sha256, "book_id": book_id},
-                        )
-                    else:
-                        # 最后一个引用，删除存储文件
-                        if book.minio_key:
-                            storage.delete_file(
-                                bucket=settings.minio.minio_bucket_books,
-                                key=book.minio_key,
-                            )
-                        if book.cover_key:
-                            storage.delete_file(
-                                bucket=settings.minio.minio_bucket_covers,
-                                key=book.cover_key,
-                            )
-                        if book.ocr_pdf_key:
-                            storage.delete_file(
-                                bucket=settings.minio.minio_bucket_books,
-                                key=book.ocr_pdf_key,
-                            )
-
-                    # 删除书籍记录
-                    conn.execute(
-                        text("DELETE FROM books WHERE id = :book_id::uuid"),
-                        {"book_id": book_id},
-                    )
-
-                    deleted_count += 1
-                    logger.info("Deleted expired book", book_id=book_id)
-
-                except Exception as e:
-                    failed_count += 1
-                    logger.error("Failed to delete book", book_id=book_id, error=str(e))
-
-            conn.commit()
+        while time.monotonic() - started < budget:
+            with get_sync_engine().begin() as conn:
+                batch = _collect_expired_batch(conn, batch_size)
+            if batch.deleted == 0 and batch.blobs == 0:
+                drained = True
+                break
+
+            totals["batches"] += 1
+            totals["deleted_count"] += batch.deleted
+            totals["released_refs"] += batch.released_refs
+            totals["blobs_reclaimed"] += batch.blobs
+            objects = dict(batch.objects)
+            if batch.derived:
+                # 派生产物按内容哈希分目录，列出后一并删除
+                books_bucket = settings.minio.minio_bucket_books
+                objects[books_bucket] = objects.get(books_bucket, []) + [
+                    key
+                    for sha256 in batch.derived
+                    for key, _ in storage.iter_objects(books_bucket, prefix=derived_prefix(sha256))
+                ]
+            for bucket, keys in objects.items():
+                failed = storage.delete_objects(keys, bucket=bucket)
+                totals["objects_deleted"] += len(keys) - len(failed)
+                totals["objects_failed"] += len(failed)
+                if failed:
+                    logger.warning("Failed to delete objects", bucket=bucket, count=len(failed), sample=failed[:5])
+
+            if batch.deleted < batch_size and batch.blobs < batch_size:
+                drained = True
+                break
 
     except Exception as e:
         logger.exception("Cleanup expired books failed")
-        return {"success": False, "error": str(e)}
+        return {"success": False, "error": str(e), **totals}
 
-    logger.info(
-        "Expired books cleanup completed",
-        deleted_count=deleted_count,
-        failed_count=failed_count,
-    )
-
-    return {
+    elapsed = time.monotonic() - started
+    report = {
         "success": True,
-        "deleted_count": deleted_count,
-        "failed_count": failed_count,
+        **totals,
+        "drained": drained,
+        "elapsed_seconds": round(elapsed, 2),
+        "books_per_second": round(totals["deleted_count"] / elapsed, 1) if elapsed else 0.0,
+        "objects_per_second": round(totals["objects_deleted"] / elapsed, 1) if elapsed else 0.0,
     }
+    logger.info("Expired books cleanup completed", **report)
+
+    if not drained:
+        # 积压未清完，立即续排 (不等下一次定时)
+        cleanup_expired_books.delay()
+
+    return report
+
 
+@dataclass
+class ExpiredBatch:
+    """一批已删除的书籍记录、回收的文件与待删除的对象"""
 
-@shared_task(name="app.tasks.cleanup_tasks.cleanup_orphan_files")
+    deleted: int = 0
+    released_refs: int = 0
+    blobs: int = 0
+    # bucket -> 对象 Key
+    objects: dict[str, list[str]] = field(default_factory=dict)
+    # 需要清理派生产物的内容哈希
+    derived: list[str] = field(default_factory=list)
+
+
+def _collect_expired_batch(conn: Connection, batch_size: int) -> ExpiredBatch:
+    """
+    删除一批过期书籍记录并释放引用，再回收一批引用计数为零的文件 (调用方提交事务)
+
+    本批释放的文件 released_at 为当前时间，要等宽限期过后才会被回收，
+    宽限期内相同内容再次上传会复活该文件。
+    """
+    rows = conn.execute(
+        text("""
+            WITH expired AS (
+                SELECT id FROM books
+                WHERE deleted_at IS NOT NULL
+                  AND deleted_at < NOW() - make_interval(days => :days)
+                ORDER BY deleted_at
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM books b
+            USING expired
+            WHERE b.id = expired.id
+            RETURNING CASE WHEN b.blob_registered THEN b.content_sha256 END AS content_sha256,
+                      b.cover_image_key
+        """),
+        {"days": settings.celery.book_retention_days, "limit": batch_size},
+    ).fetchall()
+
+    refs = [ref for row in rows for ref in book_blob_refs(row.content_sha256, row.cover_image_key)]
+    released = release_blobs(refs)
+    if released is not None:
+        conn.execute(released)
+
+    blobs = conn.execute(
+        text("""
+            WITH reclaimable AS (
+                SELECT kind, sha256 FROM storage_blobs
+                WHERE refcount = 0
+                  AND released_at < NOW() - make_interval(hours => :grace)
+                ORDER BY released_at
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM storage_blobs sb
+            USING reclaimable
+            WHERE sb.kind = reclaimable.kind AND sb.sha256 = reclaimable.sha256
+            RETURNING sb.kind, sb.sha256, sb.key
+        """),
+        {"grace": settings.celery.orphan_grace_hours, "limit": batch_size},
+    ).fetchall()
+
+    batch = ExpiredBatch(deleted=len(rows), released_refs=len(refs), blobs=len(blobs))
+    for blob in blobs:
+        if blob.kind == BLOB_BOOK:
+            # OCR 结果与原始文件同在 books 桶 (见 ocr_tasks._upload_ocr_result)
+            batch.objects.setdefault(settings.minio.minio_bucket_books, []).extend(
+                [blob.key, ocr_blob_key(blob.sha256)]
+            )
+            batch.derived.append(blob.sha256)
+        else:
+            batch.objects.setdefault(blob_bucket(blob.kind), []).extend(cover_object_keys(blob.key))
+    return batch
+
+
+# 全量列出对象耗时与对象数成正比，不受默认任务超时限制
+@shared_task(name="app.tasks.cleanup_tasks.cleanup_orphan_files", soft_time_limit=3600, time_limit=3660)
 def cleanup_orphan_files() -> dict:
     """
-    清理孤立的 MinIO 文件
+    清理孤立的 MinIO 文件 (列表对账)
 
-    检查 MinIO 中的文件是否在数据库中有对应记录。
+    对象存储按 Key 字节序分页列出，数据库中被引用的 Key 按 COLLATE "C" 排序流式读出，
+    两个有序流归并一次即得到孤立对象，不再逐个对象查询数据库:
+    - books 桶: 原始文件、转换后的 EPUB、OCR 结果；derived/ 下的派生产物按内容哈希对账
+    - covers 桶: 封面 JPEG 及其全部变体
+    只删除早于宽限期的对象，进行中的上传与对账期间新写入的对象不受影响。
     """
     logger.info("Starting orphan files cleanup")
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
-    storage = StorageService()
-
-    deleted_count = 0
+    storage = get_storage_service()
+    books_bucket = settings.minio.minio_bucket_books
+    covers_bucket = settings.minio.minio_bucket_covers
+    cutoff = datetime.now(UTC) - timedelta(hours=settings.celery.orphan_grace_hours)
+    started = time.monotonic()
+    report: dict[str, dict] = {}
 
     try:
-        # 获取 MinIO 中的所有文件
-        books_files = storage.list_files(settings.minio.minio_bucket_books)
-        covers_files = storage.list_files(settings.minio.minio_bucket_covers)
-
-        with engine.connect() as conn:
-            # 检查书籍文件
-            for file_key in books_files:
-                # 跳过 OCR 文件（它们可能被多本书引用）
-                if file_key.startswith("ocr/"):
-                    continue
-
-                result = conn.execute(
-                    text("""
-                        SELECT id FROM books
-                        WHERE minio_key = :key OR ocr_pdf_key = :key
-                        LIMIT 1
-                    """),
-                    {"key": file_key},
-                )
-
-                if result.fetchone() is None:
-                    # 孤立文件，删除
-                    logger.warning("Found orphan file", key=file_key)
-                    storage.delete_file(settings.minio.minio_bucket_books, file_key)
-                    deleted_count += 1
-
-            # 检查封面文件
-            for file_key in covers_files:
-                result = conn.execute(
-                    text("SELECT id FROM books WHERE cover_key = :key LIMIT 1"),
-                    {"key": file_key},
-                )
-
-                if result.fetchone() is None:
-                    logger.warning("Found orphan cover", key=file_key)
-                    storage.delete_file(settings.minio.minio_bucket_covers, file_key)
-                    deleted_count += 1
+        with get_sync_engine().connect() as conn:
+            conn = conn.execution_options(stream_results=True, yield_per=REFERENCE_FETCH_SIZE)
+            passes = [
+                (
+                    "books",
+                    books_bucket,
+                    (o for o in storage.iter_objects(books_bucket) if not o[0].startswith(DERIVED_PREFIX)),
+                    _referenced_keys(conn, BOOK_KEYS_SQL),
+                    None,
+                ),
+                (
+                    "derived",
+                    books_bucket,
+                    storage.iter_objects(books_bucket, prefix=DERIVED_PREFIX),
+                    _referenced_keys(conn, CONTENT_SHA_SQL),
+                    derived_sha256,
+                ),
+                (
+                    "covers",
+                    covers_bucket,
+                    storage.iter_objects(covers_bucket),
+                    _referenced_keys(conn, COVER_KEYS_SQL, {"suffixes": cover_variant_suffixes()}),
+                    None,
+                ),
+            ]
+            for name, bucket, objects, referenced, key in passes:
+                report[name] = _reconcile(storage, bucket, objects, referenced, key, cutoff)
 
     except Exception as e:
         logger.exception("Cleanup orphan files failed")
-        return {"success": False, "error": str(e)}
+        return {"success": False, "error": str(e), "passes": report}
 
-    logger.info("Orphan files cleanup completed", deleted_count=deleted_count)
+    deleted_count = sum(stats["deleted"] for stats in report.values())
+    elapsed = round(time.monotonic() - started, 2)
+    logger.info("Orphan files cleanup completed", deleted_count=deleted_count, elapsed_seconds=elapsed, passes=report)
 
-    return {"success": True, "deleted_count": deleted_count}
+    return {"success": True, "deleted_count": deleted_count, "elapsed_seconds": elapsed, "passes": report}
+
+
+def find_orphans(
+    objects: Iterable[tuple[str, datetime]],
+    referenced: Iterable[str],
+    key: Callable[[str], str | None] | None = None,
+) -> Iterator[tuple[str, datetime]]:
+    """
+    归并两个升序流，返回未被引用的对象
+
+    Args:
+        objects: (对象 Key, 修改时间)，按 Key 升序
+        referenced: 被引用的值，升序 (可重复)
+        key: 把对象 Key 映射为引用值 (默认为 Key 本身)；返回 None 的对象跳过
+
+    Raises:
+        ValueError: 任一流不是升序 (排序规则不一致时中止，避免误删)
+    """
+    refs = iter(referenced)
+    current = next(refs, None)
+    previous: str | None = None
+    for object_key, modified in objects:
+        value = key(object_key) if key else object_key
+        if value is None:
+            continue
+        if previous is not None and value < previous:
+            raise ValueError(f"object keys are not sorted: {value!r} after {previous!r}")
+        previous = value
+
+        while current is not None and current < value:
+            last, current = current, next(refs, None)
+            if current is not None and current < last:
+                raise ValueError(f"referenced keys are not sorted: {current!r} after {last!r}")
+        if current != value:
+            yield object_key, modified
+
+
+def derived_sha256(object_key: str) -> str | None:
+    """派生产物 Key 中的内容哈希"""
+    parts = object_key.split("/")
+    return parts[2] if len(parts) > 3 and parts[0] == DERIVED_PREFIX.rstrip("/") else None
+
+
+def _referenced_keys(conn: Connection, sql: str, params: dict | None = None) -> Iterator[str]:
+    """服务端游标流式读取被引用的 Key"""
+    for row in conn.execute(text(sql), params or {}):
+        yield row.key
+
+
+def _reconcile(
+    storage,  # noqa: ANN001
+    bucket: str,
+    objects: Iterable[tuple[str, datetime]],
+    referenced: Iterable[str],
+    key: Callable[[str], str | None] | None,
+    cutoff: datetime,
+) -> dict[str, int]:
+    """对账一个桶 (或前缀)，孤立对象攒满一批即删除"""
+    stats = {"orphans": 0, "recent": 0, "deleted": 0, "failed": 0}
+    pending: list[str] = []
+
+    def flush() -> None:
+        failed = storage.delete_objects(list(pending), bucket=bucket)
+        stats["deleted"] += len(pending) - len(failed)
+        stats["failed"] += len(failed)
+        pending.clear()
+
+    for object_key, modified in find_orphans(objects, referenced, key):
+        stats["orphans"] += 1
+        if modified is not None and modified > cutoff:
+            stats["recent"] += 1
+            continue
+        pending.append(object_key)
+        if len(pending) >= DELETE_BATCH_SIZE:
+            flush()
+    if pending:
+        flush()
+    return stats
+
+
+# 停在处理中的书籍: 导入中，或 OCR 状态未结束但已没有未结束的 OcrJob (Worker 崩溃、任务丢失)
+STALLED_BOOKS_SQL = """
+    SELECT CAST(b.id AS text) AS id, s.ingest_stalled, s.ocr_stalled
+    FROM books b
+    CROSS JOIN LATERAL (
+        SELECT b.processing_status = 'processing' AS ingest_stalled,
+               COALESCE(b.ocr_status IN ('pending', 'processing'), false) AND NOT EXISTS (
+                   SELECT 1 FROM ocr_jobs j
+                   WHERE j.book_id = b.id AND j.status IN ('pending', 'processing')
+               ) AS ocr_stalled
+    ) s
+    WHERE b.deleted_at IS NULL
+      AND b.updated_at < NOW() - make_interval(hours => :hours)
+      AND (s.ingest_stalled OR s.ocr_stalled)
+    ORDER BY b.updated_at
+    LIMIT :limit
+    FOR UPDATE OF b SKIP LOCKED
+"""
+
+
+@shared_task(name="app.tasks.cleanup_tasks.recover_stalled_books")
+def recover_stalled_books() -> dict:
+    """
+    把停在处理中的书籍标记为失败
+
+    导入或 OCR 的 Worker 丢失时书籍会一直显示处理中。超过 stalled_book_hours 未更新的书籍
+    按批取出 (SKIP LOCKED)，每批的修改经 BookUpdateBatch 按列组合以 executemany 写回，
+    不再逐本 UPDATE 并提交。用户可重新触发处理。
+    """
+    batch_size = settings.celery.gc_batch_size
+    totals = {"ingest_failed": 0, "ocr_failed": 0, "batches": 0}
+
+    try:
+        while True:
+            with get_sync_engine().begin() as conn:
+                rows = conn.execute(
+                    text(STALLED_BOOKS_SQL),
+                    {"hours": settings.celery.stalled_book_hours, "limit": batch_size},
+                ).fetchall()
+                with BookUpdateBatch(conn, flush_size=batch_size) as batch:
+                    for row in rows:
+                        batch.add(row.id, **stalled_book_fields(row.ingest_stalled, row.ocr_stalled))
+                        totals["ingest_failed"] += int(row.ingest_stalled)
+                        totals["ocr_failed"] += int(row.ocr_stalled)
+            totals["batches"] += 1 if rows else 0
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        logger.exception("Recover stalled books failed")
+        return {"success": False, "error": str(e), **totals}
+
+    if totals["batches"]:
+        logger.warning("Stalled books marked failed", **totals)
+    return {"success": True, **totals}
+
+
+def stalled_book_fields(ingest_stalled: bool, ocr_stalled: bool) -> dict:
+    """停滞书籍的失败状态 (OCR 仍有未结束的任务时只处理导入)"""
+    fields: dict = {}
+    if ingest_stalled:
+        fields["processing_status"] = "failed"
+    if ocr_stalled:
+        fields["ocr_status"] = "failed"
+    stage = "ingest" if ingest_stalled else "ocr"
+    fields["processing_error"] = f"{stage}: stalled for over {settings.celery.stalled_book_hours}h"
+    return fields
 
 
 @shared_task(name="app.tasks.cleanup_tasks.cleanup_expired_sessions")
@@ -180,8 +452,7 @@ def cleanup_expired_sessions() -> dict:
     """
     logger.info("Starting expired sessions cleanup")
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
+    engine = get_sync_engine()
 
     try:
         with engine.connect() as conn:
@@ -204,37 +475,53 @@ def cleanup_expired_sessions() -> dict:
 
 
 @shared_task(name="app.tasks.cleanup_tasks.cleanup_old_reading_logs")
-def cleanup_old_reading_logs(days: int = 365) -> dict:
+def cleanup_old_reading_logs(days: int | None = None) -> dict:
     """
     清理过旧的阅读日志
 
-    默认保留 365 天的数据。
+    reading_time_log 按月分区，整月都超过保留期的分区直接 DETACH 后 DROP，不逐行删除。
+    默认保留 READING_LOG_RETENTION_DAYS 天。
     """
+    days = days if days is not None else settings.reading.reading_log_retention_days
+    cutoff = datetime.now(UTC) - timedelta(days=days)
     logger.info("Starting old reading logs cleanup", days=days)
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
-
     try:
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                    DELETE FROM reading_time_log
-                    WHERE ended_at < NOW() - INTERVAL ':days days'
-                    RETURNING id
-                """.replace(":days", str(days)))
-            )
-            deleted_count = result.rowcount
-            conn.commit()
+        dropped = drop_partitions_before(get_sync_engine(), READING_LOG_TABLE, cutoff)
 
-        logger.info("Old reading logs cleanup completed", deleted_count=deleted_count)
-        return {"success": True, "deleted_count": deleted_count}
+        logger.info("Old reading logs cleanup completed", dropped_partitions=dropped)
+        return {"success": True, "dropped_partitions": dropped}
 
     except Exception as e:
         logger.exception("Cleanup old reading logs failed")
         return {"success": False, "error": str(e)}
 
 
+@shared_task(name="app.tasks.cleanup_tasks.maintain_reading_log_partitions")
+def maintain_reading_log_partitions() -> dict:
+    """
+    维护阅读日志分区
+
+    提前建立之后 READING_LOG_PARTITIONS_AHEAD 个月的分区，并删除超过保留期的分区。
+    """
+    try:
+        created = ensure_partitions(
+            get_sync_engine(),
+            READING_LOG_TABLE,
+            settings.reading.reading_log_partitions_ahead,
+        )
+    except Exception as e:
+        logger.exception("Create reading log partitions failed")
+        return {"success": False, "error": str(e)}
+
+    cleanup = cleanup_old_reading_logs()
+    return {
+        "success": cleanup["success"],
+        "created_partitions": created,
+        "dropped_partitions": cleanup.get("dropped_partitions", []),
+    }
+
+
 @shared_task(name="app.tasks.cleanup_tasks.vacuum_database")
 def vacuum_database() -> dict:
     """
@@ -245,8 +532,7 @@ def vacuum_database() -> dict:
     """
     logger.info("Starting database vacuum")
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
+    engine = get_sync_engine()
 
     try:
         with engine.connect() as conn:
@@ -12,11 +12,14 @@ import structlog
 from celery import shared_task
 
 from app.core.config import settings
+from app.services.calibre_service import get_calibre_service
+from app.services.file_cache_service import get_file_cache_service
 from app.services.storage_service import StorageService
+from app.tasks.book_writes import BookUnitOfWork
 
 logger = structlog.get_logger()
 
-# Calibre 容器中 ebook-convert 命令的超时时间（秒）
+# 单次转换的超时时间（秒）
 CONVERSION_TIMEOUT = 300  # 5 分钟
 
 
@@ -64,16 +67,15 @@ def convert_to_epub(
     _update_book_status(book_id, "converting")
 
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            input_path = Path(tmpdir) / f"input.{original_format}"
-            output_path = Path(tmpdir) / "output.epub"
-
-            # 下载原始文件
-            storage.download_file(
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            get_file_cache_service().local_copy(
+                minio_key,
                 bucket=settings.minio.minio_bucket_books,
-                key=minio_key,
-                file_path=str(input_path),
-            )
+                suffix=f".{original_format}",
+            ) as input_path,
+        ):
+            output_path = Path(tmpdir) / "output.epub"
 
             # 执行转换
             result = _run_calibre_convert(input_path, output_path)
@@ -84,10 +86,9 @@ def convert_to_epub(
 
             # 上传转换后的文件
             epub_key = minio_key.rsplit(".", 1)[0] + ".epub"
-            storage.upload_file(
-                bucket=settings.minio.minio_bucket_books,
-                key=epub_key,
-                file_path=str(output_path),
+            storage.upload_local_file(
+                str(output_path),
+                epub_key,
                 content_type="application/epub+zip",
             )
 
@@ -120,114 +121,35 @@ def convert_to_epub(
 
 def _run_calibre_convert(input_path: Path, output_path: Path) -> dict:
     """
-    调用 Calibre 的 ebook-convert 工具
+    调用 Calibre 执行转换
 
-    使用 Docker exec 在 Calibre 容器中执行转换。
+    优先使用 Calibre 容器内的常驻转换服务 (热解释器，经共享目录传递文件)，
+    服务不可用时回退为本机 ebook-convert。
     """
+    args = [
+        "--enable-heuristics",  # 启用启发式处理
+        "--embed-all-fonts",  # 嵌入所有字体
+        "--subset-embedded-fonts",  # 子集化嵌入字体
+    ]
+
     try:
-        # 构建转换命令
-        # 在 Docker 环境中，直接使用 ebook-convert
-        # 在开发环境中，可能需要配置 Calibre 路径
-        cmd = [
-            "ebook-convert",
-            str(input_path),
-            str(output_path),
-            "--enable-heuristics",  # 启用启发式处理
-            "--embed-all-fonts",  # 嵌入所有字体
-            "--subset-embedded-fonts",  # 子集化嵌入字体
-        ]
-
-        logger.debug("Running Calibre convert", cmd=" ".join(cmd))
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
+        result = get_calibre_service().convert(
+            input_path,
+            output_path,
+            args=args,
             timeout=CONVERSION_TIMEOUT,
-            check=False,
         )
-
-        if result.returncode != 0:
-            error = result.stderr or result.stdout or "Unknown error"
-            logger.error("Calibre conversion failed", error=error)
-            return {"success": False, "error": error}
-
-        if not output_path.exists():
-            return {"success": False, "error": "Output file not created"}
-
-        return {"success": True}
-
-    except FileNotFoundError:
-        # ebook-convert 不可用，尝试使用 Docker exec
-        return _run_calibre_docker_convert(input_path, output_path)
-
     except subprocess.TimeoutExpired:
         raise
-
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+    if not result["success"]:
+        logger.error("Calibre conversion failed", error=result.get("error"))
+    elif not output_path.exists():
+        return {"success": False, "error": "Output file not created"}
 
-def _run_calibre_docker_convert(input_path: Path, output_path: Path) -> dict:
-    """
-    通过 Docker exec 在 Calibre 容器中执行转换
-
-    当本地没有 Calibre 时使用此方法。
-    """
-    try:
-        # 使用 docker exec 在 calibre 容器中执行
-        cmd = [
-            "docker",
-            "exec",
-            "athena-calibre",
-            "ebook-convert",
-            f"/tmp/{input_path.name}",
-            f"/tmp/{output_path.name}",
-            "--enable-heuristics",
-            "--embed-all-fonts",
-        ]
-
-        # 先复制文件到容器
-        copy_in_cmd = [
-            "docker",
-            "cp",
-            str(input_path),
-            f"athena-calibre:/tmp/{input_path.name}",
-        ]
-        subprocess.run(copy_in_cmd, check=True, timeout=60)
-
-        # 执行转换
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=CONVERSION_TIMEOUT,
-            check=False,
-        )
-
-        if result.returncode != 0:
-            error = result.stderr or result.stdout or "Unknown error"
-            return {"success": False, "error": error}
-
-        # 复制输出文件回来
-        copy_out_cmd = [
-            "docker",
-            "cp",
-            f"athena-calibre:/tmp/{output_path.name}",
-            str(output_path),
-        ]
-        subprocess.run(copy_out_cmd, check=True, timeout=60)
-
-        if not output_path.exists():
-            return {"success": False, "error": "Output file not copied"}
-
-        return {"success": True}
-
-    except subprocess.TimeoutExpired:
-        raise
-
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return result
 
 
 @shared_task(name="app.tasks.conversion_tasks.extract_book_metadata")
@@ -239,74 +161,17 @@ def extract_book_metadata(book_id: str, minio_key: str, file_format: str) -> dic
     """
     logger.info("Extracting metadata with Calibre", book_id=book_id)
 
-    storage = StorageService()
-
-    try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            input_path = Path(tmpdir) / f"input.{file_format}"
-            storage.download_file(
-                bucket=settings.minio.minio_bucket_books,
-                key=minio_key,
-                file_path=str(input_path),
-            )
-
-            # 使用 ebook-meta 提取元数据
-            cmd = ["ebook-meta", str(input_path)]
-
-            try:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=60,
-                    check=False,
-                )
-
-                if result.returncode == 0:
-                    meta = _parse_ebook_meta_output(result.stdout)
-                    return {"success": True, "meta": meta}
-                else:
-                    return {"success": False, "error": result.stderr}
-
-            except FileNotFoundError:
-                # 尝试 Docker exec
-                return _extract_metadata_docker(input_path)
-
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
-
-def _extract_metadata_docker(input_path: Path) -> dict:
-    """通过 Docker 提取元数据"""
     try:
-        copy_cmd = [
-            "docker",
-            "cp",
-            str(input_path),
-            f"athena-calibre:/tmp/{input_path.name}",
-        ]
-        subprocess.run(copy_cmd, check=True, timeout=30)
-
-        cmd = [
-            "docker",
-            "exec",
-            "athena-calibre",
-            "ebook-meta",
-            f"/tmp/{input_path.name}",
-        ]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=60,
-            check=False,
-        )
+        with get_file_cache_service().local_copy(
+            minio_key,
+            bucket=settings.minio.minio_bucket_books,
+            suffix=f".{file_format}",
+        ) as input_path:
+            result = get_calibre_service().read_metadata(input_path)
 
-        if result.returncode == 0:
-            meta = _parse_ebook_meta_output(result.stdout)
-            return {"success": True, "meta": meta}
-        else:
-            return {"success": False, "error": result.stderr}
+        if result["success"]:
+            return {"success": True, "meta": _parse_ebook_meta_output(result["output"])}
+        return {"success": False, "error": result.get("error")}
 
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -327,47 +192,17 @@ def _parse_ebook_meta_output(output: str) -> dict:
 
 def _update_book_status(book_id: str, status: str, error: str | None = None) -> None:
     """更新书籍处理状态"""
-    from sqlalchemy import create_engine, text
-
-    from app.core.config import settings
-
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
-
-    with engine.connect() as conn:
-        conn.execute(
-            text("""
-                UPDATE books
-                SET processing_status = :status,
-                    processing_error = :error,
-                    updated_at = NOW()
-                WHERE id = :book_id::uuid
-            """),
-            {"book_id": book_id, "status": status, "error": error},
-        )
-        conn.commit()
+    with BookUnitOfWork(book_id) as uow:
+        uow.set(processing_status=status, processing_error=error)
 
 
 def _update_book_conversion_complete(book_id: str, epub_key: str) -> None:
-    """更新书籍转换完成状态"""
-    from sqlalchemy import create_engine, text
-
-    from app.core.config import settings
-
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
-
-    with engine.connect() as conn:
-        conn.execute(
-            text("""
-                UPDATE books
-                SET processing_status = 'completed',
-                    converted_epub_key = :epub_key,
-                    reader_type = 'epub',
-                    is_readable = TRUE,
-                    updated_at = NOW()
-                WHERE id = :book_id::uuid
-            """),
-            {"book_id": book_id, "epub_key": epub_key},
+    """更新书籍转换完成状态 (一条 UPDATE)"""
+    with BookUnitOfWork(book_id) as uow:
+        uow.set(
+            processing_status="completed",
+            processing_error=None,
+            converted_epub_key=epub_key,
+            reader_type="epub",
+            is_readable=True,
         )
-        conn.commit()
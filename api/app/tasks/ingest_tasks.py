@@ -0,0 +1,724 @@
+"""
+书籍入库流水线
+
+上传完成后的全部后处理以一条 Celery chain 声明：
+
+    prepare (下载 + 哈希 + 格式识别)
+      → convert (MOBI/AZW3 等 → EPUB)
+      → metadata
+      → cover
+      → text_layer
+      → finalize (一次写回数据库)
+      → fanout (OCR / 索引等后续任务)
+
+各阶段之间只传递一个可 JSON 序列化的上下文字典 (ctx)。
+文件只从对象存储下载一次，之后各阶段通过 Worker 本地缓存复用。
+每个阶段的产物以内容哈希寻址存放，产物已存在时该阶段直接跳过，
+同一内容的书被不同用户上传时不会重复转换、提取。
+"""
+
+import hashlib
+import json
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import structlog
+from celery import chain, group, shared_task
+from celery.result import AsyncResult
+from sqlalchemy import Connection, insert, text
+
+from app.core.config import settings
+from app.core.database import get_sync_engine
+from app.core.exceptions import InsufficientCreditsException
+from app.models.system import OcrJob
+from app.services.blob_service import (
+    BLOB_BOOK,
+    BLOB_COVER,
+    acquire_blob,
+    book_blob_refs,
+    cover_blob_id,
+    derived_prefix,
+    release_blobs,
+)
+from app.services.cover_service import (
+    CONTENT_TYPES,
+    COVER_FORMATS,
+    COVER_SIZES,
+    build_cover_variants,
+    content_cover_key,
+    cover_variant_key,
+)
+from app.services.file_cache_service import get_file_cache_service
+from app.services.ocr_billing import reserve_ocr_credits
+from app.services.ocr_scheduler import get_ocr_scheduler, ocr_priority_for
+from app.services.progress_service import publish_progress
+from app.services.storage_service import get_storage_service
+from app.services.text_layer_service import analyze_text_layer, estimate_ocr_pages
+from app.tasks.book_writes import BookUnitOfWork
+
+logger = structlog.get_logger()
+
+# 无需转换即可阅读的格式
+NATIVE_FORMATS = ("epub", "pdf")
+
+# 计入进度的阶段 (按执行顺序)
+STAGES = ("prepare", "convert", "metadata", "cover", "text_layer", "finalize")
+
+
+def build_ingest_pipeline(book_id: str, user_id: str, minio_key: str) -> chain:
+    """
+    构建入库流水线
+
+    Args:
+        book_id: 书籍 ID
+        user_id: 用户 ID
+        minio_key: 原始文件 Key
+
+    Returns:
+        未提交的 Celery chain
+    """
+    ctx = {
+        "book_id": book_id,
+        "user_id": user_id,
+        "minio_key": minio_key,
+        "timings_ms": {},
+        "skipped": [],
+    }
+    return chain(
+        ingest_prepare.s(ctx),
+        ingest_convert.s(),
+        ingest_metadata.s(),
+        ingest_cover.s(),
+        ingest_text_layer.s(),
+        ingest_finalize.s(),
+        ingest_fanout.s(),
+    )
+
+
+def start_ingest_pipeline(book_id: str, user_id: str, minio_key: str) -> AsyncResult:
+    """提交入库流水线"""
+    logger.info("Starting ingest pipeline", book_id=book_id)
+    return build_ingest_pipeline(book_id, user_id, minio_key).apply_async()
+
+
+# ============================================================================
+# 阶段
+# ============================================================================
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_prepare",
+    max_retries=3,
+    default_retry_delay=30,
+)
+def ingest_prepare(self, ctx: dict) -> dict:
+    """
+    下载原始文件到 Worker 缓存，计算 SHA256 并识别真实格式
+
+    同时登记书籍文件的引用；相同内容已存在时书籍改指向已有文件，删除本次上传的副本。
+    """
+
+    def run() -> dict:
+        with _local_copy(ctx) as path:
+            info = {
+                "sha256": _file_sha256(path),
+                "size": path.stat().st_size,
+                "format": _detect_format(path, fallback=_extension(ctx["minio_key"])),
+            }
+            # 后续阶段按内容哈希寻址，去重改指向已有文件后也直接命中
+            get_file_cache_service().adopt(path, info["sha256"], suffix=_suffix(ctx))
+
+        with get_sync_engine().begin() as conn:
+            with BookUnitOfWork(ctx["book_id"], conn) as uow:
+                uow.set(
+                    original_format=info["format"],
+                    processing_status="processing",
+                    processing_error=None,
+                )
+            blob_key = _register_book_blob(conn, ctx["book_id"], info["sha256"], ctx["minio_key"], info["size"])
+
+        if blob_key != ctx["minio_key"]:
+            logger.info("Duplicate upload, reusing stored file", book_id=ctx["book_id"], key=blob_key)
+            get_storage_service().delete_object(ctx["minio_key"])
+            info["minio_key"] = blob_key
+        return info
+
+    ctx.update(_run_stage(self, ctx, "prepare", run))
+    return ctx
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_convert",
+    max_retries=2,
+    default_retry_delay=60,
+    soft_time_limit=240,
+    time_limit=300,
+)
+def ingest_convert(self, ctx: dict) -> dict:
+    """非原生格式转换为 EPUB"""
+    if ctx["format"] in NATIVE_FORMATS:
+        ctx["reader_format"] = ctx["format"]
+        return ctx
+
+    epub_key = _artifact_key(ctx["sha256"], "book.epub")
+
+    def run() -> None:
+        from app.tasks.conversion_tasks import _run_calibre_convert
+
+        with tempfile.TemporaryDirectory() as tmpdir, _local_copy(ctx) as path:
+            output_path = Path(tmpdir) / "output.epub"
+            result = _run_calibre_convert(path, output_path)
+            if not result["success"]:
+                raise RuntimeError(f"Conversion failed: {result.get('error')}")
+
+            get_storage_service().upload_local_file(
+                str(output_path),
+                epub_key,
+                content_type="application/epub+zip",
+            )
+
+    _run_stage(self, ctx, "convert", run, skip_if=lambda: _artifact_exists(epub_key))
+    ctx["epub_key"] = epub_key
+    ctx["reader_format"] = "epub"
+    return ctx
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_metadata",
+    max_retries=2,
+    default_retry_delay=30,
+)
+def ingest_metadata(self, ctx: dict) -> dict:
+    """提取标题、作者、目录等元数据"""
+    key = _artifact_key(ctx["sha256"], "metadata.json")
+
+    def run() -> dict:
+        with _reader_copy(ctx) as path:
+            meta = _read_pdf_meta(path) if ctx["reader_format"] == "pdf" else _read_epub_meta(path)
+        _put_json(key, meta)
+        return meta
+
+    meta = _run_stage(self, ctx, "metadata", run, skip_if=lambda: _artifact_exists(key))
+    ctx["meta"] = meta if meta is not None else _get_json(key)
+    return ctx
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_cover",
+    max_retries=2,
+    default_retry_delay=30,
+)
+def ingest_cover(self, ctx: dict) -> dict:
+    """
+    提取封面并生成多尺寸 WebP/AVIF 变体与 BlurHash
+
+    封面按图片内容哈希寻址，不同的书使用相同封面时只存一份。
+    封面摘要 (Key、尺寸、可用变体、BlurHash) 按书籍内容哈希保存为产物，
+    同一内容已处理过时整个阶段跳过，不再打开文件提取封面。
+    """
+    summary_key = _artifact_key(ctx["sha256"], "cover.v2.json")
+    bucket = settings.minio.minio_bucket_covers
+
+    def run() -> dict:
+        with _reader_copy(ctx) as path:
+            image = _render_pdf_cover(path) if ctx["reader_format"] == "pdf" else _read_epub_cover(path)
+        if image is None:
+            _put_json(summary_key, {})
+            return {}
+
+        cover_key = content_cover_key(image[0])
+        cover = build_cover_variants(image[0])
+        # JPEG 最后上传，存在即说明全部变体已上传
+        if not _artifact_exists(cover_key, bucket=bucket):
+            storage = get_storage_service()
+            for (size, fmt), data in cover.variants.items():
+                storage.upload_bytes(
+                    data,
+                    cover_variant_key(cover_key, size, fmt),
+                    content_type=CONTENT_TYPES[fmt],
+                    bucket=bucket,
+                )
+            storage.upload_bytes(cover.jpeg, cover_key, content_type="image/jpeg", bucket=bucket)
+            uploaded = list(cover.variants)
+        else:
+            # 同一封面已由其他书籍上传 (可能由支持格式不同的 Worker 生成)，按存储中实际存在的变体列出
+            uploaded = [
+                (size, fmt)
+                for size in COVER_SIZES
+                for fmt in COVER_FORMATS
+                if _artifact_exists(cover_variant_key(cover_key, size, fmt), bucket=bucket)
+            ]
+        summary = {"key": cover_key, **cover.summary(uploaded)}
+        _put_json(summary_key, summary)
+        return summary
+
+    summary = _run_stage(self, ctx, "cover", run, skip_if=lambda: _artifact_exists(summary_key))
+    cover = summary if summary is not None else _get_json(summary_key)
+    ctx["cover_key"] = cover.pop("key", None)
+    ctx["cover"] = cover
+    return ctx
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_text_layer",
+    max_retries=2,
+    default_retry_delay=30,
+)
+def ingest_text_layer(self, ctx: dict) -> dict:
+    """抽样分析 PDF 文字层并记录逐页覆盖 (EPUB 恒为文字型)"""
+    if ctx["reader_format"] != "pdf":
+        ctx["text_layer"] = {"has_text_layer": True, "confidence": 1.0}
+        return ctx
+
+    key = _artifact_key(ctx["sha256"], "text_layer.v2.json")
+
+    def run() -> dict:
+        with _local_copy(ctx) as path:
+            result = analyze_text_layer(path)
+        _put_json(key, result)
+        return result
+
+    result = _run_stage(self, ctx, "text_layer", run, skip_if=lambda: _artifact_exists(key))
+    ctx["text_layer"] = result if result is not None else _get_json(key)
+    return ctx
+
+
+@shared_task(
+    bind=True,
+    name="app.tasks.ingest_tasks.ingest_finalize",
+    max_retries=3,
+    default_retry_delay=30,
+)
+def ingest_finalize(self, ctx: dict) -> dict:
+    """将各阶段结果一次写回 books 表"""
+    text_layer = ctx["text_layer"]
+
+    def run() -> None:
+        meta = dict(ctx.get("meta") or {})
+        meta["ingest"] = {
+            "sha256": ctx["sha256"],
+            "timings_ms": ctx["timings_ms"],
+            "skipped": ctx["skipped"],
+        }
+        if ctx.get("cover"):
+            # 封面尺寸、可用变体与 BlurHash 占位
+            meta["cover"] = ctx["cover"]
+        if "coverage" in text_layer:
+            # 逐页覆盖供局部 OCR 判断
+            meta["text_layer"] = {
+                k: text_layer[k] for k in ("page_count", "sampled_pages", "coverage", "image_pages", "method")
+            }
+        with get_sync_engine().begin() as conn:
+            if ctx.get("cover_key"):
+                _swap_cover_ref(conn, ctx["book_id"], ctx["cover_key"])
+            with BookUnitOfWork(ctx["book_id"], conn) as uow:
+                uow.merge_meta(meta)
+                uow.set(
+                    reader_type=ctx["reader_format"],
+                    has_text_layer=text_layer["has_text_layer"],
+                    text_layer_confidence=text_layer["confidence"],
+                    is_readable=True,
+                    processing_status="completed",
+                    processing_error=None,
+                )
+                if ctx.get("cover_key"):
+                    uow.set(cover_image_key=ctx["cover_key"])
+                if ctx.get("epub_key"):
+                    uow.set(converted_epub_key=ctx["epub_key"])
+
+    _run_stage(self, ctx, "finalize", run)
+    logger.info(
+        "Ingest pipeline completed",
+        book_id=ctx["book_id"],
+        timings_ms=ctx["timings_ms"],
+        skipped=ctx["skipped"],
+        total_ms=round(sum(ctx["timings_ms"].values()), 1),
+    )
+    return ctx
+
+
+@shared_task(name="app.tasks.ingest_tasks.ingest_fanout")
+def ingest_fanout(ctx: dict) -> dict:
+    """
+    分发后续任务
+
+    OCR 会消耗用户配额，默认由用户主动触发；
+    开启 OCR_AUTO_ON_INGEST 后图片型 PDF 入库即创建 OcrJob 进入公平调度队列，
+    与用户主动触发相同 (并发上限、预留积分)，不直接投递 OCR Worker；积分不足时不排队。
+    """
+    followups = []
+    ocr_job_id = None
+    if not ctx["text_layer"]["has_text_layer"] and settings.ocr.ocr_auto_on_ingest:
+        from app.tasks.ocr_tasks import dispatch_ocr_jobs
+
+        ocr_job_id = _queue_auto_ocr(ctx)
+        if ocr_job_id:
+            followups.append(dispatch_ocr_jobs.si())
+
+    if followups:
+        group(followups).apply_async()
+
+    return {
+        "book_id": ctx["book_id"],
+        "ocr_job_id": ocr_job_id,
+        "followups": [sig.task for sig in followups],
+    }
+
+
+def _queue_auto_ocr(ctx: dict) -> str | None:
+    """
+    创建 OcrJob 并进入 OCR 等待队列
+
+    Returns:
+        job_id；积分不足时为 None
+    """
+    pages = estimate_ocr_pages(ctx["text_layer"])
+    if pages is None:
+        pages = ctx["text_layer"].get("page_count")
+    try:
+        job_id, priority = _create_ocr_job(ctx["book_id"], ctx["user_id"], pages or 0)
+    except InsufficientCreditsException:
+        logger.info("Skipping auto OCR, insufficient credits", book_id=ctx["book_id"], pages=pages)
+        return None
+    get_ocr_scheduler().enqueue(
+        job_id=job_id,
+        user_id=ctx["user_id"],
+        book_id=ctx["book_id"],
+        minio_key=ctx["minio_key"],
+        sha256=ctx["sha256"],
+        priority=priority,
+        pages=pages,
+    )
+    return job_id
+
+
+def _create_ocr_job(book_id: str, user_id: str, pages: int) -> tuple[str, int]:
+    """
+    创建待调度的 OcrJob、按估算页数预留积分并标记书籍等待 OCR (同一事务)
+
+    Returns:
+        (job_id, 调度优先级)
+
+    Raises:
+        InsufficientCreditsException: 积分不足 (不创建任务)
+    """
+    with get_sync_engine().begin() as conn:
+        user = conn.execute(
+            text("SELECT membership_tier, membership_expire_at FROM users WHERE id = CAST(:user_id AS uuid)"),
+            {"user_id": user_id},
+        ).one()
+        priority = ocr_priority_for(user.membership_tier, user.membership_expire_at)
+        job_id = conn.execute(
+            insert(OcrJob)
+            .values(book_id=UUID(book_id), user_id=UUID(user_id), status="pending", priority=priority)
+            .returning(OcrJob.id)
+        ).scalar_one()
+        reserve_ocr_credits(conn, str(job_id), user_id, pages)
+        with BookUnitOfWork(book_id, conn) as uow:
+            uow.set(ocr_status="pending")
+    return str(job_id), priority
+
+
+# ============================================================================
+# 阶段执行
+# ============================================================================
+
+
+def _run_stage(
+    task,  # noqa: ANN001
+    ctx: dict,
+    name: str,
+    run: Callable[[], Any],
+    skip_if: Callable[[], bool] | None = None,
+) -> Any:
+    """
+    执行一个阶段并记录耗时
+
+    skip_if 为真 (产物已存在) 时不执行并返回 None；
+    失败时重试，重试耗尽后标记书籍失败，chain 随之中止。
+    阶段结束后向客户端推送进度。
+    """
+    started = time.perf_counter()
+    skipped = False
+    try:
+        if skip_if is not None and skip_if():
+            skipped = True
+            ctx["skipped"].append(name)
+            result = None
+        else:
+            result = run()
+    except Exception as e:
+        logger.exception("Ingest stage failed", book_id=ctx["book_id"], stage=name)
+        if task.request.retries >= task.max_retries:
+            _mark_failed(ctx["book_id"], f"{name}: {e}")
+            _publish_stage(ctx, name, "failed", error=str(e)[:500])
+            raise
+        raise task.retry(exc=e) from e
+    finally:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        ctx["timings_ms"][name] = elapsed_ms
+        logger.info(
+            "Ingest stage finished",
+            book_id=ctx["book_id"],
+            stage=name,
+            skipped=skipped,
+            elapsed_ms=elapsed_ms,
+        )
+
+    _publish_stage(ctx, name, "completed" if name == STAGES[-1] else "processing")
+    return result
+
+
+def _publish_stage(ctx: dict, name: str, status: str, error: str | None = None) -> None:
+    """推送入库进度 (按已完成阶段数计算百分比)"""
+    done = STAGES.index(name) + 1 if name in STAGES else 0
+    publish_progress(
+        ctx["user_id"],
+        ctx["book_id"],
+        kind="processing",
+        stage=name,
+        status=status,
+        progress=done * 100 // len(STAGES),
+        error=error,
+    )
+
+
+def _mark_failed(book_id: str, error: str) -> None:
+    """标记书籍处理失败"""
+    with BookUnitOfWork(book_id) as uow:
+        uow.set(processing_status="failed", processing_error=error[:2000])
+
+
+# ============================================================================
+# 文件与产物
+# ============================================================================
+
+
+def _extension(key: str) -> str:
+    return key.rsplit(".", 1)[-1].lower() if "." in key.rsplit("/", 1)[-1] else ""
+
+
+def _suffix(ctx: dict) -> str:
+    return f".{_extension(ctx['minio_key'])}" if _extension(ctx["minio_key"]) else ""
+
+
+@contextmanager
+def _local_copy(ctx: dict) -> Iterator[Path]:
+    """原始文件的本地副本 (prepare 之后按内容哈希寻址，所有阶段只下载一次且不再 stat)"""
+    with get_file_cache_service().local_copy(
+        ctx["minio_key"],
+        bucket=settings.minio.minio_bucket_books,
+        suffix=_suffix(ctx),
+        sha256=ctx.get("sha256"),
+    ) as path:
+        yield path
+
+
+@contextmanager
+def _reader_copy(ctx: dict) -> Iterator[Path]:
+    """阅读格式文件的本地副本 (转换过的书读取 EPUB 产物)"""
+    if not ctx.get("epub_key"):
+        with _local_copy(ctx) as path:
+            yield path
+        return
+
+    with get_file_cache_service().local_copy(
+        ctx["epub_key"],
+        bucket=settings.minio.minio_bucket_books,
+        suffix=".epub",
+    ) as path:
+        yield path
+
+
+def _register_book_blob(conn: Connection, book_id: str, sha256: str, minio_key: str, size: int) -> str:
+    """
+    记录内容哈希并登记书籍文件引用 (重试时不重复计数)
+
+    以 blob_registered 标记是否已持有引用：content_sha256 可能先于登记写入，不能据此判断。
+
+    Returns:
+        书籍文件的规范 Key
+    """
+    claimed = conn.execute(
+        text("""
+            UPDATE books SET content_sha256 = :sha256, blob_registered = true, updated_at = NOW()
+            WHERE id = CAST(:book_id AS uuid) AND NOT blob_registered
+            RETURNING id
+        """),
+        {"book_id": book_id, "sha256": sha256},
+    ).first()
+    if claimed is None:
+        # 上次执行已登记
+        return conn.execute(
+            text("SELECT key FROM storage_blobs WHERE kind = :kind AND sha256 = :sha256"),
+            {"kind": BLOB_BOOK, "sha256": sha256},
+        ).scalar_one_or_none() or minio_key
+
+    blob_key = conn.execute(acquire_blob(BLOB_BOOK, sha256, minio_key, size)).scalar_one()
+    if blob_key != minio_key:
+        conn.execute(
+            text("UPDATE books SET minio_key = :key WHERE id = CAST(:book_id AS uuid)"),
+            {"book_id": book_id, "key": blob_key},
+        )
+    return blob_key
+
+
+def _swap_cover_ref(conn: Connection, book_id: str, cover_key: str) -> None:
+    """封面变化时转移封面引用 (锁定书籍行，重试时不重复计数)"""
+    previous = conn.execute(
+        text("SELECT cover_image_key FROM books WHERE id = CAST(:book_id AS uuid) FOR UPDATE"),
+        {"book_id": book_id},
+    ).scalar_one_or_none()
+    if previous == cover_key:
+        return
+
+    conn.execute(acquire_blob(BLOB_COVER, cover_blob_id(cover_key), cover_key))
+    released = release_blobs(book_blob_refs(None, previous))
+    if released is not None:
+        conn.execute(released)
+
+
+def _artifact_key(sha256: str, name: str) -> str:
+    """按内容哈希寻址的派生产物 Key"""
+    return f"{derived_prefix(sha256)}{name}"
+
+
+def _artifact_exists(key: str, bucket: str | None = None) -> bool:
+    return get_storage_service().get_object_info(key, bucket=bucket) is not None
+
+
+def _put_json(key: str, data: dict) -> None:
+    get_storage_service().upload_bytes(
+        json.dumps(data, ensure_ascii=False).encode(),
+        key,
+        content_type="application/json",
+    )
+
+
+def _get_json(key: str) -> dict:
+    storage = get_storage_service()
+    info = storage.get_object_info(key)
+    return json.loads(storage.get_object_range(key, 0, info["size"]))
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _detect_format(path: Path, fallback: str) -> str:
+    """
+    按文件头识别格式
+
+    扩展名不可信 (如 .pdf 实为 EPUB)，MOBI/AZW3 文件头相同，
+    此时保留扩展名给出的具体格式。
+    """
+    with path.open("rb") as f:
+        head = f.read(128)
+
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04") and b"mimetypeapplication/epub+zip" in head:
+        return "epub"
+    if head[60:68] in (b"BOOKMOBI", b"TEXtREAd"):
+        return fallback if fallback in ("mobi", "azw", "azw3", "pdb") else "mobi"
+    return fallback or "unknown"
+
+
+# ============================================================================
+# 内容提取
+# ============================================================================
+
+
+def _read_pdf_meta(path: Path) -> dict:
+    """读取 PDF 元数据与目录"""
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(str(path)) as doc:
+            return {
+                "page_count": doc.page_count,
+                "title": doc.metadata.get("title") or None,
+                "author": doc.metadata.get("author") or None,
+                "toc": [
+                    {"level": level, "title": title, "page": page}
+                    for level, title, page in doc.get_toc()[:100]  # 限制 100 条
+                ],
+            }
+    except ImportError:
+        from app.tasks.book_tasks import _read_pdf_metadata
+
+        with path.open("rb") as f:
+            return {**_read_pdf_metadata(f), "toc": []}
+
+
+def _read_epub_meta(path: Path) -> dict:
+    """读取 EPUB 元数据与目录"""
+    from ebooklib import epub
+
+    book = epub.read_epub(str(path))
+
+    def first(name: str) -> str | None:
+        values = book.get_metadata("DC", name)
+        return values[0][0] if values else None
+
+    toc = []
+    for item in book.toc:
+        if isinstance(item, tuple):
+            section, children = item
+            toc.append({"level": 1, "title": section.title, "href": section.href})
+            toc.extend({"level": 2, "title": child.title, "href": child.href} for child in children)
+        else:
+            toc.append({"level": 1, "title": item.title, "href": item.href})
+
+    return {
+        "title": first("title"),
+        "author": first("creator"),
+        "language": first("language"),
+        "toc": toc[:100],
+    }
+
+
+def _render_pdf_cover(path: Path) -> tuple[bytes, str] | None:
+    """将 PDF 第一页按 large 变体宽度渲染为 PNG"""
+    try:
+        import fitz
+    except ImportError:
+        logger.warning("PyMuPDF not installed, skipping PDF cover")
+        return None
+
+    with fitz.open(str(path)) as doc:
+        if doc.page_count == 0:
+            return None
+        page = doc[0]
+        zoom = COVER_SIZES["large"] / max(page.rect.width, 1)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pix.tobytes("png"), "image/png"
+
+
+def _read_epub_cover(path: Path) -> tuple[bytes, str] | None:
+    """读取 EPUB 封面图片"""
+    import ebooklib
+    from ebooklib import epub
+
+    book = epub.read_epub(str(path))
+    for item in book.get_items():
+        if item.get_type() == ebooklib.ITEM_COVER:
+            return item.get_content(), item.media_type or "image/jpeg"
+    for item in book.get_items_of_type(ebooklib.ITEM_IMAGE):
+        if "cover" in item.get_name().lower():
+            return item.get_content(), item.media_type or "image/jpeg"
+    return None
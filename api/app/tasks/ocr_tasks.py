@@ -11,12 +11,25 @@ from pathlib import Path
 
 import structlog
 from celery import shared_task
+from sqlalchemy import text
 
 from app.core.config import settings
+from app.core.database import get_sync_engine
+from app.core.exceptions import InsufficientCreditsException
+from app.services.blob_service import ocr_blob_key
+from app.services.file_cache_service import get_file_cache_service
+from app.services.ocr_billing import release_ocr_credits, settle_ocr_credits
+from app.services.ocr_scheduler import export_wait_metrics, get_ocr_scheduler
+from app.services.progress_service import publish_progress
 from app.services.storage_service import StorageService
+from app.services.text_layer_service import analyze_text_layer
+from app.tasks.book_writes import BookUnitOfWork
 
 logger = structlog.get_logger()
 
+# 图片页占比达到该值时整本 OCR (抽页与嫁接不再划算)
+FULL_OCR_RATIO = 0.9
+
 
 @shared_task(
     bind=True,
@@ -26,22 +39,27 @@ logger = structlog.get_logger()
     autoretry_for=(Exception,),
 )
 def process_ocr(
-    self,  # noqa: ARG001
+    self,
     book_id: str,
-    user_id: str,  # noqa: ARG001
+    user_id: str,
     minio_key: str,
     sha256: str,
+    job_id: str,
 ) -> dict:
     """
     处理 OCR 任务
 
-    下载原始 PDF，使用 OCRmyPDF 生成双层 PDF，上传结果。
+    下载原始 PDF，只对没有文字层的页面运行 OCRmyPDF 并嫁接回原文件，
+    上传双层 PDF。识别前按实际 OCR 的页数结算预留的积分 (见 ocr_billing)，失败时退回。
+    由 OCR 调度器投递，结束后释放调度槽位并投递下一个任务。
+    开始、完成与失败时向客户端推送进度。
 
     Args:
         book_id: 书籍 ID
         user_id: 用户 ID
         minio_key: MinIO 中原始文件的 Key
         sha256: 文件 SHA256 哈希
+        job_id: OcrJob ID
 
     Returns:
         处理结果字典
@@ -50,45 +68,141 @@ def process_ocr(
         "Starting OCR processing",
         book_id=book_id,
         minio_key=minio_key,
+        job_id=job_id,
     )
 
+    _update_ocr_job(job_id, status="processing", started=True)
+
+    try:
+        result = _process_ocr(book_id, user_id, minio_key, sha256, job_id)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise
+        publish_progress(user_id, book_id, kind="ocr", stage="ocr", status="failed", error=str(e)[:500])
+        # 最终失败才标记书籍、退回积分、释放槽位，重试期间书籍保持处理中
+        _update_book_status(book_id, "ocr_failed", str(e))
+        _fail_ocr_job(job_id, user_id, str(e))
+        _finish_scheduled_job(job_id)
+        raise
+
+    if result["success"]:
+        publish_progress(
+            user_id,
+            book_id,
+            kind="ocr",
+            stage="ocr",
+            status="completed",
+            progress=100,
+            pages_done=result["ocr_pages"],
+            total_pages=result["ocr_pages"],
+        )
+    else:
+        publish_progress(
+            user_id, book_id, kind="ocr", stage="ocr", status="failed", error=result["error"][:500]
+        )
+
+    if result["success"]:
+        _complete_ocr_job(
+            job_id,
+            user_id,
+            output_key=result["ocr_pdf_key"],
+            total_pages=result["pages"],
+            ocr_pages=result["ocr_pages"],
+        )
+    else:
+        _fail_ocr_job(job_id, user_id, result["error"])
+    _finish_scheduled_job(job_id)
+    return result
+
+
+def _process_ocr(book_id: str, user_id: str, minio_key: str, sha256: str, job_id: str) -> dict:
+    """
+    下载、识别、上传并更新书籍
+
+    先逐页分析文字层并按图片页数结算积分 (余额不足时不识别)，只对图片页做 OCR:
+    - 没有图片页: 不运行 OCRmyPDF，直接标记完成
+    - 图片页占比达到 FULL_OCR_RATIO: 整本 OCR
+    - 否则抽出图片页单独 OCR，再按原页码嫁接回原始 PDF
+    """
     storage = StorageService()
 
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            input_path = Path(tmpdir) / "input.pdf"
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            get_file_cache_service().local_copy(
+                minio_key,
+                bucket=settings.minio.minio_bucket_books,
+                suffix=".pdf",
+                sha256=sha256 or None,
+            ) as input_path,
+        ):
             output_path = Path(tmpdir) / "output.pdf"
 
-            # 1. 下载原始文件
-            logger.info("Downloading original file", minio_key=minio_key)
-            storage.download_file(
-                bucket=settings.minio.minio_bucket_books,
-                key=minio_key,
-                file_path=str(input_path),
+            analysis = analyze_text_layer(input_path, full=True)
+            pages = analysis["page_count"]
+            image_pages = analysis["image_pages"]
+            mode = ocr_mode(len(image_pages), pages)
+            logger.info(
+                "OCR page plan",
+                book_id=book_id,
+                mode=mode,
+                pages=pages,
+                ocr_pages=len(image_pages),
             )
 
-            # 2. 运行 OCRmyPDF
-            logger.info("Running OCRmyPDF", input_path=str(input_path))
-            result = _run_ocrmypdf(input_path, output_path)
+            try:
+                with get_sync_engine().begin() as conn:
+                    settle_ocr_credits(conn, job_id, user_id, len(image_pages))
+            except InsufficientCreditsException:
+                logger.warning("Insufficient credits for OCR pages", book_id=book_id, ocr_pages=len(image_pages))
+                _update_book_status(book_id, "ocr_failed", "insufficient_credits")
+                return {"success": False, "book_id": book_id, "error": "insufficient_credits"}
+
+            if mode == "skip":
+                _update_book_ocr_complete(book_id, None)
+                return {
+                    "success": True,
+                    "book_id": book_id,
+                    "ocr_pdf_key": None,
+                    "pages": pages,
+                    "ocr_pages": 0,
+                }
+
+            model = get_ocr_scheduler().model()
+            publish_progress(
+                user_id,
+                book_id,
+                kind="ocr",
+                stage="ocr",
+                status="processing",
+                progress=0,
+                pages_done=0,
+                total_pages=len(image_pages),
+                eta_seconds=round(len(image_pages) / model.pages_per_sec),
+            )
+
+            # 1. 运行 OCRmyPDF (原始文件来自 Worker 本地缓存)
+            if mode == "full":
+                logger.info("Running OCRmyPDF", input_path=str(input_path))
+                result = _run_ocrmypdf(input_path, output_path)
+            else:
+                subset_path = Path(tmpdir) / "subset.pdf"
+                subset_ocr_path = Path(tmpdir) / "subset.ocr.pdf"
+                _extract_pages(input_path, image_pages, subset_path)
+                logger.info("Running OCRmyPDF on image pages", pages=len(image_pages))
+                result = _run_ocrmypdf(subset_path, subset_ocr_path)
+                if result["success"]:
+                    _graft_pages(input_path, subset_ocr_path, image_pages, output_path)
 
             if not result["success"]:
                 logger.error("OCR failed", error=result["error"])
                 _update_book_status(book_id, "ocr_failed", result["error"])
                 return result
 
-            # 3. 上传 OCR 结果
-            # 使用 SHA256 作为 Key 前缀，支持去重复用
-            ocr_pdf_key = f"ocr/{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf"
+            # 2. 上传 OCR 结果
+            ocr_pdf_key = _upload_ocr_result(storage, output_path, sha256)
 
-            logger.info("Uploading OCR result", ocr_pdf_key=ocr_pdf_key)
-            storage.upload_file(
-                bucket=settings.minio.minio_bucket_books,
-                key=ocr_pdf_key,
-                file_path=str(output_path),
-                content_type="application/pdf",
-            )
-
-            # 4. 更新数据库
+            # 3. 更新数据库
             _update_book_ocr_complete(book_id, ocr_pdf_key)
 
             logger.info(
@@ -101,14 +215,102 @@ def process_ocr(
                 "success": True,
                 "book_id": book_id,
                 "ocr_pdf_key": ocr_pdf_key,
+                "pages": pages,
+                "ocr_pages": len(image_pages),
             }
 
-    except Exception as e:
+    except Exception:
         logger.exception("OCR processing failed", book_id=book_id)
-        _update_book_status(book_id, "ocr_failed", str(e))
         raise
 
 
+def _upload_ocr_result(storage: StorageService, output_path: Path, sha256: str) -> str:
+    """
+    上传 OCR 结果
+
+    按内容哈希寻址，支持去重复用；与原始文件同在 books 桶，随书籍文件的引用计数回收。
+
+    Returns:
+        OCR 结果 Key
+    """
+    ocr_pdf_key = ocr_blob_key(sha256)
+    logger.info("Uploading OCR result", ocr_pdf_key=ocr_pdf_key)
+    storage.upload_local_file(
+        str(output_path),
+        ocr_pdf_key,
+        content_type="application/pdf",
+        bucket=settings.minio.minio_bucket_books,
+    )
+    return ocr_pdf_key
+
+
+def ocr_mode(ocr_pages: int, page_count: int) -> str:
+    """
+    选择 OCR 方式
+
+    Returns:
+        skip (无需 OCR) / full (整本 OCR) / partial (只 OCR 图片页)
+    """
+    if ocr_pages == 0:
+        return "skip"
+    if ocr_pages >= page_count * FULL_OCR_RATIO:
+        return "full"
+    return "partial"
+
+
+def _extract_pages(src: Path, indices: list[int], dst: Path) -> None:
+    """抽出指定页 (从 0 开始) 组成新的 PDF"""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(str(src))
+    writer = PdfWriter()
+    for index in indices:
+        writer.add_page(reader.pages[index])
+    with dst.open("wb") as f:
+        writer.write(f)
+
+
+def _graft_pages(original: Path, ocr_subset: Path, indices: list[int], dst: Path) -> None:
+    """
+    把 OCR 后的页面按原页码替换回原始 PDF
+
+    优先使用 PyMuPDF (保留目录)；未安装时回退为 PyPDF2 逐页重组 (保留文档信息，不保留目录)。
+    """
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(str(original)) as doc, fitz.open(str(ocr_subset)) as ocr:
+            if ocr.page_count != len(indices):
+                raise ValueError(f"OCR output has {ocr.page_count} pages, expected {len(indices)}")
+            toc = doc.get_toc(simple=False)
+            for position, index in enumerate(indices):
+                doc.delete_page(index)
+                doc.insert_pdf(ocr, from_page=position, to_page=position, start_at=index)
+            if toc:
+                doc.set_toc(toc)
+            doc.save(str(dst), garbage=3, deflate=True)
+        return
+
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(str(original))
+    ocr_pages = PdfReader(str(ocr_subset)).pages
+    if len(ocr_pages) != len(indices):
+        raise ValueError(f"OCR output has {len(ocr_pages)} pages, expected {len(indices)}")
+    replaced = dict(zip(indices, ocr_pages, strict=True))
+
+    writer = PdfWriter()
+    for index, page in enumerate(reader.pages):
+        writer.add_page(replaced.get(index, page))
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+    with dst.open("wb") as f:
+        writer.write(f)
+
+
 def _run_ocrmypdf(input_path: Path, output_path: Path) -> dict:
     """
     运行 OCRmyPDF 命令
@@ -183,55 +385,138 @@ def _run_ocrmypdf(input_path: Path, output_path: Path) -> dict:
         }
 
 
-def _update_book_status(book_id: str, status: str, error: str | None = None) -> None:
-    """更新书籍处理状态"""
-    # 使用同步数据库连接（Celery 任务中）
-    from sqlalchemy import create_engine, text
+@shared_task(name="app.tasks.ocr_tasks.dispatch_ocr_jobs")
+def dispatch_ocr_jobs() -> dict:
+    """
+    OCR 公平调度 (定时 + 入队/任务结束时触发)
 
-    from app.core.config import settings
+    回收超时槽位、补入队未进入队列的待处理任务后，按空闲槽位从等待队列投递任务，
+    并记录各等级排队等待分位数 (同时写入 Prometheus 指标)。
+    """
+    scheduler = get_ocr_scheduler()
+    # 超时 + 全部重试仍未释放视为 Worker 丢失
+    reclaimed = scheduler.reclaim_stale(
+        settings.ocr.ocr_timeout_seconds * (process_ocr.max_retries + 1) + 600
+    )
+    requeued = scheduler.requeue_missing()
+    dispatched = scheduler.dispatch()
+    wait = scheduler.wait_percentiles()
+    export_wait_metrics(wait)
+    # 预计完成时间使用的吞吐模型 (每 5 分钟从最近完成的任务重算)
+    scheduler.refresh_model()
+
+    if dispatched or reclaimed or requeued:
+        logger.info(
+            "OCR jobs dispatched",
+            dispatched=dispatched,
+            reclaimed=reclaimed,
+            requeued=requeued,
+            wait_seconds=wait,
+        )
+    return {"dispatched": dispatched, "reclaimed": reclaimed, "requeued": requeued, "wait_seconds": wait}
 
-    # 创建同步引擎
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
 
-    with engine.connect() as conn:
+def _finish_scheduled_job(job_id: str) -> None:
+    """释放调度槽位并立即投递下一个任务"""
+    try:
+        scheduler = get_ocr_scheduler()
+        scheduler.release(job_id)
+        scheduler.dispatch()
+    except Exception:
+        # 定时调度会兜底回收与投递
+        logger.exception("Failed to release OCR slot", job_id=job_id)
+
+
+def _update_ocr_job(
+    job_id: str,
+    status: str,
+    error: str | None = None,
+    started: bool = False,
+    completed: bool = False,
+) -> None:
+    """更新 OcrJob 状态"""
+    assignments = ["status = :status", "updated_at = NOW()"]
+    params = {"job_id": job_id, "status": status}
+    if error is not None:
+        assignments.append("error = :error")
+        params["error"] = error
+    if started:
+        assignments.append("started_at = NOW()")
+    if completed:
+        assignments.append("completed_at = NOW()")
+
+    with get_sync_engine().begin() as conn:
+        conn.execute(text(f"UPDATE ocr_jobs SET {', '.join(assignments)} WHERE id = :job_id"), params)
+
+
+def _complete_ocr_job(
+    job_id: str,
+    user_id: str,
+    output_key: str | None,
+    total_pages: int,
+    ocr_pages: int,
+) -> None:
+    """
+    标记 OcrJob 完成 (积分已在识别前结算)
+
+    processed_pages 记录实际 OCR 的页数 (吞吐模型使用)；每个任务计一次月度 OCR 次数。
+    """
+    with get_sync_engine().begin() as conn:
         conn.execute(
-            text("""
-                UPDATE books
-                SET ocr_status = :status,
-                    processing_error = :error,
-                    updated_at = NOW()
-                WHERE id = :book_id::uuid
-            """),
-            {"book_id": book_id, "status": status, "error": error},
+            text(
+                """
+                UPDATE ocr_jobs
+                SET status = 'completed', output_key = :output_key,
+                    total_pages = :total_pages, processed_pages = :ocr_pages, progress = 100,
+                    completed_at = NOW(), updated_at = NOW()
+                WHERE id = CAST(:job_id AS uuid)
+                """
+            ),
+            {
+                "job_id": job_id,
+                "output_key": output_key,
+                "total_pages": total_pages,
+                "ocr_pages": ocr_pages,
+            },
+        )
+        conn.execute(
+            text("UPDATE users SET free_ocr_usage = free_ocr_usage + 1 WHERE id = CAST(:user_id AS uuid)"),
+            {"user_id": user_id},
         )
-        conn.commit()
-
 
-def _update_book_ocr_complete(book_id: str, ocr_pdf_key: str) -> None:
-    """更新书籍 OCR 完成状态"""
-    from sqlalchemy import create_engine, text
 
-    from app.core.config import settings
+def _fail_ocr_job(job_id: str, user_id: str, error: str) -> None:
+    """标记 OcrJob 失败并退回预留的积分 (同一事务)"""
+    with get_sync_engine().begin() as conn:
+        release_ocr_credits(conn, job_id, user_id)
+        conn.execute(
+            text(
+                """
+                UPDATE ocr_jobs
+                SET status = 'failed', error = :error, completed_at = NOW(), updated_at = NOW()
+                WHERE id = CAST(:job_id AS uuid)
+                """
+            ),
+            {"job_id": job_id, "error": error},
+        )
 
-    sync_url = settings.database.sync_database_url
-    engine = create_engine(sync_url)
 
-    with engine.connect() as conn:
-        conn.execute(
-            text("""
-                UPDATE books
-                SET ocr_status = 'completed',
-                    ocr_pdf_key = :ocr_pdf_key,
-                    has_text_layer = TRUE,
-                    processing_status = 'completed',
-                    processing_error = NULL,
-                    updated_at = NOW()
-                WHERE id = :book_id::uuid
-            """),
-            {"book_id": book_id, "ocr_pdf_key": ocr_pdf_key},
+def _update_book_status(book_id: str, status: str, error: str | None = None) -> None:
+    """更新书籍 OCR 状态"""
+    with BookUnitOfWork(book_id) as uow:
+        uow.set(ocr_status=status, processing_error=error)
+
+
+def _update_book_ocr_complete(book_id: str, ocr_pdf_key: str | None) -> None:
+    """更新书籍 OCR 完成状态 (一条 UPDATE；无需 OCR 时 ocr_pdf_key 为空，阅读原始文件)"""
+    with BookUnitOfWork(book_id) as uow:
+        uow.set(
+            ocr_status="completed",
+            ocr_pdf_key=ocr_pdf_key,
+            has_text_layer=True,
+            processing_status="completed",
+            processing_error=None,
         )
-        conn.commit()
 
 
 @shared_task(
@@ -242,7 +527,7 @@ def check_text_layer(book_id: str, minio_key: str) -> dict:
     """
     检查 PDF 是否包含文字层
 
-    用于判断是否需要 OCR 处理。
+    用于判断是否需要 OCR 处理 (与入库流水线使用同一个分析器)。
 
     Args:
         book_id: 书籍 ID
@@ -251,38 +536,13 @@ def check_text_layer(book_id: str, minio_key: str) -> dict:
     Returns:
         检查结果
     """
-    storage = StorageService()
-
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            input_path = Path(tmpdir) / "input.pdf"
-
-            # 下载文件
-            storage.download_file(
-                bucket=settings.minio.minio_bucket_books,
-                key=minio_key,
-                file_path=str(input_path),
-            )
-
-            # 使用 pdfminer 检查文字层
-            try:
-                from pdfminer.high_level import extract_text
-
-                text = extract_text(str(input_path), maxpages=5)
-                has_text = len(text.strip()) > 100  # 至少 100 个字符
-
-                return {
-                    "book_id": book_id,
-                    "has_text_layer": has_text,
-                    "sample_length": len(text.strip()),
-                }
-            except ImportError:
-                logger.warning("pdfminer not installed, assuming no text layer")
-                return {
-                    "book_id": book_id,
-                    "has_text_layer": False,
-                    "error": "pdfminer not installed",
-                }
+        with get_file_cache_service().local_copy(
+            minio_key,
+            bucket=settings.minio.minio_bucket_books,
+            suffix=".pdf",
+        ) as input_path:
+            return {"book_id": book_id, **analyze_text_layer(input_path)}
 
     except Exception as e:
         logger.exception("Failed to check text layer", book_id=book_id)
@@ -0,0 +1,137 @@
+"""
+阅读数据任务
+
+定时把 Redis 中缓冲的阅读会话心跳与阅读位置批量写回数据库；按需由明细重建阅读统计快照与连续天数。
+"""
+
+import time
+from collections.abc import Callable, Iterator
+
+import structlog
+from celery import shared_task
+from sqlalchemy import Engine, TextClause, text
+
+from app.core.config import settings
+from app.core.database import get_sync_engine
+from app.services.reading_buffer import ReadingPositionFlusher, ReadingSessionFlusher
+from app.services.reading_stats import rebuild_stats, rebuild_streaks
+
+logger = structlog.get_logger()
+
+# 每批重建的用户数
+REBUILD_BATCH_SIZE = 500
+
+
+@shared_task(name="app.tasks.reading_tasks.flush_reading_sessions")
+def flush_reading_sessions() -> dict:
+    """
+    写回缓冲的阅读会话心跳
+
+    每批一条 UPDATE，循环到脏集合取空；单次运行不超过一个写回间隔，剩余的留给下一轮。
+    """
+    return _drain(
+        "sessions",
+        ReadingSessionFlusher(),
+        settings.reading.reading_flush_batch_size,
+        settings.reading.reading_flush_interval_seconds,
+    )
+
+
+@shared_task(name="app.tasks.reading_tasks.flush_reading_positions")
+def flush_reading_positions() -> dict:
+    """
+    写回缓冲的阅读位置
+
+    同一 (用户, 书籍) 在一个间隔内的多次翻页只写回最后一次，每批一条 INSERT ... ON CONFLICT。
+    """
+    return _drain(
+        "positions",
+        ReadingPositionFlusher(),
+        settings.reading.reading_flush_batch_size,
+        settings.reading.reading_position_flush_seconds,
+    )
+
+
+def _drain(name: str, flusher, batch_size: int, budget: float) -> dict:  # noqa: ANN001
+    """逐批写回直到脏集合取空或超出时间预算"""
+    started = time.monotonic()
+    flushed = batches = 0
+
+    try:
+        while time.monotonic() - started < budget:
+            count = flusher.flush(batch_size)
+            flushed += count
+            batches += 1 if count else 0
+            if count < batch_size:
+                break
+    except Exception as e:
+        logger.exception("Flush reading buffer failed", buffer=name)
+        return {"success": False, "error": str(e), "flushed": flushed}
+
+    if flushed:
+        logger.info("Reading buffer flushed", buffer=name, flushed=flushed, batches=batches)
+    return {"success": True, "flushed": flushed, "batches": batches}
+
+
+@shared_task(name="app.tasks.reading_tasks.rebuild_reading_stats")
+def rebuild_reading_stats(user_ids: list[str] | None = None) -> dict:
+    """
+    由明细重建阅读统计快照
+
+    增量更新无法覆盖的变化 (直接修改明细、清理历史) 后用于修正快照。
+    未指定用户时按用户 ID 分批重建全部用户，每批一条语句。
+    """
+    return _rebuild("stats", rebuild_stats, user_ids)
+
+
+@shared_task(name="app.tasks.reading_tasks.backfill_user_streaks")
+def backfill_user_streaks(user_ids: list[str] | None = None) -> dict:
+    """
+    由 reading_daily 回填连续阅读天数 (当前、最长)
+
+    user_streaks 上线前的历史只在 reading_daily 中，分批以一条 gaps-and-islands 语句重算。
+    """
+    return _rebuild("streaks", rebuild_streaks, user_ids)
+
+
+def _rebuild(name: str, statement: Callable[[list[str]], TextClause], user_ids: list[str] | None) -> dict:
+    """
+    逐批执行重建语句 (未指定用户时为全部用户)
+
+    本周/本月按每个用户的时区在语句内计算，不使用 Worker 所在服务器的日期。
+    """
+    engine = get_sync_engine()
+    rebuilt = 0
+
+    try:
+        batches = [user_ids] if user_ids is not None else _user_batches(engine)
+        for batch in batches:
+            with engine.begin() as conn:
+                conn.execute(statement(batch))
+            rebuilt += len(batch)
+    except Exception as e:
+        logger.exception("Rebuild reading stats failed", target=name, rebuilt=rebuilt)
+        return {"success": False, "error": str(e), "rebuilt": rebuilt}
+
+    logger.info("Reading stats rebuilt", target=name, rebuilt=rebuilt)
+    return {"success": True, "rebuilt": rebuilt}
+
+
+def _user_batches(engine: Engine) -> Iterator[list[str]]:
+    """按主键顺序分批取出全部用户 ID"""
+    after = None
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT CAST(id AS text) FROM users
+                    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+                    ORDER BY id
+                    LIMIT :limit
+                """),
+                {"after": after, "limit": REBUILD_BATCH_SIZE},
+            ).scalars().all()
+        if not rows:
+            return
+        yield list(rows)
+        after = rows[-1]
@@ -0,0 +1,217 @@
+"""
+阅读统计查询基准
+
+在 reading_daily 中生成约 100 万行 (默认 2850 个用户 × 365 天，每 30 天断档一天)，比较综合统计的几种取法:
+
+- serial:     原 get_comprehensive_stats，同一会话上依次执行 7 条聚合查询
+- concurrent: 同样 7 条查询，各自从连接池取连接并发执行 (asyncio.gather)
+- folded:     live_stats，一条 CTE + FILTER 语句
+- snapshot:   reading_stats 快照，一次主键读取 (当前实现)
+
+用法 (在 api 目录下，连接 DATABASE_URL 指向的数据库，需已执行迁移):
+    python -m benchmarks.reading_stats --iterations 200
+    python -m benchmarks.reading_stats --keep          # 保留生成的数据，下次加 --reuse 跳过生成
+
+生成的用户以 bench-*@bench.local 标识，结束时删除 (级联删除其统计数据)。
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.database import create_engine
+from app.models.book import Book
+from app.models.reading import BookPosition, ReadingDaily
+from app.services.reading_service import ReadingService
+from app.services.reading_stats import build_stats, live_stats, rebuild_stats, stats_from_row
+
+BENCH_EMAIL = "bench-%@bench.local"
+
+
+async def seed(engine: AsyncEngine, users: int, days: int) -> int:
+    """生成测试用户与每日统计，并由明细重建快照"""
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO users (email)
+                SELECT 'bench-' || g || '@bench.local' FROM generate_series(1, :users) g
+            """),
+            {"users": users},
+        )
+        # 每个用户每 30 天断档一天 (断档日按用户错开)，连续天数在 0-29 之间
+        await conn.execute(
+            text("""
+                INSERT INTO reading_daily (user_id, day, total_duration_ms, books_read, pages_read)
+                SELECT u.id, CURRENT_DATE - g, CAST(random() * 3600000 AS bigint), 1, 0
+                FROM users u, generate_series(0, :days - 1) g
+                WHERE u.email LIKE :pattern
+                  AND (g + abs(hashtext(CAST(u.id AS text)))) % 30 <> 0
+            """),
+            {"days": days, "pattern": BENCH_EMAIL},
+        )
+        seeded = (await conn.execute(
+            text("SELECT COUNT(*) FROM reading_daily d JOIN users u ON u.id = d.user_id WHERE u.email LIKE :pattern"),
+            {"pattern": BENCH_EMAIL},
+        )).scalar()
+        await conn.execute(text("ANALYZE reading_daily"))
+
+    ids = await bench_user_ids(engine)
+    async with engine.begin() as conn:
+        for i in range(0, len(ids), 500):
+            await conn.execute(rebuild_stats(ids[i : i + 500]))
+    return seeded
+
+
+async def bench_user_ids(engine: AsyncEngine) -> list[str]:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT CAST(id AS text) FROM users WHERE email LIKE :pattern"),
+            {"pattern": BENCH_EMAIL},
+        )
+        return list(result.scalars().all())
+
+
+async def cleanup(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": BENCH_EMAIL})
+
+
+def _independent_queries(user_id: str, today: date) -> list[Callable[[AsyncSession], Awaitable]]:
+    """原综合统计中互不依赖的 7 条查询"""
+    week_start = today - timedelta(days=today.weekday())
+
+    async def scalar(db: AsyncSession, stmt) -> object:  # noqa: ANN001
+        return (await db.execute(stmt)).scalar()
+
+    return [
+        lambda db: ReadingService(db).get_daily_stats(user_id, today),
+        lambda db: ReadingService(db).get_weekly_stats(user_id, week_start),
+        lambda db: ReadingService(db).get_monthly_stats(user_id, today.year, today.month),
+        lambda db: _legacy_streak(db, user_id, today),
+        lambda db: scalar(db, select(func.sum(ReadingDaily.total_duration_ms)).where(
+            ReadingDaily.user_id == user_id
+        )),
+        lambda db: scalar(db, select(func.count(Book.id)).where(
+            Book.user_id == user_id, Book.deleted_at.is_(None)
+        )),
+        lambda db: scalar(db, select(func.count(BookPosition.book_id)).where(
+            BookPosition.user_id == user_id, BookPosition.finished_at.isnot(None)
+        )),
+    ]
+
+
+async def _legacy_streak(db: AsyncSession, user_id: str, today: date) -> int:
+    """原 get_reading_streak: 取最近 365 天逐日比对"""
+    result = await db.execute(
+        select(ReadingDaily.day)
+        .where(ReadingDaily.user_id == user_id)
+        .order_by(ReadingDaily.day.desc())
+        .limit(365)
+    )
+    streak, expected = 0, today
+    for day in result.scalars():
+        if day == expected:
+            streak += 1
+            expected -= timedelta(days=1)
+        elif day == expected - timedelta(days=1):
+            streak += 1
+            expected = day - timedelta(days=1)
+        else:
+            break
+    return streak
+
+
+async def run_serial(factory: async_sessionmaker, user_id: str) -> None:
+    async with factory() as db:
+        for query in _independent_queries(user_id, date.today()):
+            await query(db)
+
+
+async def run_concurrent(factory: async_sessionmaker, user_id: str) -> None:
+    async def on_own_connection(query) -> None:  # noqa: ANN001
+        async with factory() as db:
+            await query(db)
+
+    await asyncio.gather(*(on_own_connection(q) for q in _independent_queries(user_id, date.today())))
+
+
+async def run_folded(factory: async_sessionmaker, user_id: str) -> None:
+    async with factory() as db:
+        row = (await db.execute(live_stats([user_id]))).one()
+        build_stats(*stats_from_row(row), date.today())
+
+
+async def run_snapshot(factory: async_sessionmaker, user_id: str) -> None:
+    async with factory() as db:
+        await ReadingService(db).get_comprehensive_stats(user_id)
+
+
+APPROACHES = {
+    "serial": run_serial,
+    "concurrent": run_concurrent,
+    "folded": run_folded,
+    "snapshot": run_snapshot,
+}
+
+
+async def measure(factory: async_sessionmaker, user_ids: list[str], iterations: int) -> None:
+    sample = random.Random(42).choices(user_ids, k=iterations)
+
+    print(f"{'approach':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}   (ms)")
+    for name, run in APPROACHES.items():
+        # 预热连接池与计划缓存
+        for user_id in sample[:10]:
+            await run(factory, user_id)
+
+        timings = []
+        for user_id in sample:
+            started = time.perf_counter()
+            await run(factory, user_id)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(
+            f"{name:<12}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}"
+            f"{p95:>10.2f}{timings[-1]:>10.2f}"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="阅读统计查询基准")
+    parser.add_argument("--users", type=int, default=2850, help="生成的用户数")
+    parser.add_argument("--days", type=int, default=365, help="每个用户的阅读天数")
+    parser.add_argument("--iterations", type=int, default=100, help="每种取法的测量次数")
+    parser.add_argument("--reuse", action="store_true", help="使用上次保留的数据")
+    parser.add_argument("--keep", action="store_true", help="结束后保留生成的数据")
+    args = parser.parse_args()
+
+    # concurrent 需要每条查询一个连接
+    engine = create_engine(pool_size=10, max_overflow=10)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    try:
+        if not args.reuse:
+            started = time.perf_counter()
+            seeded = await seed(engine, args.users, args.days)
+            print(f"seeded {seeded} reading_daily rows in {time.perf_counter() - started:.1f}s")
+
+        user_ids = await bench_user_ids(engine)
+        if not user_ids:
+            raise SystemExit("no bench users, run without --reuse first")
+        await measure(factory, user_ids, args.iterations)
+    finally:
+        if not args.keep:
+            await cleanup(engine)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""
+Calibre 常驻转换服务
+
+在 Calibre 容器内以 `calibre-debug -e conversion_server.py` 启动，
+通过 Unix Socket 接收转换请求，替代每本书启动一次 ebook-convert 进程
+以及 docker cp / docker exec。
+
+- 热解释器: 启动时预先导入转换模块并初始化插件，每个请求从已预热的
+  父进程 fork 子进程执行，省去 Calibre 的 Python 启动开销，
+  子进程崩溃或内存泄漏也不会影响服务本身
+- 并发: 每个连接一个线程，同时执行的转换数受 CALIBRE_SERVER_WORKERS 限制
+- 文件: 输入输出路径必须位于与 Worker 共享挂载的目录内 (CALIBRE_SHARED_DIR)
+
+协议: 每个连接发送一行 JSON 请求，返回一行 JSON 响应
+    {"op": "convert", "input": "...", "output": "...", "args": [...], "timeout": 300}
+    {"op": "metadata", "input": "...", "timeout": 60}
+    {"op": "ping"}
+
+本文件运行在 Calibre 自带的 Python 中，只能依赖标准库。
+"""
+
+import json
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+SOCKET_PATH = os.environ.get("CALIBRE_SOCKET_PATH", "/run/athena-calibre/convert.sock")
+SHARED_DIR = os.path.realpath(os.environ.get("CALIBRE_SHARED_DIR", "/var/cache/athena"))
+WORKERS = int(os.environ.get("CALIBRE_SERVER_WORKERS", "2"))
+
+# 子进程输出回传上限
+MAX_OUTPUT_BYTES = 64 * 1024
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def _convert(request: dict) -> int:
+    from calibre.ebooks.conversion.cli import main
+
+    return main(["ebook-convert", request["input"], request["output"], *request.get("args", [])])
+
+
+def _metadata(request: dict) -> int:
+    from calibre.ebooks.metadata.cli import main
+
+    return main(["ebook-meta", request["input"]])
+
+
+# 操作 → 在子进程中执行的函数 (返回退出码)
+HANDLERS = {
+    "convert": _convert,
+    "metadata": _metadata,
+}
+
+
+def warm_up() -> None:
+    """预先导入转换链路并加载插件，fork 出的子进程直接复用"""
+    try:
+        from calibre.customize.ui import initialize_plugins
+
+        initialize_plugins()
+        import calibre.ebooks.conversion.cli  # noqa: F401
+        import calibre.ebooks.conversion.plumber  # noqa: F401
+        import calibre.ebooks.metadata.cli  # noqa: F401
+    except ImportError:
+        print("calibre modules not importable, running without warm-up", file=sys.stderr)
+
+
+def _check_path(path: str, shared_dir: str) -> str:
+    """只允许访问共享目录内的文件"""
+    real = os.path.realpath(path)
+    if os.path.commonpath([real, shared_dir]) != shared_dir:
+        raise ValueError(f"Path outside shared dir: {path}")
+    return real
+
+
+def run_job(request: dict, shared_dir: str = SHARED_DIR) -> dict:
+    """
+    在 fork 的子进程中执行一个请求
+
+    子进程的 stdout/stderr 重定向到临时文件，结束后回传末尾部分。
+    """
+    handler = HANDLERS[request["op"]]
+    timeout = int(request.get("timeout", 300))
+
+    for key in ("input", "output"):
+        if key in request:
+            request[key] = _check_path(request[key], shared_dir)
+
+    with tempfile.TemporaryFile() as log:
+        started = time.monotonic()
+        pid = os.fork()
+        if pid == 0:  # 子进程
+            code = 1
+            try:
+                os.dup2(log.fileno(), 1)
+                os.dup2(log.fileno(), 2)
+                signal.alarm(timeout)
+                code = handler(request) or 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+
+        _, status = os.waitpid(pid, 0)
+        elapsed = time.monotonic() - started
+
+        log.seek(0, os.SEEK_END)
+        log.seek(max(0, log.tell() - MAX_OUTPUT_BYTES))
+        output = log.read().decode("utf-8", errors="replace")
+
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        error = "timeout" if signum == signal.SIGALRM else f"killed by signal {signum}"
+        return {"ok": False, "error": error, "output": output, "elapsed": elapsed}
+
+    code = os.WEXITSTATUS(status)
+    return {"ok": code == 0, "returncode": code, "output": output, "elapsed": elapsed}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """一个连接处理一个请求"""
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_BYTES))
+            if request.get("op") == "ping":
+                response = {"ok": True, "workers": self.server.workers}
+            elif request.get("op") not in HANDLERS:
+                response = {"ok": False, "error": f"unknown op: {request.get('op')}"}
+            else:
+                with self.server.slots:
+                    response = run_job(request, shared_dir=self.server.shared_dir)
+        except Exception as e:  # 请求格式错误等
+            response = {"ok": False, "error": str(e)}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix Socket 转换服务"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, workers: int, shared_dir: str = SHARED_DIR):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers)
+        self.shared_dir = os.path.realpath(shared_dir)
+        super().__init__(socket_path, RequestHandler)
+        # Worker 容器以其他用户身份连接
+        os.chmod(socket_path, 0o666)
+
+
+def main() -> None:
+    warm_up()
+    server = ConversionServer(SOCKET_PATH, WORKERS)
+    print(f"calibre conversion server listening on {SOCKET_PATH} ({WORKERS} workers)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    main()
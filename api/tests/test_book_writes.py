@@ -0,0 +1,96 @@
+"""
+任务侧书籍写入测试
+"""
+
+import json
+
+import pytest
+
+from app.tasks.book_writes import BookUnitOfWork, BookUpdateBatch, build_book_update
+
+
+class FakeConnection:
+    """记录执行的语句与参数"""
+
+    def __init__(self):
+        self.calls: list[tuple[str, object]] = []
+
+    def execute(self, statement, params=None):  # noqa: ANN001
+        self.calls.append((str(statement), params))
+
+
+def test_unit_of_work_coalesces_updates():
+    """测试一个步骤内的多次修改合并为一条 UPDATE"""
+    conn = FakeConnection()
+
+    with BookUnitOfWork("b1", conn=conn) as uow:
+        uow.set(processing_status="processing")
+        uow.set(cover_image_key="covers/x.jpg")
+        uow.merge_meta({"page_count": 3})
+        uow.merge_meta({"title": "Athena"})
+        uow.set(processing_status="completed", processing_error=None)
+
+    assert len(conn.calls) == 1
+    sql, params = conn.calls[0]
+    assert sql == build_book_update(
+        ("cover_image_key", "processing_error", "processing_status"), merge_meta=True
+    )
+    assert params["processing_status"] == "completed"
+    assert json.loads(params["meta"]) == {"page_count": 3, "title": "Athena"}
+
+
+def test_unit_of_work_skips_empty_flush():
+    """测试没有修改时不执行 UPDATE"""
+    conn = FakeConnection()
+
+    with BookUnitOfWork("b1", conn=conn):
+        pass
+
+    assert conn.calls == []
+
+
+def test_unit_of_work_discards_on_error():
+    """测试异常退出时丢弃未提交的修改"""
+    conn = FakeConnection()
+
+    with pytest.raises(RuntimeError), BookUnitOfWork("b1", conn=conn) as uow:
+        uow.set(processing_status="completed", cover_image_key="covers/x.jpg")
+        raise RuntimeError("boom")
+
+    assert conn.calls == []
+
+
+def test_unknown_column_rejected():
+    """测试列名白名单"""
+    with pytest.raises(ValueError):
+        BookUnitOfWork("b1").set(**{"title = NULL; --": 1})
+
+
+def test_batch_groups_rows_by_columns():
+    """测试批量写入按列组合分组，每组一次 executemany"""
+    conn = FakeConnection()
+
+    with BookUpdateBatch(conn=conn) as batch:
+        batch.add("b1", processing_status="failed", processing_error="x")
+        batch.add("b2", processing_error="y", processing_status="failed")
+        batch.add("b3", has_text_layer=True)
+        batch.add("b4", meta={"k": 1}, has_text_layer=False)
+
+    assert len(conn.calls) == 3
+    rows = dict(conn.calls)
+    status_sql = build_book_update(("processing_error", "processing_status"), merge_meta=False)
+    assert [row["book_id"] for row in rows[status_sql]] == ["b1", "b2"]
+    assert batch.flushed == 4
+
+
+def test_batch_auto_flush():
+    """测试达到 flush_size 时自动刷新"""
+    conn = FakeConnection()
+    batch = BookUpdateBatch(conn=conn, flush_size=2)
+
+    batch.add("b1", ocr_status="pending")
+    assert conn.calls == []
+    batch.add("b2", ocr_status="pending")
+
+    assert len(conn.calls) == 1
+    assert len(conn.calls[0][1]) == 2
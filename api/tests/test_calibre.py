@@ -0,0 +1,161 @@
+"""
+Calibre 常驻转换服务测试
+
+使用替身转换函数，验证 Socket 协议、fork 执行、超时与共享目录约束。
+"""
+
+import importlib.util
+import os
+import stat
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.calibre_service import CalibreService
+from app.services.file_cache_service import FileCacheService
+from tests.test_file_cache import FakeStorage
+
+SERVER_PATH = Path(__file__).resolve().parents[1] / "calibre" / "conversion_server.py"
+
+
+def _load_server_module():
+    spec = importlib.util.spec_from_file_location("conversion_server", SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _fake_convert(request: dict) -> int:
+    if "--slow" in request.get("args", []):
+        time.sleep(10)
+    Path(request["output"]).write_bytes(Path(request["input"]).read_bytes().upper())
+    print("converted")
+    return 0
+
+
+@pytest.fixture
+def server(tmp_path: Path):
+    module = _load_server_module()
+    module.HANDLERS["convert"] = _fake_convert
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    socket_path = str(tmp_path / "convert.sock")
+    srv = module.ConversionServer(socket_path, workers=2, shared_dir=str(shared))
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+
+    yield CalibreService(socket_path=socket_path, shared_dir=str(shared)), shared
+
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_ping(server):
+    """测试服务在线检查"""
+    client, _ = server
+
+    assert client.ping() is True
+
+
+def test_convert_via_server(server, tmp_path: Path):
+    """测试输入不在共享目录时自动链接进去，输出移回目标路径"""
+    client, shared = server
+    source = tmp_path / "book.mobi"
+    source.write_bytes(b"hello")
+    output = tmp_path / "out" / "book.epub"
+    output.parent.mkdir()
+
+    result = client.convert(source, output)
+
+    assert result == {"success": True}
+    assert output.read_bytes() == b"HELLO"
+    # 共享目录内的临时文件已清理
+    assert list((shared / "calibre").iterdir()) == []
+
+
+def test_input_handed_to_calibre_is_world_readable(tmp_path: Path, monkeypatch):
+    """测试交给转换服务 (其他用户) 的输入文件其他用户可读: 缓存条目为 0644，0600 文件复制为 0644 副本"""
+    shared = tmp_path / "shared"
+    storage = FakeStorage({"a.mobi": b"hello"})
+    cache = FileCacheService(cache_dir=str(shared), max_bytes=1024, storage=storage)
+    client = CalibreService(socket_path=str(tmp_path / "missing.sock"), shared_dir=str(shared))
+    monkeypatch.setattr(CalibreService, "server_available", True)
+    handed: list[tuple[str, int]] = []
+
+    def request(payload: dict, _timeout: int) -> dict:
+        handed.append((payload["input"], stat.S_IMODE(os.stat(payload["input"]).st_mode)))
+        return {"ok": True, "output": ""}
+
+    monkeypatch.setattr(client, "_request", request)
+
+    with cache.local_copy("a.mobi", suffix=".mobi") as cached:
+        assert client.read_metadata(cached)["success"] is True
+    private = shared / "private.mobi"
+    private.write_bytes(b"hello")
+    private.chmod(0o600)
+    assert client.read_metadata(private)["success"] is True
+
+    assert handed[0] == (str(cached), 0o644)
+    assert handed[1][0] != str(private)
+    assert handed[1][1] == 0o644
+    assert stat.S_IMODE(private.stat().st_mode) == 0o600
+
+
+def test_concurrent_conversions(server, tmp_path: Path):
+    """测试多个转换并发执行"""
+    client, shared = server
+    results = []
+
+    def convert(i: int) -> None:
+        source = shared / f"{i}.mobi"
+        source.write_bytes(f"book{i}".encode())
+        output = tmp_path / f"{i}.epub"
+        results.append((client.convert(source, output), output.read_bytes()))
+
+    threads = [threading.Thread(target=convert, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(data for _, data in results) == [f"BOOK{i}".encode() for i in range(4)]
+    assert all(r == {"success": True} for r, _ in results)
+
+
+def test_conversion_timeout(server, tmp_path: Path):
+    """测试超时的转换子进程被终止"""
+    client, shared = server
+    source = shared / "slow.mobi"
+    source.write_bytes(b"x")
+
+    result = client.convert(source, tmp_path / "slow.epub", args=["--slow"], timeout=1)
+
+    assert result == {"success": False, "error": "timeout"}
+
+
+def test_path_outside_shared_dir_rejected(server):
+    """测试服务端拒绝共享目录以外的路径"""
+    client, _ = server
+
+    response = client._request(
+        {"op": "convert", "input": "/etc/passwd", "output": "/tmp/x.epub"}, timeout=5
+    )
+
+    assert response["ok"] is False
+    assert "outside shared dir" in response["error"]
+
+
+def test_local_fallback_without_server(tmp_path: Path):
+    """测试服务不可用且本机没有 Calibre 时返回错误而不是抛出"""
+    client = CalibreService(socket_path=str(tmp_path / "missing.sock"), shared_dir=str(tmp_path))
+    client._run_local = staticmethod(  # type: ignore[method-assign]
+        lambda cmd, timeout: CalibreService._run_local(["athena-no-such-command", *cmd[1:]], timeout)
+    )
+
+    result = client.convert(tmp_path / "a.mobi", tmp_path / "a.epub")
+
+    assert result["success"] is False
+    assert "not found" in result["error"]
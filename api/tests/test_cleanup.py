@@ -0,0 +1,320 @@
+"""
+垃圾回收测试
+
+批量删除循环、时间预算、Multi-Object Delete 分组、文件引用计数语句与孤立文件归并对账
+(不连接数据库与 MinIO)。
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.models.book import Book
+from app.services.blob_service import (
+    BLOB_BOOK,
+    BLOB_COVER,
+    book_blob_refs,
+    cover_blob_id,
+    release_blobs,
+)
+from app.services.storage_service import DELETE_BATCH_SIZE, StorageService
+from app.tasks import cleanup_tasks
+from app.tasks.cleanup_tasks import ExpiredBatch, _reconcile, derived_sha256, find_orphans
+from app.tasks.ocr_tasks import _upload_ocr_result
+
+OLD = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+class FakeEngine:
+    @contextmanager
+    def begin(self):
+        yield object()
+
+
+class FakeStorage:
+    def __init__(self, failing: set[str] = frozenset(), listing: dict[str, list[str]] | None = None):
+        self.deleted: list[tuple[str, list[str]]] = []
+        self.failing = failing
+        self.listing = listing or {}
+
+    def iter_objects(self, _bucket: str | None = None, prefix: str | None = None):
+        return iter((key, OLD) for key in self.listing.get(prefix, []))
+
+    def delete_objects(self, keys: list[str], bucket: str | None = None) -> list[str]:
+        self.deleted.append((bucket, keys))
+        return [key for key in keys if key in self.failing]
+
+
+@pytest.fixture
+def gc(monkeypatch):
+    """按给定的批次序列运行垃圾回收"""
+    storage = FakeStorage(
+        failing={"b/2"},
+        listing={"derived/aa/aa11/": ["derived/aa/aa11/book.epub", "derived/aa/aa11/metadata.json"]},
+    )
+    requeued: list[bool] = []
+    monkeypatch.setattr(cleanup_tasks, "get_sync_engine", FakeEngine)
+    monkeypatch.setattr(cleanup_tasks, "get_storage_service", lambda: storage)
+    monkeypatch.setattr(cleanup_tasks.cleanup_expired_books, "delay", lambda: requeued.append(True))
+    monkeypatch.setattr(settings.celery, "gc_batch_size", 2)
+
+    def run(batches: list[ExpiredBatch]) -> dict:
+        pending = iter(batches)
+        monkeypatch.setattr(cleanup_tasks, "_collect_expired_batch", lambda _conn, _size: next(pending))
+        return cleanup_expired_books()
+
+    cleanup_expired_books = cleanup_tasks.cleanup_expired_books.run
+    run.storage = storage
+    run.requeued = requeued
+    return run
+
+
+def test_gc_loops_until_backlog_drained(gc):
+    """测试逐批删除直到某批不满，批量删除对象并汇总吞吐"""
+    result = gc(
+        [
+            ExpiredBatch(deleted=2, objects={"books": ["b/1", "b/2"]}),
+            ExpiredBatch(deleted=2, released_refs=2),
+            ExpiredBatch(deleted=1, objects={"covers": ["c/1.jpg"]}),
+        ]
+    )
+
+    assert result["success"] is True
+    assert result["batches"] == 3
+    assert result["deleted_count"] == 5
+    assert result["released_refs"] == 2
+    assert (result["objects_deleted"], result["objects_failed"]) == (2, 1)
+    assert result["drained"] is True
+    assert "books_per_second" in result
+    assert gc.storage.deleted == [("books", ["b/1", "b/2"]), ("covers", ["c/1.jpg"])]
+    assert gc.requeued == []
+
+
+def test_gc_requeues_when_time_budget_exceeded(gc, monkeypatch):
+    """测试超出时间预算时停止并续排下一轮"""
+    monkeypatch.setattr(settings.celery, "gc_time_budget_seconds", 0)
+
+    result = gc([ExpiredBatch(deleted=2)])
+
+    assert result["batches"] == 0
+    assert result["drained"] is False
+    assert gc.requeued == [True]
+
+
+def test_gc_reclaims_released_blobs(gc):
+    """测试回收引用计数为零的文件时一并删除其派生产物，只有回收也继续循环"""
+    books = settings.minio.minio_bucket_books
+    result = gc(
+        [
+            ExpiredBatch(blobs=2, objects={books: ["u/1.pdf", "ocr/aa/11/aa11.pdf"]}, derived=["aa11"]),
+            ExpiredBatch(),
+        ]
+    )
+
+    assert result["batches"] == 1
+    assert result["blobs_reclaimed"] == 2
+    assert result["drained"] is True
+    assert gc.storage.deleted == [
+        (books, ["u/1.pdf", "ocr/aa/11/aa11.pdf", "derived/aa/aa11/book.epub", "derived/aa/aa11/metadata.json"]),
+    ]
+
+
+class BucketStorage:
+    """按桶保存对象的内存存储 (未指定桶时与 StorageService 一样使用 books 桶)"""
+
+    def __init__(self):
+        self.buckets: dict[str, dict[str, bytes]] = defaultdict(dict)
+
+    def _bucket(self, bucket: str | None) -> str:
+        return bucket or settings.minio.minio_bucket_books
+
+    def upload_local_file(self, file_path: str, object_key: str, content_type: str, bucket: str | None = None):  # noqa: ARG002
+        self.buckets[self._bucket(bucket)][object_key] = Path(file_path).read_bytes()
+
+    def iter_objects(self, bucket: str | None = None, prefix: str | None = None):
+        objects = self.buckets[self._bucket(bucket)]
+        return iter((key, OLD) for key in sorted(objects) if key.startswith(prefix or ""))
+
+    def delete_objects(self, keys: list[str], bucket: str | None = None) -> list[str]:
+        objects = self.buckets[self._bucket(bucket)]
+        return [key for key in keys if objects.pop(key, None) is None]
+
+
+class BlobConnection:
+    """没有过期书籍，回收一个引用计数为零的书籍文件"""
+
+    def __init__(self, blob: SimpleNamespace):
+        self.blob = blob
+
+    def execute(self, statement, _params=None):  # noqa: ANN001, ANN201
+        rows = [self.blob] if "storage_blobs" in str(statement) else []
+        return SimpleNamespace(fetchall=lambda: rows)
+
+
+def test_gc_deletes_uploaded_ocr_blob(monkeypatch, tmp_path: Path):
+    """测试 OCR 结果上传到哪个桶，回收书籍文件时就从哪个桶删除"""
+    sha256 = "ab" * 32
+    output = tmp_path / "output.pdf"
+    output.write_bytes(b"%PDF-1.7 ocr")
+    storage = BucketStorage()
+    ocr_key = _upload_ocr_result(storage, output, sha256)
+    storage.buckets[settings.minio.minio_bucket_books]["u/1.pdf"] = b"%PDF-1.7"
+
+    blob = SimpleNamespace(kind=BLOB_BOOK, sha256=sha256, key="u/1.pdf")
+
+    @contextmanager
+    def begin():  # noqa: ANN202
+        yield BlobConnection(blob)
+
+    monkeypatch.setattr(cleanup_tasks, "get_sync_engine", lambda: SimpleNamespace(begin=begin))
+    monkeypatch.setattr(cleanup_tasks, "get_storage_service", lambda: storage)
+    monkeypatch.setattr(settings.celery, "gc_batch_size", 2)
+
+    result = cleanup_tasks.cleanup_expired_books.run()
+
+    assert result["blobs_reclaimed"] == 1
+    assert result["objects_failed"] == 0
+    assert not any(ocr_key in objects for objects in storage.buckets.values())
+    assert storage.buckets[settings.minio.minio_bucket_books] == {}
+
+
+def test_book_blob_refs():
+    """测试书籍记录持有的引用: 文件按内容哈希，封面按内容寻址 Key 中的哈希"""
+    assert book_blob_refs("aa11", "cc/cc33.jpg") == [(BLOB_BOOK, "aa11"), (BLOB_COVER, "cc33")]
+    assert book_blob_refs(None, None) == []
+
+
+def test_unregistered_book_holds_no_file_ref():
+    """测试未登记引用的书籍 (content_sha256 已写入) 删除时不释放书籍文件引用"""
+    book = Book(content_sha256="aa11", blob_registered=False, cover_image_key="cc/cc33.jpg")
+    assert book_blob_refs(book.blob_sha256, book.cover_image_key) == [(BLOB_COVER, "cc33")]
+    book.blob_registered = True
+    assert book_blob_refs(book.blob_sha256, book.cover_image_key)[0] == (BLOB_BOOK, "aa11")
+    assert cover_blob_id("legacy/covers/bb22.png") == "bb22"
+
+
+def test_release_blobs_merges_duplicate_refs():
+    """测试同一文件的多个引用合并为一次扣减"""
+    assert release_blobs([]) is None
+
+    stmt = release_blobs([(BLOB_BOOK, "aa11"), (BLOB_COVER, "cc33"), (BLOB_BOOK, "aa11")])
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "VALUES ('book', 'aa11', 2), ('cover', 'cc33', 1)" in sql
+    assert "greatest(storage_blobs.refcount - released.n, 0)" in sql
+
+
+def test_delete_objects_groups_requests():
+    """测试 Multi-Object Delete 每个请求最多 1000 个对象，并收集失败的 Key"""
+
+    class Error:
+        def __init__(self, name: str):
+            self.name = name
+
+    class FakeClient:
+        def __init__(self):
+            self.requests: list[int] = []
+
+        def remove_objects(self, _bucket, objects):  # noqa: ANN001
+            objects = list(objects)
+            self.requests.append(len(objects))
+            return iter([Error("k-7")] if any(o.name == "k-7" for o in objects) else [])
+
+    storage = StorageService.__new__(StorageService)
+    storage.client = FakeClient()
+
+    failed = storage.delete_objects([f"k-{i}" for i in range(DELETE_BATCH_SIZE * 2 + 5)], bucket="books")
+
+    assert storage.client.requests == [DELETE_BATCH_SIZE, DELETE_BATCH_SIZE, 5]
+    assert failed == ["k-7"]
+
+
+def _objects(*keys: str) -> list[tuple[str, datetime]]:
+    return [(key, OLD) for key in keys]
+
+
+def test_find_orphans_merge_walk():
+    """测试归并两个有序流找出未被引用的对象"""
+    objects = _objects("a/1.pdf", "a/2.pdf", "b/1.pdf", "ocr/x.pdf", "z/9.pdf")
+    referenced = ["a/0.pdf", "a/2.pdf", "a/2.pdf", "ocr/x.pdf"]
+
+    orphans = [key for key, _ in find_orphans(objects, referenced)]
+
+    assert orphans == ["a/1.pdf", "b/1.pdf", "z/9.pdf"]
+
+
+def test_find_orphans_by_content_hash():
+    """测试派生产物按内容哈希对账，同一哈希的多个产物一起保留"""
+    objects = _objects(
+        "derived/aa/aa11/book.epub",
+        "derived/aa/aa11/meta.json",
+        "derived/bb/bb22/cover.v2.json",
+        "derived/stray.json",
+    )
+
+    orphans = [key for key, _ in find_orphans(objects, ["aa11"], key=derived_sha256)]
+
+    # 无法解析哈希的 Key 不删除
+    assert orphans == ["derived/bb/bb22/cover.v2.json"]
+
+
+def test_find_orphans_rejects_unsorted_streams():
+    """测试排序规则不一致时中止，而不是误删"""
+    with pytest.raises(ValueError):
+        list(find_orphans(_objects("b", "a"), []))
+    with pytest.raises(ValueError):
+        list(find_orphans(_objects("c"), ["b", "a"]))
+
+
+def test_reconcile_skips_objects_within_grace_period():
+    """测试宽限期内的新对象不删除，孤立对象成批删除"""
+    storage = FakeStorage()
+    now = datetime.now(UTC)
+    objects = [("k/1", OLD), ("k/2", now), ("k/3", OLD), ("k/4", OLD)]
+
+    stats = _reconcile(storage, "books", objects, ["k/4"], None, cutoff=now - timedelta(hours=24))
+
+    assert stats == {"orphans": 3, "recent": 1, "deleted": 2, "failed": 0}
+    assert storage.deleted == [("books", ["k/1", "k/3"])]
+
+
+def test_recover_stalled_books_bulk_updates(monkeypatch):
+    """测试停滞书籍按批取出，并按列组合以 executemany 写回失败状态"""
+    batches = iter(
+        [
+            [
+                SimpleNamespace(id="b1", ingest_stalled=True, ocr_stalled=False),
+                SimpleNamespace(id="b2", ingest_stalled=False, ocr_stalled=True),
+            ],
+            [SimpleNamespace(id="b3", ingest_stalled=False, ocr_stalled=True)],
+        ]
+    )
+    updates: list[tuple[str, list[dict]]] = []
+
+    class Conn:
+        def execute(self, statement, params=None):  # noqa: ANN001, ANN201
+            if isinstance(params, list):
+                updates.append((str(statement), params))
+                return None
+            return SimpleNamespace(fetchall=lambda: next(batches))
+
+    class Engine:
+        @contextmanager
+        def begin(self):
+            yield Conn()
+
+    monkeypatch.setattr(cleanup_tasks, "get_sync_engine", Engine)
+    monkeypatch.setattr(settings.celery, "gc_batch_size", 2)
+
+    result = cleanup_tasks.recover_stalled_books.run()
+
+    assert result == {"success": True, "ingest_failed": 1, "ocr_failed": 2, "batches": 2}
+    assert [[row["book_id"] for row in rows] for _sql, rows in updates] == [["b1"], ["b2"], ["b3"]]
+    assert updates[1][1][0]["ocr_status"] == "failed"
+    assert "processing_status" not in updates[1][1][0]
@@ -0,0 +1,114 @@
+"""
+封面变体测试
+"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.services import cover_service
+from app.services.cover_service import (
+    COVER_SIZES,
+    blurhash_encode,
+    build_cover_variants,
+    content_cover_key,
+    cover_object_keys,
+    cover_variant_key,
+    select_cover_key,
+    supported_formats,
+)
+
+
+def _png(width: int, height: int, color=(180, 40, 40)) -> bytes:  # noqa: ANN001
+    out = BytesIO()
+    Image.new("RGB", (width, height), color=color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_blurhash_solid_color():
+    """测试纯色图片的 BlurHash (与参考实现一致)"""
+    assert blurhash_encode(Image.new("RGB", (32, 48))) == "L00000" + "fQ" * 11
+
+
+def test_blurhash_reflects_gradient():
+    """测试有明暗变化的图片产生非零交流分量"""
+    image = Image.new("RGB", (32, 32))
+    image.paste((255, 255, 255), (0, 0, 16, 32))
+
+    result = blurhash_encode(image)
+
+    assert len(result) == 28
+    assert result[1] != "0"
+
+
+def test_build_cover_variants():
+    """测试按宽度生成全部尺寸与格式，小图不放大"""
+    cover = build_cover_variants(_png(1200, 1800))
+    formats = supported_formats()
+
+    assert set(cover.variants) == {(size, fmt) for size in COVER_SIZES for fmt in formats}
+    for (size, fmt), data in cover.variants.items():
+        with Image.open(BytesIO(data)) as img:
+            assert img.format == fmt.upper()
+            assert img.size == (COVER_SIZES[size], COVER_SIZES[size] * 3 // 2)
+    with Image.open(BytesIO(cover.jpeg)) as img:
+        assert img.format == "JPEG"
+        assert img.width == COVER_SIZES["large"]
+    assert cover.meta["sizes"] == ["small", "medium", "large"]
+    assert (cover.width, cover.height) == (1200, 1800)
+
+    small = build_cover_variants(_png(200, 300))
+    with Image.open(BytesIO(small.variants[("large", formats[0])])) as img:
+        assert img.size == (200, 300)
+
+
+def test_cover_summary_lists_only_uploaded_formats(monkeypatch: pytest.MonkeyPatch):
+    """测试编码失败的格式不生成变体，摘要只列出每个尺寸都已上传的格式"""
+    monkeypatch.setattr(cover_service, "supported_formats", lambda: ("avif", "webp"))
+    encode = cover_service._encode
+
+    def fail_avif(image, fmt: str) -> bytes:  # noqa: ANN001
+        if fmt == "avif":
+            raise OSError("encoder not available")
+        return encode(image, fmt)
+
+    monkeypatch.setattr(cover_service, "_encode", fail_avif)
+    cover = build_cover_variants(_png(400, 600))
+
+    assert {fmt for _, fmt in cover.variants} == {"webp"}
+    assert cover.meta["formats"] == ["webp"]
+
+    # 存储中只有部分尺寸的 AVIF (由其他 Worker 上传)
+    uploaded = [(size, "webp") for size in COVER_SIZES] + [("small", "avif")]
+    assert cover.summary(uploaded)["formats"] == ["webp"]
+    assert cover.summary([])["sizes"] == []
+    assert cover.summary([])["formats"] == []
+
+
+def test_select_cover_key_falls_back_to_jpeg():
+    """测试变体不存在时回退到 JPEG 封面"""
+    meta = {"sizes": ["small", "medium", "large"], "formats": ["webp"]}
+
+    assert select_cover_key("ab/abc.jpg", meta, "small", "webp") == ("ab/abc/small.webp", "image/webp")
+    assert select_cover_key("ab/abc.jpg", meta, "small", "avif") == ("ab/abc.jpg", "image/jpeg")
+    assert select_cover_key("ab/abc.jpg", None) == ("ab/abc.jpg", "image/jpeg")
+
+
+def test_cover_object_keys():
+    """测试删除时包含全部变体"""
+    keys = cover_object_keys("ab/abc.jpg")
+
+    assert keys[0] == "ab/abc.jpg"
+    assert cover_variant_key("ab/abc.jpg", "medium", "avif") in keys
+    assert len(keys) == 1 + len(COVER_SIZES) * 2
+
+
+def test_content_cover_key_shared_by_identical_images():
+    """测试相同封面图片得到同一个 Key"""
+    red, blue = _png(200, 300), _png(200, 300, color=(40, 40, 180))
+
+    assert content_cover_key(red) == content_cover_key(_png(200, 300))
+    assert content_cover_key(red) != content_cover_key(blue)
+    key = content_cover_key(red)
+    assert key.endswith(".jpg") and key[:2] == key[3:5]
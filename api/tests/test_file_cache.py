@@ -0,0 +1,172 @@
+"""
+Worker 文件缓存测试
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.services.file_cache_service import FileCacheService
+
+
+class FakeStorage:
+    """内存对象存储"""
+
+    def __init__(self, objects: dict[str, bytes]):
+        self.objects = objects
+        self.downloads: list[str] = []
+
+    def get_object_info(self, object_key: str, bucket: str | None = None) -> dict | None:  # noqa: ARG002
+        data = self.objects.get(object_key)
+        if data is None:
+            return None
+        return {"size": len(data), "content_type": "", "etag": str(hash(data))}
+
+    def download_file(self, bucket: str, key: str, file_path: str) -> None:  # noqa: ARG002
+        self.downloads.append(key)
+        Path(file_path).write_bytes(self.objects[key])
+
+
+def test_object_is_downloaded_once(tmp_path: Path):
+    """测试同一对象只下载一次"""
+    storage = FakeStorage({"a.pdf": b"A" * 10})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+
+    with cache.local_copy("a.pdf", bucket="books", suffix=".pdf") as path:
+        assert path.read_bytes() == b"A" * 10
+        assert path.suffix == ".pdf"
+    with cache.local_copy("a.pdf", bucket="books", suffix=".pdf") as path:
+        assert path.exists()
+
+    # 另一个进程内实例共享同一目录
+    other = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+    with other.local_copy("a.pdf", bucket="books", suffix=".pdf"):
+        pass
+
+    assert storage.downloads == ["a.pdf"]
+
+
+def test_content_change_invalidates_entry(tmp_path: Path):
+    """测试对象内容变化 (etag 变化) 后重新下载"""
+    storage = FakeStorage({"a.pdf": b"v1"})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+
+    with cache.local_copy("a.pdf") as path:
+        assert path.read_bytes() == b"v1"
+    storage.objects["a.pdf"] = b"v2"
+    with cache.local_copy("a.pdf") as path:
+        assert path.read_bytes() == b"v2"
+
+    assert storage.downloads == ["a.pdf", "a.pdf"]
+
+
+def test_sha256_key_skips_stat(tmp_path: Path):
+    """测试按 sha256 寻址，不同 key 的相同内容共享条目"""
+    storage = FakeStorage({"u1/a.pdf": b"same", "u2/b.pdf": b"same"})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+
+    with cache.local_copy("u1/a.pdf", sha256="ab" * 32) as first:
+        pass
+    with cache.local_copy("u2/b.pdf", sha256="ab" * 32) as second:
+        pass
+
+    assert first == second
+    assert storage.downloads == ["u1/a.pdf"]
+
+
+def test_lru_eviction_respects_size_cap(tmp_path: Path):
+    """测试超出容量时淘汰最久未使用的条目"""
+    storage = FakeStorage({k: k.encode() * 40 for k in ("a", "b", "c")})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=100, storage=storage)
+
+    with cache.local_copy("a") as path_a:
+        pass
+    os.utime(path_a, (time.time() - 60, time.time() - 60))
+    with cache.local_copy("b") as path_b:
+        pass
+    with cache.local_copy("c") as path_c:
+        pass
+
+    assert not path_a.exists()
+    assert path_b.exists()
+    assert path_c.exists()
+
+
+def test_entries_in_use_are_not_evicted(tmp_path: Path):
+    """测试使用中的条目不会被淘汰"""
+    storage = FakeStorage({k: k.encode() * 80 for k in ("a", "b")})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=100, storage=storage)
+
+    with cache.local_copy("a") as path_a, cache.local_copy("b") as path_b:
+        assert path_a.exists()
+        assert path_b.exists()
+
+
+def test_eviction_removes_lock_files(tmp_path: Path):
+    """测试淘汰条目时删除其锁文件，并清理没有条目的遗留锁文件"""
+    storage = FakeStorage({k: k.encode() * 40 for k in ("a", "b", "c")})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=100, storage=storage)
+    (cache.locks_dir / f"{'0' * 64}.lock").touch()
+
+    with cache.local_copy("a") as path_a:
+        pass
+    os.utime(path_a, (time.time() - 60, time.time() - 60))
+    with cache.local_copy("b"), cache.local_copy("c"):
+        pass
+
+    entries = {path.name[:64] for path in cache.objects_dir.glob("*/*")}
+    locks = {path.stem for path in cache.locks_dir.glob("*.lock")}
+    assert not path_a.exists()
+    assert locks == entries
+
+
+def test_cold_caller_waits_for_filler_without_downloading(tmp_path: Path):
+    """测试其他进程填充时改为等待共享锁，填充方降级后即可并发使用"""
+    storage = FakeStorage({"a.pdf": b"A" * 10})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+    digest = hashlib.sha256(b"sha256:" + b"ab" * 32 + b".pdf").hexdigest()
+    path = cache.objects_dir / digest[:2] / f"{digest}.pdf"
+
+    # 模拟另一个进程: 持有排他锁填充，随后降级为共享锁并持续使用
+    filler = os.open(cache.locks_dir / f"{digest}.lock", os.O_RDWR | os.O_CREAT)
+    fcntl.flock(filler, fcntl.LOCK_EX)
+    seen: list[bytes] = []
+
+    def reader() -> None:
+        with cache.local_copy("a.pdf", suffix=".pdf", sha256="ab" * 32) as local:
+            seen.append(local.read_bytes())
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(0.1)
+    assert seen == []
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"filled")
+    fcntl.flock(filler, fcntl.LOCK_SH)
+    thread.join(timeout=5)
+    os.close(filler)
+
+    assert seen == [b"filled"]
+    assert storage.downloads == []
+
+
+def test_lock_retries_after_lock_file_removed(tmp_path: Path):
+    """测试等待期间锁文件被删除时，在重新创建的锁文件上加锁"""
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=FakeStorage({}))
+    lock_path = cache.locks_dir / f"{'1' * 64}.lock"
+    holder = os.open(lock_path, os.O_RDWR | os.O_CREAT)
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    acquired: list[int] = []
+
+    thread = threading.Thread(target=lambda: acquired.append(cache._lock("1" * 64, fcntl.LOCK_SH)))
+    thread.start()
+    time.sleep(0.1)
+    lock_path.unlink()
+    os.close(holder)
+    thread.join(timeout=5)
+
+    assert os.fstat(acquired[0]).st_ino == lock_path.stat().st_ino
+    os.close(acquired[0])
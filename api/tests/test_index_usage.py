@@ -0,0 +1,107 @@
+"""
+列表查询索引使用测试
+
+执行服务方法并记录其 SELECT，逐条 EXPLAIN，断言目标表走指定索引 (Index Scan / Index Only Scan)。
+测试表为空，关闭顺序扫描后比较的是各索引的代价；需要 PostgreSQL，SQLite 下跳过。
+"""
+
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import encode_cursor
+from app.services.book_service import BookService
+from app.services.note_service import NoteService
+from app.services.reading_service import ReadingService
+from tests.conftest import TEST_DATABASE_URL
+
+pytestmark = pytest.mark.skipif("postgresql" not in TEST_DATABASE_URL, reason="EXPLAIN 需要 PostgreSQL")
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan")
+
+USER_ID = str(uuid4())
+BOOK_ID = str(uuid4())
+
+
+async def _scans(db: AsyncSession, call: Callable[[], Awaitable]) -> dict[str, tuple[str, str | None]]:
+    """执行 call，返回其 SELECT 执行计划中各表的 {表名: (扫描方式, 索引名)}"""
+    statements = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany) -> None:  # noqa: ANN001
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    conn = await db.connection()
+    await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    scans: dict[str, tuple[str, str | None]] = {}
+    for statement, parameters in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        _collect(plan[0]["Plan"], scans)
+    return scans
+
+
+def _collect(node: dict, scans: dict[str, tuple[str, str | None]]) -> None:
+    if "Relation Name" in node:
+        scans[node["Relation Name"]] = (node["Node Type"], node.get("Index Name"))
+    for child in node.get("Plans", []):
+        _collect(child, scans)
+
+
+def _assert_index(scans: dict[str, tuple[str, str | None]], table: str, index: str) -> None:
+    node_type, index_name = scans[table]
+    assert node_type in INDEX_SCANS, scans
+    assert index_name == index, scans
+
+
+async def test_list_books_uses_partial_index(db_session: AsyncSession):
+    """测试书籍列表 (页码与游标) 走未删除书籍的部分索引"""
+    service = BookService(db_session)
+
+    scans = await _scans(db_session, lambda: service.list_books(USER_ID))
+    _assert_index(scans, "books", "idx_books_user_created")
+
+    cursor = encode_cursor(datetime.now(UTC), uuid4())
+    scans = await _scans(db_session, lambda: service.list_books(USER_ID, cursor=cursor))
+    _assert_index(scans, "books", "idx_books_user_created")
+
+
+async def test_list_notes_uses_partial_index(db_session: AsyncSession):
+    """测试笔记列表 (全部与按书籍筛选) 走对应的部分索引"""
+    service = NoteService(db_session)
+
+    scans = await _scans(db_session, lambda: service.list_notes(USER_ID))
+    _assert_index(scans, "notes", "idx_notes_user_created")
+
+    scans = await _scans(db_session, lambda: service.list_notes(USER_ID, book_id=BOOK_ID))
+    _assert_index(scans, "notes", "idx_notes_user_book_created")
+
+
+async def test_list_highlights_and_bookmarks_use_partial_index(db_session: AsyncSession):
+    """测试书籍的高亮、书签列表走按创建时间排序的部分索引"""
+    service = NoteService(db_session)
+
+    scans = await _scans(db_session, lambda: service.list_highlights(USER_ID, BOOK_ID))
+    _assert_index(scans, "highlights", "idx_highlights_user_book_created")
+
+    scans = await _scans(db_session, lambda: service.list_bookmarks(USER_ID, BOOK_ID))
+    _assert_index(scans, "bookmarks", "idx_bookmarks_user_book_created")
+
+
+async def test_recent_books_uses_covering_index(db_session: AsyncSession):
+    """测试最近阅读走 book_position 的覆盖索引"""
+    service = ReadingService(db_session)
+
+    scans = await _scans(db_session, lambda: service.get_recent_books(USER_ID))
+    _assert_index(scans, "book_position", "idx_book_position_user_updated")
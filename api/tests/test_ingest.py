@@ -0,0 +1,207 @@
+"""
+入库流水线测试
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.file_cache_service import FileCacheService
+from app.tasks import ingest_tasks
+from app.tasks.ingest_tasks import (
+    _detect_format,
+    _register_book_blob,
+    _run_stage,
+    build_ingest_pipeline,
+)
+from tests.test_file_cache import FakeStorage
+
+
+class FakeTask:
+    """只提供重试相关属性的任务桩"""
+
+    max_retries = 0
+
+    class request:  # noqa: N801
+        retries = 0
+
+
+def _ctx() -> dict:
+    return {"book_id": "b1", "user_id": "u1", "timings_ms": {}, "skipped": []}
+
+
+@pytest.fixture(autouse=True)
+def published(monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    """记录推送的进度事件"""
+    events: list[dict] = []
+    monkeypatch.setattr(
+        ingest_tasks,
+        "publish_progress",
+        lambda user_id, _book_id, **fields: events.append({"user_id": user_id, **fields}),
+    )
+    return events
+
+
+def test_pipeline_stage_order():
+    """测试流水线阶段顺序"""
+    pipeline = build_ingest_pipeline("b1", "u1", "u1/x.mobi")
+
+    assert [sig.task for sig in pipeline.tasks] == [
+        "app.tasks.ingest_tasks.ingest_prepare",
+        "app.tasks.ingest_tasks.ingest_convert",
+        "app.tasks.ingest_tasks.ingest_metadata",
+        "app.tasks.ingest_tasks.ingest_cover",
+        "app.tasks.ingest_tasks.ingest_text_layer",
+        "app.tasks.ingest_tasks.ingest_finalize",
+        "app.tasks.ingest_tasks.ingest_fanout",
+    ]
+    assert pipeline.tasks[0].args[0]["minio_key"] == "u1/x.mobi"
+
+
+@pytest.mark.parametrize(
+    ("head", "fallback", "expected"),
+    [
+        (b"%PDF-1.7\n", "epub", "pdf"),
+        (b"PK\x03\x04" + b"\x00" * 26 + b"mimetypeapplication/epub+zip", "pdf", "epub"),
+        (b"\x00" * 60 + b"BOOKMOBI", "azw3", "azw3"),
+        (b"\x00" * 60 + b"BOOKMOBI", "pdf", "mobi"),
+        (b"plain text", "txt", "txt"),
+    ],
+)
+def test_detect_format(tmp_path: Path, head: bytes, fallback: str, expected: str):
+    """测试按文件头识别格式"""
+    path = tmp_path / "book"
+    path.write_bytes(head)
+
+    assert _detect_format(path, fallback=fallback) == expected
+
+
+def test_stage_records_timing(published: list[dict]):
+    """测试阶段执行、记录耗时并推送进度"""
+    ctx = _ctx()
+
+    assert _run_stage(FakeTask(), ctx, "metadata", lambda: {"title": "x"}) == {"title": "x"}
+    assert "metadata" in ctx["timings_ms"]
+    assert ctx["skipped"] == []
+    assert published == [
+        {"user_id": "u1", "kind": "processing", "stage": "metadata", "status": "processing", "progress": 50, "error": None}
+    ]
+
+
+def test_stage_skipped_when_output_exists():
+    """测试产物已存在时跳过阶段"""
+    ctx = _ctx()
+    calls = []
+
+    result = _run_stage(FakeTask(), ctx, "cover", lambda: calls.append(1), skip_if=lambda: True)
+
+    assert result is None
+    assert calls == []
+    assert ctx["skipped"] == ["cover"]
+    assert "cover" in ctx["timings_ms"]
+
+
+def test_stage_failure_marks_book(monkeypatch: pytest.MonkeyPatch, published: list[dict]):
+    """测试重试耗尽后标记书籍失败"""
+    failed = []
+    monkeypatch.setattr(ingest_tasks, "_mark_failed", lambda book_id, error: failed.append((book_id, error)))
+
+    def boom():
+        raise ValueError("bad file")
+
+    with pytest.raises(ValueError):
+        _run_stage(FakeTask(), _ctx(), "prepare", boom)
+
+    assert failed == [("b1", "prepare: bad file")]
+    assert published[-1]["status"] == "failed"
+
+
+def test_fanout_queues_auto_ocr_job(monkeypatch: pytest.MonkeyPatch):
+    """测试自动 OCR 创建 OcrJob 进入调度队列，只投递调度任务而不直接投递 OCR Worker"""
+    from app.core.config import settings
+
+    queued, dispatched = [], []
+
+    class FakeScheduler:
+        def enqueue(self, **job) -> None:  # noqa: ANN003
+            queued.append(job)
+
+    class FakeGroup:
+        def __init__(self, sigs: list):
+            dispatched.extend(sig.task for sig in sigs)
+
+        def apply_async(self) -> None:
+            pass
+
+    monkeypatch.setattr(settings.ocr, "ocr_auto_on_ingest", True)
+    monkeypatch.setattr(ingest_tasks, "_create_ocr_job", lambda _book_id, _user_id, _pages: ("j1", 7))
+    monkeypatch.setattr(ingest_tasks, "get_ocr_scheduler", lambda: FakeScheduler())
+    monkeypatch.setattr(ingest_tasks, "group", FakeGroup)
+
+    ctx = {
+        **_ctx(),
+        "minio_key": "u1/x.pdf",
+        "sha256": "ab" * 32,
+        "text_layer": {"has_text_layer": False, "page_count": 40, "sampled_pages": 8, "image_pages": [0, 1]},
+    }
+    result = ingest_tasks.ingest_fanout(ctx)
+
+    assert result["ocr_job_id"] == "j1"
+    assert queued == [
+        {
+            "job_id": "j1",
+            "user_id": "u1",
+            "book_id": "b1",
+            "minio_key": "u1/x.pdf",
+            "sha256": "ab" * 32,
+            "priority": 7,
+            "pages": 10,
+        }
+    ]
+    assert dispatched == ["app.tasks.ocr_tasks.dispatch_ocr_jobs"]
+
+
+def test_stages_reuse_cache_by_content_hash(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """测试 prepare 算出哈希后，后续阶段按内容哈希命中缓存 (去重改指向已有文件也不再下载)"""
+    storage = FakeStorage({"u1/x.pdf": b"%PDF-1.7", "u2/y.pdf": b"%PDF-1.7"})
+    cache = FileCacheService(cache_dir=str(tmp_path), max_bytes=1024, storage=storage)
+    monkeypatch.setattr(ingest_tasks, "get_file_cache_service", lambda: cache)
+    ctx = {**_ctx(), "minio_key": "u1/x.pdf"}
+
+    with ingest_tasks._local_copy(ctx) as path:
+        cache.adopt(path, "ab" * 32, suffix=".pdf")
+    ctx.update(sha256="ab" * 32, minio_key="u2/y.pdf")
+    with ingest_tasks._local_copy(ctx) as path:
+        assert path.read_bytes() == b"%PDF-1.7"
+
+    assert storage.downloads == ["u1/x.pdf"]
+
+
+class BlobConnection:
+    """记录语句；books 行是否已登记引用由 registered 决定"""
+
+    def __init__(self, registered: bool):
+        self.registered = registered
+        self.statements: list[str] = []
+
+    def execute(self, statement, _params=None):  # noqa: ANN001, ANN201
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql.lstrip().startswith("UPDATE books SET content_sha256"):
+            return SimpleNamespace(first=lambda: None if self.registered else ("b1",))
+        if "storage_blobs" in sql and sql.lstrip().startswith("SELECT"):
+            return SimpleNamespace(scalar_one_or_none=lambda: "u0/a.pdf")
+        return SimpleNamespace(scalar_one=lambda: "u1/x.pdf")
+
+
+@pytest.mark.parametrize(("registered", "acquired"), [(False, True), (True, False)])
+def test_register_book_blob_keyed_on_flag(registered: bool, acquired: bool):
+    """测试以 blob_registered 判断是否登记引用，content_sha256 已写入但未登记时仍增加引用"""
+    conn = BlobConnection(registered)
+
+    _register_book_blob(conn, "b1", "ab" * 32, "u1/x.pdf", 8)
+
+    assert "NOT blob_registered" in conn.statements[0]
+    assert "content_sha256 IS NULL" not in conn.statements[0]
+    assert any(sql.startswith("INSERT INTO storage_blobs") for sql in conn.statements) is acquired
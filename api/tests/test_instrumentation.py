@@ -0,0 +1,111 @@
+"""
+请求级数据库指标测试
+
+小型应用 + 内存 SQLite 引擎: 语句计数、Server-Timing 响应头、按路由模板的直方图、查询预算警告。
+"""
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import instrumentation
+from app.core.config import settings
+from app.core.instrumentation import (
+    DbMetricsMiddleware,
+    InstrumentedQueuePool,
+    RequestDbStats,
+    current_stats,
+    instrument_engine,
+    server_timing,
+)
+
+
+@pytest.fixture
+async def client():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", poolclass=InstrumentedQueuePool, pool_size=1
+    )
+    instrument_engine(engine)
+
+    app = FastAPI()
+    app.add_middleware(DbMetricsMiddleware)
+
+    @app.get("/items/{n}")
+    async def items(n: int) -> dict[str, int]:
+        async with engine.connect() as conn:
+            for _ in range(n):
+                await conn.execute(text("SELECT 1"))
+        return {"n": n}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    await engine.dispose()
+
+
+def _count(route: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "athena_request_db_statements_count", {"method": "GET", "route": route}
+        )
+        or 0.0
+    )
+
+
+def test_server_timing_format():
+    """测试 Server-Timing 以毫秒输出数据库耗时、语句数与连接等待"""
+    stats = RequestDbStats(statements=5, db_seconds=0.01234, pool_wait_seconds=0.0004)
+
+    assert server_timing(stats) == 'db;dur=12.3;desc="5 queries", db-pool;dur=0.4'
+
+
+async def test_request_counts_statements(client: AsyncClient):
+    """测试请求内的语句计入 Server-Timing，直方图按路由模板分组，请求结束后不再计数"""
+    before = _count("/items/{n}")
+
+    response = await client.get("/items/3")
+
+    assert response.status_code == 200
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+    assert "db-pool;dur=" in response.headers["server-timing"]
+    assert _count("/items/{n}") == before + 1
+    assert (
+        REGISTRY.get_sample_value(
+            "athena_request_db_statements_sum", {"method": "GET", "route": "/items/{n}"}
+        )
+        >= 3
+    )
+    assert current_stats() is None
+
+
+async def test_unmatched_route_label(client: AsyncClient):
+    """测试未匹配的路径归入 unmatched，不按实际路径产生标签"""
+    before = _count("unmatched")
+
+    response = await client.get("/missing/123")
+
+    assert response.status_code == 404
+    assert _count("unmatched") == before + 1
+
+
+async def test_query_budget_warning(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    """测试语句数超出预算时记录警告，预算为 0 时不检查"""
+    warnings = []
+    monkeypatch.setattr(
+        instrumentation.logger, "warning", lambda event, **kw: warnings.append((event, kw))
+    )
+    monkeypatch.setattr(settings.database, "database_query_budget", 2)
+
+    await client.get("/items/2")
+    assert warnings == []
+
+    await client.get("/items/3")
+    assert len(warnings) == 1
+    assert warnings[0][1]["route"] == "/items/{n}"
+    assert warnings[0][1]["statements"] == 3
+
+    monkeypatch.setattr(settings.database, "database_query_budget", 0)
+    await client.get("/items/5")
+    assert len(warnings) == 1
@@ -0,0 +1,142 @@
+"""
+OCR 计费测试
+
+每月免费页数抵扣、预留与结算按差额多退少补、余额不足、只在最终失败时退回 (假连接，不连接数据库)。
+"""
+
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.core.exceptions import InsufficientCreditsException
+from app.services.ocr_billing import (
+    month_start,
+    release_ocr_credits,
+    reserve_ocr_credits,
+    settle_ocr_credits,
+    split_ocr_charge,
+)
+from app.tasks import ocr_tasks
+
+USER_ID = str(uuid4())
+JOB_ID = str(uuid4())
+
+
+class FakeResult:
+    def __init__(self, value):  # noqa: ANN001
+        self.value = value
+
+    def scalar_one(self):  # noqa: ANN201
+        return self.value
+
+    def scalar_one_or_none(self):  # noqa: ANN201
+        return self.value
+
+
+class FakeConnection:
+    """按顺序返回预设的标量结果，记录执行的语句"""
+
+    def __init__(self, *values):  # noqa: ANN002
+        self.values = list(values)
+        self.statements: list[str] = []
+
+    def execute(self, stmt, _params=None) -> FakeResult:  # noqa: ANN001
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        if sql.startswith(("SELECT", "UPDATE credit_accounts")):
+            return FakeResult(self.values.pop(0))
+        return FakeResult(None)
+
+    def ledger(self) -> list[str]:
+        return [s for s in self.statements if s.startswith("INSERT INTO credit_ledger")]
+
+
+@pytest.fixture(autouse=True)
+def pricing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.ocr, "ocr_credits_per_page", 1)
+    monkeypatch.setattr(settings.quota, "free_ocr_pages_monthly", 100)
+
+
+def test_split_charge_uses_monthly_free_pages():
+    """测试本月免费页数先抵扣，用完后按页计费"""
+    assert split_ocr_charge(30, 0) == (30, 0)
+    assert split_ocr_charge(30, 90) == (10, 20)
+    assert split_ocr_charge(30, 150) == (0, 30)
+    assert month_start(datetime(2026, 10, 19, 8, 30, tzinfo=UTC)) == datetime(2026, 10, 1, tzinfo=UTC)
+
+
+def test_reserve_debits_through_billing():
+    """测试预留按估算页数扣减积分并记流水，余额不足时抛出异常"""
+    # 用户行锁, 已占用积分, 本月已用免费页数, 扣减后余额
+    conn = FakeConnection(None, 0, 95, 40)
+
+    assert reserve_ocr_credits(conn, JOB_ID, USER_ID, 10) == (5, 5)
+    assert any("credit_accounts.balance >=" in s for s in conn.statements)
+    assert len(conn.ledger()) == 1
+
+    conn = FakeConnection(None, 0, 100, None)
+    with pytest.raises(InsufficientCreditsException):
+        reserve_ocr_credits(conn, JOB_ID, USER_ID, 10)
+
+
+def test_settle_refunds_overestimate_and_is_idempotent():
+    """测试实际页数少于预留时退回差额，已结算的任务重复结算不再变动"""
+    conn = FakeConnection(None, 5, 95, 45)
+    assert settle_ocr_credits(conn, JOB_ID, USER_ID, 3) == (3, 0)
+    assert len(conn.ledger()) == 1
+
+    conn = FakeConnection(None, 0, 95)
+    assert settle_ocr_credits(conn, JOB_ID, USER_ID, 3) == (3, 0)
+    assert conn.ledger() == []
+
+
+def test_settle_charges_shortfall_or_fails():
+    """测试实际页数多于预留时补扣，余额不足时抛出异常而不是扣到 0"""
+    conn = FakeConnection(None, 5, 100, 10)
+    assert settle_ocr_credits(conn, JOB_ID, USER_ID, 8) == (0, 8)
+
+    conn = FakeConnection(None, 5, 100, None)
+    with pytest.raises(InsufficientCreditsException):
+        settle_ocr_credits(conn, JOB_ID, USER_ID, 8)
+
+
+def test_release_refunds_reservation():
+    """测试任务失败退回全部预留"""
+    conn = FakeConnection(None, 7, 57)
+
+    assert release_ocr_credits(conn, JOB_ID, USER_ID) == 7
+    assert len(conn.ledger()) == 1
+    assert "credits_consumed" in conn.statements[-1]
+
+
+@pytest.mark.parametrize(("retries", "final"), [(0, False), (3, True)])
+def test_failed_attempt_marks_book_only_on_final_retry(monkeypatch: pytest.MonkeyPatch, retries: int, final: bool):
+    """测试识别异常时，重试期间不标记书籍 ocr_failed、不退回积分，最终失败才处理"""
+    calls: list[str] = []
+
+    @contextmanager
+    def broken_copy(*_args, **_kwargs):  # noqa: ANN002, ANN003, ANN202
+        raise ConnectionError("minio unavailable")
+        yield
+
+    monkeypatch.setattr(ocr_tasks, "StorageService", lambda: None)
+    monkeypatch.setattr(ocr_tasks, "get_file_cache_service", lambda: SimpleNamespace(local_copy=broken_copy))
+    monkeypatch.setattr(ocr_tasks, "publish_progress", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(ocr_tasks, "_update_ocr_job", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(ocr_tasks, "_update_book_status", lambda _book_id, status, _error: calls.append(status))
+    monkeypatch.setattr(ocr_tasks, "_fail_ocr_job", lambda *_args: calls.append("refund"))
+    monkeypatch.setattr(ocr_tasks, "_finish_scheduled_job", lambda _job_id: calls.append("finish"))
+
+    ocr_tasks.process_ocr.push_request(retries=retries)
+    try:
+        with pytest.raises(ConnectionError):
+            ocr_tasks.process_ocr.run("b1", USER_ID, "u1/x.pdf", "ab" * 32, JOB_ID)
+    finally:
+        ocr_tasks.process_ocr.pop_request()
+
+    assert calls == (["ocr_failed", "refund", "finish"] if final else [])
@@ -0,0 +1,66 @@
+"""
+局部 OCR 测试
+
+只 OCR 图片页: 抽页、嫁接回原文件与按页计费。
+"""
+
+from pathlib import Path
+
+from PyPDF2 import PdfReader
+
+from app.core.config import settings
+from app.services.ocr_billing import ocr_credits
+from app.services.text_layer_service import analyze_text_layer, estimate_ocr_pages
+from app.tasks.ocr_tasks import _extract_pages, _graft_pages, ocr_mode
+from tests.test_text_layer import _write_pdf
+
+
+def test_ocr_mode():
+    """测试按图片页数量选择 OCR 方式"""
+    assert ocr_mode(0, 300) == "skip"
+    assert ocr_mode(12, 300) == "partial"
+    assert ocr_mode(290, 300) == "full"
+    assert ocr_mode(1, 1) == "full"
+
+
+def test_ocr_credits_per_page(monkeypatch):
+    """测试只按实际 OCR 的页数计费"""
+    monkeypatch.setattr(settings.ocr, "ocr_credits_per_page", 2)
+
+    assert ocr_credits(15) == 30
+    assert ocr_credits(0) == 0
+
+
+def test_estimate_ocr_pages():
+    """测试按抽样比例估算 OCR 页数"""
+    assert estimate_ocr_pages({"page_count": 400, "sampled_pages": 24, "image_pages": [5, 90, 300]}) == 50
+    assert estimate_ocr_pages({"page_count": 400, "sampled_pages": 24, "image_pages": []}) == 0
+    # 旧版分析结果没有逐页信息
+    assert estimate_ocr_pages({"has_text_layer": False}) is None
+    assert estimate_ocr_pages(None) is None
+
+
+def test_extract_and_graft_pages(tmp_path: Path):
+    """测试抽出图片页，识别后按原页码嫁接回原文件"""
+    original = tmp_path / "mixed.pdf"
+    _write_pdf(original, "ttitbti")
+    image_pages = analyze_text_layer(original, full=True)["image_pages"]
+    assert image_pages == [2, 6]
+
+    subset = tmp_path / "subset.pdf"
+    _extract_pages(original, image_pages, subset)
+    assert len(PdfReader(str(subset)).pages) == 2
+
+    # 以文字页模拟 OCR 结果
+    ocr_subset = tmp_path / "subset.ocr.pdf"
+    _write_pdf(ocr_subset, "tt")
+    output = tmp_path / "output.pdf"
+    _graft_pages(original, ocr_subset, image_pages, output)
+
+    result = analyze_text_layer(output, full=True)
+    assert result["page_count"] == 7
+    assert result["image_pages"] == []
+    # 原有文字页与空白页保持原位
+    pages = PdfReader(str(output)).pages
+    assert "/Font" not in pages[4]["/Resources"]
+    assert "/Font" in pages[2]["/Resources"]
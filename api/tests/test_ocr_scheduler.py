@@ -0,0 +1,251 @@
+"""
+OCR 公平调度测试
+"""
+
+import math
+from collections import Counter
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.services import ocr_scheduler
+from app.services.book_service import ocr_queued_message
+from app.services.ocr_scheduler import (
+    TIER_FREE,
+    TIER_PAID,
+    OcrScheduler,
+    QueuedJob,
+    ThroughputModel,
+    estimate_eta_seconds,
+    estimate_position,
+    export_wait_metrics,
+    ocr_priority_for,
+    percentiles,
+    pick_next,
+    queue_score,
+    tier_for_priority,
+)
+from app.tasks.celery_app import OCRPriority
+
+WEIGHTS = {TIER_PAID: 3, TIER_FREE: 1}
+CAPS = {TIER_PAID: 2, TIER_FREE: 1}
+
+
+def _jobs(tier: str, users: list[str]) -> list[QueuedJob]:
+    priority = OCRPriority.PAID_NORMAL if tier == TIER_PAID else OCRPriority.FREE_NORMAL
+    return [QueuedJob(f"{tier}-{i}", user, tier, priority) for i, user in enumerate(users)]
+
+
+def test_priority_mapping():
+    """测试会员等级 + 请求优先级映射"""
+    future = datetime.now(UTC) + timedelta(days=30)
+    past = datetime.now(UTC) - timedelta(days=1)
+
+    assert ocr_priority_for("PRO", future, "high") == OCRPriority.PAID_HIGH
+    assert ocr_priority_for("PRO", None, "normal") == OCRPriority.PAID_NORMAL
+    assert ocr_priority_for("FREE", None, "high") == OCRPriority.FREE_HIGH
+    assert ocr_priority_for("FREE", None, "normal") == OCRPriority.FREE_NORMAL
+    # 会员过期按免费处理
+    assert ocr_priority_for("PRO", past, "high") == OCRPriority.FREE_HIGH
+
+    assert tier_for_priority(OCRPriority.PAID_LOW) == TIER_PAID
+    assert tier_for_priority(OCRPriority.FREE_HIGH) == TIER_FREE
+
+
+def test_queue_score_orders_priority_before_time():
+    """测试高优先级任务排在更早入队的普通任务之前"""
+    assert queue_score(OCRPriority.PAID_HIGH, 2_000_000_000_000) < queue_score(
+        OCRPriority.PAID_NORMAL, 1_000_000_000_000
+    )
+
+
+def test_weighted_share_between_tiers():
+    """测试付费/免费按权重分配槽位，免费用户不会被饿死"""
+    heads = {
+        TIER_PAID: _jobs(TIER_PAID, [f"p{i}" for i in range(40)]),
+        TIER_FREE: _jobs(TIER_FREE, [f"f{i}" for i in range(40)]),
+    }
+    passes: dict[str, float] = {}
+
+    picked = [pick_next(heads, passes, WEIGHTS, {}, CAPS).tier for _ in range(40)]
+
+    counts = Counter(picked)
+    assert counts[TIER_PAID] == 30
+    assert counts[TIER_FREE] == 10
+    # 每 4 个槽位中免费至少得到一个
+    assert all(TIER_FREE in picked[i : i + 4] for i in range(0, 40, 4))
+
+
+def test_user_concurrency_cap():
+    """测试单个用户达到并发上限后跳过其任务"""
+    heads = {
+        TIER_PAID: _jobs(TIER_PAID, ["heavy", "heavy", "heavy", "other"]),
+        TIER_FREE: [],
+    }
+    running = {"heavy": 1}
+    passes: dict[str, float] = {}
+
+    first = pick_next(heads, passes, WEIGHTS, running, CAPS)
+    second = pick_next(heads, passes, WEIGHTS, running, CAPS)
+    third = pick_next(heads, passes, WEIGHTS, running, CAPS)
+
+    assert first.user_id == "heavy"
+    assert second.user_id == "other"
+    assert third is None
+    assert running == {"heavy": 2, "other": 1}
+
+
+def test_idle_tier_does_not_hoard_share():
+    """测试长时间空闲的等级不会积攒份额一次性抢占"""
+    passes = {TIER_PAID: 10.0, TIER_FREE: 0.0}
+    heads = {TIER_PAID: _jobs(TIER_PAID, ["p1"]), TIER_FREE: []}
+
+    pick_next(heads, passes, WEIGHTS, {}, CAPS)
+
+    # 免费等级空闲期间 pass 追平到当前最小值
+    assert passes[TIER_FREE] == 10.0
+
+
+def test_percentiles():
+    """测试最近秩法分位数"""
+    samples = [float(i) for i in range(1, 101)]
+
+    assert percentiles(samples) == {"p50": 50.0, "p90": 90.0, "p99": 99.0}
+    assert percentiles([]) == {"p50": None, "p90": None, "p99": None}
+
+
+def _wait_metric(tier: str, point: str) -> float | None:
+    return REGISTRY.get_sample_value("athena_ocr_queue_wait_seconds", {"tier": tier, "percentile": point})
+
+
+def test_export_wait_metrics_by_tier():
+    """测试排队等待分位数按等级导出为 Prometheus 指标，没有样本时为 NaN"""
+    export_wait_metrics({TIER_PAID: {"p50": 1.5, "p99": 30.0}, TIER_FREE: {"p50": None, "p99": None}})
+
+    assert _wait_metric(TIER_PAID, "p50") == 1.5
+    assert _wait_metric(TIER_PAID, "p99") == 30.0
+    assert math.isnan(_wait_metric(TIER_FREE, "p50"))
+
+
+async def test_metrics_scrape_refreshes_queue_waits(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    """测试 /metrics 抓取时从 Redis 样本刷新排队等待指标 (样本由 Worker 调度时写入)"""
+
+    async def stats(_self) -> dict:  # noqa: ANN001
+        return {
+            TIER_PAID: {"queued": 1, "samples": 3, "wait_seconds": {"p50": 2.0, "p90": 12.0, "p99": 40.0}},
+            TIER_FREE: {"queued": 0, "samples": 3, "wait_seconds": {"p50": 60.0, "p90": 90.0, "p99": 99.0}},
+            "running": {"jobs": 0, "slots": 4},
+        }
+
+    monkeypatch.setattr(ocr_scheduler.OcrQueue, "stats", stats)
+
+    response = await client.get("/metrics/")
+
+    assert response.status_code == 200
+    assert 'athena_ocr_queue_wait_seconds{percentile="p90",tier="paid"} 12.0' in response.text
+    assert _wait_metric(TIER_FREE, "p99") == 99.0
+
+
+def test_estimate_position_interleaves_other_tier():
+    """测试全局位置按权重计入另一等级插入的任务"""
+    # 免费队列第 3 个 (rank=2)，付费每个免费任务插入 3 个
+    assert estimate_position(2, TIER_FREE, other_queued=100, weights=WEIGHTS) == 2 + 9 + 1
+    # 另一等级排队数不足时以实际数量为上限
+    assert estimate_position(2, TIER_FREE, other_queued=4, weights=WEIGHTS) == 2 + 4 + 1
+    # 付费队首: 最多被插入 1 个免费任务
+    assert estimate_position(0, TIER_PAID, other_queued=10, weights=WEIGHTS) == 2
+
+
+def test_estimate_eta_seconds():
+    """测试预计时间 = 前方页数 ÷ 每秒页数 ÷ Worker 数 + 本任务页数 ÷ 每秒页数"""
+    model = ThroughputModel(pages_per_sec=2.0, pages_per_job=100, samples=50)
+
+    # 前方 4 个任务 × 100 页 ÷ 2 页/秒 ÷ 2 Worker = 100 秒，本任务 60 页 = 30 秒
+    assert estimate_eta_seconds(5, 60, model, workers=2) == 130
+    # 处理中: 只计剩余页数
+    assert estimate_eta_seconds(1, 60, model, workers=2, elapsed_seconds=20) == 10
+    assert estimate_eta_seconds(1, 60, model, workers=2, elapsed_seconds=99) == 0
+
+
+def test_throughput_model_defaults_without_samples():
+    """测试没有完成样本时使用默认吞吐"""
+    model = ThroughputModel.from_hash({"samples": "0", "refreshed_at": "1"})
+
+    assert model.samples == 0
+    assert model.pages_per_sec > 0
+    assert ThroughputModel.from_hash(
+        {"samples": "3", "pages_per_sec": "1.5", "pages_per_job": "80"}
+    ) == ThroughputModel(1.5, 80.0, 3)
+
+
+def test_queued_message_without_eta():
+    """测试没有预计时间时提示不含时间"""
+    assert ocr_queued_message(3) == "OCR 任务已进入排队，预计 3 分钟后完成。"
+    assert ocr_queued_message(None) == "OCR 任务已进入排队。"
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.results: list = []
+
+    def exists(self, key: str) -> None:
+        self.results.append(key in self.redis.hashes)
+
+    def hset(self, key: str, mapping: dict) -> None:
+        self.redis.hashes[key] = mapping
+
+    def zadd(self, key: str, members: dict) -> None:
+        self.redis.zsets.setdefault(key, {}).update(members)
+
+    def set(self, key: str, value: str) -> None:
+        self.redis.strings[key] = value
+
+    def execute(self) -> list:
+        return self.results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes: dict[str, dict] = {}
+        self.zsets: dict[str, dict] = {}
+        self.strings: dict[str, str] = {}
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:  # noqa: ARG002
+        return FakePipeline(self)
+
+
+def test_requeue_pending_jobs_missing_from_queue(monkeypatch: pytest.MonkeyPatch):
+    """测试数据库中 pending 但不在 Redis 中的任务重新入队，已在队列中的不重复入队"""
+    queued, lost = uuid4(), uuid4()
+    rows = [
+        SimpleNamespace(
+            id=job_id,
+            user_id=uuid4(),
+            book_id=uuid4(),
+            priority=OCRPriority.FREE_NORMAL,
+            minio_key="u/x.pdf",
+            content_sha256="ab" * 32,
+            meta={"text_layer": {"page_count": 40, "sampled_pages": 8, "image_pages": [0, 1]}},
+        )
+        for job_id in (queued, lost)
+    ]
+
+    class FakeEngine:
+        @contextmanager
+        def connect(self):  # noqa: ANN202
+            yield SimpleNamespace(execute=lambda *_args: SimpleNamespace(all=lambda: rows))
+
+    monkeypatch.setattr(ocr_scheduler, "get_sync_engine", lambda: FakeEngine())
+    redis = FakeRedis()
+    redis.hashes[f"ocr:job:{queued}"] = {"user_id": "u"}
+
+    assert OcrScheduler(redis).requeue_missing() == 1
+    assert redis.hashes[f"ocr:job:{lost}"]["pages"] == 10
+    assert str(lost) in redis.zsets["ocr:queue:free"]
+    assert redis.strings[f"ocr:book:{rows[1].book_id}"] == str(lost)
@@ -0,0 +1,111 @@
+"""
+列表分页测试
+
+游标编解码、键集条件、多取一行判断下一页、总数推算 (假会话，不连接数据库)。
+"""
+
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.exceptions import InvalidCursorException
+from app.core.pagination import decode_cursor, encode_cursor, paginate
+from app.models.billing import PaymentSession
+
+NOW = datetime(2026, 10, 19, 8, 0, tzinfo=UTC)
+
+
+class FakeResult:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def scalars(self) -> "FakeResult":
+        return self
+
+    def all(self) -> list:
+        return self.rows
+
+    def scalar(self) -> int:
+        return self.rows[0]
+
+
+class FakeDB:
+    """按顺序返回预设结果，记录执行的语句"""
+
+    def __init__(self, *results: list):
+        self.results = list(results)
+        self.statements: list[str] = []
+
+    async def execute(self, stmt) -> FakeResult:  # noqa: ANN001
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return FakeResult(self.results.pop(0))
+
+
+def _rows(n: int) -> list[SimpleNamespace]:
+    return [SimpleNamespace(id=uuid4(), created_at=NOW - timedelta(minutes=i)) for i in range(n)]
+
+
+def _query():  # noqa: ANN202
+    return select(PaymentSession).where(PaymentSession.user_id == UUID(int=1))
+
+
+async def _paginate(db: FakeDB, **kwargs):  # noqa: ANN003, ANN202
+    return await paginate(db, _query(), PaymentSession.created_at, PaymentSession.id, page_size=2, **kwargs)
+
+
+def test_cursor_round_trip():
+    """测试游标编解码"""
+    row_id = uuid4()
+    assert decode_cursor(encode_cursor(NOW, row_id)) == (NOW, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(NOW, uuid4())[:-4], "e30"])
+def test_invalid_cursor(cursor: str):
+    """测试篡改或格式错误的游标返回 400"""
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor)
+
+
+async def test_cursor_page_uses_keyset_without_count():
+    """测试游标分页按 (排序键, id) 定位，多取一行判断下一页，默认不统计总数"""
+    rows = _rows(3)
+    db = FakeDB(rows)
+
+    page = await _paginate(db, cursor=encode_cursor(NOW, uuid4()))
+
+    assert len(db.statements) == 1
+    assert "(payment_sessions.created_at, payment_sessions.id) <" in db.statements[0]
+    assert "OFFSET" not in db.statements[0]
+    assert page.items == rows[:2]
+    assert page.has_more is True
+    assert page.total is None
+    assert decode_cursor(page.next_cursor) == (rows[1].created_at, rows[1].id)
+
+
+async def test_page_mode_infers_total_on_last_page():
+    """测试页码分页的最后一页由偏移量推算总数，不执行 COUNT"""
+    db = FakeDB(_rows(1))
+
+    page = await _paginate(db, page=3)
+
+    assert len(db.statements) == 1
+    assert "OFFSET" in db.statements[0]
+    assert page.total == 5
+    assert page.has_more is False
+    assert page.next_cursor is None
+
+
+async def test_page_mode_counts_when_more():
+    """测试页码分页还有下一页时统计总数"""
+    db = FakeDB(_rows(3), [7])
+
+    page = await _paginate(db)
+
+    assert len(db.statements) == 2
+    assert "count(*)" in db.statements[1]
+    assert page.total == 7
+    assert page.has_more is True
@@ -0,0 +1,69 @@
+"""
+按月分区维护测试
+
+分区命名、月份推算与分区 DDL、分区迁移保留行级安全 (不连接数据库)。
+"""
+
+import importlib.util
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+from app.services.partition_service import (
+    READING_LOG_TABLE,
+    add_months,
+    create_partition_sql,
+    partition_month,
+    partition_name,
+)
+
+
+def test_add_months_across_years():
+    """测试月份加减跨年"""
+    assert add_months(date(2026, 10, 1), 3) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert add_months(date(2026, 10, 1), 0) == date(2026, 10, 1)
+
+
+def test_partition_name_round_trip():
+    """测试分区名与月份互相转换，其他表或其他命名返回 None"""
+    name = partition_name(READING_LOG_TABLE, date(2026, 3, 1))
+
+    assert name == "reading_time_log_p202603"
+    assert partition_month(READING_LOG_TABLE, name) == date(2026, 3, 1)
+    assert partition_month(READING_LOG_TABLE, "reading_time_log_legacy") is None
+    assert partition_month("reading_daily", name) is None
+
+
+def test_create_partition_sql_uses_utc_bounds():
+    """测试分区边界为 UTC 月初，12 月的上界落到次年"""
+    sql = create_partition_sql(READING_LOG_TABLE, date(2026, 12, 1))
+
+    assert "reading_time_log_p202612 PARTITION OF reading_time_log" in sql
+    assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in sql
+
+
+def _run_migration(step: str) -> list[str]:
+    """以记录语句的假 op 执行 007 迁移的 upgrade/downgrade"""
+    path = Path(__file__).parents[1] / "alembic" / "versions" / "007_partition_reading_time_log.py"
+    spec = importlib.util.spec_from_file_location("migration_007", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    statements: list[str] = []
+    module.op = SimpleNamespace(execute=lambda sql: statements.append(" ".join(sql.split())))
+    getattr(module, step)()
+    return statements
+
+
+def test_partition_migration_keeps_row_level_security():
+    """测试重建 reading_time_log (分区表与回退后的普通表) 后重新启用行级安全与按用户隔离的策略"""
+    for step in ("upgrade", "downgrade"):
+        statements = _run_migration(step)
+        created = max(i for i, sql in enumerate(statements) if sql.startswith("CREATE TABLE reading_time_log ("))
+        after = statements[created:]
+
+        assert "ALTER TABLE reading_time_log ENABLE ROW LEVEL SECURITY" in after
+        assert (
+            "CREATE POLICY reading_time_log_policy ON reading_time_log FOR ALL USING (user_id = current_user_id())"
+            in after
+        )
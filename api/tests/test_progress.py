@@ -0,0 +1,118 @@
+"""
+进度推送测试
+
+使用内存中的订阅替身验证单连接扇出、用户隔离与慢消费者丢弃策略。
+"""
+
+import asyncio
+import json
+
+from app.services import progress_service
+from app.services.progress_service import (
+    CHANNEL_PREFIX,
+    HEARTBEAT,
+    ProgressHub,
+    format_sse,
+    user_channel,
+)
+
+
+class FakePubSub:
+    def __init__(self, messages: asyncio.Queue):
+        self.messages = messages
+        self.patterns: list[str] = []
+
+    async def psubscribe(self, pattern: str) -> None:
+        self.patterns.append(pattern)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.connections: list[FakePubSub] = []
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:  # noqa: ARG002
+        pubsub = FakePubSub(self.messages)
+        self.connections.append(pubsub)
+        return pubsub
+
+    def publish(self, user_id: str, event: dict) -> None:
+        self.messages.put_nowait(
+            {"type": "pmessage", "channel": user_channel(user_id), "data": json.dumps(event)}
+        )
+
+
+async def _drain() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_single_connection_fans_out_per_user():
+    """测试所有订阅者共享一个订阅连接，事件只发给对应用户"""
+    redis = FakeRedis()
+    hub = ProgressHub(redis=redis)
+
+    async with (
+        hub.subscribe("u1") as a,
+        hub.subscribe("u1") as b,
+        hub.subscribe("u2") as c,
+    ):
+        await _drain()
+        redis.publish("u1", {"kind": "ocr", "book_id": "b1"})
+        await _drain()
+
+        assert a.get_nowait()["book_id"] == "b1"
+        assert b.get_nowait()["book_id"] == "b1"
+        assert c.empty()
+        assert hub.subscriber_count == 3
+
+    assert len(redis.connections) == 1
+    assert redis.connections[0].patterns == [f"{CHANNEL_PREFIX}*"]
+    assert hub.subscriber_count == 0
+    await hub.close()
+
+
+async def test_slow_subscriber_keeps_latest_events():
+    """测试队列满时丢弃最旧的事件"""
+    hub = ProgressHub(redis=FakeRedis(), queue_size=2)
+
+    async with hub.subscribe("u1") as queue:
+        for progress in (10, 20, 30):
+            hub.deliver("u1", {"kind": "processing", "progress": progress})
+
+        assert [queue.get_nowait()["progress"] for _ in range(2)] == [20, 30]
+    await hub.close()
+
+
+async def test_heartbeat_reaches_idle_subscribers(monkeypatch):
+    """测试统一心跳下发到空闲订阅者"""
+    monkeypatch.setattr(progress_service, "HEARTBEAT_INTERVAL", 0.01)
+    hub = ProgressHub(redis=FakeRedis())
+
+    async with hub.subscribe("u1") as queue:
+        assert await asyncio.wait_for(queue.get(), timeout=1) is HEARTBEAT
+    await hub.close()
+
+
+def test_format_sse():
+    """测试 SSE 消息编码"""
+    message = format_sse({"kind": "ocr", "book_id": "b1", "status": "queued"})
+
+    assert message.startswith("event: ocr\ndata: ")
+    assert message.endswith("\n\n")
+    assert json.loads(message.split("data: ", 1)[1])["status"] == "queued"
+
+
+async def test_stream_rejects_invalid_token(client):
+    """测试 SSE 接口校验查询参数中的令牌"""
+    response = await client.get("/api/v1/events/stream", params={"token": "not-a-jwt"})
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "token_invalid"
@@ -0,0 +1,239 @@
+"""
+阅读数据写缓冲测试
+
+心跳与位置更新只写缓冲、缓冲丢失时回源、写回参数组装 (不连接数据库与 Redis)。
+"""
+
+import uuid
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.exceptions import BookNotFoundException
+from app.services.reading_buffer import (
+    BookOwnerUnknown,
+    BufferedPosition,
+    BufferedSession,
+    flush_params,
+    position_flush_params,
+    session_hash,
+)
+from app.services.reading_service import ReadingService
+
+STARTED = datetime(2026, 10, 18, 8, 0, tzinfo=UTC)
+
+
+def _session(**overrides) -> SimpleNamespace:
+    fields = {
+        "id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "book_id": uuid.uuid4(),
+        "device_id": None,
+        "duration_ms": 0,
+        "is_active": True,
+        "last_active_at": STARTED,
+        "created_at": STARTED,
+    }
+    return SimpleNamespace(**(fields | overrides))
+
+
+class FakeBuffer:
+    def __init__(self, buffered: BufferedSession | None = None):
+        self.buffered = buffered
+        self.opened: list[tuple] = []
+
+    async def heartbeat(self, *_args) -> BufferedSession | None:
+        return self.buffered
+
+    async def open(self, session, duration_ms: int | None = None) -> BufferedSession:  # noqa: ANN001
+        self.opened.append((session.id, duration_ms))
+        data = {k: str(v) for k, v in session_hash(session).items()}
+        return BufferedSession.from_hash(str(session.id), data)
+
+
+def test_session_hash_round_trip():
+    """测试 ReadingTimeLog 写入缓冲后可还原为响应字段"""
+    session = _session(device_id="ipad", duration_ms=1500)
+
+    data = {k: str(v) for k, v in session_hash(session).items()}
+    buffered = BufferedSession.from_hash(str(session.id), data)
+
+    assert buffered.book_id == str(session.book_id)
+    assert buffered.device_id == "ipad"
+    assert buffered.duration_ms == 1500
+    assert buffered.created_at == STARTED
+    assert buffered.is_active is True
+
+
+def test_flush_params_skip_ended_sessions():
+    """测试写回时跳过缓冲已删除 (会话已结束) 的会话"""
+    params = flush_params(
+        ["s1", "s2", "s3"],
+        [
+            ["1000", "1792310400000", "1792310300000"],
+            [None, None, None],
+            ["3000", "1792310460000", "1792310300000"],
+        ],
+    )
+
+    assert params["ids"] == ["s1", "s3"]
+    assert params["durations"] == [1000, 3000]
+    assert params["last_active"][0] == datetime(2026, 10, 18, 8, 0, tzinfo=UTC)
+    assert params["created"][0] == datetime(2026, 10, 18, 7, 58, 20, tzinfo=UTC)
+
+
+async def test_heartbeat_does_not_touch_database():
+    """测试心跳命中缓冲时不访问数据库"""
+    session = _session()
+    buffered = BufferedSession.from_hash(str(session.id), {k: str(v) for k, v in session_hash(session).items()})
+    service = ReadingService(db=None, buffer=FakeBuffer(buffered))
+
+    result = await service.update_reading_session(str(session.id), str(session.user_id), 30000)
+
+    assert result is buffered
+
+
+async def test_heartbeat_rebuilds_missing_buffer(monkeypatch):
+    """测试缓冲丢失时回源数据库校验归属并重建缓冲；已结束的会话不再重建"""
+    active, ended = _session(duration_ms=60000), _session(is_active=False)
+    buffer = FakeBuffer()
+    service = ReadingService(db=None, buffer=buffer)
+    sessions = {str(active.id): active, str(ended.id): ended}
+
+    async def get_session(session_id: str, _user_id: str):  # noqa: ANN202
+        return sessions.get(session_id)
+
+    monkeypatch.setattr(service, "_get_session", get_session)
+
+    rebuilt = await service.update_reading_session(str(active.id), str(active.user_id), 90000)
+    assert rebuilt.id == str(active.id)
+    assert buffer.opened == [(active.id, 90000)]
+
+    assert await service.update_reading_session(str(ended.id), str(ended.user_id), 90000) is ended
+    assert await service.update_reading_session("missing", "u", 90000) is None
+    assert len(buffer.opened) == 1
+
+
+class FakeSessionDb:
+    """只返回预设的活跃会话 ID"""
+
+    def __init__(self, active_ids: list):
+        self.active_ids = active_ids
+        self.added: list = []
+
+    async def execute(self, _stmt) -> SimpleNamespace:  # noqa: ANN001
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.active_ids))
+
+    def add(self, obj) -> None:  # noqa: ANN001
+        obj.id, obj.created_at = uuid.uuid4(), STARTED
+        self.added.append(obj)
+
+    async def commit(self) -> None:
+        pass
+
+    async def refresh(self, _obj) -> None:  # noqa: ANN001
+        pass
+
+
+async def test_start_session_ends_previous_sessions(monkeypatch):
+    """测试开始新会话时按缓冲中的时长结束之前未关闭的会话 (删除其缓冲)，再建立新会话的缓冲"""
+    previous, lost = _session(), _session()
+    buffered = BufferedSession.from_hash(
+        str(previous.id), {k: str(v) for k, v in session_hash(previous).items()} | {"duration_ms": "45000"}
+    )
+    buffer = FakeBuffer()
+
+    async def get(session_id: str) -> BufferedSession | None:
+        return buffered if session_id == str(previous.id) else None
+
+    buffer.get = get
+    service = ReadingService(db=FakeSessionDb([previous.id, lost.id]), buffer=buffer)
+    ended: list[tuple[str, int]] = []
+
+    async def end_session(session_id: str, _user_id: str, final_duration_ms: int) -> None:
+        ended.append((session_id, final_duration_ms))
+
+    async def get_book(book_id: str, user_id: str):  # noqa: ANN202
+        return SimpleNamespace(id=book_id, user_id=user_id)
+
+    monkeypatch.setattr(service, "end_reading_session", end_session)
+    monkeypatch.setattr(service, "_get_book_or_404", get_book)
+
+    session = await service.start_reading_session(str(previous.user_id), str(previous.book_id))
+
+    assert ended == [(str(previous.id), 45000), (str(lost.id), 0)]
+    assert buffer.opened == [(session.id, None)]
+    assert session.is_active is True
+
+
+class FakePositions:
+    def __init__(self, owners: dict[str, str] | None = None):
+        self.owners = owners or {}
+
+    async def update(self, user_id: str, book_id: str, progress: float, **_fields) -> BufferedPosition | None:
+        owner = self.owners.get(book_id)
+        if owner is None:
+            raise BookOwnerUnknown()
+        if owner != user_id:
+            return None
+        data = {"progress": str(progress), "updated_ms": "1792310400000"}
+        return BufferedPosition.from_hash(user_id, book_id, data)
+
+    async def remember_owner(self, book_id: str, user_id: str) -> None:
+        self.owners[book_id] = user_id
+
+
+def test_position_flush_params_skip_expired():
+    """测试位置写回参数: 空字符串还原为 NULL，缓冲已过期的成员跳过"""
+    params = position_flush_params(
+        ["u1:b1", "u1:b2"],
+        [
+            {"progress": "0.5", "last_cfi": "", "last_page": "12", "total_pages": "", "device_id": "",
+             "finished_ms": "", "updated_ms": "1792310400000"},
+            {},
+        ],
+    )
+
+    assert params["user_ids"] == ["u1"]
+    assert params["book_ids"] == ["b1"]
+    assert params["progress"] == [0.5]
+    assert params["last_cfi"] == [None]
+    assert params["last_page"] == [12]
+    assert params["total_pages"] == [None]
+    assert params["finished_at"] == [None]
+    assert params["updated_at"] == [STARTED]
+
+
+async def test_position_update_uses_cached_owner():
+    """测试归属已缓存时位置更新不访问数据库；他人书籍返回 404"""
+    service = ReadingService(db=None, positions=FakePositions({"b1": "u1"}))
+
+    position = await service.update_position("u1", "b1", 0.42, last_cfi="epubcfi(/6/4)")
+    assert position.progress == 0.42
+
+    with pytest.raises(BookNotFoundException):
+        await service.update_position("u2", "b1", 0.1)
+
+
+async def test_position_update_resolves_unknown_owner(monkeypatch):
+    """测试归属未缓存时回源数据库校验并缓存归属"""
+    positions = FakePositions()
+    service = ReadingService(db=None, positions=positions)
+    checked: list[tuple[str, str]] = []
+
+    async def get_book(book_id: str, user_id: str):  # noqa: ANN202
+        checked.append((book_id, user_id))
+        if book_id != "b1":
+            raise BookNotFoundException()
+        return SimpleNamespace(id=book_id, user_id=user_id)
+
+    monkeypatch.setattr(service, "_get_book_or_404", get_book)
+
+    assert (await service.update_position("u1", "b1", 0.3)).progress == 0.3
+    assert positions.owners == {"b1": "u1"}
+    assert (await service.update_position("u1", "b1", 0.4)).progress == 0.4
+    assert checked == [("b1", "u1")]
+
+    with pytest.raises(BookNotFoundException):
+        await service.update_position("u1", "missing", 0.1)
@@ -0,0 +1,91 @@
+"""
+阅读时长汇总测试
+
+按用户本地日期拆分时长、跨午夜拆分、批量汇总分轮 (不连接数据库)。
+"""
+
+from datetime import UTC, date, datetime
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.reading_rollup import DailyRollup, split_by_local_day
+from app.services.reading_stats import DayDuration
+
+MINUTE = 60_000
+
+
+def test_split_within_one_day():
+    """测试同一本地日期内不拆分，日期取用户时区"""
+    start = datetime(2026, 10, 17, 16, 0, tzinfo=UTC)
+    end = datetime(2026, 10, 17, 16, 30, tzinfo=UTC)
+
+    # 上海 00:30，纽约 12:30
+    assert split_by_local_day(start, end, 20 * MINUTE, "Asia/Shanghai") == [(date(2026, 10, 18), 20 * MINUTE)]
+    assert split_by_local_day(start, end, 20 * MINUTE, "America/New_York") == [(date(2026, 10, 17), 20 * MINUTE)]
+
+
+def test_split_across_local_midnight():
+    """测试跨越本地午夜时按两侧实际时长拆分"""
+    # 上海 23:50 - 00:10
+    start = datetime(2026, 10, 17, 15, 50, tzinfo=UTC)
+    end = datetime(2026, 10, 17, 16, 10, tzinfo=UTC)
+
+    assert split_by_local_day(start, end, 20 * MINUTE, "Asia/Shanghai") == [
+        (date(2026, 10, 17), 10 * MINUTE),
+        (date(2026, 10, 18), 10 * MINUTE),
+    ]
+    # 暂停不计时: 15 分钟贴近最后活跃时间计算
+    assert split_by_local_day(start, end, 15 * MINUTE, "Asia/Shanghai") == [
+        (date(2026, 10, 17), 5 * MINUTE),
+        (date(2026, 10, 18), 10 * MINUTE),
+    ]
+
+
+def test_split_overflow_and_empty():
+    """测试时长超出区间时计入最早的一天，无增量时为空"""
+    start = datetime(2026, 10, 17, 15, 55, tzinfo=UTC)
+    end = datetime(2026, 10, 17, 16, 5, tzinfo=UTC)
+
+    assert split_by_local_day(start, end, 30 * MINUTE, "Asia/Shanghai") == [
+        (date(2026, 10, 17), 25 * MINUTE),
+        (date(2026, 10, 18), 5 * MINUTE),
+    ]
+    assert split_by_local_day(start, end, 0, "Asia/Shanghai") == []
+
+
+def test_split_ends_at_midnight():
+    """测试恰好在午夜结束的阅读属于前一天"""
+    start = datetime(2026, 10, 17, 15, 30, tzinfo=UTC)
+    end = datetime(2026, 10, 17, 16, 0, tzinfo=UTC)
+
+    assert split_by_local_day(start, end, 30 * MINUTE, "Asia/Shanghai") == [(date(2026, 10, 17), 30 * MINUTE)]
+
+
+def test_rollup_merges_and_rounds():
+    """测试同一 (用户, 日期) 合并，同一用户的多个日期分轮"""
+    rollup = DailyRollup()
+    before = datetime(2026, 10, 17, 15, 50, tzinfo=UTC)
+    after = datetime(2026, 10, 17, 16, 10, tzinfo=UTC)
+    rollup.add("u1", "Asia/Shanghai", before, after, 20 * MINUTE)
+    rollup.add("u1", "Asia/Shanghai", after, datetime(2026, 10, 17, 16, 20, tzinfo=UTC), 5 * MINUTE)
+    rollup.add("u2", "America/New_York", before, after, 20 * MINUTE)
+
+    assert rollup.rounds() == [
+        [DayDuration("u1", date(2026, 10, 17), 10 * MINUTE), DayDuration("u2", date(2026, 10, 17), 20 * MINUTE)],
+        [DayDuration("u1", date(2026, 10, 18), 15 * MINUTE)],
+    ]
+
+    # reading_daily 一条，快照与连续天数每轮各一条
+    statements = rollup.statements()
+    assert len(statements) == 5
+    daily = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, day) DO UPDATE" in daily
+
+
+def test_rollup_without_durations():
+    """测试没有增量时不产生语句"""
+    rollup = DailyRollup()
+    now = datetime(2026, 10, 18, tzinfo=UTC)
+    rollup.add("u1", None, now, now, 0)
+
+    assert rollup.statements() == []
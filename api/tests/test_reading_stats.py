@@ -0,0 +1,135 @@
+"""
+阅读统计快照测试
+
+快照 → 综合统计的周期判断、连续天数、本地日期、现算结果行还原为快照 (不连接数据库)。
+"""
+
+from datetime import UTC, date, datetime
+from types import SimpleNamespace
+
+from app.models.reading import ReadingStats
+from app.models.user import UserStreak
+from app.services.reading_stats import (
+    DEFAULT_TIMEZONE,
+    STATS_COLUMNS,
+    STREAK_COLUMNS,
+    build_stats,
+    current_streak,
+    live_stats,
+    local_day,
+    period_starts,
+    rebuild_stats,
+    rebuild_streaks,
+    stats_from_row,
+)
+
+# 2026-10-18 是周日
+TODAY = date(2026, 10, 18)
+
+
+def _snapshot(**overrides) -> ReadingStats:
+    week_start, month_start = period_starts(TODAY)
+    fields = {
+        "total_duration_ms": 9_000_000,
+        "finished_books": 4,
+        "last_active_day": TODAY,
+        "today_duration_ms": 600_000,
+        "week_start": week_start,
+        "week_duration_ms": 2_100_000,
+        "week_days_active": 3,
+        "month_start": month_start,
+        "month_duration_ms": 4_000_000,
+        "month_days_active": 8,
+        "month_books_finished": 2,
+    }
+    return ReadingStats(**(fields | overrides))
+
+
+def _streak(last_read_date: date = TODAY) -> UserStreak:
+    return UserStreak(current_streak=5, longest_streak=12, last_read_date=last_read_date)
+
+
+def test_period_starts():
+    """测试周从周一开始、月从 1 日开始"""
+    assert period_starts(TODAY) == (date(2026, 10, 12), date(2026, 10, 1))
+
+
+def test_build_stats_current_periods():
+    """测试当前周期内直接返回快照计数"""
+    stats = build_stats(_snapshot(), _streak(), total_books=7, today=TODAY)
+
+    assert stats["today"]["total_duration_ms"] == 600_000
+    assert stats["today"]["books_read"] == 1
+    assert stats["this_week"]["week_end"] == TODAY
+    assert stats["this_week"]["daily_average_ms"] == 300_000
+    assert stats["this_month"]["books_finished"] == 2
+    assert stats["streak_days"] == 5
+    assert stats["total_books"] == 7
+    assert stats["finished_books"] == 4
+
+
+def test_build_stats_expired_periods():
+    """测试周期已过的计数视为 0"""
+    yesterday = build_stats(_snapshot(last_active_day=date(2026, 10, 17)), None, 7, TODAY)
+    assert yesterday["today"]["total_duration_ms"] == 0
+
+    next_month = build_stats(_snapshot(), _streak(), 7, date(2026, 11, 2))
+    assert next_month["streak_days"] == 0
+    assert next_month["this_week"]["total_duration_ms"] == 0
+    assert next_month["this_month"]["books_finished"] == 0
+    assert next_month["total_duration_ms"] == 9_000_000
+
+
+def test_build_stats_without_snapshot():
+    """测试没有阅读记录的用户"""
+    stats = build_stats(None, None, total_books=2, today=TODAY)
+
+    assert stats["streak_days"] == 0
+    assert stats["this_month"]["days_active"] == 0
+    assert stats["total_books"] == 2
+
+
+def test_stats_from_row():
+    """测试 live_stats 结果行与快照返回同样的综合统计"""
+    snapshot = _snapshot()
+    streak = _streak()
+    row = SimpleNamespace(
+        user_id="u1",
+        total_books=7,
+        **{c: getattr(snapshot, c) for c in STATS_COLUMNS},
+        **{c: getattr(streak, c) for c in STREAK_COLUMNS},
+    )
+
+    stats, rebuilt_streak, total_books = stats_from_row(row)
+
+    assert total_books == 7
+    assert build_stats(stats, rebuilt_streak, total_books, TODAY) == build_stats(snapshot, streak, 7, TODAY)
+
+
+def test_current_streak():
+    """测试昨天读过时连续天数仍然有效，更早则中断"""
+    assert current_streak(_streak(), TODAY) == 5
+    assert current_streak(_streak(date(2026, 10, 17)), TODAY) == 5
+    assert current_streak(_streak(date(2026, 10, 16)), TODAY) == 0
+    assert current_streak(None, TODAY) == 0
+
+
+def test_local_day():
+    """测试按用户时区取本地日期，无效时区回退默认时区"""
+    late_night = datetime(2026, 10, 17, 17, 30, tzinfo=UTC)
+
+    assert local_day("Asia/Shanghai", late_night) == date(2026, 10, 18)
+    assert local_day("America/New_York", late_night) == date(2026, 10, 17)
+    assert local_day("Mars/Olympus", late_night) == date(2026, 10, 18)
+    assert local_day(None, late_night) == date(2026, 10, 18)
+
+
+def test_rebuild_periods_follow_user_timezone():
+    """测试现算/重建语句不绑定服务器日期，周期按一批用户各自的时区在语句内计算"""
+    for build in (live_stats, rebuild_stats, rebuild_streaks):
+        stmt = build(["u1", "u2"])
+        params = stmt.compile().params
+
+        assert params == {"user_ids": ["u1", "u2"], "default_timezone": DEFAULT_TIMEZONE}
+        assert "now() AT TIME ZONE COALESCE(z.name, :default_timezone)" in stmt.text
+        assert "finished_at >= t.month_started_at" in stmt.text
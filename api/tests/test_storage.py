@@ -0,0 +1,102 @@
+"""
+存储读取测试
+
+ObjectRangeReader 的块缓存与 Range 请求合并行为。
+"""
+
+import io
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+from app.services.storage_service import ObjectRangeReader
+from app.tasks.book_tasks import _read_pdf_metadata
+
+
+def _make_reader(data: bytes, block_size: int = 16, max_blocks: int = 4):
+    calls: list[tuple[int, int]] = []
+
+    def fetch(offset: int, length: int) -> bytes:
+        calls.append((offset, length))
+        return data[offset : offset + length]
+
+    reader = ObjectRangeReader(fetch, size=len(data), block_size=block_size, max_blocks=max_blocks)
+    return reader, calls
+
+
+def test_read_and_seek():
+    """测试顺序读取与 seek"""
+    data = bytes(range(100))
+    reader, _ = _make_reader(data)
+
+    assert reader.read(10) == data[:10]
+    assert reader.tell() == 10
+
+    reader.seek(-5, io.SEEK_END)
+    assert reader.read() == data[-5:]
+    assert reader.read(1) == b""
+
+    reader.seek(40)
+    assert reader.read(30) == data[40:70]
+
+
+def test_missing_blocks_are_coalesced():
+    """测试一次读取的连续缺失块合并为一个请求"""
+    data = bytes(range(100))
+    reader, calls = _make_reader(data)
+
+    reader.read(40)  # 块 0-2
+    assert calls == [(0, 48)]
+
+    reader.seek(0)
+    reader.read(40)  # 全部命中缓存
+    assert len(calls) == 1
+
+
+def test_large_read_bypasses_cache():
+    """测试超过缓存容量的读取直接透传"""
+    data = bytes(range(256))
+    reader, calls = _make_reader(data, max_blocks=2)
+
+    assert reader.read(100) == data[:100]
+    assert calls == [(0, 100)]
+    assert reader.bytes_fetched == 100
+
+
+def test_block_cache_is_bounded():
+    """测试块缓存 LRU 淘汰"""
+    data = bytes(range(256))
+    reader, calls = _make_reader(data, max_blocks=2)
+
+    reader.seek(0)
+    reader.read(1)
+    reader.seek(64)
+    reader.read(1)
+    reader.seek(128)
+    reader.read(1)  # 淘汰块 0
+
+    reader.seek(0)
+    reader.read(1)
+    assert len(calls) == 4
+    assert reader.bytes_fetched == 64
+
+
+def test_pdf_metadata_reads_only_tail():
+    """测试 PDF 元数据只读取文件尾部与少量对象"""
+    writer = PdfWriter()
+    for _ in range(3):
+        page = writer.add_blank_page(width=200, height=200)
+        # 每页填充大体积内容流，模拟扫描件
+        content = DecodedStreamObject()
+        content.set_data(b"% scan\n" * 64 * 1024)
+        page[NameObject("/Contents")] = writer._add_object(content)
+    writer.add_metadata({"/Title": "Athena", "/Author": "Tester"})
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    data = buffer.getvalue()
+
+    reader, _ = _make_reader(data, block_size=4096, max_blocks=16)
+    meta = _read_pdf_metadata(reader)
+
+    assert meta == {"page_count": 3, "title": "Athena", "author": "Tester"}
+    assert reader.bytes_fetched < len(data) // 10
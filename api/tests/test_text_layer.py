@@ -0,0 +1,126 @@
+"""
+PDF 文字层分析测试
+"""
+
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import DictionaryObject, NameObject
+
+from app.services.text_layer_service import (
+    MIN_SAMPLES,
+    PageCoverage,
+    analyze_text_layer,
+    sample_pages,
+    summarize,
+)
+
+
+def _write_pdf(path: Path, kinds: str) -> None:
+    """按字符生成页面: t=有字体资源的文字页, i=整页图片, b=空白页"""
+    image_pdf = BytesIO()
+    Image.new("L", (200, 300), color=200).save(image_pdf, format="PDF")
+    image_page = PdfReader(BytesIO(image_pdf.getvalue())).pages[0]
+
+    writer = PdfWriter()
+    for kind in kinds:
+        if kind == "i":
+            writer.add_page(image_page)
+            continue
+        page = PageObject.create_blank_page(width=200, height=300)
+        if kind == "t":
+            font = DictionaryObject(
+                {
+                    NameObject("/Type"): NameObject("/Font"),
+                    NameObject("/Subtype"): NameObject("/Type1"),
+                    NameObject("/BaseFont"): NameObject("/Helvetica"),
+                }
+            )
+            page[NameObject("/Resources")] = DictionaryObject(
+                {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+            )
+        writer.add_page(page)
+    with path.open("wb") as f:
+        writer.write(f)
+
+
+def test_sample_pages_small_document():
+    """测试页数少于上限时全部抽样"""
+    assert sorted(sample_pages(10)) == list(range(10))
+
+
+def test_sample_pages_spread_across_document():
+    """测试大文档抽样包含前几页、末页，且均匀分布"""
+    pages = sample_pages(1000)
+
+    assert len(pages) <= 24
+    assert {0, 1, 2, 999} <= set(pages)
+    ordered = sorted(pages)
+    assert max(b - a for a, b in zip(ordered, ordered[1:], strict=False)) < 1000 / 10
+    # 由粗到细: 最先评估的几页已覆盖前后两半
+    assert min(pages[:4]) < 500 < max(pages[:4])
+
+
+def test_page_kind():
+    """测试页面分类"""
+    assert PageCoverage(0, text=0.3, image=0.0, text_ops=40).kind == "text"
+    # 扫描页上的少量水印文字仍需 OCR
+    assert PageCoverage(0, text=0.005, image=0.95, text_ops=2).kind == "image"
+    # 已有不可见 OCR 文字层的扫描页
+    assert PageCoverage(0, text=0.4, image=1.0, text_ops=300).kind == "text"
+    assert PageCoverage(0, text=0.0, image=0.1, text_ops=0).kind == "blank"
+
+
+def test_summarize_confidence_ignores_blank_pages():
+    """测试置信度按文字页 / (文字页 + 扫描页) 计算"""
+    pages = [
+        PageCoverage(0, 0.3, 0.0, 10),
+        PageCoverage(5, 0.0, 1.0, 0),
+        PageCoverage(9, 0.0, 0.0, 0),
+        PageCoverage(3, 0.2, 0.0, 8),
+    ]
+
+    result = summarize(pages, page_count=10, method="test")
+
+    assert result["confidence"] == round(2 / 3, 4)
+    assert result["has_text_layer"] is True
+    assert result["image_pages"] == [5]
+    assert list(result["coverage"]) == ["0", "3", "5", "9"]
+
+
+def test_analyze_scanned_pdf(tmp_path: Path):
+    """测试整本扫描件"""
+    path = tmp_path / "scan.pdf"
+    _write_pdf(path, "iiiiii")
+
+    result = analyze_text_layer(path)
+
+    assert result["has_text_layer"] is False
+    assert result["confidence"] == 0.0
+    assert result["image_pages"] == [0, 1, 2, 3, 4, 5]
+
+
+def test_analyze_mixed_pdf_full(tmp_path: Path):
+    """测试逐页分析混合文档，只有图片页需要 OCR"""
+    path = tmp_path / "mixed.pdf"
+    _write_pdf(path, "ttitbtit")
+
+    result = analyze_text_layer(path, full=True)
+
+    assert result["has_text_layer"] is True
+    assert result["page_count"] == 8
+    assert result["sampled_pages"] == 8
+    assert result["image_pages"] == [2, 6]
+
+
+def test_sampling_stops_at_time_budget(tmp_path: Path):
+    """测试超出时间预算后停止抽样 (至少评估 MIN_SAMPLES 页)"""
+    path = tmp_path / "long.pdf"
+    _write_pdf(path, "t" * 60)
+
+    result = analyze_text_layer(path, time_budget_ms=0)
+
+    assert result["sampled_pages"] == MIN_SAMPLES
+    assert result["page_count"] == 60